@@ -7,9 +7,11 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from starlette_csrf import CSRFMiddleware
 from contextlib import asynccontextmanager
-from database import engine, Base, SessionLocal, get_db
+from database import engine, Base, SessionLocal, get_db, ensure_schema
 from config import settings
 import os
+import sys
+import asyncio
 import time
 import random
 import string
@@ -41,8 +43,9 @@ from app.routes.guide import router as guide_router
 from app.routes.shop_editor_ws import router as shop_editor_ws_router
 from app.routes.url_safety import router as url_safety_router
 from app.routes.search import router as search_router
-from app.models import User
 from app.utils.auth import verify_token
+from app.utils.auth_cache import load_user
+from app.utils.media_files import MediaFiles
 
 FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
 JS_DIR = FRONTEND_DIR / "js"
@@ -421,14 +424,44 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 async def lifespan(app: FastAPI):
     # 起動時にデータベーステーブルを作成
     Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
     # ラーメンデータをロード
     db = SessionLocal()
     try:
         load_ramen_data_on_startup(db)
     finally:
         db.close()
+    # 表示用（HTMLエスケープ済み）の列が空の行を埋める（列の追加直後や、ORM を通さずに追加された行）
+    from app.utils.display_text import backfill_display_text
+
+    backfill_display_text(engine)
+    # 重複判定用の列（本文ハッシュ・MinHash 署名）が空の投稿・返信を埋める
+    from app.utils.near_duplicate import backfill_signatures
+
+    backfill_signatures(engine)
+    # IP位置情報のローカルDBは、最初のチェックイン時ではなく起動時に読み込んでおく
+    from app.utils.ip_geolocation import ip_geolocator
+
+    await ip_geolocator.load_database()
+    # URLブロックリストの定期更新（更新は1プロセスだけが行い、他のワーカーはスナップショットを読む）
+    blocklist_task = None
+    interval = settings.URL_BLOCKLIST_REFRESH_INTERVAL_SECONDS
+    testing = str(settings.TESTING).lower() in ("1", "true") or "pytest" in sys.modules
+    if interval > 0 and not testing:
+        from app.utils.url_safety import url_blocklist_manager
+
+        blocklist_task = asyncio.create_task(url_blocklist_manager.run_refresh_loop(interval))
     yield
     # シャットダウン時の処理（必要に応じて）
+    if blocklist_task is not None:
+        blocklist_task.cancel()
+    await ip_geolocator.aclose()
+    from app.utils.transcode_pool import transcode_pool
+
+    transcode_pool.shutdown()
+    from app.utils.auth import password_pool
+
+    password_pool.shutdown()
 
 def create_app():
     """FastAPIアプリケーションファクトリー"""
@@ -489,6 +522,7 @@ def create_app():
     # 静的ファイルの提供設定（JSは専用エンドポイントで難読化）
     if settings.DEBUG:
         app.mount("/css", StaticFiles(directory="frontend/css", html=True), name="css")
+        app.mount("/uploads/media", MediaFiles(), name="media")
         app.mount("/uploads", StaticFiles(directory="uploads", html=True), name="uploads")
         app.mount("/assets", StaticFiles(directory="frontend/assets", html=True), name="assets")
     else:
@@ -504,6 +538,8 @@ def create_app():
                 return response
 
         app.mount("/css", StaticFilesWithCache(directory="frontend/css", html=True), name="css")
+        # 内容のハッシュで保存したメディアは専用の配信（/uploads より先にマッチさせる）
+        app.mount("/uploads/media", MediaFiles(), name="media")
         app.mount("/uploads", StaticFilesWithCache(directory="uploads", html=True), name="uploads")
         app.mount("/assets", StaticFilesWithCache(directory="frontend/assets", html=True), name="assets")
 
@@ -645,7 +681,7 @@ def create_app():
 
         db = SessionLocal()
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = load_user(db, user_id)
         finally:
             db.close()
 
@@ -668,7 +704,7 @@ def create_app():
 
         db = SessionLocal()
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = load_user(db, user_id)
             if not user or not getattr(user, "is_admin", False):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ページが見つかりません")
         finally:
@@ -689,7 +725,7 @@ def create_app():
 
         db = SessionLocal()
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = load_user(db, user_id)
             if not user or not getattr(user, "is_admin", False):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ページが見つかりません")
         finally:
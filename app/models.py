@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, Index, UniqueConstraint
+from sqlalchemy import BigInteger, Column, Integer, LargeBinary, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, backref
 from datetime import datetime, timezone
 from database import Base
@@ -34,6 +34,9 @@ class User(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(JST))
     bio = Column(Text, nullable=True)
     profile_image_url = Column(String(255), nullable=True)
+    # 表示用（HTMLエスケープ済み）の値。username・profile_image_url への代入時に app/utils/display_text.py が書く
+    username_html = Column(Text, nullable=True)
+    profile_image_url_html = Column(Text, nullable=True)
     points = Column(Integer, default=0, nullable=False)
     internal_score = Column(Integer, default=100, nullable=False)
     rank = Column(String(80), nullable=False, default='味覚ビギナー')
@@ -86,19 +89,36 @@ class User(Base):
 class Post(Base):
     """投稿モデル"""
     __tablename__ = 'posts'
+    __table_args__ = (
+        # スパム判定のバースト件数・完全重複の検索用
+        Index('ix_posts_user_created', 'user_id', 'created_at'),
+        Index('ix_posts_user_content_hash', 'user_id', 'content_hash'),
+    )
 
     id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
     user_id = Column(String(80), ForeignKey('users.id'), nullable=False)
     thumbnail_url = Column(String(255), nullable=True)  # 低画質画像URL
     original_image_url = Column(String(255), nullable=True)  # 通常画質画像URL
+    image_srcset = Column(Text, nullable=True)  # 幅ごとの画像の srcset（"URL 200w, URL 400w, ..."）
     video_url = Column(String(255), nullable=True)  # 動画URL
     video_duration = Column(Float, nullable=True)  # 動画再生時間（秒）
     shop_id = Column(Integer, ForeignKey('ramen_shops.id'), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(JST))
     is_shadow_banned = Column(Boolean, nullable=False, default=False, index=True)
     shadow_ban_reason = Column(Text, nullable=True)
+    # 表示用（HTMLエスケープ済み）の値。content・shadow_ban_reason への代入時に app/utils/display_text.py が書く
+    content_html = Column(Text, nullable=True)
+    shadow_ban_reason_html = Column(Text, nullable=True)
     spam_score = Column(Float, nullable=True, default=0.0)  # スパム検出スコア
+    # 完全重複検出用の正規化済み本文のハッシュと、近似重複検出用の MinHash 署名・LSH バンド
+    # （どちらも app/utils/near_duplicate.py で付与）
+    content_hash = Column(String(32), nullable=True)
+    minhash = Column(LargeBinary, nullable=True)
+    lsh_band0 = Column(BigInteger, nullable=True, index=True)
+    lsh_band1 = Column(BigInteger, nullable=True, index=True)
+    lsh_band2 = Column(BigInteger, nullable=True, index=True)
+    lsh_band3 = Column(BigInteger, nullable=True, index=True)
 
     # Relationships
     author = relationship('User', back_populates='posts')
@@ -144,6 +164,10 @@ class Like(Base):
 class Reply(Base):
     """返信モデル"""
     __tablename__ = 'replies'
+    __table_args__ = (
+        Index('ix_replies_user_created', 'user_id', 'created_at'),
+        Index('ix_replies_user_content_hash', 'user_id', 'content_hash'),
+    )
 
     id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
@@ -153,6 +177,16 @@ class Reply(Base):
     is_shadow_banned = Column(Boolean, nullable=False, default=False, index=True)
     shadow_ban_reason = Column(Text, nullable=True)
     parent_id = Column(Integer, ForeignKey('replies.id'), nullable=True)
+    # 表示用（HTMLエスケープ済み）の値（Post と同じ）
+    content_html = Column(Text, nullable=True)
+    shadow_ban_reason_html = Column(Text, nullable=True)
+    # 本文のハッシュと MinHash 署名・LSH バンド（Post と同じ）
+    content_hash = Column(String(32), nullable=True)
+    minhash = Column(LargeBinary, nullable=True)
+    lsh_band0 = Column(BigInteger, nullable=True, index=True)
+    lsh_band1 = Column(BigInteger, nullable=True, index=True)
+    lsh_band2 = Column(BigInteger, nullable=True, index=True)
+    lsh_band3 = Column(BigInteger, nullable=True, index=True)
 
     children = relationship('Reply', backref=backref('parent', remote_side=[id]), cascade='all, delete-orphan')
 
@@ -182,6 +216,9 @@ class RamenShop(Base):
     longitude = Column(Float, nullable=False, index=True)
     wait_time = Column(Integer, default=0)  # 待ち時間（分）
     last_update = Column(DateTime, default=lambda: datetime.now(JST))  # 最終更新時間
+    # 表示用（HTMLエスケープ済み）の値（Post と同じ）
+    name_html = Column(Text, nullable=True)
+    address_html = Column(Text, nullable=True)
 
     reviews = relationship('ShopReview', back_populates='shop', cascade='all, delete-orphan')
 
@@ -200,6 +237,7 @@ class ShopReview(Base):
     user_id = Column(String(80), ForeignKey('users.id'), nullable=False)
     rating = Column(Integer, nullable=False)
     comment = Column(Text, nullable=False)
+    comment_html = Column(Text, nullable=True)  # 表示用（HTMLエスケープ済み）の値（Post と同じ）
     created_at = Column(DateTime, default=lambda: datetime.now(JST))
     moderation_status = Column(String(20), nullable=False, default='approved')
     moderation_reason = Column(Text, nullable=True)
@@ -433,7 +471,9 @@ class UserLoginHistory(Base):
     """ユーザーログイン履歴モデル"""
     __tablename__ = 'user_login_history'
     __table_args__ = (
-        Index('ix_user_login_history_user_id', 'user_id'),
+        # ユーザーごとの最新の履歴を索引だけで引けるようにする
+        Index('ix_user_login_history_user_id_created_at', 'user_id', 'created_at'),
+        # 保持期間を過ぎた履歴の削除用
         Index('ix_user_login_history_created_at', 'created_at'),
     )
 
@@ -445,3 +485,44 @@ class UserLoginHistory(Base):
     
     # Relationships
     user = relationship('User', backref='login_history')
+
+
+class UserLastLogin(Base):
+    """ユーザーごとの最後にログインした端末（IP・UserAgent）
+
+    ログイン時の「前回と環境が違うか」の判定はこの1行だけを見る（履歴がどれだけ増えても主キーで1回引くだけ）。
+    """
+    __tablename__ = 'user_last_logins'
+
+    user_id = Column(String(80), ForeignKey('users.id'), primary_key=True)
+    ip_address = Column(String(45), nullable=False)
+    user_agent = Column(Text, nullable=True)
+    last_seen_at = Column(DateTime, default=lambda: datetime.now(JST))
+
+
+class MediaAsset(Base):
+    """アップロードされたメディアの実体（内容のハッシュをファイル名にして1つだけ保存する）
+
+    ref_count は投稿・来店記録・プロフィールアイコンから参照されている数（app/utils/media_store.py で更新）。
+    0 になったものはガベージコレクション（python -m app.utils.media_gc）で削除される。
+    """
+    __tablename__ = 'media_assets'
+
+    url = Column(String(255), primary_key=True)  # "/uploads/media/ab/cd/<sha256>.webp"
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(JST))
+    unreferenced_at = Column(DateTime, nullable=True, index=True)  # 参照が0になった時刻
+
+
+class MediaSource(Base):
+    """アップロードされた元ファイル（と変換設定）から、変換済みメディアへの対応
+
+    同じ写真が再びアップロードされた場合は、変換も書き込みもせずにこの結果を使う。
+    """
+    __tablename__ = 'media_sources'
+
+    source_key = Column(String(64), primary_key=True)  # 元ファイルと変換設定のハッシュ
+    kind = Column(String(20), nullable=False)  # post_image / profile_icon
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(JST))
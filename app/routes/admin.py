@@ -2,7 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 
 
@@ -31,24 +31,57 @@ from app.schemas import (
     ShopHistoryResponse,
 )
 from app.utils.auth import get_current_admin_user
+from app.utils.ai_gateway import ai_gateway
+from app.utils.metrics import latency_metrics
 from app.utils.scoring import compute_effective_account_status, update_user_account_status
 
 router = APIRouter(tags=["admin"], prefix="/admin")
 
 
-def _build_user_summary(db: Session, user: User) -> AdminUserSummary:
-    posts_count = db.query(func.count(Post.id)).filter(Post.user_id == user.id).scalar() or 0
-    reports_submitted = (
-        db.query(func.count(Report.id)).filter(Report.reporter_id == user.id).scalar() or 0
+def _grouped_count(key, counted, *criteria, join=None):
+    """key ごとの件数を返すサブクエリ（key・count の2列）"""
+    query = select(key.label("key"), func.count(counted).label("count"))
+    if join is not None:
+        query = query.join(*join)
+    return query.where(*criteria).group_by(key).subquery()
+
+
+def _query_user_summaries(db: Session, user_ids) -> List[AdminUserSummary]:
+    """user_ids（id 列だけのサブクエリ）のユーザーの概要を作る
+
+    投稿数・通報した数・通報された数は、対象ユーザーに絞って GROUP BY したサブクエリを
+    ユーザーに1回ずつ外部結合して求める（ユーザー数に関係なく1回のクエリで済む）。
+    """
+    ids = select(user_ids.c.id)
+    posts = _grouped_count(Post.user_id, Post.id, Post.user_id.in_(ids))
+    reports_made = _grouped_count(Report.reporter_id, Report.id, Report.reporter_id.in_(ids))
+    reports_received = _grouped_count(
+        Post.user_id, Report.id, Post.user_id.in_(ids), join=(Post, Post.id == Report.post_id)
     )
-    reports_received = (
-        db.query(func.count(Report.id))
-        .join(Post, Post.id == Report.post_id)
-        .filter(Post.user_id == user.id)
-        .scalar()
-        or 0
+
+    rows = (
+        db.query(
+            User,
+            func.coalesce(posts.c.count, 0),
+            func.coalesce(reports_made.c.count, 0),
+            func.coalesce(reports_received.c.count, 0),
+        )
+        .join(user_ids, user_ids.c.id == User.id)
+        .outerjoin(posts, posts.c.key == User.id)
+        .outerjoin(reports_made, reports_made.c.key == User.id)
+        .outerjoin(reports_received, reports_received.c.key == User.id)
+        .order_by(User.created_at.desc(), User.id)
+        .all()
     )
+    return [
+        _build_user_summary(user, posts_count, reports_submitted, reports_received)
+        for user, posts_count, reports_submitted, reports_received in rows
+    ]
 
+
+def _build_user_summary(
+    user: User, posts_count: int, reports_submitted: int, reports_received: int
+) -> AdminUserSummary:
     effective_status = compute_effective_account_status(user)
     update_user_account_status(user)
 
@@ -76,7 +109,7 @@ def _build_user_summary(db: Session, user: User) -> AdminUserSummary:
 
 
 def _build_user_detail(db: Session, user: User) -> AdminUserDetail:
-    summary = _build_user_summary(db, user)
+    summary = _query_user_summaries(db, db.query(User.id).filter(User.id == user.id).subquery())[0]
     followers_count = user.followers.count() if hasattr(user.followers, "count") else 0
     following_count = user.following.count() if hasattr(user.following, "count") else 0
     submissions_count = (
@@ -96,18 +129,33 @@ def _build_user_detail(db: Session, user: User) -> AdminUserDetail:
     )
 
 
-def _build_shop_summary(db: Session, shop: RamenShop) -> AdminShopSummary:
-    posts_count = db.query(func.count(Post.id)).filter(Post.shop_id == shop.id).scalar() or 0
-    pending_submissions = (
-        db.query(func.count(RamenShopSubmission.id))
-        .filter(
-            RamenShopSubmission.shop_id == shop.id,
-            RamenShopSubmission.status == "pending",
+def _query_shop_summaries(db: Session, shop_ids) -> List[AdminShopSummary]:
+    """shop_ids（id 列だけのサブクエリ）の店舗の概要を作る（件数は _query_user_summaries と同じく1回で求める）"""
+    ids = select(shop_ids.c.id)
+    posts = _grouped_count(Post.shop_id, Post.id, Post.shop_id.in_(ids))
+    pending_submissions = _grouped_count(
+        RamenShopSubmission.shop_id,
+        RamenShopSubmission.id,
+        RamenShopSubmission.shop_id.in_(ids),
+        RamenShopSubmission.status == "pending",
+    )
+
+    rows = (
+        db.query(
+            RamenShop,
+            func.coalesce(posts.c.count, 0),
+            func.coalesce(pending_submissions.c.count, 0),
         )
-        .scalar()
-        or 0
+        .join(shop_ids, shop_ids.c.id == RamenShop.id)
+        .outerjoin(posts, posts.c.key == RamenShop.id)
+        .outerjoin(pending_submissions, pending_submissions.c.key == RamenShop.id)
+        .order_by(RamenShop.name.asc(), RamenShop.id)
+        .all()
     )
+    return [_build_shop_summary(shop, posts_count, pending) for shop, posts_count, pending in rows]
+
 
+def _build_shop_summary(shop: RamenShop, posts_count: int, pending_submissions: int) -> AdminShopSummary:
     return AdminShopSummary(
         id=shop.id,
         name=shop.name,
@@ -125,7 +173,7 @@ def _build_shop_summary(db: Session, shop: RamenShop) -> AdminShopSummary:
 
 
 def _build_shop_detail(db: Session, shop: RamenShop) -> AdminShopDetail:
-    summary = _build_shop_summary(db, shop)
+    summary = _query_shop_summaries(db, db.query(RamenShop.id).filter(RamenShop.id == shop.id).subquery())[0]
     submissions_total = (
         db.query(func.count(RamenShopSubmission.id))
         .filter(RamenShopSubmission.shop_id == shop.id)
@@ -177,6 +225,21 @@ async def get_admin_overview(
     )
 
 
+@router.get("/metrics/latency")
+async def get_latency_metrics(
+    prefix: str = Query("", description="集計対象ラベルのプレフィックス（例: reply_create:）"),
+    _: User = Depends(get_current_admin_user),
+):
+    """処理段階ごとのレイテンシ（p50/p99）を返す"""
+    return {"metrics": latency_metrics.snapshot(prefix)}
+
+
+@router.get("/metrics/ai-gateway")
+async def get_ai_gateway_metrics(_: User = Depends(get_current_admin_user)):
+    """AIゲートウェイのエンドポイント種別ごとの呼び出し数・エラー数・遮断状態を返す"""
+    return {"endpoints": ai_gateway.stats()}
+
+
 @router.get("/users", response_model=AdminUserListResponse)
 async def list_users(
     search: Optional[str] = Query(None, description="ユーザーID・名前・メールでの検索"),
@@ -205,11 +268,15 @@ async def list_users(
 
     total = query.count()
 
-    users = (
-        query.order_by(User.created_at.desc()).offset(offset).limit(limit).all()
+    page = (
+        query.with_entities(User.id)
+        .order_by(User.created_at.desc(), User.id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
     )
 
-    summaries = [_build_user_summary(db, user) for user in users]
+    summaries = _query_user_summaries(db, page)
 
     return AdminUserListResponse(users=summaries, total=total)
 
@@ -317,11 +384,15 @@ async def list_shops(
         )
 
     total = query.count()
-    shops = (
-        query.order_by(RamenShop.name.asc()).offset(offset).limit(limit).all()
+    page = (
+        query.with_entities(RamenShop.id)
+        .order_by(RamenShop.name.asc(), RamenShop.id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
     )
 
-    summaries = [_build_shop_summary(db, shop) for shop in shops]
+    summaries = _query_shop_summaries(db, page)
     return AdminShopListResponse(shops=summaries, total=total)
 
 
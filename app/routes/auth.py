@@ -7,7 +7,17 @@ from functools import wraps
 from database import get_db
 from app.models import User
 from app.schemas import UserCreate, UserLogin, UserResponse, Token, EmailVerificationRequest
-from app.utils.auth import create_access_token, get_current_user, get_current_active_user, get_current_user_optional
+from app.utils.auth import (
+    create_access_token,
+    get_current_user,
+    get_current_active_user,
+    get_current_user_optional,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+)
+from app.utils.bounded_pool import PoolBusyError
+from app.utils.login_history import get_last_login, record_login
 from app.utils.security import validate_registration_data, validate_login_data
 from app.utils.rate_limiter import rate_limiter
 from app.utils.turnstile import verify_turnstile_token
@@ -15,6 +25,39 @@ from config import settings
 
 router = APIRouter(tags=["auth"])
 
+PASSWORD_BUSY_DETAIL = "ログインが混み合っています。しばらく時間をおいて再度お試しください。"
+
+
+def _password_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=PASSWORD_BUSY_DETAIL,
+        headers={"Retry-After": "2"},
+    )
+
+
+async def authenticate_user(db: Session, user_id: str, password: str) -> User:
+    """ID とパスワードを確かめてユーザーを返す（bcrypt は password_pool で計算する）
+
+    保存されているハッシュのコストが BCRYPT_ROUNDS と異なる場合は、平文を受け取っているこの時点で
+    新しいコストのハッシュに置き換える。
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    try:
+        if not user or not await verify_password_async(password, user.password_hash):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="ユーザーIDまたはパスワードが正しくありません",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = await get_password_hash_async(password)
+            db.commit()
+    except PoolBusyError:
+        raise _password_busy()
+    return user
+
+
 # CSRFチェックをスキップするデコレータ
 def skip_csrf_check(func):
     @wraps(func)
@@ -102,8 +145,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db), request
         username=None,
         email=user_data.email
     )
-    user.set_password(user_data.password)
-    
+    try:
+        user.password_hash = await get_password_hash_async(user_data.password)
+    except PoolBusyError:
+        raise _password_busy()
+
     try:
         db.add(user)
         db.commit()
@@ -156,20 +202,10 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db), request: R
     await ensure_turnstile(request, login_data.turnstile_token, client_ip)
     
     # ユーザー認証
-    user = db.query(User).filter(User.id == login_data.id).first()
-    
-    if not user or not user.check_password(login_data.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="ユーザーIDまたはパスワードが正しくありません",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user = await authenticate_user(db, login_data.id, login_data.password)
     
     # 前回のログイン情報を取得
-    from app.models import UserLoginHistory
-    last_login = db.query(UserLoginHistory).filter(
-        UserLoginHistory.user_id == user.id
-    ).order_by(UserLoginHistory.created_at.desc()).first()
+    last_login = get_last_login(db, user.id)
     
     # IPアドレスとUserAgentの変更をチェック
     requires_email_verification = False
@@ -181,12 +217,7 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db), request: R
             requires_email_verification = True
     
     # ログイン履歴を記録
-    login_history = UserLoginHistory(
-        user_id=user.id,
-        ip_address=client_ip,
-        user_agent=user_agent
-    )
-    db.add(login_history)
+    record_login(db, user.id, client_ip, user_agent, last_login)
     db.commit()
     
     # メールアドレス確認が必要な場合
@@ -268,14 +299,7 @@ async def verify_email_for_login(
     await ensure_turnstile(request, verification_data.turnstile_token, client_ip)
 
     # ユーザー認証
-    user = db.query(User).filter(User.id == verification_data.id).first()
-    
-    if not user or not user.check_password(verification_data.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="ユーザーIDまたはパスワードが正しくありません",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user = await authenticate_user(db, verification_data.id, verification_data.password)
     
     # メールアドレスの一致確認
     if user.email != verification_data.email:
@@ -293,19 +317,11 @@ async def verify_email_for_login(
     user_agent = request.headers.get("user-agent", "") if request else ""
     
     # ログイン履歴を記録（既に記録されている可能性があるが、確実に記録するため）
-    from app.models import UserLoginHistory
-    # 最新のログイン履歴が同じIP/UAでない場合のみ記録
-    last_login = db.query(UserLoginHistory).filter(
-        UserLoginHistory.user_id == user.id
-    ).order_by(UserLoginHistory.created_at.desc()).first()
+    # 前回のログインが同じIP/UAでない場合のみ記録
+    last_login = get_last_login(db, user.id)
     
     if not last_login or last_login.ip_address != client_ip or last_login.user_agent != user_agent:
-        login_history = UserLoginHistory(
-            user_id=user.id,
-            ip_address=client_ip,
-            user_agent=user_agent
-        )
-        db.add(login_history)
+        record_login(db, user.id, client_ip, user_agent, last_login)
         db.commit()
     
     # アクセストークンの発行
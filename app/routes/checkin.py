@@ -17,6 +17,7 @@ from app.schemas import (
     WaitTimeReportRequest, WaitTimeReportResponse
 )
 from app.utils.auth import get_current_active_user
+from app.utils.ip_geolocation import ip_geolocator
 from app.utils.scoring import award_points, ensure_user_can_contribute
 
 router = APIRouter(tags=["checkin"])
@@ -77,8 +78,8 @@ def _is_public_ip(value: str) -> bool:
     )
 
 
-def get_ip_location(request: Request) -> Optional[Dict[str, Any]]:
-    """IPアドレスから位置情報を取得"""
+async def get_ip_location(request: Request) -> Optional[Dict[str, Any]]:
+    """IPアドレスから位置情報を取得（ローカルDB → ipinfo.io の順。結果はIPごとにキャッシュ）"""
     try:
         # X-Forwarded-Forヘッダーをチェック
         forwarded_for = request.headers.get("X-Forwarded-For")
@@ -90,25 +91,7 @@ def get_ip_location(request: Request) -> Optional[Dict[str, Any]]:
         if not ip or not _is_public_ip(ip):
             return None
 
-        # ipinfo.ioを使用して位置情報を取得
-        import httpx
-
-        response = httpx.get(
-            f"https://ipinfo.io/{ip}/json",
-            timeout=httpx.Timeout(timeout=2.0, connect=2.0),
-            follow_redirects=False,
-        )
-        if response.status_code == 200:
-            data = response.json()
-            if 'loc' in data:
-                lat, lng = data['loc'].split(',')
-                return {
-                    'latitude': float(lat),
-                    'longitude': float(lng),
-                    'city': data.get('city'),
-                    'region': data.get('region'),
-                    'country': data.get('country')
-                }
+        return await ip_geolocator.locate(ip)
     except Exception as e:
         print(f"IP位置情報取得エラー: {e}")
 
@@ -280,7 +263,7 @@ async def get_nearby_shops_for_checkin(
     # IP位置情報の使用が許可されている場合
     elif request.include_ip_location:
         location_method = 'ip'
-        ip_location = get_ip_location(http_request)
+        ip_location = await get_ip_location(http_request)
         
         if ip_location:
             # IP位置情報から近隣店舗を検索
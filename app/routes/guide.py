@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request
 from pydantic import BaseModel
-from app.utils.ai_responder import ask_ai_guide
+from app.utils.ai_responder import ask_ai_guide, stream_ai_guide
 from app.utils.auth import get_current_user
 from app.models import User
 from app.utils.rate_limiter import rate_limiter
+from app.utils.sse import sse_response
 import re
+import time
 
 router = APIRouter()
 
@@ -25,12 +27,8 @@ MALICIOUS_PATTERNS = [
 
 MALICIOUS_REGEX = re.compile("|".join(MALICIOUS_PATTERNS), re.IGNORECASE)
 
-@router.post("/guide/ask")
-async def ask_guide_question(
-    request: Request,
-    body: GuideQuestion,
-    current_user: User = Depends(get_current_user)
-):
+async def _validate_guide_question(body: GuideQuestion, current_user: User) -> str:
+    """BAN・レート制限・空入力・プロンプトインジェクションを確認し、質問文を返す"""
     # BAN済みユーザーの拒否
     if current_user.is_banned:
         raise HTTPException(
@@ -40,6 +38,7 @@ async def ask_guide_question(
 
     # レート制限 (例: 1分間に5回まで)
     # キーを user_id + endpoint にすることでユーザーごとの制限にする
+    # ストリーミング版も同じキーを使い、合計で制限する
     rate_limit_key = f"guide_ask:{current_user.id}"
     await rate_limiter.hit(rate_limit_key, limit=5, window_seconds=60)
 
@@ -55,6 +54,25 @@ async def ask_guide_question(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="不適切な質問内容は受け付けられません。"
         )
+    return question
 
+@router.post("/guide/ask")
+async def ask_guide_question(
+    request: Request,
+    body: GuideQuestion,
+    current_user: User = Depends(get_current_user)
+):
+    question = await _validate_guide_question(body, current_user)
     answer = await ask_ai_guide(question)
     return {"answer": answer}
+
+@router.post("/guide/ask/stream")
+async def ask_guide_question_stream(
+    request: Request,
+    body: GuideQuestion,
+    current_user: User = Depends(get_current_user)
+):
+    """回答を Server-Sent Events で逐次返すエンドポイント"""
+    started_at = time.perf_counter()
+    question = await _validate_guide_question(body, current_user)
+    return sse_response(stream_ai_guide(question), "guide_ask_stream", started_at)
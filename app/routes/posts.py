@@ -2,19 +2,27 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, File, Uplo
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc, func, or_
 from typing import Dict, Any, List, Optional, Set
+import asyncio
 import re
-import shutil
 import os
-import time
 
 from database import get_db
 from app.models import Post, User, Like, Reply, RamenShop, Follow
 from app.schemas import PostCreate, PostResponse, PostsResponse
 from app.utils.auth import get_current_user, get_current_active_user, get_current_user_optional
 from app.utils.security import validate_post_content
-from app.utils.image_processor import process_image
-from app.utils.image_validation import validate_image_file
-from app.utils.video_validation import validate_video_file
+from app.utils.display_text import author_display_name, display_text, replies_response_data
+from app.utils.image_processor import process_image_async
+from app.utils.media_store import media_store, register_assets
+from app.utils.transcode_pool import TranscodeBusyError
+from app.utils.image_validation import (
+    IMAGE_TOO_LARGE_ERROR,
+    MAX_IMAGE_SIZE_BYTES,
+    validate_image_filename,
+    validate_image_upload,
+)
+from app.utils.upload_ingest import UploadTooLargeError, ingest_upload_async
+from app.utils.video_validation import probe_video_file, validate_video_file
 from app.utils.scoring import award_points, ensure_user_can_contribute
 from app.utils.rate_limiter import rate_limiter
 from app.utils.spam_detector import spam_detector
@@ -31,17 +39,47 @@ router = APIRouter(tags=["posts"])
 
 UPLOAD_DIR = "uploads"
 VIDEO_DIR = os.path.join(UPLOAD_DIR, "videos")
+VIDEO_EXTENSIONS = {"mp4": ".mp4", "mov": ".mov", "webm": ".webm"}
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(VIDEO_DIR, exist_ok=True)
 
 MENTION_PATTERN = re.compile(r"@([A-Za-z0-9_]{1,30})")
 
+
+def _post_response_data(post: Post, likes_count: int, replies: List[Reply], is_liked: bool) -> Dict[str, Any]:
+    """PostResponse に渡す値（文字列は書き込み時に作った表示用の値を使う）"""
+    author = post.author
+    shop = post.shop
+    return {
+        "id": post.id,
+        "content": display_text(post, "content"),
+        "user_id": post.user_id,
+        # username は任意入力のため None の場合は id をフォールバック
+        "author_username": author_display_name(author),
+        "author_profile_image_url": display_text(author, "profile_image_url"),
+        "thumbnail_url": post.thumbnail_url,
+        "original_image_url": post.original_image_url,
+        "image_srcset": post.image_srcset,
+        "video_url": post.video_url,
+        "video_duration": post.video_duration,
+        "shop_id": post.shop_id,
+        "shop_name": display_text(shop, "name") if shop else None,
+        "shop_address": display_text(shop, "address") if shop else None,
+        "created_at": post.created_at,
+        "likes_count": likes_count,
+        "replies_count": len(replies),
+        "replies": replies_response_data(replies),
+        "is_liked_by_current_user": is_liked,
+        "is_shadow_banned": post.is_shadow_banned,
+        "shadow_ban_reason": display_text(post, "shadow_ban_reason"),
+    }
+
 @router.post("/posts", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
 async def create_post(
     content: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     video: Optional[UploadFile] = File(None),
-    video_duration: Optional[float] = Form(None),
+    video_duration: Optional[float] = Form(None),  # 互換のため受け付けるが使わない（長さはサーバー側で読み取る）
     shop_id: Optional[int] = Form(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -114,12 +152,19 @@ async def create_post(
     image_url = None
     thumbnail_url = None
     original_image_url = None
+    image_srcset = None
     video_url = None
     processed_video_duration: Optional[float] = None
     
     if image:
-        # ファイルバリデーション
-        validation_result = validate_image_file(image)
+        # ファイル名を確認してから、本体を1回だけ読み込む（以降は同じバッファを使う）
+        validation_result = validate_image_filename(image.filename)
+        if validation_result["is_valid"]:
+            try:
+                upload = await ingest_upload_async(image, MAX_IMAGE_SIZE_BYTES)
+                validation_result = validate_image_upload(upload)
+            except UploadTooLargeError:
+                validation_result = {"is_valid": False, "error": IMAGE_TOO_LARGE_ERROR}
         if not validation_result["is_valid"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -128,7 +173,7 @@ async def create_post(
         
         # 画像処理（WebP変換とリサイズ）
         try:
-            thumbnail_url, original_image_url = process_image(image, current_user.id)
+            thumbnail_url, original_image_url, image_srcset = await process_image_async(upload, current_user.id, db)
             
             if not thumbnail_url or not original_image_url:
                 raise HTTPException(
@@ -136,6 +181,12 @@ async def create_post(
                     detail="画像の処理に失敗しました"
                 )
             
+        except TranscodeBusyError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="画像の処理が混み合っています。しばらく時間をおいて再度お試しください。",
+                headers={"Retry-After": "5"},
+            )
         except Exception as e:
             print(f"画像処理エラー: {e}")
             raise HTTPException(
@@ -151,59 +202,34 @@ async def create_post(
                 detail=validation_result["error"]
             )
 
-        if video_duration is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="動画の長さを指定してください"
-            )
-
-        try:
-            processed_video_duration = float(video_duration)
-        except (TypeError, ValueError):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="動画の長さが不正です"
-            )
-
-        if processed_video_duration <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="動画の長さが不正です"
-            )
-
-        if processed_video_duration > 10:
+        # 長さはクライアントの申告（video_duration）ではなく、コンテナのヘッダーから読む
+        validation_result = await asyncio.to_thread(probe_video_file, video)
+        if not validation_result["is_valid"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="動画は10秒以内にしてください"
+                detail=validation_result["error"]
             )
-
-        original_filename = os.path.basename(video.filename) if video.filename else "video.mp4"
-        name, ext = os.path.splitext(original_filename)
-        if not ext:
-            ext = ".mp4"
-        safe_name = "".join(c for c in name if c.isalnum() or c in ('-', '_')) or "video"
-        timestamp = int(time.time())
-        video_filename = f"{current_user.id}_{safe_name}_{timestamp}{ext}"
-        video_path = os.path.join(VIDEO_DIR, video_filename)
+        video_info = validation_result["info"]
+        processed_video_duration = round(video_info.duration, 3)
+        ext = VIDEO_EXTENSIONS[video_info.container]
 
         try:
-            video.file.seek(0)
-            with open(video_path, "wb") as buffer:
-                shutil.copyfileobj(video.file, buffer)
+            # 内容のハッシュで保存する（同じ動画が既にあれば書き込まない）
+            video_url = await asyncio.to_thread(media_store.put_stream, video.file, ext)
+            register_assets(db, [video_url])
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="動画の保存に失敗しました"
             )
 
-        video_url = f"/uploads/videos/{video_filename}"
-
     try:
         post = Post(
             content=sanitized_content,
             user_id=current_user.id,
             thumbnail_url=thumbnail_url,
             original_image_url=original_image_url,
+            image_srcset=image_srcset,
             video_url=video_url,
             video_duration=processed_video_duration,
             shop_id=shop_id,
@@ -315,7 +341,8 @@ async def create_post(
         else:
             print(f"投稿ID {post.id} はモデレーション対象外です")
 
-        return post
+        # 作成直後の投稿にはいいね・返信がまだない（AI の返信はバックグラウンドで後から付く）
+        return _post_response_data(post, likes_count=0, replies=[], is_liked=False)
         
     except Exception as e:
         db.rollback()
@@ -446,28 +473,12 @@ async def get_posts(
                 if not reply.is_shadow_banned
                 or (current_user and reply.user_id == current_user.id)
             ]
-            response_data = {
-                "id": post.id,
-                "content": post.content,
-                "user_id": post.user_id,
-                # username は任意入力のため None の場合は id をフォールバック
-                "author_username": post.author.username or post.author.id,
-                "author_profile_image_url": post.author.profile_image_url,
-                "thumbnail_url": post.thumbnail_url,
-                "original_image_url": post.original_image_url,
-                "video_url": post.video_url,
-                "video_duration": post.video_duration,
-                "shop_id": post.shop_id,
-                "shop_name": post.shop.name if post.shop else None,
-                "shop_address": post.shop.address if post.shop else None,
-                "created_at": post.created_at,
-                "likes_count": likes_map.get(post.id, 0),
-                "replies_count": len(visible_replies),
-                "replies": visible_replies,
-                "is_liked_by_current_user": post.id in liked_post_ids,
-                "is_shadow_banned": post.is_shadow_banned,
-                "shadow_ban_reason": post.shadow_ban_reason,
-            }
+            response_data = _post_response_data(
+                post,
+                likes_count=likes_map.get(post.id, 0),
+                replies=visible_replies,
+                is_liked=post.id in liked_post_ids,
+            )
             post_responses.append(PostResponse.model_validate(response_data))
         
         return PostsResponse(
@@ -526,28 +537,12 @@ async def get_post(
         or (current_user and reply.user_id == current_user.id)
     ]
 
-    response_data = {
-        "id": post.id,
-        "content": post.content,
-        "user_id": post.user_id,
-        # username は任意入力のため None の場合は id をフォールバック
-        "author_username": post.author.username or post.author.id,
-        "author_profile_image_url": post.author.profile_image_url,
-        "thumbnail_url": post.thumbnail_url,
-        "original_image_url": post.original_image_url,
-        "video_url": post.video_url,
-        "video_duration": post.video_duration,
-        "shop_id": post.shop_id,
-        "shop_name": post.shop.name if post.shop else None,
-        "shop_address": post.shop.address if post.shop else None,
-        "created_at": post.created_at,
-        "likes_count": likes_count,
-        "replies_count": len(visible_replies),
-        "replies": visible_replies,
-        "is_liked_by_current_user": is_liked,
-        "is_shadow_banned": post.is_shadow_banned,
-        "shadow_ban_reason": post.shadow_ban_reason,
-    }
+    response_data = _post_response_data(
+        post,
+        likes_count=likes_count,
+        replies=visible_replies,
+        is_liked=is_liked,
+    )
     
     return PostResponse.model_validate(response_data)
 
@@ -642,28 +637,12 @@ async def get_user_posts(
                 if not reply.is_shadow_banned
                 or (current_user and reply.user_id == current_user.id)
             ]
-            response_data = {
-                "id": post.id,
-                "content": post.content,
-                "user_id": post.user_id,
-                # username は任意入力のため None の場合は id をフォールバック
-                "author_username": post.author.username or post.author.id,
-                "author_profile_image_url": post.author.profile_image_url,
-                "thumbnail_url": post.thumbnail_url,
-                "original_image_url": post.original_image_url,
-                "video_url": post.video_url,
-                "video_duration": post.video_duration,
-                "shop_id": post.shop_id,
-                "shop_name": post.shop.name if post.shop else None,
-                "shop_address": post.shop.address if post.shop else None,
-                "created_at": post.created_at,
-                "likes_count": likes_map.get(post.id, 0),
-                "replies_count": len(visible_replies),
-                "replies": visible_replies,
-                "is_liked_by_current_user": post.id in liked_post_ids,
-                "is_shadow_banned": post.is_shadow_banned,
-                "shadow_ban_reason": post.shadow_ban_reason,
-            }
+            response_data = _post_response_data(
+                post,
+                likes_count=likes_map.get(post.id, 0),
+                replies=visible_replies,
+                is_liked=post.id in liked_post_ids,
+            )
             post_responses.append(PostResponse.model_validate(response_data))
         
         return PostsResponse(
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional, Tuple
 import math
+import time
 
 from datetime import datetime, timedelta, timezone
 
@@ -10,8 +11,9 @@ from database import get_db
 from app.models import RamenShop, Checkin, User
 from app.schemas import RamenShopResponse, RamenShopsResponse
 from app.utils.auth import get_current_user
-from app.utils.ai_responder import ask_shop_question
+from app.utils.ai_responder import ask_shop_question, stream_shop_question
 from app.utils.rate_limiter import rate_limiter
+from app.utils.sse import sse_response
 
 router = APIRouter(tags=["ramen"])
 
@@ -302,15 +304,14 @@ MALICIOUS_PATTERNS = [
 MALICIOUS_REGEX = re.compile("|".join(MALICIOUS_PATTERNS), re.IGNORECASE)
 
 
-@router.post("/ramen/{shop_id}/ask")
-async def ask_shop_ai_question(
+async def _prepare_shop_question(
     shop_id: int,
     body: ShopQuestion,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """店舗についてAIに質問するエンドポイント"""
-    
+    current_user: User,
+    db: Session,
+) -> Tuple[str, dict]:
+    """BAN・レート制限・入力チェックを行い、質問文と店舗情報を返す"""
+
     # BAN済みユーザーの拒否
     if current_user.is_banned:
         raise HTTPException(
@@ -318,7 +319,7 @@ async def ask_shop_ai_question(
             detail="アカウントの利用が制限されています。"
         )
     
-    # レート制限 (1分間に5回まで)
+    # レート制限 (1分間に5回まで、ストリーミング版と合算)
     rate_limit_key = f"shop_ask:{current_user.id}"
     await rate_limiter.hit(rate_limit_key, limit=5, window_seconds=60)
     
@@ -349,6 +350,30 @@ async def ask_shop_ai_question(
         "closed_day": shop.closed_day or "不明",
         "seats": shop.seats or "不明"
     }
-    
+    return question, shop_info
+
+
+@router.post("/ramen/{shop_id}/ask")
+async def ask_shop_ai_question(
+    shop_id: int,
+    body: ShopQuestion,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """店舗についてAIに質問するエンドポイント"""
+    question, shop_info = await _prepare_shop_question(shop_id, body, current_user, db)
     answer = await ask_shop_question(question, shop_info)
     return {"answer": answer}
+
+
+@router.post("/ramen/{shop_id}/ask/stream")
+async def ask_shop_ai_question_stream(
+    shop_id: int,
+    body: ShopQuestion,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """店舗についての質問への回答を Server-Sent Events で逐次返すエンドポイント"""
+    started_at = time.perf_counter()
+    question, shop_info = await _prepare_shop_question(shop_id, body, current_user, db)
+    return sse_response(stream_shop_question(question, shop_info), "shop_ask_stream", started_at)
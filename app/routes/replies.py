@@ -1,15 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import time
 
 from database import get_db
 from app.models import Reply, Post, User
 from app.schemas import ReplyCreate, ReplyResponse
 from app.utils.auth import get_current_active_user, get_current_user_optional
 from app.utils.security import validate_reply_content
+from app.utils.display_text import replies_response_data, reply_response_data
 from app.utils.scoring import ensure_user_can_contribute
 from app.utils.rate_limiter import rate_limiter
 from app.utils.spam_detector import spam_detector
+from app.utils.metrics import latency_metrics
+from app.utils.moderation_tasks import (
+    REPLY_TIER_ASYNC,
+    REPLY_TIER_SYNC,
+    REPLY_VIOLATION_CONFIDENCE,
+    schedule_reply_moderation,
+    select_reply_moderation_tier,
+)
 
 router = APIRouter(tags=["replies"])
 
@@ -25,72 +35,95 @@ async def create_reply_for_post(
     NOTE:
     - 投稿(create_post)では app.utils.moderation_tasks.schedule_post_moderation() による
       非同期AIモデレーションを行っている。
-    - 返信も同様にAIモデレーション対象とするため、ここでコンテンツモデレータを呼び出し、
-      違反と高信頼度で判断された場合はシャドウバンではなく即座に違反扱いとして保存しない。
+    - 返信は spam_detector のスコアとユーザーの internal_score から審査段階を決める
+      (select_reply_moderation_tier)。
+      - sync : 保存前にコンテンツモデレータを呼び出し、違反と高信頼度で判断された場合は
+               シャドウバンではなく即座に違反扱いとして保存しない。
+      - async: 即時保存・公開し、バックグラウンドで審査して違反なら非表示にする。
+      - none : 明らかに問題のない信頼ユーザーの返信は審査しない。
+    - 段階ごとのレイテンシは latency_metrics に "reply_create:<tier>" として記録する
+      （段階の決定後にエラーで返したリクエストも含む）。
     """
-    ensure_user_can_contribute(current_user)
-    await rate_limiter.hit(f"reply:{current_user.id}", limit=20, window_seconds=60)
-
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-
-    # 返信内容のバリデーションとサニタイズ
-    errors, sanitized_content = validate_reply_content(reply_data.content)
-    if errors:
-        error_messages = [message for _, message in errors.items()]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_messages[0] if error_messages else "返信内容に誤りがあります"
-        )
-
-    # スパム検知（従来どおり）
-    spam_result = spam_detector.evaluate_reply(db, current_user.id, sanitized_content, post_id)
-    is_shadow_banned = spam_result.is_spam
-    shadow_ban_reason = " / ".join(spam_result.reasons) if spam_result.reasons else None
-
-    # Geminiモデレーションによる追加チェック
-    # - APIキー未設定 or エラー時は is_violation=False で返る実装なので安全側に倒れる
-    from app.utils.content_moderator import content_moderator
-
+    started_at = time.perf_counter()
+    tier = None
     try:
-        analysis = await content_moderator.analyze_content(
-            sanitized_content,
-            reason="reply_creation",
-            user_history=""
+        ensure_user_can_contribute(current_user)
+        await rate_limiter.hit(f"reply:{current_user.id}", limit=20, window_seconds=60)
+
+        post = db.query(Post).filter(Post.id == post_id).first()
+        if not post:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+
+        # 返信内容のバリデーションとサニタイズ
+        errors, sanitized_content = validate_reply_content(reply_data.content)
+        if errors:
+            error_messages = [message for _, message in errors.items()]
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=error_messages[0] if error_messages else "返信内容に誤りがあります"
+            )
+
+        # スパム検知（従来どおり）
+        spam_result = spam_detector.evaluate_reply(db, current_user.id, sanitized_content, post_id)
+        is_shadow_banned = spam_result.is_spam
+        shadow_ban_reason = " / ".join(spam_result.reasons) if spam_result.reasons else None
+
+        tier = select_reply_moderation_tier(
+            spam_result.score,
+            spam_result.is_spam,
+            current_user.internal_score,
         )
-    except Exception:
-        analysis = {"is_violation": False, "confidence": 0.0}
 
-    if analysis.get("is_violation") and analysis.get("confidence", 0) >= 0.7:
-        # 明確な違反コンテンツと判断された場合は保存せずエラーとして返す
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="コミュニティガイドラインに違反する可能性が高いため、返信を投稿できません"
+        if tier == REPLY_TIER_SYNC:
+            # Geminiモデレーションによる追加チェック
+            # - APIキー未設定 or エラー時は is_violation=False で返る実装なので安全側に倒れる
+            from app.utils.content_moderator import content_moderator
+
+            try:
+                analysis = await content_moderator.analyze_content(
+                    sanitized_content,
+                    reason="reply_creation",
+                    user_history=""
+                )
+            except Exception:
+                analysis = {"is_violation": False, "confidence": 0.0}
+
+            if analysis.get("is_violation") and analysis.get("confidence", 0) >= REPLY_VIOLATION_CONFIDENCE:
+                # 明確な違反コンテンツと判断された場合は保存せずエラーとして返す
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="コミュニティガイドラインに違反する可能性が高いため、返信を投稿できません"
+                )
+
+        # 親返信の検証
+        parent_id = reply_data.parent_id
+        if parent_id:
+            parent_reply = db.query(Reply).filter(Reply.id == parent_id).first()
+            if not parent_reply:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent reply not found")
+            if parent_reply.post_id != post_id:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent reply does not belong to this post")
+
+        reply = Reply(
+            content=sanitized_content,
+            user_id=current_user.id,
+            post_id=post_id,
+            parent_id=parent_id,
+            is_shadow_banned=is_shadow_banned,
+            shadow_ban_reason=shadow_ban_reason
         )
 
-    # 親返信の検証
-    parent_id = reply_data.parent_id
-    if parent_id:
-        parent_reply = db.query(Reply).filter(Reply.id == parent_id).first()
-        if not parent_reply:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent reply not found")
-        if parent_reply.post_id != post_id:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent reply does not belong to this post")
-
-    reply = Reply(
-        content=sanitized_content,
-        user_id=current_user.id,
-        post_id=post_id,
-        parent_id=parent_id,
-        is_shadow_banned=is_shadow_banned,
-        shadow_ban_reason=shadow_ban_reason
-    )
-
-    db.add(reply)
-    db.commit()
-    db.refresh(reply)
-    return reply
+        db.add(reply)
+        db.commit()
+        db.refresh(reply)
+
+        if tier == REPLY_TIER_ASYNC:
+            await schedule_reply_moderation(reply.id, sanitized_content, db)
+
+        return reply_response_data(reply)
+    finally:
+        if tier is not None:
+            latency_metrics.observe(f"reply_create:{tier}", time.perf_counter() - started_at)
 
 @router.get("/posts/{post_id}/replies", response_model=List[ReplyResponse])
 async def get_replies_for_post(
@@ -110,7 +143,7 @@ async def get_replies_for_post(
         or (current_user and reply.user_id == current_user.id)
     ]
 
-    return visible_replies
+    return replies_response_data(visible_replies)
 
 
 @router.delete("/replies/{reply_id}", response_model=dict)
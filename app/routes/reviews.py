@@ -11,6 +11,7 @@ from app.utils.auth import get_current_active_user, get_current_user_optional
 from app.utils.scoring import ensure_user_can_contribute, award_points
 from app.utils.rate_limiter import rate_limiter
 from app.utils.content_moderator import content_moderator
+from app.utils.display_text import review_response_data
 
 router = APIRouter(tags=["shop_reviews"])
 
@@ -87,7 +88,7 @@ async def create_shop_review(
 
     db.commit()
     db.refresh(review)
-    return review
+    return review_response_data(review)
 
 
 @router.get(
@@ -154,7 +155,7 @@ async def list_shop_reviews(
             user_review_id = user_review[0]
 
     return ShopReviewListResponse(
-        reviews=reviews,
+        reviews=[review_response_data(review) for review in reviews],
         total=total,
         average_rating=average_rating,
         rating_distribution=rating_distribution,
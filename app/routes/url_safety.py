@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
-from app.utils.url_safety import URLBlocklistManager, URLSafetyResponse
+from app.utils.url_safety import URLSafetyResponse, url_blocklist_manager
 
 router = APIRouter()
 
-# シングルトンインスタンス
-url_blocklist_manager = URLBlocklistManager()
+# バッチチェックで一度に受け付けるURLの上限
+MAX_BATCH_URLS = 100
 
 class URLSafetyRequest(BaseModel):
     url: str
@@ -18,6 +18,12 @@ class URLSafetyResult(BaseModel):
     matched_domain: Optional[str] = None
     source: Optional[str] = None
 
+class URLSafetyBatchRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_URLS)
+
+class URLSafetyBatchResult(BaseModel):
+    results: Dict[str, URLSafetyResult]
+
 @router.post("/api/url-safety-check", response_model=URLSafetyResult)
 async def check_url_safety(request: URLSafetyRequest):
     """
@@ -40,21 +46,30 @@ async def check_url_safety(request: URLSafetyRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"URL安全性チェック中にエラーが発生しました: {str(e)}")
 
+@router.post("/api/url-safety-check/batch", response_model=URLSafetyBatchResult)
+async def check_url_safety_batch(request: URLSafetyBatchRequest):
+    """
+    複数URLの安全性をまとめてチェックするAPIエンドポイント
+
+    タイムラインなどリンクの多いページを1回のリクエストで確認するためのもの。
+    同じドメインのURLは1回だけ照合し、結果はURLをキーにして返す。
+    """
+    try:
+        await url_blocklist_manager.ensure_loaded()
+        results = url_blocklist_manager.check_urls(request.urls)
+        return URLSafetyBatchResult(
+            results={url: URLSafetyResult(**result.model_dump()) for url, result in results.items()}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"URL安全性チェック中にエラーが発生しました: {str(e)}")
+
 @router.get("/api/url-safety-check/status")
 async def get_blocklist_status():
     """
     ブロックリストのステータスを取得するAPIエンドポイント
     """
     try:
-        phishing_count = len(url_blocklist_manager._cache.get("phishing", set()))
-        urlhaus_count = len(url_blocklist_manager._cache.get("urlhaus", set()))
-        
-        return {
-            "loaded": url_blocklist_manager._loaded,
-            "expire_at": url_blocklist_manager._expire_at,
-            "phishing_domains": phishing_count,
-            "urlhaus_domains": urlhaus_count,
-            "total_domains": phishing_count + urlhaus_count
-        }
+        # 件数に加えて、索引のメモリ使用量（バイト）も返す
+        return url_blocklist_manager.stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"ステータス取得中にエラーが発生しました: {str(e)}")
\ No newline at end of file
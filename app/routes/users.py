@@ -18,8 +18,15 @@ from app.schemas import (
     UserUpdate,
 )
 from app.utils.auth import get_current_user, get_current_user_optional
-from app.utils.image_processor import process_profile_icon
-from app.utils.image_validation import validate_image_file
+from app.utils.image_processor import process_profile_icon_async
+from app.utils.transcode_pool import TranscodeBusyError
+from app.utils.image_validation import (
+    IMAGE_TOO_LARGE_ERROR,
+    MAX_IMAGE_SIZE_BYTES,
+    validate_image_filename,
+    validate_image_upload,
+)
+from app.utils.upload_ingest import UploadTooLargeError, ingest_upload_async
 from app.utils.achievements import (
     build_default_title_catalog,
     get_recent_titles,
@@ -270,15 +277,27 @@ async def upload_profile_icon(
 ):
     """プロフィールアイコンをアップロードして更新する"""
 
-    validation = validate_image_file(icon)
+    validation = validate_image_filename(icon.filename)
+    if validation["is_valid"]:
+        try:
+            upload = await ingest_upload_async(icon, MAX_IMAGE_SIZE_BYTES)
+            validation = validate_image_upload(upload)
+        except UploadTooLargeError:
+            validation = {"is_valid": False, "error": IMAGE_TOO_LARGE_ERROR}
     if not validation["is_valid"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=validation["error"]
         )
 
-    icon.file.seek(0)
-    icon_url = process_profile_icon(icon, current_user.id)
+    try:
+        icon_url = await process_profile_icon_async(upload, current_user.id, db=db)
+    except TranscodeBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="画像の処理が混み合っています。しばらく時間をおいて再度お試しください。",
+            headers={"Retry-After": "5"},
+        )
     if not icon_url:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -273,6 +273,10 @@ class ReplyCreate(ReplyBase):
         return v
 
 class ReplyResponse(ReplyBase):
+    """返信のレスポンス
+
+    文字列は表示用（HTMLエスケープ済み）の値を渡す（app/utils/display_text.py の reply_response_data）。
+    """
     model_config = ConfigDict(from_attributes=True)
 
     id: int
@@ -285,22 +289,6 @@ class ReplyResponse(ReplyBase):
     is_shadow_banned: bool = False
     shadow_ban_reason: Optional[str] = None
 
-    @field_serializer('content')
-    def serialize_content(self, value):
-        return escape_html(value)
-
-    @field_serializer('author_username')
-    def serialize_author_username(self, value):
-        return escape_html(value)
-
-    @field_serializer('author_profile_image_url')
-    def serialize_author_profile_image_url(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('shadow_ban_reason')
-    def serialize_shadow_ban_reason(self, value):
-        return escape_html(value) if value else value
-
 # Like Schemas
 class LikeResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -324,6 +312,11 @@ class PostCreate(PostBase):
         return v
 
 class PostResponse(PostBase):
+    """投稿のレスポンス
+
+    文字列は表示用（HTMLエスケープ済み）の値を渡す（app/utils/display_text.py）。
+    画像・動画の URL はサーバーがメディアストアのパスとして生成するため、エスケープの必要がない。
+    """
     model_config = ConfigDict(from_attributes=True)
 
     id: int
@@ -333,6 +326,7 @@ class PostResponse(PostBase):
     image_url: Optional[str] = None  # 後方互換性のために残す
     thumbnail_url: Optional[str] = None  # 低画質画像URL
     original_image_url: Optional[str] = None  # 通常画質画像URL
+    image_srcset: Optional[str] = None  # 幅ごとの画像の srcset
     video_url: Optional[str] = None  # 動画URL
     video_duration: Optional[float] = None  # 動画再生時間（秒）
     shop_id: Optional[int] = None
@@ -346,46 +340,6 @@ class PostResponse(PostBase):
     is_shadow_banned: bool = False
     shadow_ban_reason: Optional[str] = None
 
-    @field_serializer('content')
-    def serialize_content(self, value):
-        return escape_html(value)
-    
-    @field_serializer('author_username')
-    def serialize_author_username(self, value):
-        return escape_html(value)
-
-    @field_serializer('author_profile_image_url')
-    def serialize_author_profile_image_url(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('image_url')
-    def serialize_image_url(self, value):
-        return escape_html(value) if value else value
-    
-    @field_serializer('thumbnail_url')
-    def serialize_thumbnail_url(self, value):
-        return escape_html(value) if value else value
-    
-    @field_serializer('original_image_url')
-    def serialize_original_image_url(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('shop_name')
-    def serialize_shop_name(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('shadow_ban_reason')
-    def serialize_shadow_ban_reason(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('shop_address')
-    def serialize_shop_address(self, value):
-        return escape_html(value) if value else value
-
-    @field_serializer('video_url')
-    def serialize_video_url(self, value):
-        return escape_html(value) if value else value
-
 class PostsResponse(BaseModel):
     posts: List[PostResponse]
     total: int
@@ -433,6 +387,7 @@ class ShopReviewCreate(ShopReviewBase):
 
 
 class ShopReviewResponse(ShopReviewBase):
+    """レビューのレスポンス（comment は表示用（HTMLエスケープ済み）の値を渡す）"""
     model_config = ConfigDict(from_attributes=True)
 
     id: int
@@ -443,10 +398,6 @@ class ShopReviewResponse(ShopReviewBase):
     author_profile_image_url: Optional[str] = None
     moderation_status: str
 
-    @field_serializer('comment')
-    def serialize_comment(self, value: str) -> str:
-        return escape_html(value)
-
 
 class ShopReviewListResponse(BaseModel):
     reviews: List[ShopReviewResponse]
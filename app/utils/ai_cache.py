@@ -0,0 +1,160 @@
+"""AI応答（モデレーション判定・ガイド回答）のコンテンツハッシュキャッシュ"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.utils.spam_detector import spam_detector
+
+
+def build_cache_key(variant: str, *parts: Optional[str]) -> str:
+    """正規化済みの内容とプロンプト種別からキャッシュキーを作る
+
+    正規化は SpamDetector._normalize（NFKC・ゼロ幅文字除去・空白の畳み込み）を使うため、
+    全角/半角や空白だけが異なる重複投稿も同じキーになる。
+    """
+    hasher = hashlib.sha256(variant.encode("utf-8"))
+    for part in parts:
+        hasher.update(b"\x00")
+        hasher.update(spam_detector._normalize(part or "").encode("utf-8"))
+    return f"{variant}:{hasher.hexdigest()}"
+
+
+class AIResponseCache:
+    """TTL と LRU 退避を備えたインメモリキャッシュ（SQLite への永続化は任意）
+
+    - max_entries を超えたら最も古く参照されたエントリから退避する
+    - db_path を指定すると書き込みを SQLite にも保存し、メモリにない場合はそこから読み戻す
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            self._open_store(db_path)
+
+    def _open_store(self, db_path: str) -> None:
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+                " cache_name TEXT NOT NULL,"
+                " cache_key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (cache_name, cache_key))"
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as exc:
+            print(f"AIキャッシュの永続化ストアを開けませんでした: {exc}")
+            self._conn = None
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            stored = self._load(key, now)
+            if stored is None:
+                self.misses += 1
+                return None
+            value, expires_at = stored
+            self._store_memory(key, value, expires_at)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_memory(key, value, expires_at)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO ai_response_cache (cache_name, cache_key, value, expires_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (self.name, key, json.dumps(value, ensure_ascii=False), expires_at),
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as exc:
+                    print(f"AIキャッシュの永続化に失敗しました: {exc}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM ai_response_cache WHERE cache_name = ?", (self.name,))
+                self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """期限切れエントリを削除し、削除件数を返す"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            removed = len(expired)
+            if self._conn is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM ai_response_cache WHERE cache_name = ? AND expires_at <= ?",
+                    (self.name, now),
+                )
+                self._conn.commit()
+                removed += cursor.rowcount or 0
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent": self._conn is not None,
+            }
+
+    def _store_memory(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE cache_name = ? AND cache_key = ?",
+                (self.name, key),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row or row[1] <= now:
+            return None
+        return json.loads(row[0]), row[1]
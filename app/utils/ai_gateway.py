@@ -0,0 +1,349 @@
+"""Gemini 呼び出しを一元管理する共有ゲートウェイ
+
+- genai.Client をプロセス内で1つだけ生成し、接続を再利用する
+- 全体の同時実行数と、エンドポイント種別ごとの同時実行数・トークンバケットで流量を制御する
+  （モデレーションの急増がガイドや店舗Q&Aを枯渇させない、またその逆も起きないようにする）
+- 429/5xx はバックオフ付きで再試行し、連続失敗時はサーキットブレーカーで一時遮断する
+- レイテンシは latency_metrics に "ai_gateway:<endpoint>" として記録する
+  （ストリーミングは最初のチャンクまでの時間を "ai_gateway_ttfb:<endpoint>" として別途記録する）
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from google import genai
+from google.genai import errors as genai_errors
+
+from app.utils.metrics import latency_metrics
+from config import settings
+
+ENDPOINT_MODERATION = "moderation"
+ENDPOINT_GUIDE = "guide"
+ENDPOINT_SHOP_QA = "shop_qa"
+ENDPOINT_REPLY = "reply"
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AIGatewayError(Exception):
+    """ゲートウェイが呼び出しを拒否した場合の例外"""
+
+
+class AIQuotaExceeded(AIGatewayError):
+    """エンドポイントのクォータを待機時間内に確保できなかった"""
+
+
+class AICircuitOpen(AIGatewayError):
+    """連続失敗によりエンドポイントが一時遮断されている"""
+
+
+@dataclass
+class EndpointPolicy:
+    """エンドポイント種別ごとの流量制御設定"""
+    requests_per_minute: float
+    burst: int
+    max_concurrency: int
+    # クォータ待ちの上限（秒）。対話系は短く、バックグラウンド審査は長めに待つ
+    max_wait_seconds: float
+
+
+class TokenBucket:
+    """一定レートで補充されるトークンバケット"""
+
+    def __init__(self, rate_per_second: float, capacity: int) -> None:
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self._updated_at, 0.0)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+        self._updated_at = now
+
+    def try_acquire(self) -> float:
+        """トークンを1つ取得する。取得できれば 0、できなければ補充までの待ち秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            if self.rate_per_second <= 0:
+                return float("inf")
+            return (1 - self._tokens) / self.rate_per_second
+
+    async def acquire(self, max_wait_seconds: float) -> bool:
+        deadline = time.monotonic() + max_wait_seconds
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class CircuitBreaker:
+    """連続失敗回数でオープンし、一定時間後に1件だけ試行を許すサーキットブレーカー"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                return False
+            if self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """上流の健全性と無関係な理由で試行が終わった場合に試行枠を戻す"""
+        with self._lock:
+            self._trial_in_progress = False
+
+
+def _is_upstream_failure(exc: BaseException) -> bool:
+    """上流（Gemini）の不調とみなす例外か判定する"""
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _default_policies() -> Dict[str, EndpointPolicy]:
+    return {
+        ENDPOINT_MODERATION: EndpointPolicy(
+            requests_per_minute=settings.AI_RPM_MODERATION,
+            burst=max(int(settings.AI_RPM_MODERATION), 1),
+            max_concurrency=4,
+            max_wait_seconds=30.0,
+        ),
+        ENDPOINT_GUIDE: EndpointPolicy(
+            requests_per_minute=settings.AI_RPM_GUIDE,
+            burst=max(int(settings.AI_RPM_GUIDE // 2), 1),
+            max_concurrency=3,
+            max_wait_seconds=2.0,
+        ),
+        ENDPOINT_SHOP_QA: EndpointPolicy(
+            requests_per_minute=settings.AI_RPM_SHOP_QA,
+            burst=max(int(settings.AI_RPM_SHOP_QA // 2), 1),
+            max_concurrency=3,
+            max_wait_seconds=2.0,
+        ),
+        ENDPOINT_REPLY: EndpointPolicy(
+            requests_per_minute=settings.AI_RPM_REPLY,
+            burst=max(int(settings.AI_RPM_REPLY // 2), 1),
+            max_concurrency=2,
+            max_wait_seconds=10.0,
+        ),
+    }
+
+
+class AIGateway:
+    """共有 genai.Client と流量制御・サーキットブレーカー・計測をまとめたゲートウェイ"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        policies: Optional[Dict[str, EndpointPolicy]] = None,
+        max_retries: int = 2,
+        retry_base_delay_seconds: float = 0.5,
+    ) -> None:
+        self.max_concurrency = max_concurrency or settings.AI_MAX_CONCURRENCY
+        self.policies = policies or _default_policies()
+        self.max_retries = max_retries
+        self.retry_base_delay_seconds = retry_base_delay_seconds
+        self._buckets = {
+            name: TokenBucket(policy.requests_per_minute / 60.0, policy.burst)
+            for name, policy in self.policies.items()
+        }
+        self._breakers = {name: CircuitBreaker() for name in self.policies}
+        self._counters: Dict[str, Dict[str, int]] = {
+            name: {"requests": 0, "errors": 0, "rejected": 0, "retries": 0} for name in self.policies
+        }
+        # asyncio.Semaphore はイベントループに紐づくため、ループごとに作り直す
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[genai.Client] = None
+        self._client_key: Optional[str] = None
+        self._client_lock = threading.Lock()
+
+    def get_client(self) -> Optional[genai.Client]:
+        """APIキーに対応する共有クライアントを返す（未設定なら None）"""
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            return None
+        with self._client_lock:
+            if self._client is None or self._client_key != api_key:
+                self._client = genai.Client(api_key=api_key)
+                self._client_key = api_key
+            return self._client
+
+    def _get_semaphores(self, endpoint: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphores = {"__global__": asyncio.Semaphore(self.max_concurrency)}
+            for name, policy in self.policies.items():
+                self._semaphores[name] = asyncio.Semaphore(policy.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphores["__global__"], self._semaphores[endpoint]
+
+    async def _admit(self, endpoint: str, client: Any) -> Any:
+        """サーキットブレーカーとクォータを確認し、呼び出しに使うクライアントを返す"""
+        if endpoint not in self.policies:
+            raise ValueError(f"未知のAIエンドポイントです: {endpoint}")
+
+        client = client or self.get_client()
+        if client is None:
+            raise AIGatewayError("APIキーが設定されていません")
+
+        counters = self._counters[endpoint]
+        breaker = self._breakers[endpoint]
+        if not breaker.allow():
+            counters["rejected"] += 1
+            raise AICircuitOpen(f"{endpoint} へのAI呼び出しは一時的に停止しています")
+
+        policy = self.policies[endpoint]
+        if not await self._buckets[endpoint].acquire(policy.max_wait_seconds):
+            counters["rejected"] += 1
+            breaker.release_trial()
+            raise AIQuotaExceeded(f"{endpoint} のAI呼び出し上限に達しました")
+        return client
+
+    async def generate_content(self, endpoint: str, client: Any = None, **kwargs: Any) -> Any:
+        """client.aio.models.generate_content を流量制御付きで呼び出す
+
+        client を省略した場合は共有クライアントを使う。
+        """
+        client = await self._admit(endpoint, client)
+        global_semaphore, endpoint_semaphore = self._get_semaphores(endpoint)
+        async with endpoint_semaphore:
+            async with global_semaphore:
+                return await self._call_with_retry(endpoint, client, kwargs)
+
+    async def stream_content(self, endpoint: str, client: Any = None, **kwargs: Any) -> AsyncIterator[str]:
+        """client.aio.models.generate_content_stream を流量制御付きで呼び出し、テキスト片を順に返す
+
+        同時実行枠はストリームを読み終えるまで保持する。
+        再試行はストリームを開くまで（最初のチャンクを返す前）に限り、途中で失敗した場合はそのまま例外を送出する。
+        """
+        client = await self._admit(endpoint, client)
+        counters = self._counters[endpoint]
+        breaker = self._breakers[endpoint]
+        global_semaphore, endpoint_semaphore = self._get_semaphores(endpoint)
+        async with endpoint_semaphore:
+            async with global_semaphore:
+                started_at = time.perf_counter()
+                stream = await self._call_with_retry(
+                    endpoint, client, kwargs, method="generate_content_stream"
+                )
+                first_chunk = True
+                try:
+                    async for chunk in stream:
+                        text = getattr(chunk, "text", None)
+                        if not text:
+                            continue
+                        if first_chunk:
+                            latency_metrics.observe(
+                                f"ai_gateway_ttfb:{endpoint}", time.perf_counter() - started_at
+                            )
+                            first_chunk = False
+                        yield text
+                except Exception as exc:
+                    counters["errors"] += 1
+                    if _is_upstream_failure(exc):
+                        breaker.record_failure()
+                    raise
+
+    async def _call_with_retry(
+        self,
+        endpoint: str,
+        client: Any,
+        kwargs: Dict[str, Any],
+        method: str = "generate_content",
+    ) -> Any:
+        counters = self._counters[endpoint]
+        breaker = self._breakers[endpoint]
+        call = getattr(client.aio.models, method)
+        attempt = 0
+        while True:
+            counters["requests"] += 1
+            started_at = time.perf_counter()
+            try:
+                response = await call(**kwargs)
+            except Exception as exc:
+                latency_metrics.observe(f"ai_gateway:{endpoint}", time.perf_counter() - started_at)
+                counters["errors"] += 1
+                if not _is_upstream_failure(exc):
+                    breaker.release_trial()
+                    raise
+                if attempt >= self.max_retries:
+                    breaker.record_failure()
+                    raise
+                attempt += 1
+                counters["retries"] += 1
+                await asyncio.sleep(self.retry_base_delay_seconds * (2 ** (attempt - 1)))
+                continue
+
+            latency_metrics.observe(f"ai_gateway:{endpoint}", time.perf_counter() - started_at)
+            breaker.record_success()
+            return response
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for name in self.policies:
+            result[name] = {
+                **self._counters[name],
+                "circuit": self._breakers[name].state,
+                "tokens_available": round(self._buckets[name].available, 2),
+                "latency": latency_metrics.summary(f"ai_gateway:{name}"),
+                "ttfb": latency_metrics.summary(f"ai_gateway_ttfb:{name}"),
+            }
+        return result
+
+
+ai_gateway = AIGateway()
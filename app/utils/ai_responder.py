@@ -1,29 +1,59 @@
 """AIレスポンダー関連のユーティリティ"""
 from __future__ import annotations
 
+import json
 import os
 import random
 import secrets
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from google import genai
 from google.genai import types
 from sqlalchemy.orm import Session
 
 from app.models import User
+from app.utils.ai_cache import AIResponseCache, build_cache_key
+from app.utils.ai_gateway import ENDPOINT_GUIDE, ENDPOINT_REPLY, ENDPOINT_SHOP_QA, ai_gateway
 from app.utils.auth import get_password_hash
+from config import settings
 
 AI_USER_ID = "jirok"
 AI_USER_EMAIL = "jirok@jirotter.local"
 AI_USER_DISPLAY_NAME = "Jirok"
 
+AI_UNAVAILABLE_MESSAGE = "申し訳ありません。現在AI機能は利用できません。"
+AI_EMPTY_ANSWER_MESSAGE = "申し訳ありません。回答を生成できませんでした。"
+AI_ERROR_MESSAGE = "申し訳ありません。エラーが発生しました。"
+
+GUIDE_SYSTEM_INSTRUCTION = (
+    "あなたはラーメン二郎の初心者向けガイドAIです。"
+    "ユーザーからの質問に対して、二郎のルール、マナー、用語などを優しく解説してください。"
+    "初心者にもわかりやすい言葉を選び、威圧感を与えないようにしてください。"
+    "もし二郎に関係のない質問が来た場合は、丁寧に「ラーメン二郎に関する質問をお願いします」と返してください。"
+)
+
+SHOP_SYSTEM_INSTRUCTION = (
+    "あなたはラーメン二郎・二郎系ラーメン店に精通したフレンドリーなアシスタントです。"
+    "提供された店舗情報を参考にして、ユーザーの質問に丁寧に回答してください。"
+    "店舗固有のルールや注意点がある場合は、一般的な二郎系店舗の情報も踏まえて回答してください。"
+    "初心者にもわかりやすい言葉を選び、威圧感を与えないようにしてください。"
+    "回答は簡潔で実用的な内容を心がけてください。"
+    "もし店舗やラーメンに関係のない質問が来た場合は、丁寧に「この店舗やラーメンに関する質問をお願いします」と返してください。"
+)
+
 
 class GeminiResponder:
     """Gemini API を用いた返信生成ヘルパー"""
 
-    def __init__(self) -> None:
+    def __init__(self, cache: Optional[AIResponseCache] = None) -> None:
         self.api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=self.api_key) if self.api_key else None
+        self.client = ai_gateway.get_client()
+        # よくある質問への回答を再生成しないためのキャッシュ
+        self.cache = cache or AIResponseCache(
+            "ai_answer",
+            max_entries=settings.AI_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.AI_ANSWER_CACHE_TTL_SECONDS,
+            db_path=settings.AI_CACHE_DB_PATH or None,
+        )
 
     async def generate(self, post_content: str, author_id: str) -> str:
         """Gemini で返信を生成し、失敗時はフォールバックを返す"""
@@ -35,7 +65,9 @@ class GeminiResponder:
         prompt = _build_prompt(post_content, author_id)
 
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_REPLY,
+                self.client,
                 model="gemini-flash-latest",
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -61,82 +93,167 @@ class GeminiResponder:
     async def ask_guide(self, question: str) -> str:
         """ガイド用の質問に回答する"""
         if not self.client:
-            return "申し訳ありません。現在AI機能は利用できません。"
+            return AI_UNAVAILABLE_MESSAGE
+
+        cache_key = build_cache_key("guide:v1", question)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_GUIDE,
+                self.client,
                 model="gemini-flash-latest",
                 contents=question,
-                config=types.GenerateContentConfig(
-                    system_instruction=(
-                        "あなたはラーメン二郎の初心者向けガイドAIです。"
-                        "ユーザーからの質問に対して、二郎のルール、マナー、用語などを優しく解説してください。"
-                        "初心者にもわかりやすい言葉を選び、威圧感を与えないようにしてください。"
-                        "もし二郎に関係のない質問が来た場合は、丁寧に「ラーメン二郎に関する質問をお願いします」と返してください。"
-                    ),
-                    temperature=0.7,
-                    response_mime_type="text/plain",
-                ),
+                config=_answer_config(GUIDE_SYSTEM_INSTRUCTION),
             )
 
             if response and response.text:
-                return response.text.strip()
+                answer = response.text.strip()
+                self.cache.set(cache_key, answer)
+                return answer
             
-            return "申し訳ありません。回答を生成できませんでした。"
+            return AI_EMPTY_ANSWER_MESSAGE
 
         except Exception as exc:
             print(f"AIガイド回答生成中にエラーが発生しました: {exc}")
-            return "申し訳ありません。エラーが発生しました。"
+            return AI_ERROR_MESSAGE
 
     async def ask_about_shop(self, question: str, shop_info: dict) -> str:
         """店舗情報をコンテキストとして含めて質問に回答する"""
         if not self.client:
-            return "申し訳ありません。現在AI機能は利用できません。"
+            return AI_UNAVAILABLE_MESSAGE
 
-        # 店舗情報をコンテキストとして構築
-        shop_context = f"""
-【店舗情報】
-店名: {shop_info.get('name', '不明')}
-住所: {shop_info.get('address', '不明')}
-営業時間: {shop_info.get('business_hours', '不明')}
-定休日: {shop_info.get('closed_day', '不明')}
-座席: {shop_info.get('seats', '不明')}
-
-【ユーザーの質問】
-{question}
-"""
+        cache_key = _shop_cache_key(question, shop_info)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_SHOP_QA,
+                self.client,
                 model="gemini-flash-latest",
-                contents=shop_context,
-                config=types.GenerateContentConfig(
-                    system_instruction=(
-                        "あなたはラーメン二郎・二郎系ラーメン店に精通したフレンドリーなアシスタントです。"
-                        "提供された店舗情報を参考にして、ユーザーの質問に丁寧に回答してください。"
-                        "店舗固有のルールや注意点がある場合は、一般的な二郎系店舗の情報も踏まえて回答してください。"
-                        "初心者にもわかりやすい言葉を選び、威圧感を与えないようにしてください。"
-                        "回答は簡潔で実用的な内容を心がけてください。"
-                        "もし店舗やラーメンに関係のない質問が来た場合は、丁寧に「この店舗やラーメンに関する質問をお願いします」と返してください。"
-                    ),
-                    temperature=0.7,
-                    response_mime_type="text/plain",
-                ),
+                contents=_build_shop_context(question, shop_info),
+                config=_answer_config(SHOP_SYSTEM_INSTRUCTION),
             )
 
             if response and response.text:
-                return response.text.strip()
+                answer = response.text.strip()
+                self.cache.set(cache_key, answer)
+                return answer
             
-            return "申し訳ありません。回答を生成できませんでした。"
+            return AI_EMPTY_ANSWER_MESSAGE
 
         except Exception as exc:
             print(f"店舗AI回答生成中にエラーが発生しました: {exc}")
-            return "申し訳ありません。エラーが発生しました。"
+            return AI_ERROR_MESSAGE
+
+    def stream_guide(self, question: str) -> AsyncIterator[str]:
+        """ガイド用の質問への回答を生成されたそばから返す"""
+        return self._stream_answer(
+            ENDPOINT_GUIDE,
+            question,
+            GUIDE_SYSTEM_INSTRUCTION,
+            build_cache_key("guide:v1", question),
+        )
+
+    def stream_about_shop(self, question: str, shop_info: dict) -> AsyncIterator[str]:
+        """店舗についての質問への回答を生成されたそばから返す"""
+        return self._stream_answer(
+            ENDPOINT_SHOP_QA,
+            _build_shop_context(question, shop_info),
+            SHOP_SYSTEM_INSTRUCTION,
+            _shop_cache_key(question, shop_info),
+        )
+
+    async def _stream_answer(
+        self,
+        endpoint: str,
+        contents: str,
+        system_instruction: str,
+        cache_key: str,
+    ) -> AsyncIterator[str]:
+        """回答をストリーミング生成する
+
+        キャッシュ済みの回答は1チャンクで返し、生成し終えた回答は非ストリーミング版と同じキーでキャッシュする。
+        最初のチャンクより前の失敗は定型文で返し、途中で失敗した場合は例外をそのまま送出する
+        （呼び出し側で回答が途切れたことを通知するため）。
+        """
+        if not self.client:
+            yield AI_UNAVAILABLE_MESSAGE
+            return
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            async for text in ai_gateway.stream_content(
+                endpoint,
+                self.client,
+                model="gemini-flash-latest",
+                contents=contents,
+                config=_answer_config(system_instruction),
+            ):
+                # 先頭の空白は非ストリーミング版の strip() に合わせて落とす
+                if not parts:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                parts.append(text)
+                yield text
+        except Exception as exc:
+            print(f"AI回答のストリーミング生成中にエラーが発生しました ({endpoint}): {exc}")
+            if parts:
+                raise
+            yield AI_ERROR_MESSAGE
+            return
+
+        answer = "".join(parts).strip()
+        if answer:
+            self.cache.set(cache_key, answer)
+        else:
+            yield AI_EMPTY_ANSWER_MESSAGE
 
 
 _responder = GeminiResponder()
 
 
+def _answer_config(system_instruction: str) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        temperature=0.7,
+        response_mime_type="text/plain",
+    )
+
+
+def _build_shop_context(question: str, shop_info: dict) -> str:
+    return f"""
+【店舗情報】
+店名: {shop_info.get('name', '不明')}
+住所: {shop_info.get('address', '不明')}
+営業時間: {shop_info.get('business_hours', '不明')}
+定休日: {shop_info.get('closed_day', '不明')}
+座席: {shop_info.get('seats', '不明')}
+
+【ユーザーの質問】
+{question}
+"""
+
+
+def _shop_cache_key(question: str, shop_info: dict) -> str:
+    # 店舗情報が変われば別の回答になるよう、店舗コンテキストもキーに含める
+    return build_cache_key(
+        "shop:v1",
+        json.dumps(shop_info, ensure_ascii=False, sort_keys=True, default=str),
+        question,
+    )
+
+
 def _build_prompt(post_content: str, author_id: str) -> str:
     base_content = (post_content or "").strip()
     addressee = f"{author_id}さん" if author_id else "お客様"
@@ -219,3 +336,13 @@ async def ask_ai_guide(question: str) -> str:
 async def ask_shop_question(question: str, shop_info: dict) -> str:
     """店舗情報をコンテキストとして含めてAI回答を生成する。"""
     return await _responder.ask_about_shop(question, shop_info)
+
+
+def stream_ai_guide(question: str) -> AsyncIterator[str]:
+    """ガイドへの質問に対するAI回答を逐次返す。"""
+    return _responder.stream_guide(question)
+
+
+def stream_shop_question(question: str, shop_info: dict) -> AsyncIterator[str]:
+    """店舗情報をコンテキストとして含めたAI回答を逐次返す。"""
+    return _responder.stream_about_shop(question, shop_info)
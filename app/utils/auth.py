@@ -1,3 +1,4 @@
+import os
 from datetime import datetime, timedelta, timezone
 from app.models import JST
 from typing import Optional, Union
@@ -10,42 +11,69 @@ from config import settings
 from database import get_db
 from app.models import User
 from app.utils.scoring import compute_effective_account_status
+from app.utils.auth_cache import auth_cache, load_user
+from app.utils.bounded_pool import BoundedPool
 
 # HTTPBearerスキームのインスタンス
 security = HTTPBearer(auto_error=False)
 
+def _password_bytes(password: Union[str, bytes]) -> bytes:
+    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+    # bcryptは72バイトまでしかサポートしないため、超過分は切り捨て
+    return password_bytes[:72]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """パスワードの検証"""
     if not hashed_password:
         return False
 
     try:
-        plain_bytes = plain_password.encode('utf-8') if isinstance(plain_password, str) else plain_password
+        plain_bytes = _password_bytes(plain_password)
         hash_bytes = hashed_password.encode('utf-8') if isinstance(hashed_password, str) else hashed_password
     except Exception:
         return False
 
-    # bcryptは72バイトまでしかサポートしないため、超過分は切り捨て
-    if len(plain_bytes) > 72:
-        plain_bytes = plain_bytes[:72]
-
     try:
         return bcrypt.checkpw(plain_bytes, hash_bytes)
     except ValueError:
         # ハッシュ形式が不正な場合など
         return False
 
-def get_password_hash(password: str) -> str:
-    """パスワードのハッシュ化"""
-    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
-
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """パスワードのハッシュ化（rounds を省略すると BCRYPT_ROUNDS）"""
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
     return hashed.decode('utf-8')
 
+def password_hash_rounds(hashed_password: str) -> Optional[int]:
+    """bcrypt ハッシュ（$2b$12$...）のコストを返す。bcrypt の形式でなければ None"""
+    parts = (hashed_password or "").split("$")
+    if len(parts) != 4 or parts[1] not in ("2a", "2b", "2y") or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """保存されているハッシュのコストが現在の BCRYPT_ROUNDS と異なるか"""
+    return password_hash_rounds(hashed_password) != settings.BCRYPT_ROUNDS
+
+# bcrypt は計算中に GIL を解放するため、スレッドのプールで並列に計算できる。
+# イベントループ上で直接計算すると、1回あたり数百ミリ秒の間ほかのリクエストがすべて止まる。
+password_pool = BoundedPool(
+    max_workers=settings.BCRYPT_WORKERS if settings.BCRYPT_WORKERS > 0 else min(4, os.cpu_count() or 1),
+    max_pending=settings.BCRYPT_MAX_PENDING,
+    kind="thread",
+    name="bcrypt",
+    busy_message="パスワード検証の待ち行列がいっぱいです",
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password を password_pool で実行する。埋まっていれば PoolBusyError"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash を password_pool で実行する。埋まっていれば PoolBusyError"""
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """JWTアクセストークンの作成"""
     to_encode = data.copy()
@@ -58,12 +86,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[str]:
-    """トークンの検証"""
+    """トークンの検証（検証済みのトークンは短い間キャッシュし、デコードを省く）"""
+    cached_user_id = auth_cache.get_token(token)
+    if cached_user_id is not None:
+        return cached_user_id
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+        auth_cache.put_token(token, user_id, payload.get("exp"))
         return user_id
     except JWTError:
         return None
@@ -90,7 +122,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_user(db, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -141,5 +173,4 @@ async def get_current_user_optional(
     if user_id is None:
         return None
     
-    user = db.query(User).filter(User.id == user_id).first()
-    return user
\ No newline at end of file
+    return load_user(db, user_id)
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""認証結果のプロセス内キャッシュ
+
+認証が必要なリクエストごとに行っていた JWT のデコードと users の SELECT を、短い TTL の間は省く。
+
+- トークン → ユーザーID（トークンの exp を過ぎたものは使わない）
+- ユーザーID → 認証に必要な列だけのスナップショット（ID・管理者フラグ・アカウント状態・制限の期限など）
+
+スナップショットから作った User は、SELECT をせずにセッションへ入れる（merge(load=False)）。
+スナップショットにない列（ニックネームなど）は、触れた時点でまとめて1回だけ読み込まれる。
+
+ユーザーの行を更新・削除したセッションがフラッシュ・コミットした時点で、そのユーザーのスナップショットを捨てる
+（モデレーションやプロフィールの更新はすぐに反映される）。他のプロセスでの更新は TTL の間だけ遅れて反映される。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models import User
+from config import settings
+
+# スナップショットに含める列（compute_effective_account_status が参照するもの）
+SNAPSHOT_COLUMNS = (
+    "id",
+    "is_admin",
+    "account_status",
+    "account_status_override",
+    "ban_expires_at",
+    "posting_restriction_expires_at",
+    "internal_score",
+)
+
+
+class AuthCache:
+    """トークンとユーザーのスナップショットを TTL 付きの LRU で保持する"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._users: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # コミット後の無効化はスレッドプールで動く同期エンドポイントからも呼ばれる
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _get(self, entries: OrderedDict, key: str):
+        with self._lock:
+            entry = entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del entries[key]
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _put(self, entries: OrderedDict, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            entries[key] = (value, expires_at)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def get_token(self, token: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self._get(self._tokens, token)
+
+    def put_token(self, token: str, user_id: str, exp: Optional[float]) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        self._put(self._tokens, token, user_id, expires_at)
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        return self._get(self._users, user_id)
+
+    def put_user(self, user: User) -> None:
+        if not self.enabled:
+            return
+        snapshot = {name: getattr(user, name) for name in SNAPSHOT_COLUMNS}
+        self._put(self._users, user.id, snapshot, time.time() + self.ttl_seconds)
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+auth_cache = AuthCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+def load_user(db: Session, user_id: str) -> Optional[User]:
+    """ユーザーを返す。スナップショットがあれば users を SELECT しない"""
+    snapshot = auth_cache.get_user(user_id)
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        # load=False: DB を読まずに永続状態としてセッションに入れる（同じユーザーが既にあればそれを返す）
+        return db.merge(user, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is not None:
+        auth_cache.put_user(user)
+    return user
+
+
+_PENDING_KEY = "auth_cache_invalidate"
+
+
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = {
+        obj.id
+        for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if not changed:
+        return
+    for user_id in changed:
+        auth_cache.invalidate_user(user_id)
+    # コミット前に別のリクエストが古い行からスナップショットを作り直すことがあるため、コミット後にもう一度捨てる
+    session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+def _invalidate_committed(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        auth_cache.invalidate_user(user_id)
+
+
+def _discard_pending(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(Session, "after_flush", _collect_changed_users)
+event.listen(Session, "after_commit", _invalidate_committed)
+event.listen(Session, "after_soft_rollback", _discard_pending)
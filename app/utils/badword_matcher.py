@@ -0,0 +1,115 @@
+"""不適切語の照合に使う Aho-Corasick オートマトン"""
+from __future__ import annotations
+
+import re
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 単語境界が必要な語（英字のみの語）。re の \b と同じく、前後が英数字・アンダースコアなら一致させない
+_ASCII_WORD = re.compile(r"^[a-zA-Z]+$")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class AhoCorasickMatcher:
+    """複数の語を1回の線形走査で探すマッチャー
+
+    - 照合前に語とテキストの両方を fold（小文字化・カナ統一など）で同じ表記に揃える
+    - 英字のみの語は単語境界を確認し、"class" の中の "ass" のような部分一致を除外する
+    """
+
+    def __init__(self, words: Iterable[str], fold: Optional[Callable[[str], str]] = None) -> None:
+        self._fold = fold or str.lower
+        # ノードごとの遷移・失敗リンク・出力（(語の長さ, 単語境界が必要か)）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[Tuple[Tuple[int, bool], ...]] = [()]
+        self._words: List[str] = []
+
+        pending: List[List[Tuple[int, bool]]] = [[]]
+        seen = set()
+        for word in words:
+            folded = self._fold(word)
+            if not folded or folded in seen:
+                continue
+            seen.add(folded)
+            self._words.append(folded)
+            node = 0
+            for ch in folded:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    pending.append([])
+                node = next_node
+            pending[node].append((len(folded), bool(_ASCII_WORD.match(word))))
+
+        self._build_failure_links(pending)
+
+    def _build_failure_links(self, pending: List[List[Tuple[int, bool]]]) -> None:
+        queue = deque(self._goto[0].values())
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(ch, 0)
+                self._fail[child] = candidate if candidate != child else 0
+                queue.append(child)
+
+        # BFS 順に失敗先の出力を引き継ぎ、走査中に失敗リンクを辿らずに済むようにする
+        self._outputs = [tuple(outputs) for outputs in pending]
+        for node in order:
+            inherited = self._outputs[self._fail[node]]
+            if inherited:
+                self._outputs[node] = self._outputs[node] + inherited
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._goto)
+
+    def fold(self, text: str) -> str:
+        return self._fold(text)
+
+    def finditer(self, text: str, folded: bool = False) -> Iterator[Tuple[int, int]]:
+        """一致箇所を (開始位置, 終了位置) で返す（位置は fold 後のテキスト基準）"""
+        if not folded:
+            text = self._fold(text)
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        length = len(text)
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not outputs[node]:
+                continue
+            end = index + 1
+            for word_length, needs_boundary in outputs[node]:
+                start = end - word_length
+                if needs_boundary and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (end < length and _is_word_char(text[end]))
+                ):
+                    continue
+                yield start, end
+
+    def search(self, text: str, folded: bool = False) -> Optional[str]:
+        """最初に見つかった一致語（fold 後）を返す。なければ None"""
+        if not folded:
+            text = self._fold(text)
+        for start, end in self.finditer(text, folded=True):
+            return text[start:end]
+        return None
@@ -0,0 +1,130 @@
+"""URLブロックリストのディスク上のスナップショット
+
+ワーカーごとにブロックリストをダウンロード・構築するとメモリも時間も重複するため、
+1プロセスだけが構築したスナップショットを書き出し、各ワーカーは mmap して読み取り専用で共有する。
+
+ファイル形式:
+    MAGIC (8バイト) | ヘッダ位置・ヘッダ長 (uint32 LE x2) | 各セクション（8バイト境界） | ヘッダ (JSON)
+
+開始位置の配列は書き出した環境のバイト順のまま置き、ヘッダの byteorder と一致しなければ読み込まない。
+
+ヘッダにはソースごとの本体・開始位置・ブルームフィルタの位置と、任意のメタデータ（取得元ごとの ETag など）を持つ。
+書き込みは同じディレクトリの一時ファイルに書いてから os.replace で差し替えるため、
+読み込み側が書きかけのファイルを見ることはない（古いファイルを mmap 中のプロセスはそのまま読み続けられる）。
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.domain_index import BloomFilter, DomainSuffixIndex
+
+MAGIC = b"RBLSNAP1"
+_PREFIX = struct.Struct("<II")
+_ALIGN = 8
+
+
+class SnapshotError(Exception):
+    """スナップショットが壊れている・形式が異なる"""
+
+
+def _pad(handle, position: int) -> int:
+    padding = (-position) % _ALIGN
+    if padding:
+        handle.write(b"\0" * padding)
+    return position + padding
+
+
+def write_snapshot(path: str, indexes: Dict[str, DomainSuffixIndex], meta: Optional[Dict[str, Any]] = None) -> None:
+    """索引をスナップショットとしてアトミックに書き出す"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        # mkstemp は 0600 で作るため、別ユーザーのワーカーからも読めるようにする
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(MAGIC + _PREFIX.pack(0, 0))
+            position = len(MAGIC) + _PREFIX.size
+            sources = {}
+            for name, index in indexes.items():
+                blob, offsets, bloom = index.to_buffers()
+                sections = {}
+                for section, data in (("blob", blob), ("offsets", offsets), ("bloom", bloom.to_bytes())):
+                    position = _pad(handle, position)
+                    handle.write(data)
+                    sections[section] = [position, len(data)]
+                    position += len(data)
+                sources[name] = {
+                    **sections,
+                    "count": len(index),
+                    "num_bits": bloom.num_bits,
+                    "num_hashes": bloom.num_hashes,
+                }
+
+            header = json.dumps(
+                {
+                    "byteorder": sys.byteorder,
+                    "created_at": time.time(),
+                    "sources": sources,
+                    "meta": meta or {},
+                },
+                ensure_ascii=False,
+            ).encode("utf-8")
+            handle.write(header)
+            handle.seek(len(MAGIC))
+            handle.write(_PREFIX.pack(position, len(header)))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BlocklistSnapshot:
+    """mmap したスナップショット。indexes の各索引はファイルの内容を直接参照する"""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as handle:
+            stat = os.fstat(handle.fileno())
+            if stat.st_size < len(MAGIC) + _PREFIX.size:
+                raise SnapshotError(f"スナップショットが短すぎます: {path}")
+            # mmap はファイルを閉じても有効。索引が参照しなくなった時点で解放される
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"スナップショットの形式が異なります: {path}")
+        header_at, header_len = _PREFIX.unpack_from(mapped, len(MAGIC))
+        if header_at + header_len > len(mapped):
+            raise SnapshotError(f"スナップショットが壊れています: {path}")
+        header = json.loads(mapped[header_at:header_at + header_len].decode("utf-8"))
+        if header.get("byteorder") != sys.byteorder:
+            raise SnapshotError("バイト順が異なる環境で作られたスナップショットです")
+
+        view = memoryview(mapped)
+        self.indexes: Dict[str, DomainSuffixIndex] = {}
+        for name, source in header["sources"].items():
+            blob_at, _ = source["blob"]
+            offsets_at, offsets_len = source["offsets"]
+            bloom_at, bloom_len = source["bloom"]
+            bloom = BloomFilter.from_buffer(
+                view[bloom_at:bloom_at + bloom_len], source["num_bits"], source["num_hashes"]
+            )
+            offsets = view[offsets_at:offsets_at + offsets_len].cast("I")
+            self.indexes[name] = DomainSuffixIndex.from_buffers(mapped, offsets, bloom, base=blob_at)
+
+        self.path = path
+        self.inode = stat.st_ino
+        self.size = stat.st_size
+        self.created_at: float = header["created_at"]
+        self.meta: Dict[str, Any] = header.get("meta", {})
@@ -0,0 +1,114 @@
+"""重い処理を実行する、上限付きのワーカープール
+
+画像変換やパスワードハッシュのように CPU を長く使う処理をリクエストハンドラ内で同期実行すると、
+同じワーカーの他のリクエストが止まる。ここでは処理を別プロセス（またはスレッド）のプールに渡し、
+イベントループは待つだけにする。
+
+実行中と待ち行列の合計が上限に達している場合は PoolBusyError を送出し、
+呼び出し側は 503 を返して時間をおいた再送を促す（待ち行列を際限なく伸ばさない）。
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolBusyError(Exception):
+    """プールが埋まっていて新しい処理を受け付けられない"""
+
+
+class BoundedPool:
+    """同時実行数と待ち行列の長さに上限を持つ実行プール
+
+    kind が "process" の場合、渡す関数と引数は pickle できる必要がある（モジュール直下の関数にする）。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 8,
+        kind: str = "process",
+        name: str = "pool",
+        busy_message: str = "処理の待ち行列がいっぱいです",
+    ) -> None:
+        if kind not in ("process", "thread"):
+            raise ValueError(f"未対応のプール種別です: {kind}")
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.kind = kind
+        self.name = name
+        self.busy_message = busy_message
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        """実行中 + 待ち行列で受け付けられる件数"""
+        return self.max_workers + self.max_pending
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    def _release(self, _future: concurrent.futures.Future) -> None:
+        # 呼び出し側がキャンセルされても、プール内の処理が終わるまでは枠を占有したままにする
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """func(*args) をプールで実行して結果を返す。埋まっていれば PoolBusyError"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise PoolBusyError(self.busy_message)
+            self._in_flight += 1
+            try:
+                try:
+                    future = self._get_executor().submit(func, *args)
+                except BrokenProcessPool:
+                    # ワーカーが異常終了したプールは使えないため作り直す
+                    self._executor = None
+                    future = self._get_executor().submit(func, *args)
+            except BaseException:
+                self._in_flight -= 1
+                raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            raise
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,89 @@
+"""複数アカウントによるスパムキャンペーンの検出
+
+同じ本文（またはほぼ同じ本文）や同じURLホストが、短時間に多数のアカウントから投稿されていないかを
+インメモリのスライディングウィンドウで集計する。
+
+- キーごとに「投稿者ID → 最終投稿時刻」を保持し、ウィンドウ外の投稿者は参照時に捨てる
+- キー全体は更新順の OrderedDict で管理し、期限切れのキーは先頭から、上限超過時は古い順に退避する
+- 1キーあたりの投稿者数にも上限を設け、メモリ使用量を一定に保つ
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class CampaignTracker:
+    """キー（本文指紋・URLホスト）ごとの直近の投稿者数を数える"""
+
+    def __init__(
+        self,
+        window_seconds: float = 600,
+        max_keys: int = 50000,
+        max_authors_per_key: int = 64,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.max_authors_per_key = max_authors_per_key
+        self._keys: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        # キーの最終更新時刻（先頭から期限切れを捨てるため、_keys と同じ順序で更新する）
+        self._updated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def observe(self, keys: Iterable[str], author_id: str, now: Optional[float] = None) -> Dict[str, int]:
+        """投稿を記録し、キーごとのウィンドウ内の投稿者数（今回の投稿者を含む）を返す"""
+        now = time.monotonic() if now is None else now
+        threshold = now - self.window_seconds
+        counts: Dict[str, int] = {}
+        with self._lock:
+            self._evict_expired(threshold)
+            for key in keys:
+                authors = self._keys.get(key)
+                if authors is None:
+                    authors = {}
+                    self._keys[key] = authors
+                else:
+                    self._keys.move_to_end(key)
+                    stale = [author for author, seen_at in authors.items() if seen_at <= threshold]
+                    for author in stale:
+                        del authors[author]
+
+                authors.pop(author_id, None)
+                authors[author_id] = now
+                # 投稿者数の上限を超えたら最も古い投稿者から捨てる（閾値判定には十分な数を残す）
+                while len(authors) > self.max_authors_per_key:
+                    del authors[next(iter(authors))]
+                self._updated_at[key] = now
+                counts[key] = len(authors)
+
+            while len(self._keys) > self.max_keys:
+                key, _ = self._keys.popitem(last=False)
+                self._updated_at.pop(key, None)
+                self.evictions += 1
+        return counts
+
+    def _evict_expired(self, threshold: float) -> None:
+        while self._keys:
+            key = next(iter(self._keys))
+            if self._updated_at.get(key, 0.0) > threshold:
+                break
+            self._keys.popitem(last=False)
+            self._updated_at.pop(key, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._updated_at.clear()
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._keys),
+                "authors": sum(len(authors) for authors in self._keys.values()),
+                "evictions": self.evictions,
+                "window_seconds": self.window_seconds,
+            }
@@ -1,17 +1,27 @@
 import os
 import json
 import asyncio
-from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from fastapi import UploadFile
 from app.models import Post, Report, User
 from app.utils.scoring import apply_penalty
-from app.utils.image_validation import validate_image_file
-from app.utils.image_processor import process_image
+from app.utils.image_validation import MAX_IMAGE_SIZE_BYTES, validate_image_upload
+from app.utils.image_processor import encode_for_moderation_async
+from app.utils.transcode_pool import TranscodeBusyError
+from app.utils.upload_ingest import IngestedUpload, UploadTooLargeError, ingest_upload_async
+from app.utils.ai_cache import AIResponseCache, build_cache_key
+from app.utils.ai_gateway import ENDPOINT_MODERATION, ai_gateway
+from config import settings
 from google import genai
 from google.genai import types
 
+# バッチ審査プロンプトで審査対象の JSON 配列の直前に置く目印
+BATCH_ITEMS_MARKER = "### ITEMS ###"
+
+
 class ContentAnalysisResult(BaseModel):
     """コンテンツ分析結果の構造化モデル"""
     is_violation: bool
@@ -19,19 +29,242 @@ class ContentAnalysisResult(BaseModel):
     reason: str
     severity: str  # "low", "medium", "high"
 
+
+class BatchContentAnalysisResult(ContentAnalysisResult):
+    """バッチ審査時の1件分の結果（id で入力と対応付ける）"""
+    id: int
+
+
+@dataclass
+class ModerationItem:
+    """審査待ちの1件分の入力"""
+    content: str
+    reason: str = ""
+    user_history: str = ""
+
+
+class ModerationBatcher:
+    """短い時間窓に集まった審査リクエストを1回のAPI呼び出しにまとめるマイクロバッチャー
+
+    - max_wait_seconds 経過するか max_batch_size 件集まった時点で handler を呼び出す
+    - handler は入力と同じ順序の結果リストを返し、各呼び出し元の Future に振り分ける
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[ModerationItem]], Awaitable[List[Dict]]],
+        max_batch_size: int = 10,
+        max_wait_seconds: float = 0.05,
+    ) -> None:
+        self._handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[Tuple[ModerationItem, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.items_processed = 0
+
+    async def submit(self, item: ModerationItem) -> Dict:
+        if self.max_batch_size <= 1:
+            return (await self._dispatch([item]))[0]
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # イベントループが切り替わった場合（テスト等）は古い状態を破棄する
+            self._pending = []
+            self._timer = None
+            self._loop = loop
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch or self._loop is None:
+            return
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[ModerationItem, asyncio.Future]]) -> None:
+        results = await self._dispatch([item for item, _ in batch])
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _dispatch(self, items: List[ModerationItem]) -> List[Dict]:
+        self.batches_sent += 1
+        self.items_processed += len(items)
+        try:
+            results = await self._handler(items)
+        except Exception as e:
+            print(f"バッチ審査中にエラーが発生しました: {e}")
+            results = []
+        if len(results) != len(items):
+            error = {"is_violation": False, "confidence": 0.0, "reason": "AI分析中にエラーが発生しました: バッチ結果の件数不一致"}
+            results = list(results) + [dict(error) for _ in range(len(items) - len(results))]
+        return results
+
+
 class ContentModerator:
     """Gemini AIによるコンテンツ審査を行うクラス"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        batch_max_items: Optional[int] = None,
+        batch_window_seconds: Optional[float] = None,
+        cache: Optional[AIResponseCache] = None,
+    ):
         self.api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=self.api_key) if self.api_key else None
-        
+        # client を渡した場合はそれを使う（FakeGenAIClient によるオフライン検証など）
+        # 通常は AIゲートウェイの共有クライアントを使い、接続を再利用する
+        self.client = client or ai_gateway.get_client()
+        self.batcher = ModerationBatcher(
+            self._analyze_batch,
+            max_batch_size=settings.MODERATION_BATCH_MAX_ITEMS if batch_max_items is None else batch_max_items,
+            max_wait_seconds=(
+                settings.MODERATION_BATCH_WINDOW_MS / 1000 if batch_window_seconds is None else batch_window_seconds
+            ),
+        )
+        # 同一内容（正規化後）の判定結果を再利用するキャッシュ
+        self.cache = cache or AIResponseCache(
+            "moderation",
+            max_entries=settings.AI_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.MODERATION_CACHE_TTL_SECONDS,
+            db_path=settings.AI_CACHE_DB_PATH or None,
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+
     async def analyze_content(self, content: str, reason: str = "", user_history: str = "") -> Dict:
-        """コンテンツの悪質性をGemini AIで分析する"""
-        if not self.api_key or not self.client:
+        """コンテンツの悪質性をGemini AIで分析する
+
+        同時期に届いたリクエストは ModerationBatcher でまとめて1回のAPI呼び出しで審査する。
+        正規化後に同一の内容は、キャッシュ済み・審査中の結果を共有して外部APIを呼ばない。
+        判定は審査理由と投稿者の履歴にも左右されるため、キーにはこの2つも含める
+        （自動審査のように履歴が空の呼び出しは、同じ文面どうしで結果を共有できる）。
+        """
+        if not self.client:
             # APIキーがない場合はデフォルトで安全と判定
             return {"is_violation": False, "confidence": 0.0, "reason": "APIキーが設定されていません"}
-        
+
+        key = build_cache_key("moderation:v2", content, reason, user_history)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight.get_loop() is loop:
+            return dict(await asyncio.shield(inflight))
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            result = await self.batcher.submit(ModerationItem(content, reason, user_history))
+            # severity を含むのはAPIの応答を解析できた結果のみ（エラー時の既定値はキャッシュしない）
+            if "severity" in result:
+                self.cache.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # 待機者がいなくても未取得例外の警告を出さない
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _analyze_batch(self, items: List[ModerationItem]) -> List[Dict]:
+        """バッチ単位の審査。1件のみの場合は従来の単独プロンプトを使う"""
+        if len(items) == 1:
+            return [await self._analyze_single(items[0])]
+
+        payload = []
+        for index, item in enumerate(items):
+            entry = {"id": index, "content": item.content, "reason": item.reason}
+            # 履歴は空でない場合のみ含めてプロンプトを小さく保つ
+            if item.user_history:
+                entry["user_history"] = item.user_history
+            payload.append(entry)
+
+        prompt = f"""
+        以下のJSON配列に含まれる{len(items)}件の投稿内容をそれぞれ分析し、コミュニティガイドラインに違反しているか判断してください。
+        各要素の content が投稿内容、reason が審査理由、user_history がユーザーの過去の投稿です。
+
+        以下の基準で評価してください：
+        1. ヘイトスピーチや差別的な内容
+        2. 暴力的または脅迫的な内容
+        3. スパムや宣伝目的の投稿
+        4. 性的に露骨な内容
+        5. 誹謗中傷や個人攻撃
+        6. デマや偽情報
+
+        ユーザーの過去の行動パターンも考慮に入れて判断してください。
+        各投稿は独立して判断し、必ず入力と同じ id を付けて全件の結果を返してください。
+        {BATCH_ITEMS_MARKER}
+        {json.dumps(payload, ensure_ascii=False)}
+        """
+
+        try:
+            print(f"{len(items)}件のコンテンツをまとめて分析します...")
+            response = await ai_gateway.generate_content(
+                ENDPOINT_MODERATION,
+                self.client,
+                model="gemini-flash-latest",
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    system_instruction="あなたはコンテンツモデレーターとして、投稿内容の適切性を客観的に評価します。",
+                    response_mime_type="application/json",
+                    response_schema=list[BatchContentAnalysisResult],
+                    temperature=0.3,
+                )
+            )
+            parsed = json.loads(response.text) if response and response.text else []
+        except Exception as e:
+            print(f"バッチ分析中にエラーが発生しました: {str(e)}")
+            parsed = []
+
+        results: Dict[int, Dict] = {}
+        if isinstance(parsed, list):
+            for entry in parsed:
+                if not isinstance(entry, dict) or "id" not in entry:
+                    continue
+                try:
+                    index = int(entry.pop("id"))
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= index < len(items):
+                    results[index] = entry
+
+        # 結果が欠けた項目は単独リクエストで審査し直す
+        missing = [index for index in range(len(items)) if index not in results]
+        if missing:
+            print(f"バッチ結果に含まれない{len(missing)}件を個別に分析します")
+            retried = await asyncio.gather(*[self._analyze_single(items[index]) for index in missing])
+            results.update(zip(missing, retried))
+
+        return [results[index] for index in range(len(items))]
+
+    async def _analyze_single(self, item: ModerationItem) -> Dict:
+        """1件のコンテンツを単独プロンプトで分析する"""
+        content, reason, user_history = item.content, item.reason, item.user_history
         prompt = f"""
         以下の投稿内容を分析し、コミュニティガイドラインに違反しているか判断してください。
         
@@ -57,7 +290,9 @@ class ContentModerator:
         
         try:
             print("コンテンツ分析を開始します...")
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_MODERATION,
+                self.client,
                 model="gemini-flash-latest",
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -85,7 +320,7 @@ class ContentModerator:
     async def analyze_multimodal_content(
         self,
         content: Optional[str] = None,
-        image: Optional[UploadFile] = None,
+        image: Optional[Union[UploadFile, IngestedUpload]] = None,
         media_path: Optional[str] = None,
         media_type: Optional[str] = None,
         reason: str = "",
@@ -94,7 +329,7 @@ class ContentModerator:
         """
         テキストと画像を含むコンテンツを分析する（画像アップロード対応版）
 
-        - image が指定されていれば優先して使用
+        - image が指定されていれば優先して使用（取り込み済みのバッファをそのまま使い、ファイルには保存しない）
         - media_path / media_type は後方互換用
         """
         if not self.api_key or not self.client:
@@ -110,14 +345,21 @@ class ContentModerator:
         if content:
             contents.append(content)
 
-        # 画像（UploadFile）入力に対応
+        # 画像（UploadFile / 取り込み済みのアップロード）入力に対応
         temp_media_path: Optional[str] = None
         temp_media_type: Optional[str] = None
+        image_bytes: Optional[bytes] = None
 
         try:
             if image is not None:
                 # 画像バリデーション
-                validation = validate_image_file(image)
+                try:
+                    upload = image if isinstance(image, IngestedUpload) else await ingest_upload_async(
+                        image, MAX_IMAGE_SIZE_BYTES
+                    )
+                    validation = validate_image_upload(upload)
+                except UploadTooLargeError as exc:
+                    validation = {"is_valid": False, "error": str(exc)}
                 if not validation.get("is_valid", False):
                     return {
                         "is_violation": False,
@@ -125,18 +367,17 @@ class ContentModerator:
                         "reason": f"画像バリデーションエラー: {validation.get('error')}",
                     }
 
-                # 画像処理（WebP化など）＋保存
-                thumbnail_url, original_url = process_image(image, user_id="moderation")
-                if not original_url:
+                # 画像処理（WebP化。EXIF の位置情報は送らない）
+                try:
+                    image_bytes = await encode_for_moderation_async(upload)
+                except TranscodeBusyError:
+                    image_bytes = None
+                if not image_bytes:
                     return {
                         "is_violation": False,
                         "confidence": 0.0,
                         "reason": "画像処理に失敗しました",
                     }
-
-                # Gemini API に渡すために実ファイルパスを取得
-                # process_image は "/uploads/..." を返すため先頭の "/" を落として相対パスとして扱う
-                temp_media_path = original_url.lstrip("/")
                 temp_media_type = "image/webp"
 
             # 後方互換: media_path/media_type が直接指定されるケース
@@ -145,13 +386,14 @@ class ContentModerator:
                 temp_media_type = media_type
 
             # メディアがあれば Gemini 用に組み立て
-            if temp_media_path and temp_media_type:
+            if (temp_media_path or image_bytes) and temp_media_type:
                 from google.genai import types as genai_types
 
                 if temp_media_type.startswith("image/"):
                     try:
-                        with open(temp_media_path, "rb") as f:
-                            image_bytes = f.read()
+                        if image_bytes is None:
+                            with open(temp_media_path, "rb") as f:
+                                image_bytes = f.read()
                         contents.append(
                             genai_types.Part.from_bytes(
                                 data=image_bytes,
@@ -198,7 +440,9 @@ class ContentModerator:
             contents.append(prompt)
 
             print(f"マルチモーダルコンテンツ分析を開始します... (media_type: {temp_media_type})")
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_MODERATION,
+                self.client,
                 model="gemini-flash-latest",
                 contents=contents,
                 config=types.GenerateContentConfig(
@@ -260,7 +504,9 @@ class ContentModerator:
         
         try:
             print("思考機能を使用したコンテンツ分析を開始します...")
-            response = await self.client.aio.models.generate_content(
+            response = await ai_gateway.generate_content(
+                ENDPOINT_MODERATION,
+                self.client,
                 model="gemini-flash-latest",
                 contents=prompt,
                 config=types.GenerateContentConfig(
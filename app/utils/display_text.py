@@ -0,0 +1,120 @@
+"""表示用（HTMLエスケープ済み）テキストの書き込み時生成
+
+投稿・返信・レビューの本文やユーザー名・店舗名は、以前はレスポンスを返すたびに
+field_serializer で escape_html していた（タイムライン1ページで数百回の Python 呼び出し）。
+ここでは元の列に値を代入した時点で、エスケープ済みの値を *_html 列にも書いておく。
+レスポンスではこの列をそのまま使うため、シリアライズは Pydantic のコアだけで完結する。
+
+元の列（content など）はモデレーション・検索・スパム判定のため、エスケープせずに残す。
+*_html が NULL の行（導入前の行や、ORM を通さずに追加された行）は、読むときにエスケープする。
+起動時には backfill_display_text で NULL の行をまとめて埋める。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, func, update
+from sqlalchemy.engine import Engine
+
+from app.models import Post, RamenShop, Reply, ShopReview, User
+from app.utils.security import escape_html
+
+# モデル -> エスケープ済みの値を持たせる列（エスケープ済みの値は「列名_html」の列に入る）
+DISPLAY_COLUMNS = {
+    Post: ("content", "shadow_ban_reason"),
+    Reply: ("content", "shadow_ban_reason"),
+    ShopReview: ("comment",),
+    User: ("username", "profile_image_url"),
+    RamenShop: ("name", "address"),
+}
+
+# html.escape(quote=True) と同じ置換（& を最初に置換する）
+_SQL_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;"))
+
+
+def display_text(obj: Any, column: str) -> Optional[str]:
+    """エスケープ済みの値を返す（NULL や空文字はそのまま）"""
+    escaped = getattr(obj, f"{column}_html")
+    if escaped is not None:
+        return escaped
+    value = getattr(obj, column)
+    return escape_html(value) if value else value
+
+
+def author_display_name(user: User) -> str:
+    """投稿者名（ニックネームが未設定なら ID。ID は英数字と _ のみのためエスケープ不要）"""
+    return display_text(user, "username") or user.id
+
+
+def reply_response_data(reply: Reply) -> Dict[str, Any]:
+    """ReplyResponse に渡す値"""
+    author = reply.author
+    return {
+        "id": reply.id,
+        "content": display_text(reply, "content"),
+        "user_id": reply.user_id,
+        "post_id": reply.post_id,
+        "parent_id": reply.parent_id,
+        "author_username": author_display_name(author),
+        "author_profile_image_url": display_text(author, "profile_image_url") if author else None,
+        "created_at": reply.created_at,
+        "is_shadow_banned": reply.is_shadow_banned,
+        "shadow_ban_reason": display_text(reply, "shadow_ban_reason"),
+    }
+
+
+def replies_response_data(replies: List[Reply]) -> List[Dict[str, Any]]:
+    return [reply_response_data(reply) for reply in replies]
+
+
+def review_response_data(review: ShopReview) -> Dict[str, Any]:
+    """ShopReviewResponse に渡す値"""
+    return {
+        "id": review.id,
+        "shop_id": review.shop_id,
+        "user_id": review.user_id,
+        "rating": review.rating,
+        "comment": display_text(review, "comment"),
+        "created_at": review.created_at,
+        "author_username": review.author_username,
+        "author_profile_image_url": review.author_profile_image_url,
+        "moderation_status": review.moderation_status,
+    }
+
+
+def _escape_on_set(escaped_column: str):
+    def listener(target, value, oldvalue, initiator):
+        setattr(target, escaped_column, escape_html(value) if value else value)
+
+    return listener
+
+
+for _model, _columns in DISPLAY_COLUMNS.items():
+    for _column in _columns:
+        event.listen(getattr(_model, _column), "set", _escape_on_set(f"{_column}_html"))
+
+
+def _sql_escape(column):
+    expression = column
+    for char, entity in _SQL_ESCAPES:
+        expression = func.replace(expression, char, entity)
+    return expression
+
+
+def backfill_display_text(bind: Engine) -> int:
+    """*_html が NULL の行を SQL の replace でまとめて埋め、更新した行数を返す"""
+    updated = 0
+    with bind.begin() as conn:
+        for model, columns in DISPLAY_COLUMNS.items():
+            table = model.__table__
+            for column in columns:
+                escaped_column = f"{column}_html"
+                source = table.c[column]
+                target = table.c[escaped_column]
+                result = conn.execute(
+                    update(table)
+                    .where(target.is_(None), source.is_not(None), source != "")
+                    .values({escaped_column: _sql_escape(source)})
+                )
+                updated += result.rowcount or 0
+    return updated
@@ -0,0 +1,166 @@
+"""ブロックリスト用のコンパクトなドメイン索引
+
+数十万件のドメインを set[str] で持つと、文字列オブジェクトとハッシュ表だけで数十MBになる。
+ここではラベルを逆順にしたドメイン（例: evil.example.com -> com.example.evil）を昇順に並べ、
+
+- 1本の bytes に連結した本体と、各要素の開始位置（array('I')）だけを保持する
+- 手前にブルームフィルタを置き、ほとんどの（ブロックされていない）ドメインは二分探索せずに弾く
+
+逆順にすると「サブドメインを含めた一致」はキーの先頭一致になるため、
+照合対象のラベルを先頭から1回たどるだけで、登録済みの最も具体的なドメインを見つけられる。
+
+本体・開始位置・ブルームフィルタはいずれも平坦なバッファなので、
+ファイルに書き出して mmap したもの（app/utils/blocklist_snapshot.py）をそのまま索引として使える。
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+from array import array
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def reverse_domain(domain: str) -> str:
+    """ラベルの順序を逆にする（evil.example.com -> com.example.evil）"""
+    return ".".join(reversed(domain.split(".")))
+
+
+class BloomFilter:
+    """固定サイズのブルームフィルタ（偽陽性はあるが偽陰性はない）
+
+    位置の計算には blake2b を使い、プロセスをまたいでも同じビット列になるようにする。
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        bits = int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))
+        self.num_bits = max(bits, 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits: Buffer = bytearray((self.num_bits + 7) // 8)
+
+    @classmethod
+    def from_buffer(cls, bits: Buffer, num_bits: int, num_hashes: int) -> "BloomFilter":
+        """書き出し済みのビット列（mmap 上の memoryview など）から復元する"""
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom._bits = bits
+        return bloom
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+    @staticmethod
+    def _hashes(key: bytes) -> Tuple[int, int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, key: bytes) -> None:
+        h1, h2 = self._hashes(key)
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % self.num_bits
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        # 未登録のキーは最初の数ビットで外れることが多いため、1ビットずつ確かめて早めに抜ける
+        h1, h2 = self._hashes(key)
+        bits = self._bits
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class DomainSuffixIndex:
+    """サブドメインを含めて照合できる、読み取り専用のドメイン集合"""
+
+    def __init__(self, domains: Iterable[str], false_positive_rate: float = 0.01) -> None:
+        keys = sorted({reverse_domain(domain).encode("utf-8") for domain in domains if domain})
+        offsets = array("I", [0])
+        total = 0
+        for key in keys:
+            total += len(key)
+            offsets.append(total)
+        self._blob: Buffer = b"".join(keys)
+        self._base = 0  # _blob 内での本体の開始位置（mmap したファイル全体を渡す場合に使う）
+        self._offsets: Sequence[int] = offsets
+        self._bloom = BloomFilter(len(keys), false_positive_rate)
+        for key in keys:
+            self._bloom.add(key)
+
+    @classmethod
+    def from_buffers(
+        cls,
+        blob: Buffer,
+        offsets: Sequence[int],
+        bloom: BloomFilter,
+        base: int = 0,
+    ) -> "DomainSuffixIndex":
+        """to_buffers() で書き出したバッファから、コピーせずに索引を復元する
+
+        blob に mmap オブジェクトを渡すと、スライスが直接 bytes になるため照合が速い（base は本体の開始位置）。
+        """
+        index = cls.__new__(cls)
+        index._blob = blob
+        index._base = base
+        index._offsets = offsets
+        index._bloom = bloom
+        return index
+
+    def to_buffers(self) -> Tuple[bytes, bytes, BloomFilter]:
+        """本体・開始位置（ネイティブのバイト順の uint32）・ブルームフィルタを返す"""
+        blob = bytes(self._blob[self._base:self._base + self._offsets[-1]])
+        return blob, array("I", self._offsets).tobytes(), self._bloom
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _key_at(self, index: int) -> bytes:
+        base = self._base
+        return self._blob[base + self._offsets[index]:base + self._offsets[index + 1]]
+
+    def _contains_key(self, key: bytes) -> bool:
+        if key not in self._bloom:
+            return False
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self._key_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low < len(self) and self._key_at(low) == key
+
+    def __contains__(self, domain: str) -> bool:
+        return self._contains_key(reverse_domain(domain).encode("utf-8"))
+
+    def match(self, domain: str) -> Optional[str]:
+        """domain 自身または親ドメインのうち、登録済みで最も具体的なものを返す
+
+        TLD だけ（例: com）には一致させない。
+        """
+        labels = domain.split(".")
+        if len(labels) < 2 or not len(self):
+            return None
+        reversed_key = ".".join(reversed(labels)).encode("utf-8")
+        # 逆順キーのラベル境界（= 各親ドメインの終端）。先頭は TLD だけなので照合しない
+        boundaries = []
+        end = -1
+        for label in reversed(labels):
+            end += len(label.encode("utf-8")) + 1
+            boundaries.append(end)
+        for depth in range(len(boundaries) - 1, 0, -1):
+            if self._contains_key(reversed_key[:boundaries[depth]]):
+                return ".".join(labels[len(labels) - depth - 1:])
+        return None
+
+    def memory_bytes(self) -> int:
+        """索引が保持しているバッファのサイズ（バイト）。mmap の場合はページキャッシュを全プロセスで共有する"""
+        return self._offsets[-1] + len(self._offsets) * 4 + self._bloom.memory_bytes()
@@ -0,0 +1,81 @@
+"""オフライン検証用の genai.Client 互換フェイククライアント"""
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.utils.content_moderator import BATCH_ITEMS_MARKER
+
+# フェイクの審査で違反扱いにするキーワード
+FAKE_VIOLATION_KEYWORDS = ("死ね", "殺す", "違反テスト")
+
+
+def _contents_to_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(part for part in contents if isinstance(part, str))
+    return str(contents or "")
+
+
+def _fake_judgement(content: str) -> Dict[str, Any]:
+    is_violation = any(keyword in (content or "") for keyword in FAKE_VIOLATION_KEYWORDS)
+    return {
+        "is_violation": is_violation,
+        "confidence": 0.95 if is_violation else 0.05,
+        "reason": "フェイク審査: 禁止語を検出" if is_violation else "フェイク審査: 問題なし",
+        "severity": "high" if is_violation else "low",
+    }
+
+
+def default_moderation_responder(contents: Any, config: Any) -> str:
+    """モデレーション用プロンプトを解釈し、キーワードベースで判定結果を返す"""
+    text = _contents_to_text(contents)
+    if BATCH_ITEMS_MARKER in text:
+        payload = json.loads(text.split(BATCH_ITEMS_MARKER, 1)[1].strip())
+        return json.dumps(
+            [{"id": item["id"], **_fake_judgement(item.get("content", ""))} for item in payload],
+            ensure_ascii=False,
+        )
+    return json.dumps(_fake_judgement(text), ensure_ascii=False)
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: "FakeGenAIClient") -> None:
+        self._client = client
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        self._client.calls.append({"model": model, "contents": contents, "config": config})
+        return SimpleNamespace(text=self._client.responder(contents, config))
+
+    async def generate_content_stream(
+        self, model: str, contents: Any, config: Any = None
+    ) -> AsyncIterator[SimpleNamespace]:
+        self._client.calls.append({"model": model, "contents": contents, "config": config, "stream": True})
+        text = self._client.responder(contents, config)
+        size = self._client.stream_chunk_size
+
+        async def _chunks() -> AsyncIterator[SimpleNamespace]:
+            for start in range(0, len(text), size):
+                yield SimpleNamespace(text=text[start:start + size])
+
+        return _chunks()
+
+
+class FakeGenAIClient:
+    """client.aio.models.generate_content(_stream) の呼び出しを記録し、responder の結果を返す
+
+    外部APIに接続せずにモデレーション等の処理を検証するために使用する。
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[Any, Any], str]] = None,
+        stream_chunk_size: int = 8,
+    ) -> None:
+        self.responder = responder or default_moderation_responder
+        # generate_content_stream で応答を何文字ずつ返すか
+        self.stream_chunk_size = stream_chunk_size
+        self.calls: List[Dict[str, Any]] = []
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
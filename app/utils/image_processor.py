@@ -3,14 +3,19 @@
 WebP変換、リサイズ、品質調整機能を提供
 """
 
+import asyncio
 import os
-import time
-from typing import Tuple, Optional
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
 from PIL import Image
 import io
 from fastapi import UploadFile
-import tempfile
-import shutil
+from sqlalchemy.orm import Session
+
+from config import settings
+from app.utils.image_validation import MAX_IMAGE_SIZE_BYTES
+from app.utils.media_store import find_source, media_store, record_source, source_key
+from app.utils.transcode_pool import TranscodeBusyError, transcode_pool
+from app.utils.upload_ingest import IngestedUpload, ingest_upload, ingest_upload_async
 
 
 def ensure_directories_exist():
@@ -18,148 +23,273 @@ def ensure_directories_exist():
     os.makedirs("uploads/thumbnails", exist_ok=True)
     os.makedirs("uploads/original", exist_ok=True)
     os.makedirs("uploads/profile_icons", exist_ok=True)
+    os.makedirs(media_store.root, exist_ok=True)
+
+
+ImageSource = Union[UploadFile, IngestedUpload]
+
+
+def _as_upload(image: ImageSource) -> IngestedUpload:
+    """UploadFile が渡された場合は取り込む（取り込み済みならそのまま返す）"""
+    if isinstance(image, IngestedUpload):
+        return image
+    return ingest_upload(image, MAX_IMAGE_SIZE_BYTES)
+
+
+async def _as_upload_async(image: ImageSource) -> IngestedUpload:
+    if isinstance(image, IngestedUpload):
+        return image
+    return await ingest_upload_async(image, MAX_IMAGE_SIZE_BYTES)
+
+
+class ProcessedImage(NamedTuple):
+    """投稿画像の変換結果（URL はいずれも "/uploads/..."。失敗時はすべて None）"""
+
+    thumbnail_url: Optional[str]
+    original_url: Optional[str]
+    srcset: Optional[str]  # 幅ごとの画像の srcset（例: "/uploads/media/ab/cd/<sha256>.webp 200w, ..."）
+
+
+THUMBNAIL_WIDTH = 400
+_FAILED = ProcessedImage(None, None, None)
+
+
+def _fit_within(size: Tuple[int, int], max_side: int) -> Tuple[int, int]:
+    """長辺が max_side 以下になるようにアスペクト比を保って縮めたサイズ（0 なら元のまま）"""
+    width, height = size
+    longest = max(width, height)
+    if not max_side or longest <= max_side:
+        return size
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _scaled_to_width(img: Image.Image, width: int) -> Image.Image:
+    height = max(1, round(img.height * width / img.width))
+    # reducing_gap を指定すると、整数倍の縮小（reduce）を先に行ってから LANCZOS をかけるため速い
+    return img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _save_webp(img: Image.Image, **options) -> str:
+    """WebP にエンコードしてメディアストアに保存し、URLを返す（同じ内容が既にあれば書き込まない）"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'WEBP', **options)
+    return media_store.put_bytes(buffer.getvalue(), "webp")
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """RGB にする（透明度を持つ画像は白背景で合成）"""
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _transcode_image(
+    data: bytes,
+    rendition_widths: Sequence[int] = (),
+    original_max_side: int = 0,
+) -> ProcessedImage:
+    """
+    画像のバイト列を1回だけデコードし、通常画質画像・サムネイル・幅ごとの画像（WebP）を保存する
+
+    - JPEG は original_max_side に収まる範囲で DCT の縮小デコード（draft）を使う
+    - 透明度の合成は縮小した後の大きさで行う
+    - 幅ごとの画像は大きい順に、1つ前の画像から縮小して作る（元画像の幅を超えるものは作らない）
+    - 保存先はメディアストア（内容のハッシュがファイル名になる）
+
+    ワーカープロセスでも実行するため、引数・戻り値は pickle できる値だけにする。
+    """
+    # PILで画像を開く（BytesIO は bytes をコピーせずに参照する）
+    with Image.open(io.BytesIO(data)) as img:
+        # EXIFからGPS情報を除去（位置情報をサーバー側で削除）
+        try:
+            exif = img.getexif()
+            if exif:
+                from PIL.ExifTags import TAGS
+
+                gps_tag_id = None
+                for tag_id, tag_name in TAGS.items():
+                    if tag_name == "GPSInfo":
+                        gps_tag_id = tag_id
+                        break
+
+                if gps_tag_id is not None and gps_tag_id in exif:
+                    del exif[gps_tag_id]
+
+                # PillowのWebP保存では EXIF をそのまま保存しないケースも多いが、
+                # 念のため他形式に拡張されてもGPSは含まれないようにクリーンなEXIFを用意
+                img.info["exif"] = exif.tobytes()
+        except Exception as exif_err:
+            # EXIF処理に失敗してもアップロード自体は継続（安全側でログのみ）
+            print(f"EXIF削除処理エラー: {exif_err}")
+
+        target_size = _fit_within(img.size, original_max_side)
+        if target_size != img.size and img.format == 'JPEG':
+            # 要求サイズを下回らない 1/2, 1/4, 1/8 の縮小でデコードさせる
+            img.draft('RGB', target_size)
+        if img.size != target_size:
+            img = img.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        base = _flatten(img)
+        # 変換が不要だった場合は遅延読み込みのままなので、ファイルを閉じる前にデコードしておく
+        base.load()
+
+    # 通常画質画像（長辺 original_max_side まで、品質90%）
+    original_url = _save_webp(base, quality=90)
 
+    # 幅ごとの画像（大きい順に、直前の画像から縮小する）
+    srcset_entries: List[Tuple[int, str]] = []
+    thumbnail_source = base
+    source = base
+    for width in sorted({w for w in rendition_widths if 0 < w < base.width}, reverse=True):
+        source = _scaled_to_width(source, width)
+        srcset_entries.append((width, _save_webp(source, quality=80)))
+        if width >= THUMBNAIL_WIDTH:
+            thumbnail_source = source
+    srcset_entries.append((base.width, original_url))
+    srcset = ", ".join(f"{url} {width}w" for width, url in sorted(srcset_entries))
 
-def process_image(image: UploadFile, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+    # 低画質サムネイル（幅400px、品質40%）。最も近い幅の画像から作る
+    if thumbnail_source.width != THUMBNAIL_WIDTH:
+        thumbnail_source = _scaled_to_width(thumbnail_source, THUMBNAIL_WIDTH)
+    thumbnail_url = _save_webp(thumbnail_source, quality=40)
+
+    return ProcessedImage(thumbnail_url, original_url, srcset)
+
+
+def _transcode_profile_icon(data: bytes, size: int) -> str:
+    """画像のバイト列を正方形に切り抜いてアイコン（WebP）として保存し、URLを返す"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGBA")
+
+        width, height = img.size
+        min_side = min(width, height)
+        left = (width - min_side) / 2
+        top = (height - min_side) / 2
+        right = left + min_side
+        bottom = top + min_side
+        cropped = img.crop((left, top, right, bottom))
+
+        resized = cropped.resize((size, size), Image.Resampling.LANCZOS)
+
+        return _save_webp(resized, quality=90, method=6)
+
+
+def _encode_moderation_image(data: bytes) -> bytes:
+    """モデレーションAPIに渡す画像をメモリ上でWebPにする（EXIFは付けないため位置情報も送らない）"""
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=90)
+        return buffer.getvalue()
+
+
+def process_image(image: ImageSource, user_id: str) -> ProcessedImage:
     """
-    アップロードされた画像を処理してWebP形式に変換
+    アップロードされた画像を処理してWebP形式に変換（呼び出し元のスレッドで同期実行）
     
     Args:
-        image: アップロードされた画像ファイル
-        user_id: ユーザーID
+        image: アップロードされた画像ファイル（取り込み済みのものも可）
+        user_id: ユーザーID（エラーログ用）
         
     Returns:
-        Tuple[thumbnail_url, original_url]: サムネイルと元画像のURL
+        ProcessedImage: サムネイル・通常画質画像のURLと srcset
     """
     try:
         # 必要なディレクトリを確認
         ensure_directories_exist()
-        
-        # ファイルを一時的に保存
-        image.file.seek(0)
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            shutil.copyfileobj(image.file, temp_file)
-            temp_file_path = temp_file.name
-        
-        try:
-            # PILで画像を開く
-            with Image.open(temp_file_path) as img:
-                # EXIFからGPS情報を除去（位置情報をサーバー側で削除）
-                try:
-                    exif = img.getexif()
-                    if exif:
-                        from PIL.ExifTags import TAGS
-
-                        gps_tag_id = None
-                        for tag_id, tag_name in TAGS.items():
-                            if tag_name == "GPSInfo":
-                                gps_tag_id = tag_id
-                                break
-
-                        if gps_tag_id is not None and gps_tag_id in exif:
-                            del exif[gps_tag_id]
-
-                        # PillowのWebP保存では EXIF をそのまま保存しないケースも多いが、
-                        # 念のため他形式に拡張されてもGPSは含まれないようにクリーンなEXIFを用意
-                        img.info["exif"] = exif.tobytes()
-                except Exception as exif_err:
-                    # EXIF処理に失敗してもアップロード自体は継続（安全側でログのみ）
-                    print(f"EXIF削除処理エラー: {exif_err}")
-                # RGBモードに変換（必要な場合）
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    # 透明度を持つ画像は白背景で合成
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # 元の解像度を保持
-                original_size = img.size
-                
-                # タイムスタンプを生成
-                timestamp = int(time.time())
-                
-                # 通常画質画像（元の解像度、品質90%）
-                original_filename = f"{user_id}_{timestamp}_original.webp"
-                original_path = f"uploads/original/{original_filename}"
-                
-                # WebP形式で保存（品質90%）
-                img.save(original_path, 'WEBP', quality=90, optimize=True)
-                original_url = f"/{original_path}"
-                
-                # 低画質サムネイル（幅400px、品質40%）
-                thumbnail_filename = f"{user_id}_{timestamp}_thumbnail.webp"
-                thumbnail_path = f"uploads/thumbnails/{thumbnail_filename}"
-                
-                # 幅を400pxにリサイズ（アスペクト比を維持）
-                thumbnail_img = img.copy()
-                thumbnail_width = 400
-                aspect_ratio = thumbnail_img.height / thumbnail_img.width
-                thumbnail_height = int(thumbnail_width * aspect_ratio)
-                thumbnail_img = thumbnail_img.resize((thumbnail_width, thumbnail_height), Image.Resampling.LANCZOS)
-                
-                # WebP形式で保存（品質40%）
-                thumbnail_img.save(thumbnail_path, 'WEBP', quality=40, optimize=True)
-                thumbnail_url = f"/{thumbnail_path}"
-                
-                return thumbnail_url, original_url
-
-        finally:
-            # 一時ファイルを削除
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-
+        return _transcode_image(
+            _as_upload(image).data, settings.IMAGE_RENDITION_WIDTHS, settings.IMAGE_ORIGINAL_MAX_SIDE
+        )
     except Exception as e:
-        print(f"画像処理エラー: {e}")
-        return None, None
+        print(f"画像処理エラー ({user_id}): {e}")
+        return _FAILED
 
 
-def process_profile_icon(image: UploadFile, user_id: str, size: int = 256) -> Optional[str]:
-    """プロフィールアイコン用に画像を処理して保存する."""
+async def process_image_async(image: ImageSource, user_id: str, db: Optional[Session] = None) -> ProcessedImage:
+    """
+    process_image の非同期版。変換はワーカープールで行い、イベントループを止めない
 
+    db を渡した場合、同じ画像が同じ設定で変換済みなら以前の結果を返す（変換もファイルの書き込みもしない）。
+    プールが埋まっている場合は TranscodeBusyError を送出する（呼び出し側で 503 にする）。
+    """
     try:
         ensure_directories_exist()
+        upload = await _as_upload_async(image)
+        widths = settings.IMAGE_RENDITION_WIDTHS
+        max_side = settings.IMAGE_ORIGINAL_MAX_SIDE
+        key = None
+        if db is not None:
+            key = await asyncio.to_thread(source_key, upload.data, "post_image", (widths, max_side))
+            cached = find_source(db, key)
+            if cached is not None:
+                return ProcessedImage(**cached)
+        result = await transcode_pool.run(_transcode_image, upload.data, widths, max_side)
+        if key is not None:
+            record_source(db, key, "post_image", result._asdict())
+        return result
+    except TranscodeBusyError:
+        raise
+    except Exception as e:
+        print(f"画像処理エラー ({user_id}): {e}")
+        return _FAILED
 
-        image.file.seek(0)
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            shutil.copyfileobj(image.file, temp_file)
-            temp_file_path = temp_file.name
 
-        try:
-            with Image.open(temp_file_path) as img:
-                if img.mode not in ("RGB", "RGBA"):
-                    img = img.convert("RGBA")
-                else:
-                    img = img.convert("RGBA")
+async def encode_for_moderation_async(image: ImageSource) -> Optional[bytes]:
+    """モデレーション用の画像（WebP のバイト列）をワーカープールで作る。ファイルには保存しない"""
+    try:
+        upload = await _as_upload_async(image)
+        return await transcode_pool.run(_encode_moderation_image, upload.data)
+    except TranscodeBusyError:
+        raise
+    except Exception as e:
+        print(f"画像処理エラー: {e}")
+        return None
 
-                width, height = img.size
-                min_side = min(width, height)
-                left = (width - min_side) / 2
-                top = (height - min_side) / 2
-                right = left + min_side
-                bottom = top + min_side
-                cropped = img.crop((left, top, right, bottom))
 
-                resized = cropped.resize((size, size), Image.Resampling.LANCZOS)
+def process_profile_icon(image: ImageSource, user_id: str, size: int = 256) -> Optional[str]:
+    """プロフィールアイコン用に画像を処理して保存する."""
 
-                timestamp = int(time.time())
-                filename = f"{user_id}_{timestamp}_icon.webp"
-                icon_path = f"uploads/profile_icons/{filename}"
+    try:
+        ensure_directories_exist()
+        return _transcode_profile_icon(_as_upload(image).data, size)
+    except Exception as exc:
+        print(f"プロフィールアイコン処理エラー ({user_id}): {exc}")
 
-                resized.save(icon_path, "WEBP", quality=90, method=6)
+    return None
 
-                return f"/{icon_path}"
-        finally:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
 
-    except Exception as exc:
-        print(f"プロフィールアイコン処理エラー: {exc}")
+async def process_profile_icon_async(
+    image: ImageSource, user_id: str, size: int = 256, db: Optional[Session] = None
+) -> Optional[str]:
+    """process_profile_icon の非同期版（ワーカープールで変換する。埋まっていれば TranscodeBusyError）
 
-    return None
+    db を渡した場合は process_image_async と同様に、変換済みの同じ画像の結果を再利用する。
+    """
+    try:
+        ensure_directories_exist()
+        upload = await _as_upload_async(image)
+        key = None
+        if db is not None:
+            key = await asyncio.to_thread(source_key, upload.data, "profile_icon", (size,))
+            cached = find_source(db, key)
+            if cached is not None:
+                return cached["url"]
+        url = await transcode_pool.run(_transcode_profile_icon, upload.data, size)
+        if key is not None:
+            record_source(db, key, "profile_icon", {"url": url})
+        return url
+    except TranscodeBusyError:
+        raise
+    except Exception as exc:
+        print(f"プロフィールアイコン処理エラー ({user_id}): {exc}")
+        return None
 
 
 def resize_image_if_needed(img: Image.Image, max_width: int = 1200, max_height: int = 1200) -> Image.Image:
@@ -2,41 +2,43 @@
 
 import io
 import os
-import tempfile
-import filetype
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from fastapi import UploadFile
 from PIL import Image
-from PIL.ExifTags import TAGS
 
+from app.utils.upload_ingest import IngestedUpload, UploadTooLargeError, ingest_upload
 
-def validate_image_file(image: UploadFile) -> Dict[str, Any]:
-    """アップロードされた画像ファイルの安全性を検証する."""
-
-    # 対応拡張子/形式:
-    # - JPEG, PNG, GIF, WebP
-    # - HEIC/HEIF (Pillow側でサポートされている環境を前提)
-    allowed_mime_types = [
-        "image/jpeg",
-        "image/jpg",
-        "image/png",
-        "image/gif",
-        "image/webp",
-        "image/heic",
-        "image/heif",
-    ]
 
-    # サイズ上限を20MBに設定（サーバー側での最終防衛ライン）
-    max_size_in_bytes = 20 * 1024 * 1024
+# 対応拡張子/形式:
+# - JPEG, PNG, GIF, WebP
+# - HEIC/HEIF (Pillow側でサポートされている環境を前提)
+ALLOWED_IMAGE_MIME_TYPES = [
+    "image/jpeg",
+    "image/jpg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/heic",
+    "image/heif",
+]
+ALLOWED_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif"]
+
+# サイズ上限を20MBに設定（サーバー側での最終防衛ライン）
+MAX_IMAGE_SIZE_BYTES = 20 * 1024 * 1024
+
+IMAGE_TOO_LARGE_ERROR = "画像サイズは20MB以下にしてください"
+
 
-    if not image.filename:
+def validate_image_filename(filename: Optional[str]) -> Dict[str, Any]:
+    """ファイル名（拡張子）を検証する."""
+
+    if not filename:
         return {"is_valid": False, "error": "ファイル名がありません"}
 
-    allowed_extensions = [".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif"]
-    file_extension = os.path.splitext(image.filename)[1].lower()
+    file_extension = os.path.splitext(filename)[1].lower()
 
-    if file_extension not in allowed_extensions:
+    if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
         return {
             "is_valid": False,
             "error": "対応している画像形式はJPEG、PNG、GIF、WebPのみです",
@@ -54,61 +56,31 @@ def validate_image_file(image: UploadFile) -> Dict[str, Any]:
         ".rb",
     ]
     for ext in dangerous_extensions:
-        if image.filename.lower().endswith(ext):
+        if filename.lower().endswith(ext):
             return {"is_valid": False, "error": "このファイル形式は許可されていません"}
 
-    # FastAPIのUploadFileは size 属性を持たない場合があるため、実際のストリームサイズを計測してチェックする
-    try:
-        current_position = image.file.tell()
-        image.file.seek(0)
-        file_content = image.file.read()
-        image.file.seek(current_position)
-
-        if len(file_content) > max_size_in_bytes:
-            return {
-                "is_valid": False,
-                "error": "画像サイズは20MB以下にしてください",
-            }
-    except Exception:
-        # サイズ取得に失敗した場合も、安全側でエラーにする
-        return {
-            "is_valid": False,
-            "error": "画像サイズの検証に失敗しました。もう一度お試しください。",
-        }
+    return {"is_valid": True, "error": None}
 
-    try:
-        file_position = image.file.tell()
-        image.file.seek(0)
-        file_header = image.file.read(1024)
-        image.file.seek(file_position)
 
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file_header)
-            temp_file_path = temp_file.name
+def validate_image_upload(upload: IngestedUpload) -> Dict[str, Any]:
+    """取り込み済みの画像アップロードの安全性を検証する（本体の読み直しはしない）."""
 
-        try:
-            kind = filetype.guess(file_header)
-            if kind is not None:
-                if kind.mime not in allowed_mime_types:
-                    return {
-                        "is_valid": False,
-                        "error": f"ファイルの内容が対応している画像形式ではありません: {kind.mime}",
-                    }
-            else:
-                # filetype で判定できない場合は、Pillow での検証に任せる
-                pass
-        except Exception as exc:  # pragma: no cover - ログ用
-            print(f"画像形式検出エラー: {exc}")
-    except Exception as exc:  # pragma: no cover - ログ用
-        print(f"画像形式検出エラー: {exc}")
+    filename_validation = validate_image_filename(upload.filename)
+    if not filename_validation["is_valid"]:
+        return filename_validation
 
-    try:
-        file_position = image.file.tell()
-        image.file.seek(0)
-        file_content = image.file.read()
-        image.file.seek(file_position)
+    if upload.size > MAX_IMAGE_SIZE_BYTES:
+        return {"is_valid": False, "error": IMAGE_TOO_LARGE_ERROR}
 
-        validation_result = validate_image_content(file_content)
+    # 先頭のバイト列から判定した形式を確認する（判定できない場合は Pillow での検証に任せる）
+    if upload.mime is not None and upload.mime not in ALLOWED_IMAGE_MIME_TYPES:
+        return {
+            "is_valid": False,
+            "error": f"ファイルの内容が対応している画像形式ではありません: {upload.mime}",
+        }
+
+    try:
+        validation_result = validate_image_content(upload.data)
         if not validation_result["is_valid"]:
             return validation_result
     except Exception as exc:  # pragma: no cover - ログ用
@@ -121,8 +93,34 @@ def validate_image_file(image: UploadFile) -> Dict[str, Any]:
     return {"is_valid": True, "error": None}
 
 
+def validate_image_file(image: UploadFile) -> Dict[str, Any]:
+    """アップロードされた画像ファイルの安全性を検証する（UploadFile を直接受け取る互換用）."""
+
+    filename_validation = validate_image_filename(image.filename)
+    if not filename_validation["is_valid"]:
+        return filename_validation
+
+    try:
+        upload = ingest_upload(image, MAX_IMAGE_SIZE_BYTES)
+    except UploadTooLargeError:
+        return {"is_valid": False, "error": IMAGE_TOO_LARGE_ERROR}
+    except Exception:
+        # サイズ取得に失敗した場合も、安全側でエラーにする
+        return {
+            "is_valid": False,
+            "error": "画像サイズの検証に失敗しました。もう一度お試しください。",
+        }
+    finally:
+        try:
+            image.file.seek(0)
+        except Exception:
+            pass
+
+    return validate_image_upload(upload)
+
+
 def validate_image_content(file_content: bytes) -> Dict[str, Any]:
-    """画像のメタ情報や品質を検証する."""
+    """画像のメタ情報や品質を検証する（file_content は bytes / memoryview）."""
 
     try:
         with Image.open(io.BytesIO(file_content)) as img:
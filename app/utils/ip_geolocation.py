@@ -0,0 +1,284 @@
+"""IPアドレスからのおおよその位置情報の取得
+
+- 外部API（ipinfo.io）は共有の httpx.AsyncClient で非同期に呼び、イベントループを止めない
+- 結果は IP ごとに TTL 付きの LRU キャッシュに保存する（取得できなかった場合も短い TTL で覚えておく）
+- 同じ IP への同時の問い合わせは1回にまとめる
+- IP_GEO_DB_PATH にIPレンジのCSVを置くと、外部APIより先にローカルで引く（外部APIを無効にしても動く）
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import csv
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from config import settings
+
+Location = Dict[str, Any]
+
+# CSV の列名の別名（DB-IP / IP2Location の Lite 版の列名も受け付ける）
+_COLUMN_ALIASES = {
+    "start": ("start", "ip_start", "start_ip", "ip_from"),
+    "end": ("end", "ip_end", "end_ip", "ip_to"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng"),
+    "city": ("city", "city_name"),
+    "region": ("region", "stateprov", "region_name"),
+    "country": ("country", "country_code"),
+}
+
+
+def _parse_ip(value: str) -> Optional[Tuple[int, int]]:
+    """IPアドレス（または整数表記）を (バージョン, 整数値) にする"""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number < 2 ** 32 else 6), number
+    try:
+        ip = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    return ip.version, int(ip)
+
+
+class IPRangeDatabase:
+    """IPレンジ → 位置情報のローカルデータベース（CSV を読み込み、二分探索で引く）
+
+    CSV はヘッダ付きで、開始IP・終了IP・緯度・経度（任意で city / region / country）を持つ。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # IPバージョンごとに、開始IPの昇順で (開始, 終了, 位置情報) を並べる
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ranges: Dict[int, List[Tuple[int, int, Location]]] = {4: [], 6: []}
+        self._load(path)
+
+    def _load(self, path: str) -> None:
+        rows: Dict[int, List[Tuple[int, int, Location]]] = {4: [], 6: []}
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fields = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+            columns = {}
+            for key, aliases in _COLUMN_ALIASES.items():
+                columns[key] = next((fields[alias] for alias in aliases if alias in fields), None)
+            missing = [key for key in ("start", "end", "latitude", "longitude") if columns[key] is None]
+            if missing:
+                raise ValueError(f"IP位置情報DBに必要な列がありません: {', '.join(missing)}")
+
+            for row in reader:
+                start = _parse_ip(row[columns["start"]] or "")
+                end = _parse_ip(row[columns["end"]] or "")
+                if start is None or end is None or start[0] != end[0]:
+                    continue
+                try:
+                    location = {
+                        "latitude": float(row[columns["latitude"]]),
+                        "longitude": float(row[columns["longitude"]]),
+                        "city": row.get(columns["city"]) if columns["city"] else None,
+                        "region": row.get(columns["region"]) if columns["region"] else None,
+                        "country": row.get(columns["country"]) if columns["country"] else None,
+                    }
+                except (TypeError, ValueError):
+                    continue
+                rows[start[0]].append((start[1], end[1], location))
+
+        for version, ranges in rows.items():
+            ranges.sort(key=lambda item: item[0])
+            self._ranges[version] = ranges
+            self._starts[version] = [start for start, _, _ in ranges]
+
+    def __len__(self) -> int:
+        return sum(len(ranges) for ranges in self._ranges.values())
+
+    def lookup(self, ip: str) -> Optional[Location]:
+        parsed = _parse_ip(ip)
+        if parsed is None:
+            return None
+        version, value = parsed
+        index = bisect.bisect_right(self._starts[version], value) - 1
+        if index < 0:
+            return None
+        start, end, location = self._ranges[version][index]
+        if start <= value <= end:
+            return dict(location)
+        return None
+
+
+class IPGeolocator:
+    """キャッシュ付きのIP位置情報取得（ローカルDB → 外部APIの順に引く）"""
+
+    IPINFO_URL = "https://ipinfo.io/{ip}/json"
+
+    def __init__(
+        self,
+        database_path: str = "",
+        online_lookup: bool = True,
+        ttl_seconds: float = 21600,
+        negative_ttl_seconds: float = 600,
+        max_entries: int = 10000,
+        timeout_seconds: float = 2.0,
+    ) -> None:
+        self.database_path = database_path
+        self.online_lookup = online_lookup
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.timeout_seconds = timeout_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Location]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._database: Optional[IPRangeDatabase] = None
+        self._database_loaded = False
+        self._database_lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _read_database(self) -> Optional[IPRangeDatabase]:
+        """ローカルDBの CSV を読み込む（読み込めなければ使わない）"""
+        try:
+            database = IPRangeDatabase(self.database_path)
+        except (OSError, ValueError) as e:
+            print(f"IP位置情報DBを読み込めませんでした: {e}")
+            return None
+        print(f"IP位置情報DBを読み込みました: {len(database)}件")
+        return database
+
+    async def load_database(self) -> Optional[IPRangeDatabase]:
+        """ローカルDBを返す（未読み込みなら読み込む）
+
+        CSV の解析は数十万行になりうるため、スレッドで行いイベントループを止めない。
+        起動時に lifespan から呼んでおき、リクエスト中に読み込まないようにする。
+        """
+        if self._database_loaded or not self.database_path:
+            return self._database
+        if self._database_lock is None:
+            self._database_lock = asyncio.Lock()
+        async with self._database_lock:
+            # 待っている間に他のリクエストが読み込んでいれば、それを使う
+            if not self._database_loaded:
+                self._database = await asyncio.to_thread(self._read_database)
+                self._database_loaded = True
+        return self._database
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout=self.timeout_seconds, connect=self.timeout_seconds),
+                follow_redirects=False,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _cached(self, ip: str) -> Tuple[bool, Optional[Location]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, location = entry
+            if expires_at <= now:
+                del self._entries[ip]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(ip)
+            self.hits += 1
+            return True, location
+
+    def _store(self, ip: str, location: Optional[Location]) -> None:
+        ttl = self.ttl_seconds if location is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[ip] = (time.monotonic() + ttl, location)
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def locate(self, ip: str) -> Optional[Location]:
+        """IPアドレスの位置情報を返す（取得できなければ None）"""
+        found, location = self._cached(ip)
+        if found:
+            return None if location is None else dict(location)
+
+        # 同じIPを同時に引く場合は最初の1件の結果を待つ
+        pending = self._inflight.get(ip)
+        if pending is not None:
+            location = await asyncio.shield(pending)
+            return None if location is None else dict(location)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[ip] = future
+        location = None
+        try:
+            location = await self._resolve(ip)
+            self._store(ip, location)
+        finally:
+            self._inflight.pop(ip, None)
+            future.set_result(location)
+        return None if location is None else dict(location)
+
+    async def _resolve(self, ip: str) -> Optional[Location]:
+        database = await self.load_database()
+        if database is not None:
+            location = database.lookup(ip)
+            if location is not None:
+                return location
+        if not self.online_lookup:
+            return None
+        return await self._lookup_ipinfo(ip)
+
+    async def _lookup_ipinfo(self, ip: str) -> Optional[Location]:
+        try:
+            response = await self._get_client().get(self.IPINFO_URL.format(ip=ip))
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            if "loc" not in data:
+                return None
+            lat, lng = data["loc"].split(",")
+            return {
+                "latitude": float(lat),
+                "longitude": float(lng),
+                "city": data.get("city"),
+                "region": data.get("region"),
+                "country": data.get("country"),
+            }
+        except Exception as e:
+            print(f"IP位置情報取得エラー: {e}")
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "database_ranges": len(self._database) if self._database is not None else 0,
+            "online_lookup": self.online_lookup,
+        }
+
+
+ip_geolocator = IPGeolocator(
+    database_path=settings.IP_GEO_DB_PATH,
+    online_lookup=settings.IP_GEO_ONLINE_LOOKUP,
+    ttl_seconds=settings.IP_GEO_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=settings.IP_GEO_NEGATIVE_TTL_SECONDS,
+)
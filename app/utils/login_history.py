@@ -0,0 +1,123 @@
+"""ログイン履歴と、ユーザーごとの最後にログインした端末の記録
+
+- UserLoginHistory: ログインのたびに1行追加する（追記のみ）。保持期間を過ぎた行は prune_login_history で削除する
+- UserLastLogin: ユーザーごとに1行だけ持ち、ログインのたびに upsert で上書きする。
+  「前回と環境が違うか」の判定はこちらを主キーで引くため、履歴の件数に関係なく一定の手間で済む
+
+実行方法（cron などで定期的に実行する）:
+    python -m app.utils.login_history
+    python -m app.utils.login_history --dry-run --retention-days 90
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import JST, UserLastLogin, UserLoginHistory
+from config import settings
+
+
+def get_last_login(db: Session, user_id: str) -> Optional[UserLastLogin]:
+    """ユーザーが最後にログインした端末を返す（初回ログインなら None）"""
+    last_login = db.get(UserLastLogin, user_id)
+    if last_login is not None:
+        return last_login
+
+    # UserLastLogin の導入前にログインしていたユーザーは、最新の履歴から作る
+    # （ix_user_login_history_user_id_created_at の索引だけで引ける）
+    latest = db.query(UserLoginHistory).filter(
+        UserLoginHistory.user_id == user_id
+    ).order_by(UserLoginHistory.created_at.desc()).first()
+    if latest is None:
+        return None
+    # 同じユーザーの同時ログインが先に作っていれば、そちらを残す
+    db.execute(
+        sqlite_insert(UserLastLogin)
+        .values(
+            user_id=user_id,
+            ip_address=latest.ip_address,
+            user_agent=latest.user_agent,
+            last_seen_at=latest.created_at,
+        )
+        .on_conflict_do_nothing(index_elements=[UserLastLogin.user_id])
+    )
+    return db.get(UserLastLogin, user_id)
+
+
+def record_login(
+    db: Session,
+    user_id: str,
+    ip_address: str,
+    user_agent: Optional[str],
+    last_login: Optional[UserLastLogin] = None,
+) -> UserLoginHistory:
+    """履歴を1行追加し、最後にログインした端末を更新する（コミットは呼び出し側で行う）
+
+    最後の端末は INSERT ... ON CONFLICT DO UPDATE で1文で書き換えるため、
+    行がまだないユーザーが同時にログインしても主キーの重複で失敗しない。
+    last_login に get_last_login の結果を渡すと、書き換え後の値を読み直すように期限切れにする。
+    """
+    now = datetime.now(JST)
+    history = UserLoginHistory(user_id=user_id, ip_address=ip_address, user_agent=user_agent, created_at=now)
+    db.add(history)
+
+    values = {"ip_address": ip_address, "user_agent": user_agent, "last_seen_at": now}
+    statement = sqlite_insert(UserLastLogin).values(user_id=user_id, **values)
+    db.execute(statement.on_conflict_do_update(index_elements=[UserLastLogin.user_id], set_=values))
+    if last_login is not None and last_login in db:
+        db.expire(last_login)
+    return history
+
+
+def prune_login_history(
+    db: Session,
+    retention_days: Optional[float] = None,
+    batch_size: int = 5000,
+    dry_run: bool = False,
+) -> int:
+    """保持期間を過ぎたログイン履歴を削除し、件数を返す
+
+    一度に大量の行を消すと書き込みロックが長く続くため、batch_size 件ずつ消してはコミットする。
+    UserLastLogin は消さないため、古い履歴がなくなっても前回の端末との比較はそのまま行える。
+    """
+    days = settings.LOGIN_HISTORY_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.now(JST) - timedelta(days=days)
+    expired = db.query(UserLoginHistory.id).filter(UserLoginHistory.created_at < cutoff)
+    if dry_run:
+        return expired.count()
+
+    deleted = 0
+    while True:
+        ids = [row.id for row in expired.order_by(UserLoginHistory.created_at).limit(batch_size)]
+        if not ids:
+            break
+        deleted += db.query(UserLoginHistory).filter(
+            UserLoginHistory.id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+    return deleted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retention-days", type=float, default=None, help="ログイン履歴を残す日数")
+    parser.add_argument("--dry-run", action="store_true", help="削除せずに件数だけを表示する")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = prune_login_history(db, retention_days=args.retention_days, dry_run=args.dry_run)
+    finally:
+        db.close()
+    label = "削除予定" if args.dry_run else "削除"
+    print(f"ログイン履歴の{label}: {count} 件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""メディアストア（/uploads/media）の配信
+
+ファイル名が内容の SHA-256 なので、内容が変わることはない。これを前提に StaticFiles より軽く配信する。
+
+- ETag はファイル名のハッシュをそのまま使う強い ETag（stat や内容の読み直しは不要）
+- If-None-Match が一致すれば 304、Cache-Control は immutable（再検証のリクエスト自体を減らす）
+- Range（単一範囲）に 206 で応え、範囲外は 416。If-Range が ETag と一致しない場合は全体を返す
+- 本体の転送は、サーバーが ASGI の拡張に対応していれば任せる
+  （http.response.zerocopysend は os.sendfile による送信、http.response.pathsend はサーバー側でのファイル送信）。
+  対応していなければ、スレッドで os.pread した大きめのチャンクを送る
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from typing import BinaryIO, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from app.utils.media_store import MediaStore, media_store
+
+CHUNK_SIZE = 1024 * 1024
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_MEDIA_PATH = re.compile(r"/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})\.[a-z0-9]{1,5}")
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """Range ヘッダーを [start, end]（end を含む）にする。無視すべきなら None、満たせなければ ValueError"""
+    match = _RANGE.fullmatch(value.strip())
+    if match is None:
+        return None  # 複数範囲や単位違いは無視して全体を返す（RFC 9110 で許される）
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("空の範囲")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("範囲外")
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match の比較（弱い比較。W/ は外して比べる）"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class MediaFiles:
+    """/uploads/media にマウントする ASGI アプリ"""
+
+    def __init__(self, store: MediaStore = media_store, chunk_size: int = CHUNK_SIZE) -> None:
+        self.store = store
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        method = scope["method"].upper()
+        if method not in ("GET", "HEAD"):
+            await self._send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        relative = self._route_path(scope)
+        match = _MEDIA_PATH.fullmatch(relative)
+        if match is None or match.group(1) != match.group(3)[:2] or match.group(2) != match.group(3)[2:4]:
+            await self._send_empty(send, 404)
+            return
+        path = os.path.join(self.store.root, relative.lstrip("/"))
+        try:
+            file = await anyio.to_thread.run_sync(open, path, "rb")
+        except (FileNotFoundError, NotADirectoryError):
+            await self._send_empty(send, 404)
+            return
+
+        with file:
+            await self._respond(scope, send, file, path, f'"{match.group(3)}"', method == "HEAD")
+
+    @staticmethod
+    def _route_path(scope: Scope) -> str:
+        # Mount は root_path にマウント先のパスを足して渡す
+        path: str = scope["path"]
+        root_path: str = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
+
+    async def _respond(self, scope: Scope, send: Send, file: BinaryIO, path: str, etag: str, head_only: bool) -> None:
+        size = os.fstat(file.fileno()).st_size
+        request_headers = Headers(scope=scope)
+        headers: List[Tuple[bytes, bytes]] = [
+            (b"etag", etag.encode()),
+            (b"cache-control", CACHE_CONTROL.encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            await self._send_empty(send, 304, headers)
+            return
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        headers.append((b"content-type", content_type.encode()))
+
+        byte_range = None
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header is not None and (if_range is None or if_range.strip() == etag):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                headers.append((b"content-range", f"bytes */{size}".encode()))
+                await self._send_empty(send, 416, headers)
+                return
+
+        if byte_range is None:
+            status, start, length = 200, 0, size
+        else:
+            start, end = byte_range
+            status, length = 206, end - start + 1
+            headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        headers.append((b"content-length", str(length).encode()))
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if head_only or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            await send(
+                {"type": "http.response.zerocopysend", "file": file, "offset": start, "count": length, "more_body": False}
+            )
+        elif "http.response.pathsend" in extensions and status == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(path)})
+        else:
+            await self._send_chunks(send, file.fileno(), start, length)
+
+    async def _send_chunks(self, send: Send, fd: int, offset: int, remaining: int) -> None:
+        # os.pread は位置を引数で受け取るので、ファイルの読み取り位置を共有せずに済む
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, min(self.chunk_size, remaining), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # 配信中にファイルが短くなった場合（通常は起きない）
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _send_empty(send: Send, status: int, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": list(headers or [])})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
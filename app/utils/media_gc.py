@@ -0,0 +1,179 @@
+"""参照されなくなったメディアファイルのガベージコレクション
+
+1. 投稿・来店記録・プロフィールアイコンの URL 列から参照数を数え直し、MediaAsset.ref_count を補正する
+   （一括削除など、フラッシュを通らない変更で ref_count がずれていても直る）
+2. 参照が 0 のまま猶予期間を過ぎたメディアを、ファイル・MediaAsset・それを指す MediaSource ごと削除する
+3. MediaAsset に登録されていないメディアストアのファイル（保存後に投稿が失敗した場合など）と、
+   旧形式のディレクトリ（uploads/original など）で参照されていないファイルを、猶予期間を過ぎていれば削除する
+
+実行方法:
+    python -m app.utils.media_gc
+    python -m app.utils.media_gc --dry-run --grace-hours 48
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models import JST, MediaAsset, MediaSource
+from app.utils.media_store import REFERENCE_COLUMNS, MediaStore, media_store, media_urls
+from config import settings
+
+# メディアストア導入前の保存先（ファイル名に内容のハッシュを使っていないもの）
+LEGACY_DIRECTORIES = ("original", "thumbnails", "renditions", "profile_icons", "videos")
+
+
+def count_references(db: Session) -> Counter:
+    """メディアストアの URL ごとに、参照している行の数を数える"""
+    counts: Counter = Counter()
+    for model, columns in REFERENCE_COLUMNS.items():
+        query = db.query(*(getattr(model, name) for name in columns)).execution_options(yield_per=1000)
+        for row in query:
+            urls: Set[str] = set()
+            for value in row:
+                urls.update(media_urls(value))
+            counts.update(urls)
+    return counts
+
+
+def _referenced_legacy_urls(db: Session) -> Set[str]:
+    urls: Set[str] = set()
+    for model, columns in REFERENCE_COLUMNS.items():
+        for row in db.query(*(getattr(model, name) for name in columns)).execution_options(yield_per=1000):
+            for value in row:
+                if not value:
+                    continue
+                for entry in value.split(","):
+                    url = entry.strip().split(" ")[0]
+                    if url.startswith("/uploads/"):
+                        urls.add(url)
+    return urls
+
+
+def _as_aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite はタイムゾーンを保存しないため、読み出した値は JST とみなす
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=JST)
+    return value
+
+
+def _walk_files(directory: str) -> Iterable[str]:
+    for current, _, files in os.walk(directory):
+        for name in files:
+            yield os.path.join(current, name)
+
+
+def collect_garbage(
+    db: Session,
+    grace_hours: Optional[float] = None,
+    dry_run: bool = False,
+    store: MediaStore = media_store,
+    upload_root: str = "uploads",
+) -> Dict[str, int]:
+    """参照されていないメディアを削除し、件数と削除したバイト数を返す"""
+    grace = timedelta(hours=settings.MEDIA_GC_GRACE_HOURS if grace_hours is None else grace_hours)
+    now = datetime.now(JST)
+    cutoff = now - grace
+    cutoff_timestamp = time.time() - grace.total_seconds()
+    stats = {"recounted": 0, "assets_deleted": 0, "untracked_deleted": 0, "legacy_deleted": 0, "bytes_freed": 0}
+
+    references = count_references(db)
+    assets = db.query(MediaAsset).all()
+    registered = {asset.url for asset in assets}
+    doomed: Set[str] = set()
+    for asset in assets:
+        count = references.get(asset.url, 0)
+        if asset.ref_count != count:
+            stats["recounted"] += 1
+            asset.ref_count = count
+            asset.unreferenced_at = None if count else (asset.unreferenced_at or now)
+        if count:
+            continue
+        since = _as_aware(asset.unreferenced_at) or _as_aware(asset.created_at) or now
+        if since <= cutoff:
+            doomed.add(asset.url)
+
+    for asset in assets:
+        if asset.url not in doomed:
+            continue
+        stats["assets_deleted"] += 1
+        stats["bytes_freed"] += asset.size if dry_run else store.remove(asset.url)
+        if not dry_run:
+            db.delete(asset)
+
+    if doomed and not dry_run:
+        # 削除したファイルを結果に含む変換記録は、再利用できないので消す
+        for source in db.query(MediaSource).all():
+            if any(url in doomed for value in source.result.values() if isinstance(value, str) for url in media_urls(value)):
+                db.delete(source)
+
+    # MediaAsset に登録されていないメディアストアのファイル
+    for path in _walk_files(store.root):
+        relative = os.path.relpath(path, store.root).replace(os.sep, "/")
+        url = store.url_prefix + relative
+        if url in registered or references.get(url) or os.path.basename(path).startswith(".upload-"):
+            continue
+        stats["untracked_deleted"] += _remove_if_stale(path, cutoff_timestamp, dry_run, stats)
+
+    # 旧形式のディレクトリで参照されていないファイル
+    legacy_references = _referenced_legacy_urls(db)
+    for directory in LEGACY_DIRECTORIES:
+        for path in _walk_files(os.path.join(upload_root, directory)):
+            relative = os.path.relpath(path, upload_root).replace(os.sep, "/")
+            if f"/uploads/{relative}" in legacy_references:
+                continue
+            stats["legacy_deleted"] += _remove_if_stale(path, cutoff_timestamp, dry_run, stats)
+
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    return stats
+
+
+def _remove_if_stale(path: str, cutoff_timestamp: float, dry_run: bool, stats: Dict[str, int]) -> int:
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    if info.st_mtime > cutoff_timestamp:
+        # 保存した直後でまだ行が作られていないファイルは残す
+        return 0
+    if not dry_run:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+    stats["bytes_freed"] += info.st_size
+    return 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grace-hours", type=float, default=None, help="参照がなくなってから削除するまでの猶予（時間）")
+    parser.add_argument("--dry-run", action="store_true", help="削除せずに件数だけを表示する")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        stats = collect_garbage(db, grace_hours=args.grace_hours, dry_run=args.dry_run)
+    finally:
+        db.close()
+    label = "削除予定" if args.dry_run else "削除"
+    print(
+        f"参照数の補正 {stats['recounted']} 件 / {label}: メディア {stats['assets_deleted']} 件, "
+        f"未登録ファイル {stats['untracked_deleted']} 件, 旧形式ファイル {stats['legacy_deleted']} 件 "
+        f"({stats['bytes_freed'] / 1024 / 1024:.1f} MiB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""内容アドレス方式のメディア保存と参照カウント
+
+アップロードされたメディアは内容の SHA-256 をファイル名にして uploads/media/ab/cd/<sha256>.<拡張子> に保存する。
+
+- 同じ内容のファイルは1つしか保存しない（既にあれば書き込まない）
+- 同じ元ファイルが同じ設定で再びアップロードされた場合は、MediaSource の記録から変換結果を再利用する
+  （変換もファイルの書き込みも行わない）
+- 投稿・来店記録・プロフィールアイコンの URL 列の変化をフラッシュ時に集計し、MediaAsset.ref_count を増減する
+- 参照が 0 になったファイルは、ガベージコレクション（app/utils/media_gc.py）が猶予期間の後に削除する
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, event, insert, inspect as sa_inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models import JST, MediaAsset, MediaSource, Post, User, Visit
+
+MEDIA_URL_PREFIX = "/uploads/media/"
+_MEDIA_URL_PATTERN = re.compile(r"/uploads/media/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]{1,5}")
+_CHUNK_SIZE = 1024 * 1024
+
+# メディアの URL を持つ列（image_srcset は複数の URL を含む）
+REFERENCE_COLUMNS = {
+    Post: ("thumbnail_url", "original_image_url", "image_srcset", "video_url"),
+    Visit: ("image_url",),
+    User: ("profile_image_url",),
+}
+
+
+def media_urls(value: Optional[str]) -> List[str]:
+    """URL（または srcset）に含まれるメディアストアの URL を返す"""
+    if not value or MEDIA_URL_PREFIX not in value:
+        return []
+    return _MEDIA_URL_PATTERN.findall(value)
+
+
+class MediaStore:
+    """ハッシュで分散したディレクトリにメディアを保存する"""
+
+    def __init__(self, root: str = "uploads/media", url_prefix: str = MEDIA_URL_PREFIX) -> None:
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/") + "/"
+
+    def _relative(self, digest: str, ext: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext.lstrip('.').lower()}"
+
+    def path_for_url(self, url: str) -> Optional[str]:
+        if not url.startswith(self.url_prefix) or ".." in url:
+            return None
+        return os.path.join(self.root, url[len(self.url_prefix):])
+
+    def _write_atomic(self, path: str, chunks: Iterable[bytes]) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=directory)
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+            # 同じ内容を同時に書いた場合も、どちらかが残るだけで中身は同じ
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def put_bytes(self, data: bytes, ext: str) -> str:
+        """data を保存して URL を返す（同じ内容が既にあれば書き込まない）"""
+        relative = self._relative(hashlib.sha256(data).hexdigest(), ext)
+        path = os.path.join(self.root, relative)
+        if not os.path.exists(path):
+            self._write_atomic(path, (data,))
+        return self.url_prefix + relative
+
+    def put_stream(self, stream: BinaryIO, ext: str) -> str:
+        """ストリームを保存して URL を返す
+
+        先にハッシュだけを計算し、同じ内容が既にあれば書き込まない（重複の書き込みは0バイト）。
+        """
+        stream.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        relative = self._relative(digest.hexdigest(), ext)
+        path = os.path.join(self.root, relative)
+        if not os.path.exists(path):
+            stream.seek(0)
+            self._write_atomic(path, iter(lambda: stream.read(_CHUNK_SIZE), b""))
+        return self.url_prefix + relative
+
+    def exists(self, url: str) -> bool:
+        path = self.path_for_url(url)
+        return path is not None and os.path.exists(path)
+
+    def size(self, url: str) -> int:
+        path = self.path_for_url(url)
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    def remove(self, url: str) -> int:
+        """ファイルを削除して削除したバイト数を返す（無ければ 0）"""
+        path = self.path_for_url(url)
+        if path is None:
+            return 0
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+
+media_store = MediaStore()
+
+
+def source_key(data: bytes, kind: str, params: Sequence[Any]) -> str:
+    """元ファイルと変換設定から、変換結果を引くためのキーを作る"""
+    digest = hashlib.sha256(data)
+    digest.update(repr((kind, tuple(params))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _result_urls(result: Dict[str, Any]) -> List[str]:
+    urls: List[str] = []
+    for value in result.values():
+        if isinstance(value, str):
+            urls.extend(media_urls(value))
+    return urls
+
+
+def find_source(db: Session, key: str) -> Optional[Dict[str, Any]]:
+    """以前の変換結果を返す（ファイルが1つでも消えていれば None）"""
+    source = db.get(MediaSource, key)
+    if source is None:
+        return None
+    if not all(media_store.exists(url) for url in _result_urls(source.result)):
+        return None
+    return dict(source.result)
+
+
+def record_source(db: Session, key: str, kind: str, result: Dict[str, Any]) -> None:
+    """変換結果を記録し、生成したファイルを MediaAsset に登録する"""
+    register_assets(db, _result_urls(result))
+    db.merge(MediaSource(source_key=key, kind=kind, result=result))
+
+
+def register_assets(db: Session, urls: Iterable[str]) -> None:
+    """保存したファイルを MediaAsset に登録する（参照は 0 のまま。投稿などに使われた時点で増える）
+
+    ORM のフラッシュを待たずにすぐ INSERT するため、同じトランザクション内で参照する行より先に存在する。
+    """
+    urls = sorted(set(url for url in urls if url.startswith(MEDIA_URL_PREFIX)))
+    if not urls:
+        return
+    connection = db.connection()
+    existing = set(connection.execute(select(MediaAsset.url).where(MediaAsset.url.in_(urls))).scalars())
+    now = datetime.now(JST)
+    rows = [
+        {"url": url, "size": media_store.size(url), "ref_count": 0, "created_at": now, "unreferenced_at": now}
+        for url in urls
+        if url not in existing
+    ]
+    if rows:
+        connection.execute(insert(MediaAsset), rows)
+
+
+def _reference_sets(obj: Any, columns: Sequence[str], connection) -> tuple:
+    """変更前と変更後に参照しているメディアの URL の集合"""
+    state = sa_inspect(obj)
+    before: set = set()
+    after: set = set()
+    unloaded = []
+    for name in columns:
+        history = state.attrs[name].history
+        new_values = history.added or history.unchanged
+        old_values = history.deleted or history.unchanged
+        for value in new_values:
+            after.update(media_urls(value))
+        if not old_values and history.added and state.has_identity:
+            # 期限切れの属性に代入した場合は変更前の値が読み込まれていないため、DB から読む
+            unloaded.append(name)
+        for value in old_values:
+            before.update(media_urls(value))
+
+    if unloaded:
+        mapper = state.mapper
+        table = mapper.local_table
+        conditions = [column == value for column, value in zip(mapper.primary_key, state.identity)]
+        row = connection.execute(select(*(table.c[name] for name in unloaded)).where(*conditions)).first()
+        if row is not None:
+            for value in row:
+                before.update(media_urls(value))
+    return before, after
+
+
+def _track_references(session: Session, flush_context, instances) -> None:
+    """フラッシュ前に、メディアの URL 列の変化から参照カウントの増減を求めて反映する"""
+    deltas: Counter = Counter()
+    with session.no_autoflush:
+        connection = None
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            columns = REFERENCE_COLUMNS.get(type(obj))
+            if not columns:
+                continue
+            if obj in session.new:
+                before, after = set(), set()
+                for name in columns:
+                    after.update(media_urls(getattr(obj, name)))
+            elif obj in session.deleted:
+                before, after = set(), set()
+                for name in columns:
+                    before.update(media_urls(getattr(obj, name)))
+            else:
+                if connection is None:
+                    connection = session.connection()
+                before, after = _reference_sets(obj, columns, connection)
+            for url in after - before:
+                deltas[url] += 1
+            for url in before - after:
+                deltas[url] -= 1
+
+    deltas = {url: delta for url, delta in deltas.items() if delta}
+    if deltas:
+        apply_reference_deltas(session.connection(), deltas)
+
+
+def apply_reference_deltas(connection, deltas: Dict[str, int]) -> None:
+    """ref_count を増減し、参照が 0 になった（なくなった）時刻を記録する"""
+    now = datetime.now(JST)
+    table = MediaAsset.__table__
+    for url, delta in deltas.items():
+        new_count = table.c.ref_count + delta
+        result = connection.execute(
+            update(table)
+            .where(table.c.url == url)
+            .values(
+                ref_count=case((new_count < 0, 0), else_=new_count),
+                unreferenced_at=case((new_count > 0, None), else_=now),
+            )
+        )
+        if result.rowcount == 0 and delta > 0:
+            # 登録前のファイル（register_assets を通らなかったもの）は、ここで登録する
+            connection.execute(
+                insert(table).values(url=url, size=media_store.size(url), ref_count=delta, created_at=now)
+            )
+
+
+event.listen(Session, "before_flush", _track_references)
@@ -0,0 +1,62 @@
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+
+class LatencyTracker:
+    """ラベルごとに直近のレイテンシを保持し、p50/p99 を算出するインメモリ集計器"""
+
+    def __init__(self, window_size: int = 1000) -> None:
+        self._window_size = window_size
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self._window_size))
+        self._totals: Dict[str, int] = defaultdict(int)
+
+    def observe(self, label: str, seconds: float) -> None:
+        """処理時間（秒）を記録する"""
+        with self._lock:
+            self._samples[label].append(seconds)
+            self._totals[label] += 1
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], percentile: float) -> float:
+        if not sorted_values:
+            return 0.0
+        # nearest-rank 法
+        rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+        return sorted_values[min(rank, len(sorted_values)) - 1]
+
+    def summary(self, label: str) -> Optional[Dict[str, float]]:
+        """ラベルの集計値（ミリ秒）を返す。記録がなければ None"""
+        with self._lock:
+            values = sorted(self._samples.get(label, ()))
+            total = self._totals.get(label, 0)
+        if not values:
+            return None
+        return {
+            "count": total,
+            "window": len(values),
+            "p50_ms": round(self._percentile(values, 50) * 1000, 2),
+            "p99_ms": round(self._percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Dict[str, float]]:
+        """prefix に一致する全ラベルの集計値を返す"""
+        with self._lock:
+            labels = [label for label in self._samples if label.startswith(prefix)]
+        result: Dict[str, Dict[str, float]] = {}
+        for label in sorted(labels):
+            stats = self.summary(label)
+            if stats:
+                result[label] = stats
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+latency_metrics = LatencyTracker()
@@ -4,10 +4,33 @@ from datetime import datetime
 
 from sqlalchemy.orm import Session, joinedload, sessionmaker
 
-from app.models import Post, Report, User
+from app.models import Post, Reply, Report, User
 from app.utils.content_moderator import content_moderator
 from app.utils.scoring import apply_penalty
 
+# 返信モデレーションの段階
+# - sync : 保存前にAI審査を待つ（低スコアユーザー・スパム疑いの強い返信）
+# - async: 即時公開し、バックグラウンドでAI審査する
+# - none : スパムシグナルのない信頼ユーザーの返信は審査しない（投稿と同じ方針）
+REPLY_TIER_SYNC = "sync"
+REPLY_TIER_ASYNC = "async"
+REPLY_TIER_NONE = "none"
+
+REPLY_LOW_TRUST_INTERNAL_SCORE = 70
+REPLY_SYNC_SPAM_SCORE = 2.5
+REPLY_ASYNC_SPAM_SCORE = 1.0
+REPLY_VIOLATION_CONFIDENCE = 0.7
+
+
+def select_reply_moderation_tier(spam_score: float, is_spam: bool, internal_score: int | None) -> str:
+    """スパムスコアとユーザーの internal_score から返信の審査段階を決定する"""
+    score = internal_score if internal_score is not None else 100
+    if score <= REPLY_LOW_TRUST_INTERNAL_SCORE or is_spam or spam_score >= REPLY_SYNC_SPAM_SCORE:
+        return REPLY_TIER_SYNC
+    if spam_score >= REPLY_ASYNC_SPAM_SCORE:
+        return REPLY_TIER_ASYNC
+    return REPLY_TIER_NONE
+
 
 async def _moderate_post(post_id: int, session_factory: sessionmaker) -> None:
     db = session_factory()
@@ -130,6 +153,62 @@ async def _moderate_post(post_id: int, session_factory: sessionmaker) -> None:
         db.close()
 
 
+async def _moderate_reply(reply_id: int, content: str, session_factory: sessionmaker) -> None:
+    """公開済みの返信をAI審査し、違反であれば非表示化してペナルティを適用する"""
+    try:
+        analysis = await content_moderator.analyze_content(
+            content,
+            reason="reply_creation",
+            user_history="",
+        )
+    except Exception as exc:  # noqa: BLE001
+        print(f"返信ID {reply_id} の審査中にエラーが発生しました: {exc}")
+        return
+
+    if not (analysis.get("is_violation") and analysis.get("confidence", 0) >= REPLY_VIOLATION_CONFIDENCE):
+        print(f"返信ID {reply_id} は適切と判断されました (レベル: async)")
+        return
+
+    # 違反と判断された場合のみDBセッションを開く
+    db = session_factory()
+    try:
+        reply = (
+            db.query(Reply)
+            .options(joinedload(Reply.author))
+            .filter(Reply.id == reply_id)
+            .first()
+        )
+        if not reply:
+            return
+
+        reason = analysis.get("reason") or "不適切なコンテンツが検出されました"
+        reply.is_shadow_banned = True
+        reply.shadow_ban_reason = f"AI審査: {reason}"
+
+        offender: User | None = reply.author
+        if offender:
+            apply_penalty(
+                db,
+                offender,
+                "content_violation",
+                analysis.get("severity", "medium") or "medium",
+                metadata={
+                    "reply_id": reply_id,
+                    "post_id": reply.post_id,
+                    "moderation_level": REPLY_TIER_ASYNC,
+                },
+                override_reason=analysis.get("reason"),
+            )
+
+        db.commit()
+        print(f"返信ID {reply_id} を違反と判断し、非表示にしました")
+    except Exception as exc:  # noqa: BLE001
+        print(f"返信の自動モデレーション処理でエラーが発生しました: {exc}")
+        db.rollback()
+    finally:
+        db.close()
+
+
 async def schedule_task(coro) -> None:
     """
     任意の非同期処理をバックグラウンドで実行するためのユーティリティ。
@@ -160,4 +239,19 @@ async def schedule_post_moderation(post_id: int, db_session: Session) -> None:
     except RuntimeError:
         # テスト環境などでイベントループが存在しない場合は同期的に実行
         with suppress(Exception):
-            asyncio.run(_moderate_post(post_id, session_factory))
\ No newline at end of file
+            asyncio.run(_moderate_post(post_id, session_factory))
+
+
+async def schedule_reply_moderation(reply_id: int, content: str, db_session: Session) -> None:
+    """公開済みの返信のAI審査をイベントループ上で非同期に実行する"""
+    bind = db_session.get_bind()
+    if bind is None:
+        return
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+    try:
+        asyncio.create_task(_moderate_reply(reply_id, content, session_factory))
+    except RuntimeError:
+        with suppress(Exception):
+            asyncio.run(_moderate_reply(reply_id, content, session_factory))
@@ -0,0 +1,196 @@
+"""MinHash + LSH による近似重複検出
+
+- 投稿・返信の本文の文字3-gram集合から MinHash 署名（16個の32bit値）を作り、Post/Reply の minhash 列に保存する
+- 署名を 4 行ずつ 4 つのバンドに分け、各バンドのハッシュをインデックス付きの列（lsh_band0〜3）に保存する
+  Jaccard 類似度 s の2件がいずれかのバンドで一致する確率は 1-(1-s^4)^4（s=0.85 で約95%、s=0.5 で約23%）
+- 候補はバンド列の等値検索だけで取り出し、署名から推定した類似度で最終判定する（本文同士の総当たり比較は不要）
+- 署名は保存時に SQLAlchemy のイベントで自動的に付与する（完全重複判定用の本文ハッシュも同時に付与する）
+- 列の追加前に保存された行は、起動時に backfill_signatures でまとめて埋める
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, event, inspect as sa_inspect, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import Post, Reply
+
+NUM_PERMUTATIONS = 16
+LSH_BANDS = 4
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_UINT32_MASK = (1 << 32) - 1
+_SIGNATURE_FORMAT = f">{NUM_PERMUTATIONS}I"
+
+# 署名はDBに保存するため、置換パラメータは固定シードで決める（変えると既存の署名と比較できなくなる）
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def _feature_hash(feature: str) -> int:
+    # 組み込みの hash() はプロセスごとに値が変わるため、DBに保存する署名には使えない
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    """文字・数字だけを残した文字 n-gram を返す（短文は全体を1つの特徴とする）
+
+    記号・空白・絵文字を除くことで、句読点や装飾だけを変えたコピペも同じ特徴になる。
+    """
+    compact = "".join(ch for ch in text if ch.isalnum())
+    if len(compact) <= size:
+        return [compact] if compact else []
+    return [compact[i:i + size] for i in range(len(compact) - size + 1)]
+
+
+def minhash(features: Iterable[str]) -> Optional[Tuple[int, ...]]:
+    """特徴量の集合から MinHash 署名を計算する。特徴がなければ None"""
+    hashes = {_feature_hash(feature) for feature in features}
+    if not hashes:
+        return None
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes) & _UINT32_MASK
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimate_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """2つの署名から Jaccard 類似度を推定する"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def lsh_bands(signature: Sequence[int]) -> List[int]:
+    """署名をバンドごとにまとめたハッシュ（SQLite の INTEGER に収まる 56bit）を返す"""
+    bands = []
+    for index in range(LSH_BANDS):
+        rows = signature[index * ROWS_PER_BAND:(index + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            struct.pack(f">B{ROWS_PER_BAND}I", index, *rows), digest_size=7
+        ).digest()
+        bands.append(int.from_bytes(digest, "big"))
+    return bands
+
+
+def pack_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack_signature(data: bytes) -> Tuple[int, ...]:
+    return struct.unpack(_SIGNATURE_FORMAT, data)
+
+
+def signature_columns(signature: Optional[Sequence[int]]) -> Dict[str, Any]:
+    """Post/Reply に保存する列の値を返す"""
+    if signature is None:
+        return {"minhash": None, **{f"lsh_band{i}": None for i in range(LSH_BANDS)}}
+    columns: Dict[str, Any] = {"minhash": pack_signature(signature)}
+    for index, band in enumerate(lsh_bands(signature)):
+        columns[f"lsh_band{index}"] = band
+    return columns
+
+
+def find_near_duplicates(
+    db: Session,
+    model: Any,
+    signature: Sequence[int],
+    since: datetime,
+    min_similarity: float,
+    limit: int,
+) -> List[Tuple[Any, float]]:
+    """推定類似度が min_similarity 以上の最近の投稿（または返信）を (行, 類似度) で返す"""
+    band_filters = [
+        getattr(model, f"lsh_band{index}") == band for index, band in enumerate(lsh_bands(signature))
+    ]
+    candidates = (
+        db.query(model)
+        .filter(or_(*band_filters), model.created_at >= since)
+        .order_by(model.id.desc())
+        .limit(limit)
+        .all()
+    )
+    matches = []
+    for candidate in candidates:
+        if not candidate.minhash:
+            continue
+        similarity = estimate_similarity(signature, unpack_signature(candidate.minhash))
+        if similarity >= min_similarity:
+            matches.append((candidate, similarity))
+    return matches
+
+
+def _assign_signature(mapper, connection, target) -> None:
+    """保存前に本文から署名・本文ハッシュを付与する（本文が変わった場合は付け直す）"""
+    state = sa_inspect(target)
+    if (
+        target.minhash is not None
+        and target.content_hash is not None
+        and not state.attrs.content.history.has_changes()
+    ):
+        return
+    # spam_detector はこのモジュールを import するため、循環を避けて遅延 import する
+    from app.utils.spam_detector import spam_detector
+
+    analysis = spam_detector.analyze(target.content)
+    target.content_hash = spam_detector.content_hash(analysis)
+    for name, value in signature_columns(spam_detector.content_signature(analysis)).items():
+        setattr(target, name, value)
+
+
+def backfill_signatures(bind: Engine, batch_size: int = 1000) -> int:
+    """content_hash が NULL の投稿・返信に署名・本文ハッシュを付与し、更新した行数を返す
+
+    ORM のイベントは読み込んだだけの行には働かないため、列の追加前の行は重複判定に使えない。
+    本文が空（正規化後に何も残らない）行は NULL のままになるため、id 順に一度ずつ進める。
+    """
+    # spam_detector はこのモジュールを import するため、循環を避けて遅延 import する
+    from app.utils.spam_detector import spam_detector
+
+    updated = 0
+    for model in (Post, Reply):
+        table = model.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values({name: bindparam(f"new_{name}") for name in ("content_hash", *signature_columns(None))})
+        )
+        last_id = 0
+        while True:
+            with bind.begin() as conn:
+                rows = conn.execute(
+                    select(table.c.id, table.c.content)
+                    .where(table.c.content_hash.is_(None), table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                params = []
+                for row in rows:
+                    analysis = spam_detector.analyze(row.content)
+                    digest = spam_detector.content_hash(analysis)
+                    if digest is None:
+                        continue
+                    signature = spam_detector.content_signature(analysis)
+                    values = {"content_hash": digest, **signature_columns(signature)}
+                    params.append({"row_id": row.id, **{f"new_{name}": value for name, value in values.items()}})
+                if params:
+                    conn.execute(statement, params)
+                    updated += len(params)
+    return updated
+
+
+for _model in (Post, Reply):
+    event.listen(_model, "before_insert", _assign_signature)
+    event.listen(_model, "before_update", _assign_signature)
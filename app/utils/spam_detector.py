@@ -1,18 +1,23 @@
 import re
 import math
+import hashlib
 import unicodedata
 import os
 import importlib
+from collections import Counter
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from app.models import JST
-from difflib import SequenceMatcher
-from typing import List, Optional, Tuple, Set
+from typing import List, Optional, Tuple, Set, Union
 
+from sqlalchemy import exists, func, select
 from sqlalchemy.orm import Session
 
 from app.models import Post, Reply
-from app.utils.url_safety import URLBlocklistManager, URLSafetyResponse
+from app.utils.badword_matcher import AhoCorasickMatcher
+from app.utils.campaign_detector import CampaignTracker
+from app.utils.near_duplicate import find_near_duplicates, lsh_bands, minhash, shingles
+from app.utils.url_safety import URLBlocklistManager, URLSafetyResponse, url_blocklist_manager
 
 JACONV_AVAILABLE = importlib.util.find_spec("jaconv") is not None
 if JACONV_AVAILABLE:
@@ -31,6 +36,29 @@ class SpamCheckResult:
     score: float = 0.0  # 追加: スコアで重み付け評価（既存呼び出し互換）
 
 
+# -----------------------------
+# 事前解析結果（各チェックはここから読む）
+# -----------------------------
+@dataclass
+class TextAnalysis:
+    """正規化済みテキストと、各チェックが使うトークン類をまとめた解析結果"""
+    text: str  # 正規化済みテキスト
+    kana_folded: str  # 小文字化・カナ統一済み（不適切語照合用）
+    urls: List[str]
+    hosts: List[Optional[str]]  # urls と同じ順序のホスト（抽出できなければ None）
+    word_tokens: List[str]  # [A-Za-z0-9_]+ の語（元の大文字小文字を保持）
+    alnum_tokens: List[str]  # [A-Za-z0-9]+ の語
+    cjk_runs: List[str]  # かな・漢字の連続部分
+    bigram_counts: Counter  # CJK文字列の2-gram出現数
+    bigram_total: int
+    emoji_count: int
+    mention_count: int
+    signature: Optional[Tuple[int, ...]] = field(default=None, repr=False)  # MinHash 署名（初回参照時に計算）
+
+
+TextInput = Union[str, TextAnalysis]
+
+
 # -----------------------------
 # 設定（重み・閾値はプロダクションで調整可能）
 # -----------------------------
@@ -47,9 +75,17 @@ class SpamDetectorConfig:
     burst_window_min: int = 5
     burst_max_posts: int = 5
 
-    # 近似重複の探索範囲
-    near_dup_limit: int = 20
-    near_dup_ratio: float = 0.95
+    # 近似重複（MinHash + LSH）の判定
+    near_dup_limit: int = 50  # LSH で取り出す候補の上限
+    near_dup_min_similarity: float = 0.75  # 署名から推定した Jaccard 類似度の下限（16個中12個一致）
+    near_dup_window_hours: int = 72  # 全アカウントの直近投稿を対象にする期間
+    near_dup_min_length: int = 30  # これより短い本文は近似重複判定をしない
+
+    # 複数アカウントによるキャンペーン（インメモリのスライディングウィンドウで集計）
+    campaign_window_min: int = 10
+    campaign_min_authors: int = 4  # ウィンドウ内でこの人数以上が同じ本文/ホストを投稿したら判定
+    campaign_max_keys: int = 50000  # 保持するキー数の上限（超えたら古いキーから捨てる）
+    campaign_max_authors_per_key: int = 64
 
     # 繰り返し語の比率
     max_top_token_ratio: float = 0.6
@@ -71,6 +107,9 @@ class SpamDetectorConfig:
         "meaningless_reply": 1.0,
         "exact_duplicate": 3.0,
         "near_duplicate": 2.0,
+        "cross_account_duplicate": 2.0,
+        "campaign_content": 2.5,
+        "campaign_url_host": 2.0,
         "burst": 2.0,
         "base64_blob": 2.0,
         "obfuscated_url": 2.0,
@@ -94,6 +133,8 @@ class SpamDetector:
     # --- 文字列分析のためのUnicode正規表現 ---
     RE_HIRAGANA = re.compile(r'[\u3040-\u309F]')
     RE_JAPANESE = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]')
+    RE_LOWER_UPPER = re.compile(r'[a-z][A-Z]')
+    RE_LETTER_DIGIT_LETTER = re.compile(r'[a-zA-Z]\d[a-zA-Z]')
 
     # --- 英語圏の単語としてありえない子音のペア ---
     UNLIKELY_CONSONANT_PAIRS = {
@@ -133,6 +174,12 @@ class SpamDetector:
         "bit.ly", "t.co", "goo.gl", "is.gd", "ow.ly", "tinyurl.com", "cutt.ly",
         "rebrand.ly", "buff.ly", "tiny.one", "lnkd.in",
     }
+    # 多数のアカウントが普通に貼るホストはキャンペーン集計の対象外（m.youtube.com などのサブドメインも含む）
+    CAMPAIGN_IGNORED_HOSTS = {
+        "youtube.com", "youtu.be", "x.com", "twitter.com", "instagram.com", "tiktok.com",
+        "facebook.com", "tabelog.com", "google.com", "maps.google.com", "maps.app.goo.gl",
+        "ramendb.supleks.jp",
+    }
     SUSPICIOUS_TLDS = {
         ".xyz", ".top", ".tk", ".icu", ".click", ".work", ".cn", ".ru", ".gq", ".cf", ".pw",
     }
@@ -140,14 +187,25 @@ class SpamDetector:
     EMOJI_PATTERN = re.compile(r"[\U0001F300-\U0001FAFF]")
     MENTION_PATTERN = re.compile(r"@[-_A-Za-z0-9]{2,}")
 
+    # 解析時のトークン化用
+    WORD_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+    CJK_RUN_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff]+")
+    WHITESPACE_PATTERN = re.compile(r"\s+")
+
     def __init__(self, config: Optional[SpamDetectorConfig] = None):
         self.cfg = config or SpamDetectorConfig()
         # badwords.txtから不適切な単語リストを読み込む
         self.badwords = self._load_badwords()
-        # badwordsの正規表現パターンをコンパイル
-        self.badwords_pattern = self._compile_badwords_pattern()
-        # URLブロックリストマネージャーを初期化
-        self.url_blocklist_manager = URLBlocklistManager()
+        # badwordsからカナ統一済みの Aho-Corasick オートマトンを構築
+        self.badwords_matcher = AhoCorasickMatcher(self.badwords, fold=self._fold_kana)
+        # URLブロックリストはURL安全性チェックAPIと共有する（スナップショットがあれば照合時に読み込まれる）
+        self.url_blocklist_manager = url_blocklist_manager
+        # 複数アカウントで同じ本文・URLホストを投稿するキャンペーンの集計
+        self.campaign_tracker = CampaignTracker(
+            window_seconds=self.cfg.campaign_window_min * 60,
+            max_keys=self.cfg.campaign_max_keys,
+            max_authors_per_key=self.cfg.campaign_max_authors_per_key,
+        )
 
     def _load_badwords(self) -> Set[str]:
         """badwords.txtから不適切な単語リストを読み込む"""
@@ -198,61 +256,13 @@ class SpamDetector:
                 return variant
         return text
 
-    def _compile_badwords_pattern(self) -> re.Pattern:
-        """badwordsから正規表現パターンをコンパイルする"""
-        if not self.badwords:
-            return re.compile(r"(?!a)a")  # 空のパターン（マッチしない）
-        
-        # 特殊文字をエスケープして正規表現パターンを作成
-        # 英単語は単語境界(\b)を使用し、日本語は直接マッチングを使用
-        escaped_words = []
-        for word in sorted(self.badwords, key=len, reverse=True):
-            escaped_word = re.escape(word)
-            # 英単語（アルファベットのみ）の場合は単語境界を追加
-            if re.match(r'^[a-zA-Z]+$', word):
-                escaped_words.append(r'\b' + escaped_word + r'\b')
-            else:
-                escaped_words.append(escaped_word)
-        
-        pattern = r'(?:' + '|'.join(escaped_words) + r')'
-        
-        try:
-            return re.compile(pattern, re.IGNORECASE)
-        except re.error:
-            # パターンが大きすぎる場合は分割して処理
-            return self._compile_chunked_patterns(escaped_words)
-
-    def _compile_chunked_patterns(self, escaped_words: List[str]) -> re.Pattern:
-        """大きなパターンを分割してコンパイルする"""
-        chunk_size = 100  # チャンクサイズを調整
-        patterns = []
-        
-        for i in range(0, len(escaped_words), chunk_size):
-            chunk = escaped_words[i:i + chunk_size]
-            chunk_pattern = r'(?:' + '|'.join(chunk) + r')'
-            try:
-                patterns.append(re.compile(chunk_pattern, re.IGNORECASE))
-            except re.error:
-                # さらに分割
-                if len(chunk) > 1:
-                    sub_patterns = self._compile_chunked_patterns(chunk[:len(chunk)//2])
-                    patterns.extend([sub_patterns] if isinstance(sub_patterns, re.Pattern) else sub_patterns)
-                    sub_patterns = self._compile_chunked_patterns(chunk[len(chunk)//2:])
-                    patterns.extend([sub_patterns] if isinstance(sub_patterns, re.Pattern) else sub_patterns)
-        
-        # 分割されたパターンをまとめるためのラッパー
-        class ChunkedPattern:
-            def __init__(self, patterns):
-                self.patterns = patterns
-            
-            def search(self, text):
-                for pattern in self.patterns:
-                    match = pattern.search(text)
-                    if match:
-                        return match
-                return None
-        
-        return ChunkedPattern(patterns)
+    @staticmethod
+    def _fold_kana(text: str) -> str:
+        """照合用に小文字化し、カタカナをひらがなに揃える"""
+        folded = text.lower()
+        if JACONV_AVAILABLE and jaconv is not None:
+            folded = jaconv.kata2hira(folded)
+        return folded
 
     def is_random_alphanum_string(self, s: str) -> bool:
         """英数字の文字列がランダムな羅列である可能性が高いか判定する。"""
@@ -260,7 +270,7 @@ class SpamDetector:
             return len(s) == 2 and s.isupper() and not any(c in 'AEIOU' for c in s)
 
         # 不自然な大文字化 (例: "jsuBRAH")
-        if re.search(r'[a-z][A-Z]', s):
+        if self.RE_LOWER_UPPER.search(s):
             return True
 
         s_lower = s.lower()
@@ -276,7 +286,7 @@ class SpamDetector:
             return True
         if all(c.isupper() or c.isdigit() for c in s) and has_upper and has_digit and len(s) > 4:
             return True
-        if re.search(r'[a-zA-Z]\d[a-zA-Z]', s):
+        if self.RE_LETTER_DIGIT_LETTER.search(s):
             return True
             
         name_alpha_only = ''.join(filter(str.isalpha, s))
@@ -315,56 +325,56 @@ class SpamDetector:
     # -----------------------------
     def evaluate_post(self, db: Session, user_id: str, content: str) -> SpamCheckResult:
         reasons: List[str] = []
-        normalized = self._normalize(content)
-        if not normalized:
+        analysis = self.analyze(content)
+        if analysis is None:
             return SpamCheckResult(is_spam=False, reasons=reasons, score=0.0)
 
-        score = 0.0
-        score += self._check_links(normalized, reasons)
-        score += self._check_patterns(normalized, reasons)
-        score += self._check_badwords(normalized, reasons)
-        score += self._check_repetition(normalized, reasons)
-        score += self._check_contacts(normalized, reasons)
-        score += self._check_noise(normalized, reasons)
-        score += self._check_social(normalized, reasons)
-        score += self._check_random_strings(normalized, reasons)
-
-        # DB依存のチェック（存在すれば）
-        score += self._check_exact_duplicate_post(db, user_id, normalized, reasons)
-        score += self._check_near_duplicate_posts(db, user_id, normalized, reasons)
-        score += self._check_burst_posts(db, user_id, reasons)
+        score = self._score_content(analysis, reasons)
+
+        # DB依存のチェック（完全重複とバーストで1回、近似重複で1回の問い合わせ）
+        score += self._check_user_activity(db, user_id, analysis, reasons)
+        score += self._check_near_duplicate_posts(db, user_id, analysis, reasons)
+        score += self._check_campaign(user_id, analysis, reasons)
 
         is_spam = (score >= self.cfg.threshold) or bool(reasons and any(r for r in reasons if "重複" in r or "過剰" in r))
         return SpamCheckResult(is_spam=is_spam, reasons=reasons, score=round(score, 2))
 
     def evaluate_reply(self, db: Session, user_id: str, content: str, post_id: int) -> SpamCheckResult:
         reasons: List[str] = []
-        normalized = self._normalize(content)
-        if not normalized:
+        analysis = self.analyze(content)
+        if analysis is None:
             return SpamCheckResult(is_spam=False, reasons=reasons, score=0.0)
 
         score = 0.0
+        normalized = analysis.text
         # 既存の短文ノイズ
         if len(normalized) < 3 and normalized.lower() in {"ok", "nice", "test"}:
             reasons.append("意味のない短い返信です")
             score += self.cfg.weights["meaningless_reply"]
 
-        score += self._check_links(normalized, reasons)
-        score += self._check_patterns(normalized, reasons)
-        score += self._check_badwords(normalized, reasons)
-        score += self._check_repetition(normalized, reasons)
-        score += self._check_contacts(normalized, reasons)
-        score += self._check_noise(normalized, reasons)
-        score += self._check_social(normalized, reasons)
-        score += self._check_random_strings(normalized, reasons)
+        score += self._score_content(analysis, reasons)
 
-        # DB依存チェック
-        score += self._check_exact_duplicate_reply(db, user_id, post_id, normalized, reasons)
-        score += self._check_burst_posts(db, user_id, reasons)  # 返信もバーストに含める
+        # DB依存チェック（返信もバーストに含める）
+        score += self._check_user_activity(db, user_id, analysis, reasons, post_id=post_id)
+        score += self._check_near_duplicate_replies(db, user_id, analysis, reasons)
+        score += self._check_campaign(user_id, analysis, reasons)
 
         is_spam = (score >= self.cfg.threshold) or bool(reasons and any(r for r in reasons if "重複" in r or "過剰" in r))
         return SpamCheckResult(is_spam=is_spam, reasons=reasons, score=round(score, 2))
 
+    def _score_content(self, analysis: TextAnalysis, reasons: List[str]) -> float:
+        """DBに依存しない本文のチェックをまとめて実行する"""
+        score = 0.0
+        score += self._check_links(analysis, reasons)
+        score += self._check_patterns(analysis, reasons)
+        score += self._check_badwords(analysis, reasons)
+        score += self._check_repetition(analysis, reasons)
+        score += self._check_contacts(analysis, reasons)
+        score += self._check_noise(analysis, reasons)
+        score += self._check_social(analysis, reasons)
+        score += self._check_random_strings(analysis, reasons)
+        return score
+
     # -----------------------------
     # Normalization & common utils
     # -----------------------------
@@ -374,24 +384,67 @@ class SpamDetector:
         # 全角半角の統一 + 制御文字除去 + 空白正規化
         t = unicodedata.normalize("NFKC", text)
         t = self.ZERO_WIDTH_PATTERN.sub("", t)
-        t = re.sub(r"\s+", " ", t).strip()
+        t = self.WHITESPACE_PATTERN.sub(" ", t).strip()
         return t
 
+    def analyze(self, content: Optional[str]) -> Optional[TextAnalysis]:
+        """本文を1回だけ正規化・トークン化し、各チェックが共有する解析結果を返す
+
+        正規化後に空になる場合は None を返す。
+        """
+        text = self._normalize(content)
+        if not text:
+            return None
+
+        # 文字クラスごとの findall は C 実装で走査されるため、Python 側で1トークンずつ振り分けるより速い
+        word_tokens = self.WORD_TOKEN_PATTERN.findall(text)
+        cjk_runs = self.CJK_RUN_PATTERN.findall(text)
+
+        # [A-Za-z0-9]+ の語は [A-Za-z0-9_]+ の語をアンダースコアで分割したものと一致する
+        alnum_tokens = [part for token in word_tokens for part in token.split("_") if part]
+
+        chars = "".join(cjk_runs)
+        bigrams = [chars[i:i + 2] for i in range(len(chars) - 1)] if len(chars) > 2 else []
+
+        urls = self.URL_PATTERN.findall(text)
+        hosts = [self._extract_host(url) for url in urls]
+
+        return TextAnalysis(
+            text=text,
+            kana_folded=self.badwords_matcher.fold(text),
+            urls=urls,
+            hosts=hosts,
+            word_tokens=word_tokens,
+            alnum_tokens=alnum_tokens,
+            cjk_runs=cjk_runs,
+            bigram_counts=Counter(bigrams),
+            bigram_total=len(bigrams),
+            emoji_count=len(self.EMOJI_PATTERN.findall(text)),
+            mention_count=len(self.MENTION_PATTERN.findall(text)),
+        )
+
+    def _as_analysis(self, value: TextInput) -> Optional[TextAnalysis]:
+        """チェックに文字列が直接渡された場合（単体利用・テスト）は解析してから使う"""
+        if isinstance(value, TextAnalysis):
+            return value
+        return self.analyze(value)
+
     # -----------------------------
     # Heuristic checks (content only)
     # -----------------------------
-    def _check_links(self, text: str, reasons: List[str]) -> float:
+    def _check_links(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         score = 0.0
-        links = list(self.URL_PATTERN.findall(text))
-        link_count = len(links)
+        link_count = len(analysis.urls)
 
         if link_count > self.cfg.link_excess_threshold:
             reasons.append("短文に過剰なリンクが含まれています")
             score += self.cfg.weights["excess_links"]
 
         # 短縮URL/TLD
-        for url in links:
-            host = self._extract_host(url)
+        for url, host in zip(analysis.urls, analysis.hosts):
             if not host:
                 continue
             if any(host.endswith(tld) for tld in self.SUSPICIOUS_TLDS):
@@ -412,14 +465,18 @@ class SpamDetector:
                 pass
 
         # 難読化URL
-        if self.OBFUSCATED_URL_PATTERN.search(text):
+        if self.OBFUSCATED_URL_PATTERN.search(analysis.text):
             reasons.append("URLを難読化した表現が含まれています")
             score += self.cfg.weights["obfuscated_url"]
 
         return score
 
-    def _check_patterns(self, text: str, reasons: List[str]) -> float:
+    def _check_patterns(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         score = 0.0
+        text = analysis.text
         if self.REPEATED_CHAR_PATTERN.search(text):
             reasons.append("同じ文字が異常に繰り返されています")
             score += self.cfg.weights["repeated_chars"]
@@ -434,48 +491,37 @@ class SpamDetector:
             score += self.cfg.weights["zero_width"]
         return score
 
-    def _check_badwords(self, text: str, reasons: List[str]) -> float:
+    def _check_badwords(self, text: TextInput, reasons: List[str]) -> float:
         """badwordsリストに含まれる不適切な単語をチェックする"""
-        if not self.badwords_pattern:
+        if not len(self.badwords_matcher):
+            return 0.0
+        analysis = self._as_analysis(text)
+        if analysis is None:
             return 0.0
-        
-        # テキストを正規化（カタカナとひらがなの変換も考慮）
-        normalized_text = self._normalize(text)
-        
-        texts_to_check = [normalized_text]
 
-        # カタカナをひらがなに変換したテキストでもチェック
-        if JACONV_AVAILABLE and jaconv is not None:
-            hiragana_text = jaconv.kata2hira(normalized_text)
-            if hiragana_text != normalized_text:
-                texts_to_check.append(hiragana_text)
-            
-            # ひらがなをカタカナに変換したテキストでもチェック
-            katakana_text = jaconv.hira2kata(normalized_text)
-            if katakana_text != normalized_text:
-                texts_to_check.append(katakana_text)
-        
-        for check_text in texts_to_check:
-            if self.badwords_pattern.search(check_text):
-                reasons.append("不適切な単語が含まれています")
-                return self.cfg.weights.get("badwords", 2.5)  # 重み設定
+        # 解析時にカナ統一済みのテキストを1回だけ走査する
+        if self.badwords_matcher.search(analysis.kana_folded, folded=True) is not None:
+            reasons.append("不適切な単語が含まれています")
+            return self.cfg.weights.get("badwords", 2.5)  # 重み設定
         
         return 0.0
 
-    def _check_contacts(self, text: str, reasons: List[str]) -> float:
-        if self.CONTACT_PATTERN.search(text):
+    def _check_contacts(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is not None and self.CONTACT_PATTERN.search(analysis.text):
             reasons.append("外部連絡先やIDへの誘導が含まれています")
             return self.cfg.weights["contact_drop"]
         return 0.0
 
-    def _check_repetition(self, text: str, reasons: List[str]) -> float:
+    def _check_repetition(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         score = 0.0
         # 単語ベース（英数字）
-        word_tokens = re.findall(r"[A-Za-z0-9_]+", text.lower())
+        word_tokens = analysis.word_tokens
         if word_tokens:
-            freq = {}
-            for w in word_tokens:
-                freq[w] = freq.get(w, 0) + 1
+            freq = Counter(token.lower() for token in word_tokens)
             max_count = max(freq.values())
             ratio = max_count / max(len(word_tokens), 1)
             if ratio > self.cfg.max_top_token_ratio and len(word_tokens) > self.cfg.min_tokens_for_ratio:
@@ -483,44 +529,42 @@ class SpamDetector:
                 score += self.cfg.weights["repetition"]
 
         # CJK向けの文字n-gram（2-gram）での繰り返し検出
-        cjk = re.findall(r"[\u3040-\u30ff\u3400-\u9fff]+", text)
-        if cjk:
-            chars = "".join(cjk)
-            ngrams = [chars[i:i+2] for i in range(len(chars)-1)] if len(chars) > 2 else []
-            if ngrams:
-                freq2 = {}
-                for g in ngrams:
-                    freq2[g] = freq2.get(g, 0) + 1
-                top = max(freq2.values())
-                if top / max(len(ngrams), 1) > 0.5 and len(ngrams) > 8:
-                    reasons.append("CJK文字列での不自然な繰り返しパターンが検出されました")
-                    score += self.cfg.weights["repetition"]
+        if analysis.bigram_total:
+            top = max(analysis.bigram_counts.values())
+            if top / analysis.bigram_total > 0.5 and analysis.bigram_total > 8:
+                reasons.append("CJK文字列での不自然な繰り返しパターンが検出されました")
+                score += self.cfg.weights["repetition"]
         return score
 
-    def _check_noise(self, text: str, reasons: List[str]) -> float:
+    def _check_noise(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         # 大文字や記号、絵文字の密度など
         score = 0.0
-        total = max(len(text), 1)
-        emojis = len(self.EMOJI_PATTERN.findall(text))
+        total = max(len(analysis.text), 1)
+        emojis = analysis.emoji_count
         if emojis / total > self.cfg.emoji_max_ratio and emojis >= 5:
             reasons.append("絵文字が不自然に多用されています")
             score += self.cfg.weights["emoji_bomb"]
         return score
 
-    def _check_random_strings(self, text: str, reasons: List[str]) -> float:
+    def _check_random_strings(self, text: TextInput, reasons: List[str]) -> float:
         """ランダムな英数字文字列と意味のない日本語文字列をチェックする"""
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         score = 0.0
         
-        # 英数字のみの部分文字列をチェック
-        alphanum_parts = re.findall(r'[A-Za-z0-9]+', text)
-        for part in alphanum_parts:
+        # 英数字のみの部分文字列をチェック（同じ語は1回だけ判定する）
+        for part in dict.fromkeys(analysis.alnum_tokens):
             if self.is_random_alphanum_string(part):
                 reasons.append("ランダムな英数字列が含まれています")
                 score += self.cfg.weights["random_alphanum"]
                 break  # 1回検出すれば十分
         
         # 日本語文字列の意味チェック
-        japanese_parts = self.RE_JAPANESE.findall(text)
+        japanese_parts = analysis.cjk_runs
         if japanese_parts:
             has_meaningful_japanese = any(self.is_meaningful_japanese_string(part) for part in japanese_parts)
             if not has_meaningful_japanese:
@@ -529,10 +573,12 @@ class SpamDetector:
         
         return score
 
-    def _check_social(self, text: str, reasons: List[str]) -> float:
+    def _check_social(self, text: TextInput, reasons: List[str]) -> float:
+        analysis = self._as_analysis(text)
+        if analysis is None:
+            return 0.0
         score = 0.0
-        mentions = self.MENTION_PATTERN.findall(text)
-        if len(mentions) > self.cfg.mention_max_count:
+        if analysis.mention_count > self.cfg.mention_max_count:
             reasons.append("メンションが過剰に含まれています")
             score += self.cfg.weights["mention_bomb"]
         return score
@@ -540,69 +586,156 @@ class SpamDetector:
     # -----------------------------
     # DB-based checks
     # -----------------------------
-    def _check_exact_duplicate_post(self, db: Session, user_id: str, content: str, reasons: List[str]) -> float:
+    def content_hash(self, content: TextInput) -> Optional[str]:
+        """完全重複判定用に、正規化済み本文のハッシュを返す（Post/Reply の content_hash 列と同じ値）"""
+        analysis = self._as_analysis(content)
+        if analysis is None:
+            return None
+        return hashlib.blake2b(analysis.text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _check_user_activity(
+        self,
+        db: Session,
+        user_id: str,
+        content: TextInput,
+        reasons: List[str],
+        post_id: Optional[int] = None,
+    ) -> float:
+        """完全重複とバースト投稿を1回の問い合わせでまとめて判定する
+
+        post_id を指定すると返信として扱い、同じ投稿への同一内容の返信を重複とみなす。
+        いずれも (user_id, created_at) / (user_id, content_hash) の複合インデックスで引ける。
+        """
         try:
-            duplicate = (
-                db.query(Post)
-                .filter(Post.user_id == user_id, Post.content == content)
-                .order_by(Post.id.desc())
-                .first()
+            window_start = datetime.now(JST) - timedelta(minutes=self.cfg.burst_window_min)
+            recent_posts = (
+                select(func.count())
+                .select_from(Post)
+                .where(Post.user_id == user_id, Post.created_at >= window_start)
+                .scalar_subquery()
             )
-            if duplicate:
-                reasons.append("同一内容の投稿が既に存在します")
-                return self.cfg.weights["exact_duplicate"]
-        except Exception:
-            pass
-        return 0.0
-
-    def _check_exact_duplicate_reply(self, db: Session, user_id: str, post_id: int, content: str, reasons: List[str]) -> float:
-        try:
-            duplicate = (
-                db.query(Reply)
-                .filter(Reply.user_id == user_id, Reply.post_id == post_id, Reply.content == content)
-                .first()
+            recent_replies = (
+                select(func.count())
+                .select_from(Reply)
+                .where(Reply.user_id == user_id, Reply.created_at >= window_start)
+                .scalar_subquery()
             )
-            if duplicate:
-                reasons.append("同一内容の返信が既に存在します")
-                return self.cfg.weights["exact_duplicate"]
+            digest = self.content_hash(content)
+            if post_id is None:
+                duplicate = exists().where(Post.user_id == user_id, Post.content_hash == digest)
+            else:
+                duplicate = exists().where(
+                    Reply.user_id == user_id,
+                    Reply.content_hash == digest,
+                    Reply.post_id == post_id,
+                )
+            total_posts, total_replies, has_duplicate = db.execute(
+                select(recent_posts, recent_replies, duplicate)
+            ).one()
+
+            score = 0.0
+            if digest is not None and has_duplicate:
+                reasons.append("同一内容の返信が既に存在します" if post_id is not None else "同一内容の投稿が既に存在します")
+                score += self.cfg.weights["exact_duplicate"]
+            if total_posts + total_replies > self.cfg.burst_max_posts:
+                reasons.append("短時間に大量の投稿/返信が行われています")
+                score += self.cfg.weights["burst"]
+            return score
         except Exception:
             pass
         return 0.0
 
-    def _check_near_duplicate_posts(self, db: Session, user_id: str, content: str, reasons: List[str]) -> float:
+    def content_signature(self, content: TextInput) -> Optional[Tuple[int, ...]]:
+        """近似重複検出用の MinHash 署名を返す（カナ統一・記号除去した文字3-gramから計算）"""
+        analysis = self._as_analysis(content)
+        if analysis is None:
+            return None
+        if analysis.signature is None:
+            analysis.signature = minhash(shingles(analysis.kana_folded))
+        return analysis.signature
+
+    def _check_near_duplicate_posts(self, db: Session, user_id: str, content: TextInput, reasons: List[str]) -> float:
+        return self._check_near_duplicates(db, Post, user_id, content, reasons, "投稿")
+
+    def _check_near_duplicate_replies(self, db: Session, user_id: str, content: TextInput, reasons: List[str]) -> float:
+        return self._check_near_duplicates(db, Reply, user_id, content, reasons, "返信")
+
+    def _check_near_duplicates(
+        self,
+        db: Session,
+        model,
+        user_id: str,
+        content: TextInput,
+        reasons: List[str],
+        label: str,
+    ) -> float:
+        """LSH バンドで候補を引き、MinHash 署名の推定類似度で近似重複を判定する
+
+        自分の直近の投稿だけでなく、全アカウントの直近の投稿（コピペ拡散）も対象にする。
+        """
         try:
-            recent = (
-                db.query(Post)
-                .filter(Post.user_id == user_id)
-                .order_by(Post.id.desc())
-                .limit(self.cfg.near_dup_limit)
-                .all()
+            analysis = self._as_analysis(content)
+            # 短文は厳しめに近似重複判定を避ける
+            if analysis is None or len(analysis.text) < self.cfg.near_dup_min_length:
+                return 0.0
+            signature = self.content_signature(analysis)
+            if signature is None:
+                return 0.0
+
+            since = datetime.now(JST) - timedelta(hours=self.cfg.near_dup_window_hours)
+            matches = find_near_duplicates(
+                db,
+                model,
+                signature,
+                since,
+                self.cfg.near_dup_min_similarity,
+                self.cfg.near_dup_limit,
             )
-            for p in recent:
-                other = (p.content or "").strip()
-                if not other:
-                    continue
-                if len(content) < 30 and len(other) < 30:
-                    # 短文は厳しめに近似重複判定を避ける
-                    continue
-                ratio = SequenceMatcher(None, content, other).ratio()
-                if ratio >= self.cfg.near_dup_ratio:
-                    reasons.append("直近の投稿と内容がほぼ同一です")
-                    return self.cfg.weights["near_duplicate"]
+            score = 0.0
+            if any(row.user_id == user_id for row, _ in matches):
+                reasons.append(f"直近の{label}と内容がほぼ同一です")
+                score += self.cfg.weights["near_duplicate"]
+            if any(row.user_id != user_id for row, _ in matches):
+                reasons.append(f"他のアカウントの{label}とほぼ同一の内容です")
+                score += self.cfg.weights["cross_account_duplicate"]
+            return score
         except Exception:
             pass
         return 0.0
 
-    def _check_burst_posts(self, db: Session, user_id: str, reasons: List[str]) -> float:
+    def _check_campaign(self, user_id: str, content: TextInput, reasons: List[str]) -> float:
+        """同じ本文（LSH バンド）や同じURLホストを短時間に投稿したアカウント数で判定する
+
+        DBを引かずにインメモリで集計するため、投稿作成時にそのまま呼べる。
+        判定に使った投稿も集計に含める（スパム判定で弾かれた試行もキャンペーンの兆候として数える）。
+        """
         try:
-            # created_at は JST（tz-aware）で保存されている前提
-            window_start = datetime.now(JST) - timedelta(minutes=self.cfg.burst_window_min)
-            count_posts = db.query(Post).filter(Post.user_id == user_id, Post.created_at >= window_start).count()
-            count_replies = db.query(Reply).filter(Reply.user_id == user_id, Reply.created_at >= window_start).count()
-            total = count_posts + count_replies
-            if total > self.cfg.burst_max_posts:
-                reasons.append("短時間に大量の投稿/返信が行われています")
-                return self.cfg.weights["burst"]
+            analysis = self._as_analysis(content)
+            if analysis is None:
+                return 0.0
+
+            content_keys = []
+            if len(analysis.text) >= self.cfg.near_dup_min_length:
+                signature = self.content_signature(analysis)
+                if signature is not None:
+                    content_keys = [f"lsh{index}:{band}" for index, band in enumerate(lsh_bands(signature))]
+            host_keys = []
+            for host in dict.fromkeys(analysis.hosts):
+                host = self._campaign_host(host)
+                if host:
+                    host_keys.append(f"host:{host}")
+            if not content_keys and not host_keys:
+                return 0.0
+
+            counts = self.campaign_tracker.observe(content_keys + host_keys, user_id)
+            score = 0.0
+            if any(counts[key] >= self.cfg.campaign_min_authors for key in content_keys):
+                reasons.append("複数のアカウントから同じ内容が短時間に投稿されています")
+                score += self.cfg.weights["campaign_content"]
+            if any(counts[key] >= self.cfg.campaign_min_authors for key in host_keys):
+                reasons.append("複数のアカウントから同じドメインのURLが短時間に投稿されています")
+                score += self.cfg.weights["campaign_url_host"]
+            return score
         except Exception:
             pass
         return 0.0
@@ -610,6 +743,16 @@ class SpamDetector:
     # -----------------------------
     # helpers
     # -----------------------------
+    def _campaign_host(self, host: Optional[str]) -> Optional[str]:
+        if not host:
+            return None
+        host = host.split(":", 1)[0]
+        if host.startswith("www."):
+            host = host[4:]
+        if not host or any(host == ignored or host.endswith("." + ignored) for ignored in self.CAMPAIGN_IGNORED_HOSTS):
+            return None
+        return host
+
     @staticmethod
     def _extract_host(url: str) -> Optional[str]:
         # 粗い抽出で十分（正規のURLパーサ不要）
@@ -0,0 +1,56 @@
+"""AI回答を Server-Sent Events で返すためのヘルパー"""
+from __future__ import annotations
+
+import json
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from app.utils.metrics import latency_metrics
+
+STREAM_ERROR_MESSAGE = "回答の生成が中断されました。もう一度お試しください。"
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """1件の SSE イベントを組み立てる"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _sse_events(chunks: AsyncIterator[str], metric_label: str, started_at: float) -> AsyncIterator[str]:
+    first_chunk = True
+    try:
+        async for text in chunks:
+            if first_chunk:
+                latency_metrics.observe(f"{metric_label}:ttfb", time.perf_counter() - started_at)
+                first_chunk = False
+            yield format_sse({"delta": text})
+    except Exception as exc:
+        print(f"SSEストリーミング中にエラーが発生しました ({metric_label}): {exc}")
+        yield format_sse({"detail": STREAM_ERROR_MESSAGE}, event="error")
+        return
+    finally:
+        latency_metrics.observe(f"{metric_label}:total", time.perf_counter() - started_at)
+    yield format_sse({}, event="done")
+
+
+def sse_response(chunks: AsyncIterator[str], metric_label: str, started_at: Optional[float] = None) -> StreamingResponse:
+    """テキスト片の非同期イテレータを text/event-stream のレスポンスに変換する
+
+    各テキスト片は `data: {"delta": ...}` として送出し、正常終了時は `event: done`、
+    途中で失敗した場合は `event: error` を送る。
+    最初のチャンクまでの時間を "<metric_label>:ttfb" として latency_metrics に記録する。
+    """
+    return StreamingResponse(
+        _sse_events(chunks, metric_label, started_at or time.perf_counter()),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # リバースプロキシでのバッファリングを無効化し、チャンクをすぐに届ける
+            "X-Accel-Buffering": "no",
+        },
+    )
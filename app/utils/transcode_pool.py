@@ -0,0 +1,31 @@
+"""画像変換用のワーカープール
+
+Pillow のデコード・リサイズ・WebP エンコードをリクエストハンドラ内で同期実行すると、
+大きな写真が1枚アップロードされるだけで同じワーカーの他のリクエストが止まる。
+ここでは BoundedPool で別プロセスに渡し、埋まっていれば TranscodeBusyError（= PoolBusyError）を送出する。
+"""
+from __future__ import annotations
+
+import os
+
+from app.utils.bounded_pool import BoundedPool, PoolBusyError
+from config import settings
+
+# 画像処理の呼び出し側で使っている名前（実体は汎用のプール）
+TranscodePool = BoundedPool
+TranscodeBusyError = PoolBusyError
+
+
+def _default_workers() -> int:
+    if settings.IMAGE_TRANSCODE_WORKERS > 0:
+        return settings.IMAGE_TRANSCODE_WORKERS
+    return min(2, os.cpu_count() or 1)
+
+
+transcode_pool = TranscodePool(
+    max_workers=_default_workers(),
+    max_pending=settings.IMAGE_TRANSCODE_MAX_PENDING,
+    kind=settings.IMAGE_TRANSCODE_EXECUTOR,
+    name="transcode",
+    busy_message="画像処理の待ち行列がいっぱいです",
+)
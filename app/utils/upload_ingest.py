@@ -0,0 +1,115 @@
+"""アップロードファイルの取り込み
+
+アップロード1件につき、本体を上限付きで1回だけメモリに読み込み、
+同じバッファをバリデーション・Pillow・モデレーションで使い回す。
+
+- 読み込む前にストリームの長さを確かめ、上限を超えていれば読まずに拒否する
+- 長さが分かる場合は、ちょうどその大きさで1回だけ読む（途中のコピーや一時ファイルを作らない）
+- 形式はファイル名や Content-Type ではなく、先頭のバイト列から判定する
+
+1件あたりのメモリは「上限バイト数 + デコード後の画素」で頭打ちになる
+（画素数は image_validation の解像度上限で抑えている）。
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+from typing import BinaryIO, Optional
+
+import filetype
+from fastapi import UploadFile
+from PIL import Image
+
+# 形式判定に使う先頭のバイト数（filetype が参照する範囲）
+SNIFF_BYTES = 262
+_CHUNK_SIZE = 256 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """アップロードが上限サイズを超えている"""
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"アップロードが上限サイズ（{max_bytes}バイト）を超えています")
+        self.max_bytes = max_bytes
+
+
+class IngestedUpload:
+    """取り込み済みのアップロード（本体は読み取り専用の bytes 1つ）"""
+
+    def __init__(self, data: bytes, filename: Optional[str] = None, declared_type: Optional[str] = None) -> None:
+        self.data = data
+        self.filename = filename
+        self.declared_type = declared_type
+        kind = filetype.guess(data[:SNIFF_BYTES]) if data else None
+        # 先頭のバイト列から判定した MIME タイプ（判定できなければ None）
+        self.mime: Optional[str] = kind.mime if kind is not None else None
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename or "")[1].lower()
+
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    def open_image(self) -> Image.Image:
+        """本体を Pillow で開く（BytesIO は bytes をコピーせずに参照する）"""
+        return Image.open(io.BytesIO(self.data))
+
+
+def _stream_length(stream: BinaryIO) -> Optional[int]:
+    """シーク可能なストリームの残りの長さ（分からなければ None）"""
+    try:
+        position = stream.tell()
+        end = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def read_stream(stream: BinaryIO, max_bytes: int) -> bytes:
+    """ストリームを先頭から上限付きで読み込む。上限を超えていれば UploadTooLargeError"""
+    try:
+        stream.seek(0)
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    length = _stream_length(stream)
+    if length is not None:
+        if length > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        data = stream.read(length)
+        if len(data) == length:
+            return data
+        # 長さが途中で変わった場合は読み直さず、残りを順に読む
+        chunks = [data]
+        total = len(data)
+    else:
+        chunks = []
+        total = 0
+
+    while True:
+        chunk = stream.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def ingest_upload(upload: UploadFile, max_bytes: int) -> IngestedUpload:
+    """UploadFile を取り込む（ディスクにスプールされている場合は読み込みを伴う）"""
+    data = read_stream(upload.file, max_bytes)
+    return IngestedUpload(data, filename=upload.filename, declared_type=upload.content_type)
+
+
+async def ingest_upload_async(upload: UploadFile, max_bytes: int) -> IngestedUpload:
+    """ingest_upload をスレッドで実行する（スプールファイルの読み込みでイベントループを止めない）"""
+    return await asyncio.to_thread(ingest_upload, upload, max_bytes)
@@ -1,13 +1,26 @@
 import asyncio
+import hashlib
 import logging
+import os
+import threading
 import time
 import urllib.parse
-from typing import Optional, Dict, List, Set, Any
+from collections import OrderedDict
+from typing import Iterable, Optional, Dict, List, Set, Any, Tuple
 from dataclasses import dataclass, field
 
 import httpx
 from pydantic import BaseModel
 
+from app.utils.blocklist_snapshot import BlocklistSnapshot, SnapshotError, write_snapshot
+from app.utils.domain_index import DomainSuffixIndex
+from config import settings
+
+try:
+    import fcntl  # プロセス間ロック（POSIX のみ）
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 # --- 定数定義 ---
@@ -30,21 +43,112 @@ class URLSafetyResponse(BaseModel):
 
 # --- マネージャークラス ---
 class URLBlocklistManager:
-    def __init__(self, ttl_seconds: float = 86400.0):
+    """フィッシング・マルウェア配布ドメインのブロックリスト
+
+    cache_dir を指定すると、構築した索引をスナップショットとして書き出し、全ワーカーで mmap して共有する。
+    更新はプロセス間ロック（refresh.lock）を取れた1プロセスだけが行い、取得元ごとに保存した
+    ETag / Last-Modified で条件付きリクエストを送る（304 の場合は保存済みのリストを再利用する）。
+    """
+
+    SNAPSHOT_FILE = "blocklist.snap"
+    LOCK_FILE = "refresh.lock"
+    LISTS_DIR = "lists"
+    # スナップショットの差し替えを確認する間隔（秒）
+    SNAPSHOT_STAT_INTERVAL = 5.0
+    # 他プロセスが更新中だった場合に再試行するまでの秒数
+    REFRESH_RETRY_SECONDS = 60.0
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400.0,
+        cache_dir: Optional[str] = None,
+        verdict_ttl_seconds: float = 300.0,
+        verdict_max_entries: int = 10000,
+    ):
         """
         :param ttl_seconds: ブロックリストのキャッシュ有効期限（秒）。デフォルトは24時間。
+        :param cache_dir: スナップショットの保存先。None なら設定値、空文字ならメモリのみ。
+        :param verdict_ttl_seconds: ドメインごとの判定結果をキャッシュする秒数。
+        :param verdict_max_entries: 判定結果キャッシュの最大件数（超えたら古いものから捨てる）。
         """
         self.block_lists = DEFAULT_BLOCK_LISTS
         self.extra_lists = DEFAULT_EXTRA_BLOCKLISTS
-        
-        # キャッシュ: {"source_name": set(domains)}
-        self._cache: Dict[str, Set[str]] = {"phishing": set(), "urlhaus": set()}
-        
+
+        # キャッシュ: {"source_name": DomainSuffixIndex}
+        # set[str] より大幅に小さい索引（逆順ドメインのソート済み配列 + ブルームフィルタ）で保持する
+        self._cache: Dict[str, DomainSuffixIndex] = {
+            "phishing": DomainSuffixIndex(()),
+            "urlhaus": DomainSuffixIndex(()),
+        }
+
         self._loaded = False
         self._expire_at = 0.0
         self._lock = asyncio.Lock()
         self._ttl = ttl_seconds
 
+        self._cache_dir = settings.URL_BLOCKLIST_CACHE_DIR if cache_dir is None else cache_dir
+        self._snapshot: Optional[BlocklistSnapshot] = None
+        self._next_stat_at = 0.0
+        # 取得元URLごとの ETag / Last-Modified
+        self._list_validators: Dict[str, Dict[str, str]] = {}
+
+        # ドメインごとの判定結果（索引が差し替わったら破棄する）
+        self._verdicts: "OrderedDict[str, Tuple[float, URLSafetyResponse]]" = OrderedDict()
+        self._verdict_ttl = verdict_ttl_seconds
+        self._verdict_max_entries = verdict_max_entries
+        self._verdict_lock = threading.Lock()
+        self.verdict_hits = 0
+        self.verdict_misses = 0
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        return os.path.join(self._cache_dir, self.SNAPSHOT_FILE) if self._cache_dir else None
+
+    def _list_cache_path(self, url: str) -> Optional[str]:
+        if not self._cache_dir:
+            return None
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_dir, self.LISTS_DIR, f"{name}.txt")
+
+    def _install_indexes(self, indexes: Dict[str, DomainSuffixIndex]) -> None:
+        self._cache = dict(indexes)
+        with self._verdict_lock:
+            self._verdicts.clear()
+
+    def _maybe_reload_snapshot(self, force: bool = False) -> None:
+        """他プロセスが書き出したスナップショットがあれば mmap し直す（確認は一定間隔に間引く）"""
+        path = self.snapshot_path
+        if not path:
+            return
+        now = time.time()
+        if not force and now < self._next_stat_at:
+            return
+        self._next_stat_at = now + self.SNAPSHOT_STAT_INTERVAL
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Blocklist snapshot stat failed: {e}")
+            return
+
+        if self._snapshot is not None and (stat.st_ino, stat.st_size) == (self._snapshot.inode, self._snapshot.size):
+            # 内容が変わらなかった更新では mtime だけが進む
+            self._expire_at = stat.st_mtime + self._ttl
+            return
+        try:
+            snapshot = BlocklistSnapshot(path)
+        except (OSError, ValueError, KeyError, SnapshotError) as e:
+            logger.warning(f"Blocklist snapshot load failed: {e}")
+            return
+
+        self._snapshot = snapshot
+        self._install_indexes(snapshot.indexes)
+        self._list_validators = dict(snapshot.meta.get("lists", {}))
+        self._loaded = True
+        self._expire_at = stat.st_mtime + self._ttl
+        logger.info(f"Blocklist snapshot mapped: {path}")
+
     async def ensure_loaded(self, client: Optional[httpx.AsyncClient] = None, force: bool = False):
         """
         ブロックリストが未ロード、または期限切れの場合に読み込みます。
@@ -52,54 +156,116 @@ class URLBlocklistManager:
         :param client: httpx.AsyncClientインスタンス。指定がない場合は一時的に作成します。
         :param force: TTLに関わらず強制的に再読み込みする場合True。
         """
-        now = time.time()
-        if not force and self._loaded and self._expire_at > now:
+        self._maybe_reload_snapshot()
+        if not force and self._loaded and self._expire_at > time.time():
             return
 
         async with self._lock:
-            # ダブルチェックロッキング
-            now = time.time()
-            if not force and self._loaded and self._expire_at > now:
+            # ダブルチェックロッキング（他プロセスが更新済みならスナップショットを読むだけで済む）
+            self._maybe_reload_snapshot(force=True)
+            if not force and self._loaded and self._expire_at > time.time():
                 return
 
-            should_close_client = False
-            if client is None:
-                client = httpx.AsyncClient(timeout=10.0)
-                should_close_client = True
-
+            # 何も読み込めていない場合だけ、他プロセスの更新完了を待つ
+            acquired, lock_fd = await self._acquire_refresh_lock(blocking=not self._loaded)
+            if not acquired:
+                self._expire_at = time.time() + self.REFRESH_RETRY_SECONDS
+                return
             try:
-                await self._refresh_lists(client)
-                self._loaded = True
-                self._expire_at = time.time() + self._ttl
-                logger.info(f"Blocklists updated. TTL: {self._ttl}s")
+                if not force:
+                    self._maybe_reload_snapshot(force=True)
+                    if self._loaded and self._expire_at > time.time():
+                        return
+
+                should_close_client = False
+                if client is None:
+                    client = httpx.AsyncClient(timeout=10.0)
+                    should_close_client = True
+
+                try:
+                    await self._refresh_lists(client)
+                    self._loaded = True
+                    self._expire_at = time.time() + self._ttl
+                    logger.info(f"Blocklists updated. TTL: {self._ttl}s")
+                finally:
+                    if should_close_client:
+                        await client.aclose()
             finally:
-                if should_close_client:
-                    await client.aclose()
+                self._release_refresh_lock(lock_fd)
+
+    async def _acquire_refresh_lock(self, blocking: bool) -> Tuple[bool, Optional[int]]:
+        """更新担当を決めるプロセス間ロックを取る。(取得できたか, ファイル記述子) を返す"""
+        if not self._cache_dir or fcntl is None:
+            return True, None
+        os.makedirs(self._cache_dir, exist_ok=True)
+        fd = os.open(os.path.join(self._cache_dir, self.LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if blocking:
+                await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False, None
+        except BaseException:
+            os.close(fd)
+            raise
+        return True, fd
+
+    @staticmethod
+    def _release_refresh_lock(fd: Optional[int]) -> None:
+        if fd is None:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def run_refresh_loop(self, interval_seconds: float) -> None:
+        """定期的に期限を確認し、期限切れなら更新する（アプリ起動時にバックグラウンドで動かす）"""
+        while True:
+            try:
+                await self.ensure_loaded()
+            except Exception as e:
+                logger.error(f"Blocklist refresh failed: {e}")
+            await asyncio.sleep(interval_seconds)
 
     async def _refresh_lists(self, client: httpx.AsyncClient):
         """内部メソッド: リストの並列ダウンロードと統合"""
         # インデックス 0,1 は phishing、2 は urlhaus として扱うロジックを継承
-        core_tasks = [self._download_list(client, url) for url in self.block_lists]
-        extra_tasks = [self._download_list(client, url) for url in self.extra_lists]
-        
-        all_tasks = core_tasks + extra_tasks
-        results = await asyncio.gather(*all_tasks, return_exceptions=True)
+        urls = self.block_lists + self.extra_lists
+        results = await asyncio.gather(
+            *(self._fetch_list(client, url) for url in urls), return_exceptions=True
+        )
 
         phishing_sets: List[Set[str]] = []
         urlhaus_sets: List[Set[str]] = []
+        lists_meta: Dict[str, Dict[str, str]] = {}
+        changed = False
 
         # 結果の振り分け
-        core_len = len(self.block_lists)
-        for idx, res in enumerate(results):
+        for idx, (url, res) in enumerate(zip(urls, results)):
             if isinstance(res, Exception):
                 logger.error(f"Blocklist download failed (idx={idx}): {res}")
                 continue
-            
+            domains, validators, list_changed = res
+            changed = changed or list_changed
+            if validators:
+                lists_meta[url] = validators
+
             # ロジック: core[2] (urlhaus) 以外は全て phishing 扱い
             if idx == 2:
-                urlhaus_sets.append(res)
+                urlhaus_sets.append(domains)
             else:
-                phishing_sets.append(res)
+                phishing_sets.append(domains)
+
+        path = self.snapshot_path
+        if path and not changed and self._snapshot is not None:
+            # すべて 304 なら索引を作り直さず、スナップショットの期限だけ延ばす
+            os.utime(path)
+            self._maybe_reload_snapshot(force=True)
+            logger.info("Blocklists not modified; snapshot reused")
+            return
 
         # 集合の結合
         phishing = set().union(*phishing_sets) if phishing_sets else set()
@@ -110,41 +276,120 @@ class URLBlocklistManager:
         if common:
             urlhaus = urlhaus - common
 
-        self._cache["phishing"] = phishing
-        self._cache["urlhaus"] = urlhaus
-        
-        logger.info(f"Loaded domains - Phishing: {len(phishing)}, URLHaus: {len(urlhaus)}")
+        # 索引の構築・書き出しは数百ms〜数秒かかるため、イベントループを止めないようスレッドで行う
+        indexes = await asyncio.to_thread(self._build_indexes, phishing, urlhaus, lists_meta)
+        self._list_validators = lists_meta
+        if path:
+            # 構築したヒープ上の索引は捨て、書き出したスナップショットを mmap して使う
+            self._maybe_reload_snapshot(force=True)
+        else:
+            self._install_indexes(indexes)
+
+        logger.info(
+            f"Loaded domains - Phishing: {len(phishing)}, URLHaus: {len(urlhaus)}, "
+            f"index memory: {self.memory_bytes()} bytes"
+        )
+
+    def _build_indexes(
+        self,
+        phishing: Set[str],
+        urlhaus: Set[str],
+        lists_meta: Dict[str, Dict[str, str]],
+    ) -> Dict[str, DomainSuffixIndex]:
+        indexes = {"phishing": DomainSuffixIndex(phishing), "urlhaus": DomainSuffixIndex(urlhaus)}
+        path = self.snapshot_path
+        if path:
+            write_snapshot(path, indexes, {"lists": lists_meta})
+        return indexes
+
+    async def _fetch_list(self, client: httpx.AsyncClient, url: str) -> Tuple[Set[str], Dict[str, str], bool]:
+        """条件付きリクエストでリストを取得する。(ドメイン集合, ETag等, 内容が変わったか) を返す
+
+        304 の場合や取得に失敗した場合は、保存済みのリストがあればそれを使う。
+        """
+        cache_path = self._list_cache_path(url)
+        cached_available = bool(cache_path and os.path.exists(cache_path))
+        validators = self._list_validators.get(url, {}) if cached_available else {}
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        try:
+            resp = await self._retrying_get(client, url, headers=headers or None)
+            if resp.status_code == 304 and cached_available:
+                return self._read_cached_list(cache_path), validators, False
+            resp.raise_for_status()
+        except Exception as e:
+            if not cached_available:
+                logger.error(f"Failed to download {url}: {e}")
+                raise
+            logger.warning(f"Failed to download {url}, using cached list: {e}")
+            return self._read_cached_list(cache_path), validators, False
+
+        domains = self._parse_list(resp.text)
+        new_validators = {
+            key: value
+            for key, value in (("etag", resp.headers.get("ETag")), ("last_modified", resp.headers.get("Last-Modified")))
+            if value
+        }
+        if cache_path:
+            await asyncio.to_thread(self._write_cached_list, cache_path, domains)
+        return domains, new_validators, True
+
+    @staticmethod
+    def _read_cached_list(path: str) -> Set[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line for line in f.read().splitlines() if line}
+
+    @staticmethod
+    def _write_cached_list(path: str, domains: Set[str]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(sorted(domains)))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _parse_list(text: str) -> Set[str]:
+        result = set()
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith("!"):
+                continue
+            # hosts形式対応 (127.0.0.1 domain.com)
+            if " " in line:
+                line = line.split()[-1]
+
+            dom = line.strip(".").lower()
+            if "." in dom: # 最低限のドメインチェック
+                result.add(dom)
+        return result
 
     async def _download_list(self, client: httpx.AsyncClient, url: str) -> Set[str]:
         """単一のリストをダウンロードしてドメインセットを返す"""
         try:
             resp = await self._retrying_get(client, url)
             resp.raise_for_status()
-            text = resp.text
-            result = set()
-            for line in text.splitlines():
-                line = line.strip()
-                if not line or line.startswith("#") or line.startswith("!"):
-                    continue
-                # hosts形式対応 (127.0.0.1 domain.com)
-                if " " in line:
-                    line = line.split()[-1]
-                
-                dom = line.strip(".").lower()
-                if "." in dom: # 最低限のドメインチェック
-                    result.add(dom)
-            return result
+            return self._parse_list(resp.text)
         except Exception as e:
             logger.error(f"Failed to download {url}: {e}")
             raise e
 
-    async def _retrying_get(self, client: httpx.AsyncClient, url: str, max_retries: int = 2) -> httpx.Response:
+    async def _retrying_get(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        max_retries: int = 2,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
         """リトライ付きGETリクエスト"""
         attempt = 0
         backoff = 0.5
         while True:
             try:
-                resp = await client.get(url)
+                resp = await client.get(url, headers=headers) if headers else await client.get(url)
                 if resp.status_code in (429, 502, 503, 504):
                     raise httpx.HTTPStatusError("Transient error", request=resp.request, response=resp)
                 return resp
@@ -167,28 +412,98 @@ class URLBlocklistManager:
             return None
 
     def check_url(self, url: str) -> URLSafetyResponse:
-        """URLの安全性を同期的にチェック（キャッシュ済みデータを使用）"""
+        """URLの安全性を同期的にチェック（キャッシュ済みデータを使用）
+
+        ダウンロードはしないが、他プロセスが書き出したスナップショットがあれば読み込んで使う。
+        """
+        self._maybe_reload_snapshot()
         domain = self.extract_domain(url)
         if not domain:
             return URLSafetyResponse(safe=False, reason="invalid_url")
+        return self.check_domain(domain)
+
+    def check_urls(self, urls: Iterable[str]) -> Dict[str, URLSafetyResponse]:
+        """複数のURLをまとめてチェックし、URLをキーにした結果を返す（同じドメインは1回だけ照合する）"""
+        self._maybe_reload_snapshot()
+        results: Dict[str, URLSafetyResponse] = {}
+        by_domain: Dict[str, URLSafetyResponse] = {}
+        for url in dict.fromkeys(urls):
+            domain = self.extract_domain(url)
+            if not domain:
+                results[url] = URLSafetyResponse(safe=False, reason="invalid_url")
+                continue
+            verdict = by_domain.get(domain)
+            if verdict is None:
+                verdict = by_domain[domain] = self.check_domain(domain)
+            results[url] = verdict
+        return results
+
+    def check_domain(self, domain: str) -> URLSafetyResponse:
+        """正規化済みのドメインをチェックする（判定結果は短時間キャッシュする）"""
+        now = time.monotonic()
+        with self._verdict_lock:
+            entry = self._verdicts.get(domain)
+            if entry is not None and entry[0] > now:
+                self._verdicts.move_to_end(domain)
+                self.verdict_hits += 1
+                return entry[1]
+            self.verdict_misses += 1
+
+        verdict = self._match_domain(domain)
+        with self._verdict_lock:
+            self._verdicts[domain] = (now + self._verdict_ttl, verdict)
+            self._verdicts.move_to_end(domain)
+            while len(self._verdicts) > self._verdict_max_entries:
+                self._verdicts.popitem(last=False)
+        return verdict
 
-        # サブドメインマッチング (例: a.b.c.com -> a.b.c.com, b.c.com, c.com)
-        parts = domain.split('.')
+    def _match_domain(self, domain: str) -> URLSafetyResponse:
         # 少なくとも2つの部分（例: example.com）からなるドメインのみをチェック
-        if len(parts) < 2:
-             # localhostなどの単純なホスト名はチェックしない、または安全とする
+        # localhostなどの単純なホスト名はチェックしない、または安全とする
+        if "." not in domain:
             return URLSafetyResponse(safe=True, reason="clean")
 
-        domain_variants = [".".join(parts[i:]) for i in range(len(parts) - 1)]
-
-        for source, blocklist in self._cache.items():
-            for variant in domain_variants:
-                if variant in blocklist:
-                    return URLSafetyResponse(
-                        safe=False,
-                        reason="matched",
-                        matched_domain=variant,
-                        source=source
-                    )
-        
-        return URLSafetyResponse(safe=True, reason="clean")
\ No newline at end of file
+        # サブドメインマッチング (例: a.b.c.com -> a.b.c.com, b.c.com, c.com の順で最も具体的なもの)
+        for source, index in self._cache.items():
+            matched = index.match(domain)
+            if matched:
+                return URLSafetyResponse(
+                    safe=False,
+                    reason="matched",
+                    matched_domain=matched,
+                    source=source
+                )
+
+        return URLSafetyResponse(safe=True, reason="clean")
+
+    def memory_bytes(self) -> int:
+        """ブロックリスト索引が保持しているメモリ量（バイト）"""
+        return sum(index.memory_bytes() for index in self._cache.values())
+
+    def stats(self) -> Dict[str, Any]:
+        phishing_count = len(self._cache["phishing"])
+        urlhaus_count = len(self._cache["urlhaus"])
+        return {
+            "loaded": self._loaded,
+            "expire_at": self._expire_at,
+            "phishing_domains": phishing_count,
+            "urlhaus_domains": urlhaus_count,
+            "total_domains": phishing_count + urlhaus_count,
+            "memory_bytes": {source: index.memory_bytes() for source, index in self._cache.items()},
+            "total_memory_bytes": self.memory_bytes(),
+            "verdict_cache": {
+                "entries": len(self._verdicts),
+                "hits": self.verdict_hits,
+                "misses": self.verdict_misses,
+                "ttl_seconds": self._verdict_ttl,
+            },
+            "snapshot": {
+                "path": self.snapshot_path,
+                "mapped": self._snapshot is not None,
+                "created_at": self._snapshot.created_at if self._snapshot else None,
+            },
+        }
+
+
+# 投稿のスパム判定とURL安全性チェックAPIで共有するインスタンス
+url_blocklist_manager = URLBlocklistManager()
\ No newline at end of file
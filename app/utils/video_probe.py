@@ -0,0 +1,346 @@
+"""動画コンテナのヘッダーから長さとコーデックを読み取る
+
+MP4 / QuickTime（ISO BMFF の box）と WebM（EBML の要素）のヘッダーだけを読み、フレームはデコードしない。
+ヘッダーの大きさを見て中身（mdat やブロックの本体）はシークで飛ばすため、読むのは数 KB 程度で済む。
+
+- MP4: moov/mvhd の duration / timescale（断片化 MP4 は mvex/mehd）、映像トラックの stsd の最初のエントリー
+- WebM: Segment/Info の Duration × TimestampScale、映像トラックの CodecID。
+  Duration を書かない録画（MediaRecorder など）は、Cluster の Timestamp とブロックの相対時刻から求める
+"""
+from __future__ import annotations
+
+import math
+import os
+import struct
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple
+
+
+class VideoProbeError(ValueError):
+    """動画のヘッダーを解釈できない"""
+
+
+class VideoInfo(NamedTuple):
+    container: str  # "mp4" / "mov" / "webm"
+    duration: float  # 秒
+    codec: Optional[str]  # "avc1", "hvc1", "V_VP9" など（映像トラックがなければ None）
+
+
+# ---- MP4 / QuickTime ----
+
+# ファイルの先頭に置かれうる box（QuickTime は ftyp を持たないことがある）
+_MP4_FIRST_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pdin", b"uuid"}
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """start から end までの box を (種類, 本体の開始位置, 終了位置) で返す"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos  # ファイルの最後まで
+        if size < header_size or pos + size > end:
+            raise VideoProbeError("MP4 の box の大きさが不正です")
+        yield kind, pos + header_size, pos + size
+        pos += size
+
+
+def _find_box(f: BinaryIO, start: int, end: int, *path: bytes) -> Optional[Tuple[int, int]]:
+    for kind, body, box_end in _iter_boxes(f, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return body, box_end
+            return _find_box(f, body, box_end, *path[1:])
+    return None
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise VideoProbeError("動画のヘッダーが途中で切れています")
+    return data
+
+
+def _full_box_version(f: BinaryIO, body: int) -> int:
+    f.seek(body)
+    version = _read_exact(f, 4)[0]  # version(1) + flags(3)
+    return version
+
+
+def _mp4_video_codec(f: BinaryIO, trak: Tuple[int, int]) -> Optional[str]:
+    mdia = _find_box(f, *trak, b"mdia")
+    if mdia is None:
+        return None
+    hdlr = _find_box(f, *mdia, b"hdlr")
+    if hdlr is None:
+        return None
+    f.seek(hdlr[0] + 8)  # version/flags, pre_defined
+    if _read_exact(f, 4) != b"vide":
+        return None
+    stsd = _find_box(f, *mdia, b"minf", b"stbl", b"stsd")
+    if stsd is None:
+        return None
+    f.seek(stsd[0] + 8)  # version/flags, entry_count
+    _, fourcc = struct.unpack(">I4s", _read_exact(f, 8))
+    return fourcc.decode("latin-1").strip()
+
+
+def _probe_mp4(f: BinaryIO, file_size: int) -> VideoInfo:
+    container = "mp4"
+    moov = None
+    for kind, body, end in _iter_boxes(f, 0, file_size):
+        if kind == b"ftyp":
+            f.seek(body)
+            if _read_exact(f, 4) == b"qt  ":
+                container = "mov"
+        elif kind == b"moov":
+            moov = (body, end)
+            break
+    if moov is None:
+        raise VideoProbeError("MP4 に moov box がありません")
+
+    timescale = duration = None
+    codec = None
+    for kind, body, end in _iter_boxes(f, *moov):
+        if kind == b"mvhd":
+            if _full_box_version(f, body) == 1:
+                f.seek(body + 4 + 16)  # creation_time, modification_time（64bit）
+                timescale, duration = struct.unpack(">IQ", _read_exact(f, 12))
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                f.seek(body + 4 + 8)
+                timescale, duration = struct.unpack(">II", _read_exact(f, 8))
+                unknown = 0xFFFFFFFF
+            if duration == unknown:
+                duration = 0
+        elif kind == b"mvex" and not duration:
+            mehd = _find_box(f, body, end, b"mehd")
+            if mehd is not None:
+                if _full_box_version(f, mehd[0]) == 1:
+                    duration = struct.unpack(">Q", _read_exact(f, 8))[0]
+                else:
+                    duration = struct.unpack(">I", _read_exact(f, 4))[0]
+        elif kind == b"trak" and codec is None:
+            codec = _mp4_video_codec(f, (body, end))
+
+    if not timescale or not duration:
+        raise VideoProbeError("MP4 から動画の長さを読み取れません")
+    return VideoInfo(container, duration / timescale, codec)
+
+
+# ---- WebM（Matroska） ----
+
+_EBML = 0x1A45DFA3
+_DOC_TYPE = 0x4282
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMESTAMP_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_TRACK_TYPE = 0x83
+_CODEC_ID = 0x86
+_CLUSTER = 0x1F43B675
+_CLUSTER_TIMESTAMP = 0xE7
+_SIMPLE_BLOCK = 0xA3
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_BLOCK_DURATION = 0x9B
+# Segment 直下の要素（大きさ不明の Cluster は、次にこれらが現れた位置で終わる）
+_SEGMENT_CHILDREN = {
+    0x114D9B74, _INFO, _TRACKS, 0x1C53BB6B, 0x1941A469, 0x1043A770, 0x1254C367, _CLUSTER,
+}
+_VIDEO_TRACK = 1
+
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> Tuple[int, bool]:
+    """可変長整数を読む（戻り値は値と「大きさ不明」かどうか）"""
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    length = 9 - first[0].bit_length()
+    if length > 8:
+        raise VideoProbeError("WebM の要素が不正です")
+    value = first[0] if keep_marker else first[0] & ((1 << (8 - length)) - 1)
+    for byte in _read_exact(f, length - 1):
+        value = (value << 8) | byte
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, unknown
+
+
+def _read_element(f: BinaryIO) -> Tuple[int, int, Optional[int]]:
+    """要素の ID・本体の開始位置・大きさ（不明なら None）を読む"""
+    element_id, _ = _read_vint(f, keep_marker=True)
+    size, unknown = _read_vint(f, keep_marker=False)
+    return element_id, f.tell(), None if unknown else size
+
+
+def _iter_elements(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        try:
+            element_id, body, size = _read_element(f)
+        except EOFError:
+            return
+        if size is None:
+            raise VideoProbeError("WebM の要素の大きさが不明です")
+        yield element_id, body, size
+        pos = body + size
+
+
+def _read_uint(f: BinaryIO, body: int, size: int) -> int:
+    f.seek(body)
+    return int.from_bytes(_read_exact(f, size), "big") if size else 0
+
+
+def _read_float(f: BinaryIO, body: int, size: int) -> float:
+    f.seek(body)
+    if size == 4:
+        value = struct.unpack(">f", _read_exact(f, 4))[0]
+    elif size == 8:
+        value = struct.unpack(">d", _read_exact(f, 8))[0]
+    else:
+        raise VideoProbeError("WebM の Duration が不正です")
+    if not math.isfinite(value):
+        # NaN は長さの上限との比較をすべてすり抜けるため、値として扱わない
+        raise VideoProbeError("WebM の Duration が不正です")
+    return value
+
+
+def _block_timestamp(f: BinaryIO, body: int) -> int:
+    """Block / SimpleBlock の Cluster からの相対時刻（トラック番号の後ろの符号付き16bit）"""
+    f.seek(body)
+    _read_vint(f, keep_marker=False)
+    return struct.unpack(">h", _read_exact(f, 2))[0]
+
+
+def _scan_cluster(f: BinaryIO, start: int, size: Optional[int], file_size: int) -> Tuple[int, int]:
+    """Cluster 内の最後のブロックの終了時刻（TimestampScale 単位）と、Cluster の終了位置を返す"""
+    limit = file_size if size is None else start + size
+    cluster_timestamp = 0
+    last = 0
+    pos = start
+    while pos < limit:
+        f.seek(pos)
+        try:
+            element_id, body, child_size = _read_element(f)
+        except EOFError:
+            break
+        if size is None and element_id in _SEGMENT_CHILDREN:
+            return last, pos
+        if child_size is None:
+            raise VideoProbeError("WebM の要素の大きさが不明です")
+        if element_id == _CLUSTER_TIMESTAMP:
+            cluster_timestamp = _read_uint(f, body, child_size)
+        elif element_id == _SIMPLE_BLOCK:
+            last = max(last, cluster_timestamp + _block_timestamp(f, body))
+        elif element_id == _BLOCK_GROUP:
+            block_time, block_duration = None, 0
+            for grand_id, grand_body, grand_size in _iter_elements(f, body, body + child_size):
+                if grand_id == _BLOCK:
+                    block_time = _block_timestamp(f, grand_body)
+                elif grand_id == _BLOCK_DURATION:
+                    block_duration = _read_uint(f, grand_body, grand_size)
+            if block_time is not None:
+                last = max(last, cluster_timestamp + block_time + block_duration)
+        pos = body + child_size
+    return last, limit
+
+
+def _probe_webm(f: BinaryIO, file_size: int) -> VideoInfo:
+    f.seek(0)
+    element_id, body, size = _read_element(f)
+    if element_id != _EBML or size is None:
+        raise VideoProbeError("WebM の形式ではありません")
+    for child_id, child_body, child_size in _iter_elements(f, body, body + size):
+        if child_id == _DOC_TYPE:
+            f.seek(child_body)
+            if _read_exact(f, child_size).rstrip(b"\x00") not in (b"webm", b"matroska"):
+                raise VideoProbeError("WebM の形式ではありません")
+
+    f.seek(body + size)
+    try:
+        segment_id, segment_body, segment_size = _read_element(f)
+    except EOFError:
+        raise VideoProbeError("WebM に Segment がありません") from None
+    if segment_id != _SEGMENT:
+        raise VideoProbeError("WebM に Segment がありません")
+    segment_end = file_size if segment_size is None else min(file_size, segment_body + segment_size)
+
+    timestamp_scale = 1_000_000  # ナノ秒（既定は 1ms）
+    duration: Optional[float] = None
+    codec: Optional[str] = None
+    tracks_seen = False
+    last_block = 0
+    pos = segment_body
+    while pos < segment_end:
+        f.seek(pos)
+        try:
+            element_id, body, size = _read_element(f)
+        except EOFError:
+            break
+        if element_id == _CLUSTER:
+            if duration is not None and tracks_seen:
+                break  # 必要な情報はそろっているので、ブロックは読まない
+            cluster_last, pos = _scan_cluster(f, body, size, segment_end)
+            last_block = max(last_block, cluster_last)
+            continue
+        if size is None:
+            raise VideoProbeError("WebM の要素の大きさが不明です")
+        if element_id == _INFO:
+            for child_id, child_body, child_size in _iter_elements(f, body, body + size):
+                if child_id == _TIMESTAMP_SCALE:
+                    timestamp_scale = _read_uint(f, child_body, child_size)
+                elif child_id == _DURATION:
+                    try:
+                        duration = _read_float(f, child_body, child_size)
+                    except VideoProbeError:
+                        # 不正な Duration は無視し、Cluster のブロックの時刻から求める
+                        duration = None
+                    if duration is not None and duration <= 0:
+                        duration = None
+        elif element_id == _TRACKS:
+            tracks_seen = True
+            for child_id, child_body, child_size in _iter_elements(f, body, body + size):
+                if child_id != _TRACK_ENTRY or codec is not None:
+                    continue
+                track_type, codec_id = None, None
+                for entry_id, entry_body, entry_size in _iter_elements(f, child_body, child_body + child_size):
+                    if entry_id == _TRACK_TYPE:
+                        track_type = _read_uint(f, entry_body, entry_size)
+                    elif entry_id == _CODEC_ID:
+                        f.seek(entry_body)
+                        codec_id = _read_exact(f, entry_size).rstrip(b"\x00").decode("ascii", "replace")
+                if track_type == _VIDEO_TRACK:
+                    codec = codec_id
+        pos = body + size
+
+    if duration is None:
+        duration = float(last_block)
+    seconds = duration * timestamp_scale / 1_000_000_000
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise VideoProbeError("WebM から動画の長さを読み取れません")
+    return VideoInfo("webm", seconds, codec)
+
+
+def probe_video(f: BinaryIO) -> VideoInfo:
+    """シーク可能なファイルから動画の形式・長さ・コーデックを読み取る（読み取り位置は先頭に戻す）"""
+    try:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(0)
+        head = f.read(8)
+        if head[:4] == struct.pack(">I", _EBML):
+            return _probe_webm(f, file_size)
+        if len(head) == 8 and head[4:8] in _MP4_FIRST_BOXES:
+            return _probe_mp4(f, file_size)
+        raise VideoProbeError("サポートされていない動画形式です")
+    except (struct.error, EOFError):
+        raise VideoProbeError("動画のヘッダーが途中で切れています") from None
+    finally:
+        f.seek(0)
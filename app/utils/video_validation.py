@@ -1,8 +1,12 @@
+import math
 from typing import Any, Dict
 from fastapi import UploadFile
 
+from app.utils.video_probe import VideoProbeError, probe_video
+
 ALLOWED_VIDEO_TYPES = {"video/mp4", "video/quicktime", "video/webm"}
 MAX_VIDEO_SIZE_BYTES = 50 * 1024 * 1024  # 50MB 上限
+MAX_VIDEO_DURATION_SECONDS = 10
 
 def validate_video_file(video: UploadFile) -> Dict[str, Any]:
     """動画ファイルの簡易バリデーションを行う"""
@@ -32,3 +36,23 @@ def validate_video_file(video: UploadFile) -> Dict[str, Any]:
         return {"is_valid": False, "error": "動画サイズは50MB以内にしてください"}
 
     return {"is_valid": True}
+
+
+def probe_video_file(video: UploadFile) -> Dict[str, Any]:
+    """動画のヘッダーから長さとコーデックを読み取り、長さの上限を確認する（ブロッキング I/O のためスレッドで呼ぶ）
+
+    長さはクライアントの申告ではなく、コンテナのヘッダーの値を使う。
+    """
+    try:
+        info = probe_video(video.file)
+    except VideoProbeError as exc:
+        print(f"動画ヘッダーの解析エラー: {exc}")
+        return {"is_valid": False, "error": "動画の長さを読み取れませんでした"}
+
+    if not math.isfinite(info.duration) or info.duration <= 0:
+        return {"is_valid": False, "error": "動画の長さを読み取れませんでした"}
+
+    if info.duration > MAX_VIDEO_DURATION_SECONDS:
+        return {"is_valid": False, "error": "動画は10秒以内にしてください", "info": info}
+
+    return {"is_valid": True, "info": info}
@@ -0,0 +1,86 @@
+"""不適切語マッチングのベンチマーク
+
+旧実装（巨大な正規表現の選択を原文・ひらがな・カタカナの最大3回走査）と
+Aho-Corasick オートマトン（カナ統一後に1回走査）を投稿長ごとに比較する。
+
+実行方法:
+    python -m benchmarks.bench_badwords
+"""
+from __future__ import annotations
+
+import random
+import re
+import time
+from typing import Callable, List
+
+from app.utils.spam_detector import JACONV_AVAILABLE, jaconv, spam_detector
+from benchmarks.corpus import build_posts
+
+POST_LENGTHS = [40, 140, 500, 2000]
+POSTS_PER_LENGTH = 200
+REPEAT = 3
+
+
+def build_legacy_matcher() -> Callable[[str], bool]:
+    """旧実装と同じ正規表現・走査方法を再現する"""
+    escaped = []
+    for word in sorted(spam_detector.badwords, key=len, reverse=True):
+        escaped_word = re.escape(word)
+        if re.match(r"^[a-zA-Z]+$", word):
+            escaped.append(r"\b" + escaped_word + r"\b")
+        else:
+            escaped.append(escaped_word)
+    pattern = re.compile(r"(?:" + "|".join(escaped) + r")", re.IGNORECASE)
+
+    def match(text: str) -> bool:
+        texts = [text]
+        if JACONV_AVAILABLE and jaconv is not None:
+            hiragana = jaconv.kata2hira(text)
+            if hiragana != text:
+                texts.append(hiragana)
+            katakana = jaconv.hira2kata(text)
+            if katakana != text:
+                texts.append(katakana)
+        return any(pattern.search(candidate) for candidate in texts)
+
+    return match
+
+
+def measure(func: Callable[[str], object], posts: List[str]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        for post in posts:
+            func(post)
+        best = min(best, time.perf_counter() - started)
+    return len(posts) / best
+
+
+def main() -> None:
+    rng = random.Random(0)
+    started = time.perf_counter()
+    legacy = build_legacy_matcher()
+    legacy_build = time.perf_counter() - started
+    matcher = spam_detector.badwords_matcher
+
+    print(f"語数: {len(matcher)}  ノード数: {matcher.node_count}  旧正規表現のコンパイル: {legacy_build * 1000:.1f}ms")
+    print(f"{'文字数':>6} {'旧実装 posts/s':>16} {'Aho-Corasick posts/s':>22} {'倍率':>6} {'判定差異':>8}")
+    for length in POST_LENGTHS:
+        # 1割の投稿には不適切語を混ぜる
+        posts = [
+            spam_detector._normalize(post)
+            for post in build_posts(length, POSTS_PER_LENGTH, rng, inject=sorted(spam_detector.badwords))
+        ]
+        mismatches = sum(
+            1 for post in posts if legacy(post) != (matcher.search(post) is not None)
+        )
+        legacy_rate = measure(legacy, posts)
+        new_rate = measure(matcher.search, posts)
+        print(
+            f"{length:>6} {legacy_rate:>16.0f} {new_rate:>22.0f} "
+            f"{new_rate / legacy_rate:>6.1f} {mismatches:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
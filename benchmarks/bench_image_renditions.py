@@ -0,0 +1,119 @@
+"""投稿画像の変換にかかる CPU 時間と、タイムライン表示で転送される画像サイズの計測
+
+旧実装（元の解像度でデコード → 元サイズで白背景と合成 → 元の解像度の WebP と 400px サムネイル）と、
+現在の _transcode_image（JPEG の縮小デコード、長辺の上限、幅ごとの画像）を比較する。
+
+転送量は、デスクトップのタイムライン（表示幅 360px）で
+旧実装は通常画質画像（<source media="(min-width: 768px)">）、現在は srcset から選ばれる画像を読む前提で求める。
+
+実行方法:
+    python -m benchmarks.bench_image_renditions
+    python -m benchmarks.bench_image_renditions --width 4000 --height 3000 --dpr 2
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from typing import Callable
+
+from PIL import Image
+
+from app.utils.image_processor import _transcode_image, ensure_directories_exist
+from config import settings
+
+DISPLAY_WIDTH = 360
+REPEAT = 3
+
+
+def legacy_transcode(data: bytes, user_id: str) -> tuple:
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        original_path = f"uploads/original/{user_id}_legacy_original.webp"
+        img.save(original_path, 'WEBP', quality=90, optimize=True)
+        thumbnail = img.resize((400, int(400 * img.height / img.width)), Image.Resampling.LANCZOS)
+        thumbnail_path = f"uploads/thumbnails/{user_id}_legacy_thumbnail.webp"
+        thumbnail.save(thumbnail_path, 'WEBP', quality=40, optimize=True)
+    return f"/{thumbnail_path}", f"/{original_path}"
+
+
+def build_photo(width: int, height: int, fmt: str, rng: random.Random) -> bytes:
+    """写真に近い（一様でない）画像を作る"""
+    small = Image.new("RGBA" if fmt == "PNG" else "RGB", (width // 16, height // 16))
+    small.putdata([
+        tuple(rng.randrange(256) for _ in range(len(small.getbands())))
+        for _ in range(small.width * small.height)
+    ])
+    buffer = io.BytesIO()
+    small.resize((width, height), Image.Resampling.BICUBIC).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def cpu_seconds(func: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.process_time()
+        func()
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def pick_from_srcset(srcset: str, needed_width: float) -> str:
+    """ブラウザと同様に、必要な幅以上で最小の候補（なければ最大）を選ぶ"""
+    candidates = sorted(
+        (int(width.rstrip("w")), url) for url, width in (entry.rsplit(" ", 1) for entry in srcset.split(", "))
+    )
+    for width, url in candidates:
+        if width >= needed_width:
+            return url
+    return candidates[-1][1]
+
+
+def file_size(url: str) -> int:
+    return os.path.getsize(url.lstrip("/"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--dpr", type=float, default=1.0, help="表示端末のデバイスピクセル比")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    widths = settings.IMAGE_RENDITION_WIDTHS
+    max_side = settings.IMAGE_ORIGINAL_MAX_SIDE
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        ensure_directories_exist()
+        print(f"幅ごとの画像 {list(widths)}, 長辺の上限 {max_side}px, 表示幅 {DISPLAY_WIDTH}px x DPR {args.dpr}")
+        for fmt in ("JPEG", "PNG"):
+            data = build_photo(args.width, args.height, fmt, rng)
+            legacy_cpu = cpu_seconds(lambda: legacy_transcode(data, "bench"))
+            current_cpu = cpu_seconds(lambda: _transcode_image(data, widths, max_side))
+
+            _, legacy_original = legacy_transcode(data, "bench")
+            result = _transcode_image(data, widths, max_side)
+            legacy_bytes = file_size(legacy_original)
+            current_bytes = file_size(pick_from_srcset(result.srcset, DISPLAY_WIDTH * args.dpr))
+
+            print(f"{fmt} {args.width}x{args.height}")
+            print(f"  CPU時間/枚       : 旧 {legacy_cpu:6.2f} s  現在 {current_cpu:6.2f} s  ({current_cpu / legacy_cpu:.0%})")
+            print(
+                f"  表示1件の転送量  : 旧 {legacy_bytes / 1024:7.1f} KiB  現在 {current_bytes / 1024:7.1f} KiB  "
+                f"({current_bytes / legacy_bytes:.0%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
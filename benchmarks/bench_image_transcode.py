@@ -0,0 +1,126 @@
+"""画像アップロードの同時実行がタイムライン読み込みの応答時間に与える影響の計測
+
+写真のアップロード（WebP 変換）を並行して流しながら、軽い「タイムライン読み込み」相当の処理
+（投稿一覧の JSON 化）を一定間隔で発行し、その応答時間の分布を比較する。
+
+- inline : 旧実装と同じく、async ハンドラ内で変換を同期実行する
+- pool   : TranscodePool（別プロセス）で変換し、イベントループは待つだけにする
+
+実行方法:
+    python -m benchmarks.bench_image_transcode
+    python -m benchmarks.bench_image_transcode --uploads 16 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from PIL import Image
+
+from app.utils.image_processor import _transcode_image, ensure_directories_exist
+from app.utils.transcode_pool import TranscodePool
+
+READ_INTERVAL = 0.01
+TIMELINE = [
+    {"id": i, "content": "ラーメン" * 20, "author": f"user{i}", "likes": i * 3, "replies": []}
+    for i in range(20)
+]
+
+
+def build_photo(rng: random.Random, size=(3000, 2000)) -> bytes:
+    """写真に近い（一様でない）画像を作る"""
+    small = Image.new("RGB", (size[0] // 20, size[1] // 20))
+    small.putdata([
+        (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for _ in range(small.width * small.height)
+    ])
+    buffer = io.BytesIO()
+    small.resize(size, Image.Resampling.BICUBIC).save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+async def timeline_reads(stop: asyncio.Event, latencies: List[float]) -> None:
+    """READ_INTERVAL ごとに読み込みが届いたとみなし、届いてから応答するまでの時間を記録する"""
+    arrived = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, arrived - time.perf_counter()))
+        json.dumps(TIMELINE, ensure_ascii=False)
+        finished = time.perf_counter()
+        # イベントループが止まっていた間に届いた読み込みも、それぞれ待たされたものとして数える
+        while arrived <= finished:
+            latencies.append(finished - arrived)
+            arrived += READ_INTERVAL
+
+
+async def run_scenario(upload: Callable, photos: List[bytes]) -> tuple:
+    latencies: List[float] = []
+    stop = asyncio.Event()
+    reader = asyncio.create_task(timeline_reads(stop, latencies))
+    await asyncio.sleep(READ_INTERVAL * 5)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(photo) for photo in photos))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await reader
+    return elapsed, latencies
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def report(label: str, elapsed: float, latencies: List[float], uploads: int) -> None:
+    print(
+        f"  {label:<8} アップロード {uploads / elapsed:6.2f} 件/s | "
+        f"読み込み {len(latencies):5d}回  p50 {statistics.median(latencies) * 1000:8.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  最大 {max(latencies) * 1000:8.2f} ms"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        ensure_directories_exist()
+        photos = [build_photo(rng) for _ in range(args.uploads)]
+
+        async def inline_upload(photo: bytes):
+            return _transcode_image(photo)
+
+        pool = TranscodePool(max_workers=args.workers, max_pending=args.uploads, kind="process")
+        # プロセスの起動時間を計測に含めない
+        await asyncio.gather(*(pool.run(os.getpid) for _ in range(args.workers)))
+
+        async def pool_upload(photo: bytes):
+            return await pool.run(_transcode_image, photo)
+
+        print(f"同時アップロード {args.uploads}件 (3000x2000 JPEG), ワーカー {args.workers}")
+        try:
+            for label, upload in (("inline", inline_upload), ("pool", pool_upload)):
+                elapsed, latencies = await run_scenario(upload, photos)
+                report(label, elapsed, latencies, args.uploads)
+        finally:
+            pool.shutdown(wait=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
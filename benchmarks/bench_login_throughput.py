@@ -0,0 +1,66 @@
+"""ログインの同時実行がタイムライン読み込みの応答時間に与える影響の計測
+
+ログイン（bcrypt によるパスワード検証）をまとめて流しながら、bench_image_transcode と同じ
+「タイムライン読み込み」相当の処理を一定間隔で発行し、ログインの処理件数と読み込みの応答時間を比較する。
+
+- inline : 旧実装と同じく、async ハンドラ内で bcrypt.checkpw を同期実行する
+- pool   : password_pool と同じ BoundedPool（スレッド）で検証し、イベントループは待つだけにする
+
+実行方法:
+    python -m benchmarks.bench_login_throughput
+    python -m benchmarks.bench_login_throughput --logins 64 --rounds 10 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+from typing import List
+
+from app.utils.auth import get_password_hash, verify_password
+from app.utils.bounded_pool import BoundedPool
+from benchmarks.bench_image_transcode import percentile, run_scenario
+
+PASSWORD = "password123!"
+
+
+def report(label: str, elapsed: float, latencies: List[float], logins: int) -> None:
+    print(
+        f"  {label:<8} ログイン {logins / elapsed:7.2f} 件/s | "
+        f"読み込み {len(latencies):5d}回  p50 {statistics.median(latencies) * 1000:8.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  最大 {max(latencies) * 1000:8.2f} ms"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    hashed = get_password_hash(PASSWORD, rounds=args.rounds)
+    attempts = [PASSWORD] * args.logins
+
+    async def inline_login(password: str) -> bool:
+        return verify_password(password, hashed)
+
+    pool = BoundedPool(max_workers=args.workers, max_pending=args.logins, kind="thread")
+
+    async def pool_login(password: str) -> bool:
+        return await pool.run(verify_password, password, hashed)
+
+    print(f"同時ログイン {args.logins}件 (bcrypt コスト {args.rounds}), スレッド {args.workers}")
+    try:
+        for label, login in (("inline", inline_login), ("pool", pool_login)):
+            elapsed, latencies = await run_scenario(login, attempts)
+            report(label, elapsed, latencies, args.logins)
+    finally:
+        pool.shutdown(wait=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""動画の同時ストリーミング配信のスループット計測
+
+動画プレイヤーと同じく Range リクエスト（既定 2 MiB ずつ）で動画全体を読むストリームを同時に走らせ、
+ASGI アプリを直接呼び出して、合計のスループットと 1 GiB あたりの CPU 時間を比べる。
+
+- StaticFiles: 従来の /uploads の配信（FileResponse、64 KiB ずつ読む）
+- MediaFiles: /uploads/media の配信（os.pread で 1 MiB ずつ読む）
+- MediaFiles + zerocopysend: サーバーが http.response.zerocopysend に対応している場合
+  （ここではサーバー役が os.sendfile で /dev/null に送る）
+
+ネットワークは通さないため、ファイルの読み出しとアプリ側の処理の差だけが出る。
+
+実行方法:
+    python -m benchmarks.bench_media_streaming
+    python -m benchmarks.bench_media_streaming --streams 32 --size-mib 48
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict
+
+import anyio
+from starlette.staticfiles import StaticFiles
+
+from app.utils.media_files import MediaFiles
+from app.utils.media_store import MediaStore
+
+ASGIApp = Callable[[dict, Callable, Callable], Awaitable[None]]
+
+
+async def _receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def fetch_range(app: ASGIApp, path: str, root_path: str, start: int, end: int, zero_copy_fd: int) -> int:
+    """1回の Range リクエストを実行し、受け取った（送った）バイト数を返す"""
+    received = 0
+    extensions: Dict[str, dict] = {"http.response.zerocopysend": {}} if zero_copy_fd >= 0 else {}
+
+    async def send(message: dict) -> None:
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+        elif message["type"] == "http.response.zerocopysend":
+            offset, count = message["offset"], message["count"]
+            fd = message["file"].fileno()
+            while count > 0:
+                sent = await anyio.to_thread.run_sync(os.sendfile, zero_copy_fd, fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+                received += sent
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": root_path,
+        "query_string": b"",
+        "headers": [(b"range", f"bytes={start}-{end}".encode())],
+        "extensions": extensions,
+    }
+    await app(scope, _receive, send)
+    return received
+
+
+async def run_streams(app: ASGIApp, path: str, root_path: str, size: int, streams: int, range_size: int,
+                      zero_copy_fd: int = -1) -> tuple:
+    async def stream() -> int:
+        total = 0
+        for start in range(0, size, range_size):
+            total += await fetch_range(app, path, root_path, start, min(size, start + range_size) - 1, zero_copy_fd)
+        return total
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    totals = await asyncio.gather(*(stream() for _ in range(streams)))
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    assert all(total == size for total in totals), "途中で切れたストリームがあります"
+    return sum(totals), wall, cpu
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    size = args.size_mib * 1024 * 1024
+    range_size = args.range_mib * 1024 * 1024
+    with tempfile.TemporaryDirectory() as workdir:
+        store = MediaStore(root=os.path.join(workdir, "uploads", "media"))
+        url = store.put_bytes(os.urandom(size), "mp4")
+        relative = url[len(store.url_prefix):]
+
+        static_files = StaticFiles(directory=os.path.join(workdir, "uploads"))
+        media_files = MediaFiles(store)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        scenarios = (
+            ("StaticFiles", static_files, f"/uploads/media/{relative}", "/uploads", -1),
+            ("MediaFiles", media_files, f"/uploads/media/{relative}", "/uploads/media", -1),
+            ("MediaFiles + zerocopysend", media_files, f"/uploads/media/{relative}", "/uploads/media", devnull),
+        )
+        print(f"動画 {args.size_mib} MiB を {args.streams} ストリームで同時に配信（Range {args.range_mib} MiB ずつ）")
+        try:
+            for label, app, path, root_path, zero_copy_fd in scenarios:
+                # ページキャッシュに載せてから計測する
+                await run_streams(app, path, root_path, size, 1, range_size, zero_copy_fd)
+                total, wall, cpu = await run_streams(
+                    app, path, root_path, size, args.streams, range_size, zero_copy_fd
+                )
+                gib = total / 1024 ** 3
+                print(
+                    f"  {label:<26}: {total / 1024 / 1024 / wall:8.0f} MiB/s  "
+                    f"CPU {cpu / gib:6.2f} s/GiB  ({wall:.2f} s)"
+                )
+        finally:
+            os.close(devnull)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--size-mib", type=int, default=32)
+    parser.add_argument("--range-mib", type=int, default=2)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""タイムライン1ページ（100投稿）のレスポンスのシリアライズ時間の計測
+
+返信付きの投稿 100 件から PostsResponse を組み立て、JSON のバイト列にするまでの時間を比べる。
+
+- serializer  : 旧実装と同じく、読むたびに field_serializer で escape_html してから
+                FastAPI と同じ TypeAdapter.dump_json で JSON にする
+- orjson      : 同じモデルを dump_python(mode="json") してから orjson で JSON にする（ORJSONResponse 相当）
+- precomputed : 書き込み時に作ったエスケープ済みの値を渡し、field_serializer なしで dump_json する
+
+実行方法:
+    python -m benchmarks.bench_response_serialization
+    python -m benchmarks.bench_response_serialization --posts 100 --replies 5 --rounds 500
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from pydantic import TypeAdapter, field_serializer
+
+from app.schemas import PostResponse, PostsResponse, ReplyResponse
+from app.utils.security import escape_html
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 未導入環境
+    orjson = None
+
+
+class LegacyReplyResponse(ReplyResponse):
+    @field_serializer('content', 'author_username')
+    def serialize_required(self, value):
+        return escape_html(value)
+
+    @field_serializer('author_profile_image_url', 'shadow_ban_reason')
+    def serialize_optional(self, value):
+        return escape_html(value) if value else value
+
+
+class LegacyPostResponse(PostResponse):
+    replies: List[LegacyReplyResponse] = []
+
+    @field_serializer('content', 'author_username')
+    def serialize_required(self, value):
+        return escape_html(value)
+
+    @field_serializer(
+        'author_profile_image_url', 'image_url', 'thumbnail_url', 'original_image_url', 'image_srcset',
+        'shop_name', 'shadow_ban_reason', 'shop_address', 'video_url',
+    )
+    def serialize_optional(self, value):
+        return escape_html(value) if value else value
+
+
+class LegacyPostsResponse(PostsResponse):
+    posts: List[LegacyPostResponse]
+
+
+def build_page(posts: int, replies: int, escape: Callable[[str], str]) -> List[Dict[str, Any]]:
+    now = datetime.now()
+    media = "/uploads/media/3f/a2/3fa2c1d4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f9"
+    return [
+        {
+            "id": post_id,
+            "content": escape("ニンニクヤサイマシマシ & アブラ少なめ <最高> " * 4),
+            "user_id": f"user{post_id}",
+            "author_username": escape(f"ラーメン好き{post_id}"),
+            "author_profile_image_url": escape(f"{media}.webp"),
+            "thumbnail_url": f"{media}.webp",
+            "original_image_url": f"{media}.webp",
+            "image_srcset": f"{media}-200.webp 200w, {media}-400.webp 400w, {media}-800.webp 800w",
+            "shop_id": 1,
+            "shop_name": escape("ラーメン二郎 三田本店"),
+            "shop_address": escape("東京都港区三田2-16-4"),
+            "created_at": now,
+            "likes_count": post_id % 7,
+            "replies_count": replies,
+            "replies": [
+                {
+                    "id": post_id * 100 + reply_id,
+                    "content": escape("うまそう！ \"また行きたい\"" * 2),
+                    "user_id": "replier",
+                    "post_id": post_id,
+                    "author_username": escape("返信ユーザー"),
+                    "author_profile_image_url": None,
+                    "created_at": now,
+                }
+                for reply_id in range(replies)
+            ],
+        }
+        for post_id in range(posts)
+    ]
+
+
+def measure(label: str, page_data: List[Dict[str, Any]], post_model, page_model, dump, rounds: int) -> None:
+    adapter = TypeAdapter(page_model)
+    build_total = dump_total = 0.0
+    size = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        page = page_model(
+            posts=[post_model.model_validate(data) for data in page_data], total=len(page_data), pages=1, current_page=1
+        )
+        built = time.perf_counter()
+        body = dump(adapter, page)
+        dump_total += time.perf_counter() - built
+        build_total += built - started
+        size = len(body)
+    print(
+        f"  {label:<12} 組み立て {build_total / rounds * 1000:6.2f} ms  "
+        f"JSON化 {dump_total / rounds * 1000:6.2f} ms  "
+        f"合計 {(build_total + dump_total) / rounds * 1000:6.2f} ms  ({size / 1024:.0f} KiB)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--replies", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    raw = build_page(args.posts, args.replies, lambda value: value)
+    escaped = build_page(args.posts, args.replies, escape_html)
+
+    print(f"タイムライン {args.posts}投稿 (返信 {args.replies}件ずつ), {args.rounds}回の平均")
+    measure("serializer", raw, LegacyPostResponse, LegacyPostsResponse,
+            lambda adapter, page: adapter.dump_json(page), args.rounds)
+    if orjson is not None:
+        measure("orjson", raw, LegacyPostResponse, LegacyPostsResponse,
+                lambda adapter, page: orjson.dumps(adapter.dump_python(page, mode="json")), args.rounds)
+    else:
+        print("  orjson       未インストールのため省略")
+    measure("precomputed", escaped, PostResponse, PostsResponse,
+            lambda adapter, page: adapter.dump_json(page), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""SpamDetector の本文チェックのスループット計測（posts/sec）
+
+DBに依存しないチェック（解析 + 各ヒューリスティック）を投稿長ごとに計測する。
+--min-posts-per-sec を指定すると、いずれかの投稿長で下回った場合に終了コード1で終わるため、
+性能劣化の検知に使える。
+
+実行方法:
+    python -m benchmarks.bench_spam_detector
+    python -m benchmarks.bench_spam_detector --min-posts-per-sec 2000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import List
+
+from app.utils.spam_detector import spam_detector
+from benchmarks.corpus import SPAM_SENTENCES, build_posts
+
+POST_LENGTHS = [40, 140, 500, 2000]
+POSTS_PER_LENGTH = 300
+REPEAT = 3
+
+
+def run_checks(posts: List[str]) -> None:
+    for post in posts:
+        analysis = spam_detector.analyze(post)
+        if analysis is not None:
+            spam_detector._score_content(analysis, [])
+
+
+def measure(posts: List[str]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        run_checks(posts)
+        best = min(best, time.perf_counter() - started)
+    return len(posts) / best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-posts-per-sec", type=float, default=0.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    failed = False
+    print(f"{'文字数':>6} {'posts/s':>10} {'解析のみ posts/s':>18}")
+    for length in POST_LENGTHS:
+        posts = build_posts(length, POSTS_PER_LENGTH, rng, inject=SPAM_SENTENCES, inject_every=5)
+        rate = measure(posts)
+
+        started = time.perf_counter()
+        for post in posts:
+            spam_detector.analyze(post)
+        analyze_rate = len(posts) / (time.perf_counter() - started)
+
+        marker = ""
+        if args.min_posts_per_sec and rate < args.min_posts_per_sec:
+            failed = True
+            marker = "  << 基準値未満"
+        print(f"{length:>6} {rate:>10.0f} {analyze_rate:>18.0f}{marker}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
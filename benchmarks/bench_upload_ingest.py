@@ -0,0 +1,128 @@
+"""画像アップロード1件あたりのピークメモリの計測
+
+旧実装の読み込み経路（サイズ計測のための全読み込み → 先頭の読み込み → 内容検証のための全読み込み
+→ 一時ファイルへのコピー → Pillow で開き直し）と、upload_ingest による1回だけの取り込み
+（取り込み → 検証 → 同じバッファを Pillow に渡す）を、tracemalloc のピークで比較する。
+上限を超えるアップロードを拒否するまでに読むバイト数も比べる。
+
+tracemalloc は Python 側の確保だけを数えるため、Pillow がデコードした画素のメモリは含まない
+（どちらの経路でも同じで、画素数は解像度上限で抑えられている）。
+
+実行方法:
+    python -m benchmarks.bench_upload_ingest
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+from typing import Callable
+
+from PIL import Image
+
+from app.utils.image_validation import MAX_IMAGE_SIZE_BYTES, validate_image_content, validate_image_upload
+from app.utils.upload_ingest import UploadTooLargeError, ingest_upload
+
+
+class FakeUpload:
+    """UploadFile と同じく、ディスクにスプールされたファイルを file に持つ"""
+
+    def __init__(self, data: bytes, filename: str = "photo.jpg") -> None:
+        self.file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self.file.write(data)
+        self.file.seek(0)
+        self.filename = filename
+        self.content_type = "image/jpeg"
+
+    def counting(self) -> "FakeUpload":
+        original_read = self.file.read
+        self.bytes_read = 0
+
+        def read(size=-1):
+            chunk = original_read(size)
+            self.bytes_read += len(chunk)
+            return chunk
+
+        self.file.read = read
+        return self
+
+
+def legacy_ingest(upload: FakeUpload) -> None:
+    upload.file.seek(0)
+    if len(upload.file.read()) > MAX_IMAGE_SIZE_BYTES:
+        return
+    upload.file.seek(0)
+    upload.file.read(1024)
+    upload.file.seek(0)
+    validate_image_content(upload.file.read())
+
+    upload.file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        shutil.copyfileobj(upload.file, temp_file)
+        path = temp_file.name
+    try:
+        with Image.open(path) as img:
+            img.load()
+    finally:
+        os.unlink(path)
+
+
+def single_ingest(upload: FakeUpload) -> None:
+    try:
+        ingested = ingest_upload(upload, MAX_IMAGE_SIZE_BYTES)
+    except UploadTooLargeError:
+        return
+    validate_image_upload(ingested)
+    with ingested.open_image() as img:
+        img.load()
+
+
+def peak_bytes(func: Callable[[FakeUpload], None], data: bytes) -> int:
+    upload = FakeUpload(data)
+    tracemalloc.start()
+    func(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def build_photo(size: int, rng: random.Random) -> bytes:
+    """ほぼ圧縮の効かない JPEG を作り、ファイルサイズを大きくする"""
+    img = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2048, help="画像の一辺（px）")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    photo = build_photo(args.size, rng)
+    print(f"画像 {args.size}x{args.size} JPEG, {len(photo) / 1024 / 1024:.1f} MiB")
+    for label, func in (("旧経路", legacy_ingest), ("一括取り込み", single_ingest)):
+        peak = peak_bytes(func, photo)
+        print(f"  {label:<10}: ピーク {peak / 1024 / 1024:6.1f} MiB ({peak / len(photo):.2f} x ファイルサイズ)")
+
+    oversized = b"\xff\xd8\xff" + b"0" * (MAX_IMAGE_SIZE_BYTES + 1024)
+    print(f"上限超過 ({len(oversized) / 1024 / 1024:.0f} MiB) の拒否")
+    for label, func in (("旧経路", legacy_ingest), ("一括取り込み", single_ingest)):
+        upload = FakeUpload(oversized).counting()
+        tracemalloc.start()
+        func(upload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"  {label:<10}: 読み込み {upload.bytes_read / 1024 / 1024:6.1f} MiB, "
+            f"ピーク {peak / 1024 / 1024:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""URLブロックリストのメモリ使用量と照合速度の計測
+
+旧実装（ソースごとの set[str] に対して、サブドメインの候補を1つずつ引く）と
+DomainSuffixIndex（逆順ドメインのソート済み配列 + ブルームフィルタ）を、合成したドメインで比較する。
+
+実行方法:
+    python -m benchmarks.bench_url_blocklist
+    python -m benchmarks.bench_url_blocklist --domains 500000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import string
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Set
+
+from app.utils.domain_index import DomainSuffixIndex
+
+TLDS = ["com", "net", "org", "xyz", "top", "ru", "cn", "info", "co.jp", "io"]
+LOOKUPS = 50000
+
+
+def random_domain(rng: random.Random) -> str:
+    labels = [
+        "".join(rng.choices(string.ascii_lowercase + string.digits + "-", k=rng.randint(4, 14)))
+        for _ in range(rng.randint(1, 3))
+    ]
+    return ".".join(labels + [rng.choice(TLDS)])
+
+
+def measure_memory(build: Callable[[], object]) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def legacy_match(blocklist: Set[str], domain: str) -> Optional[str]:
+    parts = domain.split(".")
+    for i in range(len(parts) - 1):
+        variant = ".".join(parts[i:])
+        if variant in blocklist:
+            return variant
+    return None
+
+
+def measure_lookups(func: Callable[[str], object], hosts: List[str]) -> float:
+    started = time.perf_counter()
+    for host in hosts:
+        func(host)
+    return len(hosts) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--domains", type=int, default=300000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # ダウンロードしたリストと同様に、文字列は構築時に生成させる（共有された文字列を数えないため）
+    raw = "\n".join(random_domain(rng) for _ in range(args.domains))
+    domains = raw.splitlines()
+
+    legacy, legacy_bytes = measure_memory(lambda: set(raw.splitlines()))
+    index, index_bytes = measure_memory(lambda: DomainSuffixIndex(raw.splitlines()))
+
+    # 1割はブロック対象のサブドメイン、残りは未登録のドメイン
+    hosts = [
+        f"www.{rng.choice(domains)}" if i % 10 == 0 else random_domain(rng)
+        for i in range(LOOKUPS)
+    ]
+    mismatches = sum(1 for host in hosts if legacy_match(legacy, host) != index.match(host))
+
+    print(f"ドメイン数: {len(index)}")
+    print(f"  set[str]           : {legacy_bytes / 1024 / 1024:8.1f} MiB")
+    print(
+        f"  DomainSuffixIndex  : {index_bytes / 1024 / 1024:8.1f} MiB "
+        f"(memory_bytes()={index.memory_bytes() / 1024 / 1024:.1f} MiB)"
+    )
+    print(f"  削減率             : {1 - index_bytes / legacy_bytes:8.1%}")
+    print(f"照合 ({LOOKUPS}件, 1割がブロック対象)  判定差異: {mismatches}")
+    print(f"  set[str]           : {measure_lookups(lambda h: legacy_match(legacy, h), hosts):10.0f} lookups/s")
+    print(f"  DomainSuffixIndex  : {measure_lookups(index.match, hosts):10.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
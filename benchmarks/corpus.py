@@ -0,0 +1,51 @@
+"""ベンチマーク用の投稿コーパス生成"""
+from __future__ import annotations
+
+import random
+from typing import List, Sequence
+
+SAMPLE_SENTENCES = [
+    "今日は三田本店で小ラーメンを食べました。",
+    "ニンニクヤサイマシマシアブラカラメでコールしました。",
+    "開店30分前に着いたのに既に20人並んでいた。",
+    "麺が硬めで最高でした。スープは乳化寄りです。",
+    "食券を先に買ってから並ぶのがルールらしいです。",
+    "豚がホロホロで、ボリュームもすごかった。",
+    "Great bowl today, the noodles were thick and chewy.",
+    "初めての二郎系でしたが、店員さんが優しく教えてくれました。",
+    "次は汁なしに挑戦したい。",
+    "ロットを乱さないように黙々と食べました。",
+    "詳しくはこちら https://example.com/ramen/mita を見てください。",
+    "@ramen_lover さんのおすすめで来ました😋",
+]
+
+SPAM_SENTENCES = [
+    "今だけ完全無料！副業で高収入 https://bit.ly/xyz123",
+    "LINE ID追加で即金 https://cheap-offer.xyz/join",
+    "ｸﾘｯｸしてね😀😀😀😀😀😀",
+    "earn money earn money earn money earn money earn money",
+]
+
+
+def build_posts(
+    length: int,
+    count: int,
+    rng: random.Random,
+    inject: Sequence[str] = (),
+    inject_every: int = 10,
+) -> List[str]:
+    """指定した文字数前後の投稿を count 件作る
+
+    inject を指定すると inject_every 件に1件、その中の語を任意の位置に混ぜる。
+    """
+    posts = []
+    for index in range(count):
+        parts: List[str] = []
+        while sum(len(part) for part in parts) < length:
+            parts.append(rng.choice(SAMPLE_SENTENCES))
+        text = "".join(parts)[:length]
+        if inject and index % inject_every == 0:
+            position = rng.randrange(len(text))
+            text = text[:position] + rng.choice(inject) + text[position:]
+        posts.append(text)
+    return posts
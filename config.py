@@ -27,6 +27,56 @@ class Settings:
     
     # AI設定
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY", "")
+    # モデレーションのマイクロバッチ（最大件数 / 待ち時間）。1以下でバッチ無効
+    MODERATION_BATCH_MAX_ITEMS: int = int(os.getenv("MODERATION_BATCH_MAX_ITEMS", "10"))
+    MODERATION_BATCH_WINDOW_MS: int = int(os.getenv("MODERATION_BATCH_WINDOW_MS", "50"))
+    # AIゲートウェイ（全体の同時実行数 / エンドポイント種別ごとの毎分リクエスト数）
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+    AI_RPM_MODERATION: float = float(os.getenv("AI_RPM_MODERATION", "120"))
+    AI_RPM_GUIDE: float = float(os.getenv("AI_RPM_GUIDE", "60"))
+    AI_RPM_SHOP_QA: float = float(os.getenv("AI_RPM_SHOP_QA", "60"))
+    AI_RPM_REPLY: float = float(os.getenv("AI_RPM_REPLY", "30"))
+    # AI応答キャッシュ（TTL秒 / 最大件数 / SQLite永続化先。空ならメモリのみ）
+    MODERATION_CACHE_TTL_SECONDS: int = int(os.getenv("MODERATION_CACHE_TTL_SECONDS", "21600"))
+    AI_ANSWER_CACHE_TTL_SECONDS: int = int(os.getenv("AI_ANSWER_CACHE_TTL_SECONDS", "86400"))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "4096"))
+    AI_CACHE_DB_PATH: str = os.getenv("AI_CACHE_DB_PATH", "")
+
+    # URLブロックリスト（スナップショットの保存先。空ならメモリのみ / 期限確認の間隔秒。0でバックグラウンド更新なし）
+    URL_BLOCKLIST_CACHE_DIR: str = os.getenv("URL_BLOCKLIST_CACHE_DIR", "./cache/url_blocklist")
+    URL_BLOCKLIST_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("URL_BLOCKLIST_REFRESH_INTERVAL_SECONDS", "3600"))
+
+    # IP位置情報（ローカルのIPレンジCSV。空なら使わない / 外部API(ipinfo.io)を使うか / キャッシュ秒数）
+    IP_GEO_DB_PATH: str = os.getenv("IP_GEO_DB_PATH", "")
+    IP_GEO_ONLINE_LOOKUP: bool = os.getenv("IP_GEO_ONLINE_LOOKUP", "true").lower() == "true"
+    IP_GEO_CACHE_TTL_SECONDS: int = int(os.getenv("IP_GEO_CACHE_TTL_SECONDS", "21600"))
+    IP_GEO_NEGATIVE_TTL_SECONDS: int = int(os.getenv("IP_GEO_NEGATIVE_TTL_SECONDS", "600"))
+
+    # 画像変換のワーカープール（process / thread、0 なら CPU 数から決める、実行中以外に待たせる最大件数）
+    IMAGE_TRANSCODE_EXECUTOR: str = os.getenv("IMAGE_TRANSCODE_EXECUTOR", "process")
+    IMAGE_TRANSCODE_WORKERS: int = int(os.getenv("IMAGE_TRANSCODE_WORKERS", "0"))
+    IMAGE_TRANSCODE_MAX_PENDING: int = int(os.getenv("IMAGE_TRANSCODE_MAX_PENDING", "8"))
+
+    # 投稿画像の幅ごとの画像（srcset 用、カンマ区切り）と、通常画質画像の長辺の上限（0 なら縮小しない）
+    IMAGE_RENDITION_WIDTHS: tuple = tuple(
+        int(width) for width in os.getenv("IMAGE_RENDITION_WIDTHS", "200,400,800").split(",") if width.strip()
+    )
+    IMAGE_ORIGINAL_MAX_SIDE: int = int(os.getenv("IMAGE_ORIGINAL_MAX_SIDE", "2048"))
+
+    # 認証結果のキャッシュ（検証済みトークンとユーザーのスナップショットを保持する秒数。0 で無効）
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+    # パスワードハッシュ（bcrypt のコスト、計算用スレッド数（0 なら CPU 数から決める）、待ち行列の上限）
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    BCRYPT_WORKERS: int = int(os.getenv("BCRYPT_WORKERS", "0"))
+    BCRYPT_MAX_PENDING: int = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+
+    # ログイン履歴を残す日数（python -m app.utils.login_history で古い履歴を削除する）
+    LOGIN_HISTORY_RETENTION_DAYS: float = float(os.getenv("LOGIN_HISTORY_RETENTION_DAYS", "180"))
+
+    # メディアのガベージコレクションで、参照がなくなってから削除するまでの猶予（時間）
+    MEDIA_GC_GRACE_HOURS: float = float(os.getenv("MEDIA_GC_GRACE_HOURS", "24"))
 
     # Cloudflare Turnstile
     TURNSTILE_SITE_KEY: str = os.getenv("TURNSTILE_SITE_KEY", "")
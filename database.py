@@ -25,4 +25,31 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def ensure_schema(bind=None) -> None:
+    """create_all では既存テーブルに追加された列・インデックスが作られないため、不足分を追加する
+
+    追加できるのは NULL 許容の列のみ（既存行の値は NULL になる）。
+    """
+    from sqlalchemy import inspect, text
+
+    bind = bind or engine
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable:
+                    print(f"警告: {table.name}.{column.name} はNOT NULLのため自動追加できません")
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"{table.name}.{column.name} 列を追加しました")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
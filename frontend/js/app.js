@@ -199,6 +199,7 @@ const API = {
                 text: post.content,
                 thumbnail_url: post.thumbnail_url,
                 original_image_url: post.original_image_url,
+                image_srcset: post.image_srcset,
                 time: this.formatTime(post.created_at),
                 shop_id: post.shop_id,
                 shop_name: post.shop_name,
@@ -342,6 +343,7 @@ const API = {
                 text: post.content,
                 thumbnail_url: post.thumbnail_url,
                 original_image_url: post.original_image_url,
+                image_srcset: post.image_srcset,
                 time: this.formatTime(post.created_at),
                 shop_id: post.shop_id,
                 shop_name: post.shop_name,
@@ -385,6 +387,7 @@ const API = {
                 text: post.content,
                 thumbnail_url: post.thumbnail_url,
                 original_image_url: post.original_image_url,
+                image_srcset: post.image_srcset,
                 time: this.formatTime(post.created_at),
                 shop_id: post.shop_id,
                 shop_name: post.shop_name,
@@ -432,6 +435,7 @@ const API = {
                 text: data.content,
                 thumbnail_url: data.thumbnail_url,
                 original_image_url: data.original_image_url,
+                image_srcset: data.image_srcset,
                 time: this.formatTime(data.created_at),
                 shop_id: data.shop_id,
                 shop_name: data.shop_name,
@@ -711,6 +715,15 @@ const API = {
         }
     },
 
+    // 複数URLの安全性をまとめて確認（結果はURLをキーにしたオブジェクト）
+    async checkUrlSafetyBatch(urls) {
+        const data = await this.request('/api/url-safety-check/batch', {
+            method: 'POST',
+            body: { urls }
+        });
+        return (data && data.results) || {};
+    },
+
     // 時間フォーマット
     formatTime(dateString) {
         const date = new Date(dateString);
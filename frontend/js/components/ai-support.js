@@ -4,7 +4,7 @@ const AiSupportComponent = {
     CONTAINER_ID: 'ai-chat-messages',
     INPUT_ID: 'ai-chat-input',
     SEND_BTN_ID: 'send-ai-chat',
-    API_ENDPOINT: '/api/v1/guide/ask',
+    API_ENDPOINT: '/api/v1/guide/ask/stream',
 
     init() {
         // ログイン状態を確認
@@ -98,26 +98,13 @@ const AiSupportComponent = {
         const loadingId = AiChatUtils.appendLoading(this.CONTAINER_ID, 'guide-loading');
 
         try {
-            const response = await fetch(this.API_ENDPOINT, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRF-Token': API.getCookie('csrftoken')
-                },
-                body: JSON.stringify({ question }),
-            });
-
-            // ローディング削除
-            AiChatUtils.removeMessage(loadingId);
-
-            if (!response.ok) {
-                const errorMessage = await AiChatUtils.handleApiError(response);
-                AiChatUtils.appendMessage(this.CONTAINER_ID, errorMessage, 'ai', true, 'guide-msg');
-                return;
-            }
-
-            const data = await response.json();
-            AiChatUtils.appendMessage(this.CONTAINER_ID, data.answer, 'ai', false, 'guide-msg');
+            await AiChatUtils.streamAnswer(
+                this.API_ENDPOINT,
+                question,
+                this.CONTAINER_ID,
+                loadingId,
+                'guide-msg'
+            );
 
         } catch (error) {
             console.error('Error:', error);
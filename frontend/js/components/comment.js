@@ -1660,6 +1660,24 @@ const CommentComponent = {
 
     // 投稿画像のHTMLを生成（picture要素を使用）
     createPostImageHTML(post) {
+        // 幅ごとの画像がある場合は srcset で表示幅に合うものをブラウザに選ばせる（元画像はクリック時のみ）
+        if (post.image_srcset) {
+            const originalUrl = post.original_image_url || post.thumbnail_url;
+
+            return `
+                <div class="post-image">
+                    <img src="${API.escapeHtml(post.thumbnail_url || originalUrl)}"
+                         srcset="${API.escapeHtml(post.image_srcset)}"
+                         sizes="(min-width: 768px) 600px, 100vw"
+                         style="width:100%; border-radius: 16px; margin-top: 12px;"
+                         alt="Post image"
+                         loading="lazy"
+                         decoding="async"
+                         onclick="CommentComponent.openImageModal(['${API.escapeHtml(originalUrl)}'], 0)">
+                </div>
+            `;
+        }
+
         // 新しい画像URLがある場合はpicture要素を使用
         if (post.thumbnail_url || post.original_image_url) {
             const thumbnailUrl = post.thumbnail_url || post.image_url;
@@ -1,4 +1,60 @@
 const ExternalLinkComponent = {
+    // URLごとの判定結果（タイムライン表示時にまとめて取得しておく）
+    _verdicts: new Map(),
+    _pendingUrls: new Set(),
+    _prefetchTimer: null,
+    _verdictTtlMs: 5 * 60 * 1000,
+    _batchSize: 100,
+
+    // 表示中のリンクを短い待ち時間でまとめ、1回のバッチAPI呼び出しで確認する
+    prefetch(urls = []) {
+        urls.forEach((url) => {
+            if (/^https?:\/\//i.test(url) && !this._getCachedVerdict(url)) {
+                this._pendingUrls.add(url);
+            }
+        });
+        if (this._pendingUrls.size === 0 || this._prefetchTimer) {
+            return;
+        }
+        this._prefetchTimer = setTimeout(() => {
+            this._prefetchTimer = null;
+            this._flushPrefetch();
+        }, 100);
+    },
+
+    async _flushPrefetch() {
+        const urls = Array.from(this._pendingUrls);
+        this._pendingUrls.clear();
+        for (let i = 0; i < urls.length; i += this._batchSize) {
+            await this._fetchVerdicts(urls.slice(i, i + this._batchSize));
+        }
+    },
+
+    async _fetchVerdicts(urls) {
+        try {
+            const results = await API.checkUrlSafetyBatch(urls);
+            const expiresAt = Date.now() + this._verdictTtlMs;
+            Object.entries(results).forEach(([url, result]) => {
+                this._verdicts.set(url, { result, expiresAt });
+            });
+        } catch (error) {
+            // 事前確認に失敗してもリンクを開くときに個別に確認する
+            console.error('URL安全性の一括チェックに失敗しました:', error);
+        }
+    },
+
+    _getCachedVerdict(url) {
+        const cached = this._verdicts.get(url);
+        if (!cached) {
+            return null;
+        }
+        if (cached.expiresAt <= Date.now()) {
+            this._verdicts.delete(url);
+            return null;
+        }
+        return cached.result;
+    },
+
     async render(params = []) {
         const contentArea = document.getElementById('contentArea');
         if (!contentArea) {
@@ -49,9 +105,17 @@ const ExternalLinkComponent = {
     },
 
     async _checkUrlSafety(url) {
+        const cached = this._getCachedVerdict(url);
+        if (cached) {
+            return cached;
+        }
         try {
-            const response = await API.post('/api/url-safety-check', { url });
-            return response;
+            await this._fetchVerdicts([url]);
+            const result = this._getCachedVerdict(url);
+            if (!result) {
+                throw new Error('判定結果がありません');
+            }
+            return result;
         } catch (error) {
             console.error('URL安全性チェックAPI呼び出しエラー:', error);
             // APIエラー時は安全とみなして続行
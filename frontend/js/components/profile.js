@@ -1177,7 +1177,7 @@ const ProfileComponent = {
 
                         const picture = document.createElement('picture');
 
-                        if (post.original_image_url) {
+                        if (post.original_image_url && !post.image_srcset) {
                             const source = document.createElement('source');
                             source.srcset = post.original_image_url;
                             source.media = '(min-width: 768px)';
@@ -1190,7 +1190,11 @@ const ProfileComponent = {
                         img.loading = 'lazy';
                         img.className = 'profile-post-image';
 
-                        if (post.original_image_url) {
+                        if (post.image_srcset) {
+                            // 幅ごとの画像から表示幅に合うものをブラウザに選ばせる
+                            img.srcset = post.image_srcset;
+                            img.sizes = '(min-width: 768px) 300px, 50vw';
+                        } else if (post.original_image_url) {
                             img.dataset.src = post.original_image_url;
                         }
 
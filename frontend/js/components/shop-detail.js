@@ -749,26 +749,13 @@ const ShopDetailComponent = {
         const loadingId = AiChatUtils.appendLoading(containerId, 'shop-ai-loading');
 
         try {
-            const response = await fetch(`/api/v1/ramen/${this.shopData.id}/ask`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRF-Token': API.getCookie('csrftoken')
-                },
-                body: JSON.stringify({ question }),
-            });
-
-            // ローディング削除
-            AiChatUtils.removeMessage(loadingId);
-
-            if (!response.ok) {
-                const errorMessage = await AiChatUtils.handleApiError(response);
-                AiChatUtils.appendMessage(containerId, errorMessage, 'ai', true, 'shop-ai-msg');
-                return;
-            }
-
-            const data = await response.json();
-            AiChatUtils.appendMessage(containerId, data.answer, 'ai', false, 'shop-ai-msg');
+            await AiChatUtils.streamAnswer(
+                `/api/v1/ramen/${this.shopData.id}/ask/stream`,
+                question,
+                containerId,
+                loadingId,
+                'shop-ai-msg'
+            );
 
         } catch (error) {
             console.error('AI質問エラー:', error);
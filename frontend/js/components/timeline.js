@@ -433,6 +433,7 @@ const TimelineComponent = {
 
         // 遅延読み込みを設定
         this.setupLazyLoading();
+        this.prefetchLinkSafety(newPosts);
     },
 
     // 新着投稿通知を表示
@@ -870,6 +871,25 @@ const TimelineComponent = {
 
         // 遅延読み込みを設定
         this.setupLazyLoading();
+        this.prefetchLinkSafety(newPosts);
+    },
+
+    // 投稿内のリンクの安全性をまとめて確認しておく（リンクごとのリクエストを避ける）
+    prefetchLinkSafety(posts) {
+        if (typeof ExternalLinkComponent === 'undefined') {
+            return;
+        }
+        const urlRegex = /(https?:\/\/[^\s]+)/g;
+        const urls = [];
+        posts.forEach((post) => {
+            const matches = (post.content || '').match(urlRegex);
+            if (matches) {
+                urls.push(...matches);
+            }
+        });
+        if (urls.length > 0) {
+            ExternalLinkComponent.prefetch(urls);
+        }
     },
 
     createPostHTML(post) {
@@ -1623,8 +1643,29 @@ const TimelineComponent = {
         return false; // 判定できない場合はfalseを返す
     },
 
+    // 投稿画像の表示幅（タイムラインの列幅の60%）。srcset からの選択に使う
+    POST_IMAGE_SIZES: '(min-width: 768px) 360px, 60vw',
+
     // 投稿画像のHTMLを生成（picture要素を使用）
     createPostImageHTML(post) {
+        // 幅ごとの画像がある場合は srcset で表示幅に合うものをブラウザに選ばせる（元画像はクリック時のみ）
+        if (post.image_srcset) {
+            const originalUrl = post.original_image_url || post.thumbnail_url;
+
+            return `
+                <div class="post-image">
+                    <img src="${API.escapeHtml(post.thumbnail_url || originalUrl)}"
+                         srcset="${API.escapeHtml(post.image_srcset)}"
+                         sizes="${this.POST_IMAGE_SIZES}"
+                         style="width:60%; border-radius: 16px; margin-top: 12px;"
+                         alt="Post image"
+                         loading="lazy"
+                         decoding="async"
+                         onclick="TimelineComponent.handleImageClick(event, '${API.escapeHtml(originalUrl)}')">
+                </div>
+            `;
+        }
+
         // 新しい画像URLがある場合はpicture要素を使用
         if (post.thumbnail_url || post.original_image_url) {
             const thumbnailUrl = post.thumbnail_url || post.image;
@@ -33,6 +33,87 @@ const AiChatUtils = {
         return msgId;
     },
 
+    // 既存メッセージの本文を差し替え（ストリーミング表示用）
+    updateMessage(id, text) {
+        const element = document.getElementById(id);
+        if (!element) return;
+        const content = element.querySelector('.message-content');
+        if (content) {
+            content.innerHTML = this.escapeHtml(text).replace(/\n/g, '<br>');
+        }
+        const container = element.parentElement;
+        if (container) {
+            container.scrollTop = container.scrollHeight;
+        }
+    },
+
+    // SSE で返される回答を受信し、届いた分から表示する
+    // 戻り値: 正常に完了した場合 true
+    async streamAnswer(url, question, containerId, loadingId, idPrefix = 'ai-msg') {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+                'X-CSRF-Token': API.getCookie('csrftoken')
+            },
+            body: JSON.stringify({ question }),
+        });
+
+        if (!response.ok || !response.body) {
+            this.removeMessage(loadingId);
+            const errorMessage = await this.handleApiError(response);
+            this.appendMessage(containerId, errorMessage, 'ai', true, idPrefix);
+            return false;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let messageId = null;
+
+        const handleEvent = (rawEvent) => {
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach((line) => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            const payload = data ? JSON.parse(data) : {};
+
+            if (eventName === 'error') {
+                this.removeMessage(loadingId);
+                this.appendMessage(containerId, payload.detail || 'エラーが発生しました。', 'ai', true, idPrefix);
+                return;
+            }
+            if (eventName === 'message' && payload.delta) {
+                answer += payload.delta;
+                if (!messageId) {
+                    // 最初のチャンクが届いた時点でローディング表示を差し替える
+                    this.removeMessage(loadingId);
+                    messageId = this.appendMessage(containerId, answer, 'ai', false, idPrefix);
+                } else {
+                    this.updateMessage(messageId, answer);
+                }
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+
+        this.removeMessage(loadingId);
+        return true;
+    },
+
     // ローディングメッセージを追加
     appendLoading(containerId, idPrefix = 'ai-loading') {
         const messagesContainer = document.getElementById(containerId);
@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import subprocess
@@ -10,9 +10,12 @@ import signal
 import sys
 import httpx
 import uuid
+from contextlib import contextmanager
 
 from app import create_app
 from database import Base, get_db
+from app.utils.spam_detector import spam_detector
+from app.utils.auth_cache import auth_cache
 
 # Use a file-based SQLite database for tests to allow sharing with subprocess
 # Use a unique filename to avoid conflicts if running multiple sessions
@@ -113,6 +116,10 @@ def test_db():
     """
     # Create tables
     Base.metadata.create_all(bind=engine)
+    # キャンペーン集計はプロセス内に残るため、テストごとに空にする
+    spam_detector.campaign_tracker.reset()
+    # 認証キャッシュもテストをまたいで残らないようにする
+    auth_cache.clear()
 
     # Create session
     db = TestingSessionLocal()
@@ -179,3 +186,37 @@ def auth_headers(test_client):
     # 2. The registration response should contain the token
     token = register_response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def count_queries():
+    """
+    Fixture to count SQL statements executed on the test engine.
+
+        with count_queries() as statements:
+            test_client.get("/api/v1/admin/users")
+        assert len(statements) <= 5
+
+    Pass max_queries to fail with the executed statements listed:
+
+        with count_queries(max_queries=5):
+            ...
+    """
+    @contextmanager
+    def counter(max_queries=None):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        if max_queries is not None:
+            assert len(statements) <= max_queries, (
+                f"{len(statements)} queries executed (max {max_queries}):\n" + "\n".join(statements)
+            )
+
+    return counter
@@ -0,0 +1,75 @@
+import pytest
+
+from app.models import Post, RamenShop, RamenShopSubmission, Report, User
+from app.utils.auth import create_access_token
+
+
+@pytest.fixture
+def admin_headers(test_db):
+    test_db.add(User(
+        id="listing_admin", username="管理者", email="listing-admin@example.com", password_hash="x", is_admin=True
+    ))
+    test_db.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'listing_admin'})}"}
+
+
+def _add_users(db, count, start=0):
+    shop = db.query(RamenShop).first()
+    if shop is None:
+        shop = RamenShop(name="一覧テスト店", address="東京都", latitude=35.0, longitude=139.0)
+        db.add(shop)
+        db.flush()
+    for index in range(start, start + count):
+        user_id = f"listed{index}"
+        db.add(User(id=user_id, username=user_id, email=f"{user_id}@example.com", password_hash="x"))
+        db.flush()
+        for _ in range(2):
+            post = Post(content="投稿", user_id=user_id, shop_id=shop.id)
+            db.add(post)
+            db.flush()
+        db.add(Report(post_id=post.id, reporter_id="listing_admin", reason="spam"))
+        db.add(RamenShopSubmission(shop_id=shop.id, proposer_id=user_id, proposed_changes={}))
+    db.commit()
+
+
+def _list_query_count(test_client, count_queries, path, headers):
+    with count_queries() as statements:
+        response = test_client.get(path, headers=headers)
+    assert response.status_code == 200
+    return response.json(), len(statements)
+
+
+def test_user_listing_query_count_does_not_grow_with_page_size(test_client, test_db, admin_headers, count_queries):
+    _add_users(test_db, 3)
+    _, small = _list_query_count(test_client, count_queries, "/api/v1/admin/users?limit=100", admin_headers)
+
+    _add_users(test_db, 30, start=3)
+    body, large = _list_query_count(test_client, count_queries, "/api/v1/admin/users?limit=100", admin_headers)
+
+    assert large == small
+    assert body["total"] == 34
+    listed = next(user for user in body["users"] if user["id"] == "listed0")
+    assert (listed["posts_count"], listed["reports_submitted"], listed["reports_received"]) == (2, 0, 1)
+    admin = next(user for user in body["users"] if user["id"] == "listing_admin")
+    assert (admin["posts_count"], admin["reports_submitted"], admin["reports_received"]) == (0, 33, 0)
+
+
+def test_shop_listing_counts_posts_and_pending_submissions(test_client, test_db, admin_headers, count_queries):
+    _add_users(test_db, 5)
+    test_db.add(RamenShop(name="別の店", address="大阪府", latitude=34.0, longitude=135.0))
+    test_db.commit()
+
+    with count_queries(max_queries=4):
+        response = test_client.get("/api/v1/admin/shops", headers=admin_headers)
+
+    shops = {shop["name"]: shop for shop in response.json()["shops"]}
+    assert (shops["一覧テスト店"]["posts_count"], shops["一覧テスト店"]["pending_submissions"]) == (10, 5)
+    assert (shops["別の店"]["posts_count"], shops["別の店"]["pending_submissions"]) == (0, 0)
+
+
+def test_detail_uses_the_same_counts(test_client, test_db, admin_headers):
+    _add_users(test_db, 2)
+
+    detail = test_client.get("/api/v1/admin/users/listed1", headers=admin_headers).json()
+
+    assert (detail["posts_count"], detail["reports_received"], detail["shop_submissions_count"]) == (2, 1, 1)
@@ -0,0 +1,127 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.utils.ai_cache import AIResponseCache, build_cache_key
+from app.utils.ai_responder import GeminiResponder
+from app.utils.content_moderator import ContentModerator
+from app.utils.fake_genai import FakeGenAIClient
+
+
+def test_cache_key_uses_normalized_content():
+    """全角/半角や空白の違いは同じキーになり、プロンプト種別が違えば別キーになる"""
+    assert build_cache_key("moderation:v2", "ＡＢＣ  無料​") == build_cache_key("moderation:v2", "ABC 無料")
+    assert build_cache_key("moderation:v2", "ABC") != build_cache_key("guide:v1", "ABC")
+
+
+def test_cache_expires_after_ttl():
+    cache = AIResponseCache("test", ttl_seconds=10)
+    with patch("app.utils.ai_cache.time.time", return_value=1000.0):
+        cache.set("k", {"v": 1})
+    with patch("app.utils.ai_cache.time.time", return_value=1005.0):
+        assert cache.get("k") == {"v": 1}
+    with patch("app.utils.ai_cache.time.time", return_value=1011.0):
+        assert cache.get("k") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = AIResponseCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_persists_to_sqlite(tmp_path):
+    db_path = str(tmp_path / "ai_cache.sqlite")
+    AIResponseCache("moderation", db_path=db_path).set("k", {"is_violation": True})
+
+    restored = AIResponseCache("moderation", db_path=db_path)
+    assert restored.get("k") == {"is_violation": True}
+    # 名前が異なるキャッシュとは共有しない
+    assert AIResponseCache("ai_answer", db_path=db_path).get("k") is None
+
+
+async def test_duplicate_moderation_requests_share_one_call():
+    """同一内容・同一の理由と履歴の審査はキャッシュと審査中の結果を共有し、外部呼び出しは1回だけ"""
+    client = FakeGenAIClient()
+    moderator = ContentModerator(client=client, batch_window_seconds=0.01)
+
+    first, second = await asyncio.gather(
+        moderator.analyze_content("今だけ無料で稼げる", "自動審査"),
+        moderator.analyze_content("今だけ  無料で稼げる", "自動審査"),
+    )
+    third = await moderator.analyze_content("今だけ無料で稼げる", "自動審査")
+
+    assert len(client.calls) == 1
+    assert first == second == third
+
+
+async def test_moderation_cache_key_includes_reason_and_history():
+    """審査理由や投稿者の履歴が違えば、同じ文面でも別の判定として審査する"""
+    client = FakeGenAIClient()
+    moderator = ContentModerator(client=client, batch_window_seconds=0.01)
+
+    await asyncio.gather(
+        moderator.analyze_content("今だけ無料で稼げる", "自動審査"),
+        moderator.analyze_content("今だけ無料で稼げる", "自動審査", "違反で3回通報されたユーザー"),
+    )
+    await moderator.analyze_content("今だけ無料で稼げる", "ユーザーからの通報")
+
+    # 履歴付きの1件は同じバッチで別の項目として審査される
+    assert len(client.calls) == 2
+    assert "違反で3回通報されたユーザー" in client.calls[0]["contents"]
+
+    # 3通りとも個別にキャッシュされる
+    await moderator.analyze_content("今だけ無料で稼げる", "自動審査", "違反で3回通報されたユーザー")
+    await moderator.analyze_content("今だけ無料で稼げる", "ユーザーからの通報")
+    assert len(client.calls) == 2
+
+
+async def test_moderation_errors_are_not_cached():
+    def failing(contents, config):
+        raise RuntimeError("quota exceeded")
+
+    client = FakeGenAIClient(responder=failing)
+    moderator = ContentModerator(client=client, batch_window_seconds=0.01)
+
+    await moderator.analyze_content("テスト")
+    await moderator.analyze_content("テスト")
+
+    assert len(client.calls) == 2
+
+
+async def test_guide_answers_are_cached():
+    client = FakeGenAIClient(responder=lambda contents, config: "食券を先に買いましょう")
+    responder = GeminiResponder(cache=AIResponseCache("test_answer"))
+    responder.client = client
+
+    assert await responder.ask_guide("食券はいつ買う？") == "食券を先に買いましょう"
+    assert await responder.ask_guide("  食券はいつ買う? ") == "食券を先に買いましょう"
+    assert len(client.calls) == 1
+
+    shop = {"name": "ラーメン二郎 三田本店", "address": "東京都港区"}
+    await responder.ask_about_shop("並びますか？", shop)
+    await responder.ask_about_shop("並びますか？", shop)
+    await responder.ask_about_shop("並びますか？", {**shop, "name": "別の店"})
+    assert len(client.calls) == 3
+
+
+async def test_streamed_guide_answer_is_cached():
+    client = FakeGenAIClient(responder=lambda contents, config: "  食券を先に買いましょう", stream_chunk_size=3)
+    responder = GeminiResponder(cache=AIResponseCache("test_stream_answer"))
+    responder.client = client
+
+    chunks = [chunk async for chunk in responder.stream_guide("食券はいつ買う？")]
+    assert len(chunks) > 1
+    assert "".join(chunks) == "食券を先に買いましょう"
+
+    # 生成済みの回答はストリーミング版・通常版のどちらからもキャッシュで返る
+    assert [chunk async for chunk in responder.stream_guide("食券はいつ買う？")] == ["食券を先に買いましょう"]
+    assert await responder.ask_guide("食券はいつ買う？") == "食券を先に買いましょう"
+    assert len(client.calls) == 1
@@ -0,0 +1,192 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from google.genai import errors as genai_errors
+
+from app.utils.ai_gateway import (
+    AICircuitOpen,
+    AIGateway,
+    AIQuotaExceeded,
+    CircuitBreaker,
+    EndpointPolicy,
+    TokenBucket,
+)
+
+
+class SlowClient:
+    """呼び出しごとに event を待つテスト用クライアント"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.active = 0
+        self.max_active = 0
+
+        async def generate_content(**kwargs):
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await self.release.wait()
+                return SimpleNamespace(text="ok")
+            finally:
+                self.active -= 1
+
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+
+class ScriptedClient:
+    """あらかじめ決めた例外/応答を順に返すテスト用クライアント"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+        async def generate_content(**kwargs):
+            self.calls += 1
+            outcome = self.outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return SimpleNamespace(text=outcome)
+
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+
+def make_gateway(**overrides):
+    policies = {
+        "moderation": EndpointPolicy(requests_per_minute=6000, burst=100, max_concurrency=2, max_wait_seconds=1),
+        "guide": EndpointPolicy(requests_per_minute=6000, burst=100, max_concurrency=2, max_wait_seconds=1),
+    }
+    policies.update(overrides)
+    return AIGateway(max_concurrency=3, policies=policies, retry_base_delay_seconds=0)
+
+
+def test_token_bucket_limits_burst():
+    bucket = TokenBucket(rate_per_second=1, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10)
+    with patch("app.utils.ai_gateway.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+    with patch("app.utils.ai_gateway.time.monotonic", return_value=111.0):
+        assert breaker.state == "half_open"
+        assert breaker.allow()
+        # 試行中は他のリクエストを通さない
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+
+async def test_moderation_spike_does_not_starve_guide():
+    """モデレーションが同時実行枠を使い切っても、ガイドの呼び出しは処理される"""
+    gateway = make_gateway()
+    moderation_client = SlowClient()
+
+    moderation_tasks = [
+        asyncio.create_task(gateway.generate_content("moderation", moderation_client, contents="x"))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.01)
+    assert moderation_client.max_active == 2
+
+    guide_client = ScriptedClient(["回答"])
+    response = await asyncio.wait_for(
+        gateway.generate_content("guide", guide_client, contents="質問"),
+        timeout=1,
+    )
+    assert response.text == "回答"
+
+    moderation_client.release.set()
+    await asyncio.gather(*moderation_tasks)
+    assert gateway.stats()["moderation"]["requests"] == 5
+
+
+async def test_rate_limited_calls_are_retried():
+    gateway = make_gateway()
+    client = ScriptedClient([genai_errors.ClientError(429, {"error": {"message": "quota"}}), "ok"])
+
+    response = await gateway.generate_content("moderation", client, contents="x")
+
+    assert response.text == "ok"
+    assert client.calls == 2
+    stats = gateway.stats()["moderation"]
+    assert stats["retries"] == 1
+    assert stats["circuit"] == "closed"
+
+
+async def test_repeated_upstream_failures_open_circuit():
+    gateway = make_gateway()
+    gateway.max_retries = 0
+    gateway._breakers["moderation"] = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60)
+    client = ScriptedClient([genai_errors.ServerError(503, {"error": {}})] * 2)
+
+    for _ in range(2):
+        with pytest.raises(genai_errors.ServerError):
+            await gateway.generate_content("moderation", client, contents="x")
+
+    with pytest.raises(AICircuitOpen):
+        await gateway.generate_content("moderation", client, contents="x")
+    assert client.calls == 2
+    # 他のエンドポイントには影響しない
+    assert gateway.stats()["guide"]["circuit"] == "closed"
+
+
+async def test_quota_exhaustion_is_rejected():
+    gateway = make_gateway(
+        guide=EndpointPolicy(requests_per_minute=1, burst=1, max_concurrency=1, max_wait_seconds=0)
+    )
+    client = ScriptedClient(["1", "2"])
+
+    await gateway.generate_content("guide", client, contents="q")
+    with pytest.raises(AIQuotaExceeded):
+        await gateway.generate_content("guide", client, contents="q")
+    assert gateway.stats()["guide"]["rejected"] == 1
+
+
+def test_components_share_one_client():
+    """ContentModerator と GeminiResponder は同じ genai.Client を再利用する"""
+    from app.utils.ai_responder import GeminiResponder
+    from app.utils.content_moderator import ContentModerator
+
+    gateway = AIGateway()
+    with patch.dict("os.environ", {"GOOGLE_API_KEY": "test-api-key"}), patch(
+        "app.utils.content_moderator.ai_gateway", gateway
+    ), patch("app.utils.ai_responder.ai_gateway", gateway):
+        moderator = ContentModerator()
+        responder = GeminiResponder()
+
+    assert moderator.client is not None
+    assert moderator.client is responder.client
+    with patch.dict("os.environ", {}, clear=True):
+        assert gateway.get_client() is None
+
+
+async def test_stream_holds_slot_and_records_ttfb():
+    """ストリーム読み終わりまで同時実行枠を保持し、TTFB を記録する"""
+    from app.utils.fake_genai import FakeGenAIClient
+    from app.utils.metrics import latency_metrics
+
+    gateway = make_gateway(
+        guide=EndpointPolicy(requests_per_minute=6000, burst=100, max_concurrency=1, max_wait_seconds=1)
+    )
+    client = FakeGenAIClient(responder=lambda contents, config: "食券を先に買いましょう", stream_chunk_size=4)
+
+    stream = gateway.stream_content("guide", client, model="m", contents="q")
+    first = await stream.__anext__()
+    assert first == "食券を先"
+    semaphore = gateway._get_semaphores("guide")[1]
+    assert semaphore.locked()
+
+    rest = [chunk async for chunk in stream]
+    assert first + "".join(rest) == "食券を先に買いましょう"
+    assert not semaphore.locked()
+    assert client.calls[0]["stream"] is True
+    assert latency_metrics.summary("ai_gateway_ttfb:guide")["count"] >= 1
@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app.models import User
+from app.utils import auth
+from app.utils.auth import create_access_token, verify_token
+from app.utils.auth_cache import AuthCache, auth_cache, load_user
+
+
+@contextmanager
+def count_user_selects(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _add_user(db, user_id="cacheuser"):
+    db.add(User(id=user_id, email=f"{user_id}@example.com", password_hash="x", username="キャッシュ"))
+    db.commit()
+
+
+def test_snapshot_skips_users_lookup(test_db):
+    _add_user(test_db)
+    load_user(test_db, "cacheuser")
+    test_db.close()
+
+    with count_user_selects(test_db) as selects:
+        user = load_user(test_db, "cacheuser")
+        assert user.id == "cacheuser"
+        assert user.is_admin is False
+        assert user.account_status == "active"
+        assert selects == []
+
+        # スナップショットにない列は、触れたときに1回だけ読み込む
+        assert user.username == "キャッシュ"
+        assert user.email == "cacheuser@example.com"
+        assert len(selects) == 1
+
+
+def test_commit_invalidates_snapshot(test_db):
+    _add_user(test_db)
+    user = load_user(test_db, "cacheuser")
+    user.account_status_override = "banned"
+    test_db.commit()
+    test_db.close()
+
+    assert auth_cache.get_user("cacheuser") is None
+    assert load_user(test_db, "cacheuser").account_status_override == "banned"
+
+
+def test_banned_user_is_rejected_right_after_moderation(test_client, test_db):
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": "banme", "email": "banme@example.com", "password": "password123!"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert test_client.post("/api/v1/posts", data={"content": "BAN前"}, headers=headers).status_code == 201
+
+    user = test_db.query(User).filter(User.id == "banme").first()
+    user.account_status_override = "banned"
+    test_db.commit()
+
+    response = test_client.post("/api/v1/posts", data={"content": "BAN後"}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_verified_token_is_not_decoded_again(monkeypatch):
+    token = create_access_token({"sub": "tokenuser"})
+    assert verify_token(token) == "tokenuser"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("キャッシュ済みのトークンをデコードした")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert verify_token(token) == "tokenuser"
+
+
+def test_token_entry_never_outlives_its_exp(monkeypatch):
+    cache = AuthCache(ttl_seconds=60)
+    now = 1_000_000.0
+    monkeypatch.setattr("app.utils.auth_cache.time.time", lambda: now)
+    cache.put_token("t", "u", exp=now + 5)
+
+    assert cache.get_token("t") == "u"
+    now += 6
+    assert cache.get_token("t") is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AuthCache(ttl_seconds=0)
+    cache.put_token("t", "u", exp=None)
+
+    assert cache.get_token("t") is None
+    assert cache.stats()["tokens"] == 0
+
+
+def test_expired_token_is_rejected():
+    assert verify_token(create_access_token({"sub": "late"}, expires_delta=timedelta(seconds=-1))) is None
@@ -1,8 +1,10 @@
 import pytest
 import asyncio
+import json
 from unittest.mock import Mock, patch, MagicMock, AsyncMock, mock_open
 from sqlalchemy.orm import Session
-from app.utils.content_moderator import ContentModerator, ContentAnalysisResult
+from app.utils.content_moderator import BATCH_ITEMS_MARKER, ContentModerator, ContentAnalysisResult
+from app.utils.fake_genai import FakeGenAIClient, default_moderation_responder
 from app.models import Post, Report, User
 
 @pytest.fixture
@@ -133,7 +135,37 @@ class TestContentModerator:
                 assert result["confidence"] == 0.1
                 assert result["reason"] == "問題なし"
                 assert result["severity"] == "low"
-    
+
+    async def test_analyze_multimodal_content_with_uploaded_image_buffer(self, mock_moderator, monkeypatch):
+        """取り込み済みの画像はファイルに保存せず、メモリ上で WebP にして渡す"""
+        import io
+        from PIL import Image
+        from app.utils import image_processor
+        from app.utils.transcode_pool import TranscodePool
+        from app.utils.upload_ingest import IngestedUpload
+
+        pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+        monkeypatch.setattr(image_processor, "transcode_pool", pool)
+        buffer = io.BytesIO()
+        Image.new("RGB", (200, 200), (255, 0, 0)).save(buffer, "JPEG")
+        upload = IngestedUpload(buffer.getvalue(), filename="photo.jpg", declared_type="image/jpeg")
+
+        analysis_result = ContentAnalysisResult(is_violation=False, confidence=0.1, reason="問題なし", severity="low")
+        mock_response = Mock()
+        mock_response.text = analysis_result.model_dump_json()
+        mock_moderator.client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+
+        with patch("app.utils.image_processor.ensure_directories_exist") as mock_dirs, \
+                patch("google.genai.types.Part.from_bytes") as mock_from_bytes:
+            result = await mock_moderator.analyze_multimodal_content(content="テストコンテンツ", image=upload)
+        pool.shutdown(wait=True)
+
+        assert result["reason"] == "問題なし"
+        mock_dirs.assert_not_called()
+        sent = mock_from_bytes.call_args.kwargs
+        assert sent["mime_type"] == "image/webp"
+        assert sent["data"][:4] == b"RIFF" and sent["data"][8:12] == b"WEBP"
+
     async def test_analyze_content_with_thinking(self, mock_moderator):
         """思考機能を使用したコンテンツ分析テスト"""
         # モックレスポンスの設定
@@ -318,6 +350,74 @@ class TestContentModerator:
                 assert result["confidence"] == 0.9
                 assert result["severity"] == "high"
 
+class TestModerationBatching:
+    """マイクロバッチ審査のテスト（FakeGenAIClient を使いオフラインで実行）"""
+
+    async def test_concurrent_requests_are_sent_as_one_batch(self):
+        """同時に届いた審査は1回のAPI呼び出しにまとめられ、結果が各呼び出し元に返る"""
+        client = FakeGenAIClient()
+        moderator = ContentModerator(client=client, batch_max_items=10, batch_window_seconds=0.01)
+
+        results = await asyncio.gather(
+            moderator.analyze_content("美味しいラーメンでした", "自動審査"),
+            moderator.analyze_content("お前なんか死ね", "自動審査", "過去の投稿"),
+            moderator.analyze_content("また行きたい", "自動審査"),
+        )
+
+        assert len(client.calls) == 1
+        assert [r["is_violation"] for r in results] == [False, True, False]
+        assert "id" not in results[0]
+        assert moderator.batcher.batches_sent == 1
+        assert moderator.batcher.items_processed == 3
+
+    async def test_batch_flushes_when_max_items_reached(self):
+        """最大件数に達したら待ち時間を待たずに送信される"""
+        client = FakeGenAIClient()
+        moderator = ContentModerator(client=client, batch_max_items=2, batch_window_seconds=10)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                moderator.analyze_content("一杯目"),
+                moderator.analyze_content("二杯目"),
+            ),
+            timeout=1,
+        )
+
+        assert len(client.calls) == 1
+        assert all(r["is_violation"] is False for r in results)
+
+    async def test_single_request_uses_single_prompt(self):
+        """1件のみの場合は従来の単独プロンプトで審査される"""
+        client = FakeGenAIClient()
+        moderator = ContentModerator(client=client, batch_window_seconds=0.01)
+
+        result = await moderator.analyze_content("違反テストの投稿")
+
+        assert result["is_violation"] is True
+        assert len(client.calls) == 1
+        assert BATCH_ITEMS_MARKER not in client.calls[0]["contents"]
+
+    async def test_missing_batch_results_fall_back_to_single_requests(self):
+        """バッチ結果に欠けた項目は個別リクエストで審査し直す"""
+        def responder(contents, config):
+            if BATCH_ITEMS_MARKER in contents:
+                # 1件目の結果だけを返す
+                return json.dumps([{"id": 0, "is_violation": False, "confidence": 0.1, "reason": "ok", "severity": "low"}])
+            return default_moderation_responder(contents, config)
+
+        client = FakeGenAIClient(responder=responder)
+        moderator = ContentModerator(client=client, batch_window_seconds=0.01)
+
+        results = await asyncio.gather(
+            moderator.analyze_content("普通の投稿"),
+            moderator.analyze_content("殺すぞ"),
+        )
+
+        assert len(client.calls) == 2
+        assert results[0]["reason"] == "ok"
+        assert results[1]["is_violation"] is True
+
+
 class TestContentAnalysisResult:
     """ContentAnalysisResultモデルのテスト"""
     
@@ -0,0 +1,60 @@
+import html
+
+from sqlalchemy import update
+
+from app.models import Post, RamenShop, Reply, User
+from app.utils.display_text import backfill_display_text, display_text
+
+RAW = """<b>"二郎" & 'ラーメン'</b>"""
+
+
+def _add_post(db, content=RAW):
+    user = User(id="escaper", email="escaper@example.com", password_hash="x", username="<i>名前</i>")
+    shop = RamenShop(name="店 & 支店", address="<東京>", latitude=35.0, longitude=139.0)
+    db.add_all([user, shop])
+    db.flush()
+    post = Post(content=content, user_id=user.id, shop_id=shop.id)
+    db.add(post)
+    db.flush()
+    db.add(Reply(content=RAW, user_id=user.id, post_id=post.id))
+    db.commit()
+    return post
+
+
+def test_escaped_text_is_written_with_the_raw_text(test_db):
+    post = _add_post(test_db)
+
+    assert post.content == RAW
+    assert post.content_html == html.escape(RAW, quote=True)
+
+    post.author.username = "新しい<名前>"
+    test_db.commit()
+    assert post.author.username_html == "新しい&lt;名前&gt;"
+
+
+def test_timeline_returns_escaped_text(test_client, test_db):
+    post = _add_post(test_db)
+
+    body = test_client.get("/api/v1/posts").json()["posts"][0]
+    assert body["content"] == html.escape(RAW, quote=True)
+    assert body["author_username"] == "&lt;i&gt;名前&lt;/i&gt;"
+    assert body["shop_name"] == "店 &amp; 支店"
+    assert body["shop_address"] == "&lt;東京&gt;"
+    assert body["replies"][0]["content"] == html.escape(RAW, quote=True)
+
+    replies = test_client.get(f"/api/v1/posts/{post.id}/replies").json()
+    assert replies[0]["content"] == html.escape(RAW, quote=True)
+
+
+def test_rows_without_escaped_text_are_escaped_on_read_and_backfilled(test_db):
+    post = _add_post(test_db)
+    test_db.execute(update(Post).values(content_html=None))
+    test_db.commit()
+    test_db.expire_all()
+
+    assert post.content_html is None
+    assert display_text(post, "content") == html.escape(RAW, quote=True)
+
+    assert backfill_display_text(test_db.get_bind()) >= 1
+    test_db.expire_all()
+    assert post.content_html == html.escape(RAW, quote=True)
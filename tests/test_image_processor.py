@@ -0,0 +1,97 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils import image_processor
+from app.utils.image_processor import _transcode_image
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def _open(url: str) -> Image.Image:
+    return Image.open(url.lstrip("/"))
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image_processor.ensure_directories_exist()
+    return tmp_path
+
+
+class TestTranscodeImage:
+    def test_large_jpeg_is_capped_and_gets_renditions(self, upload_dir):
+        data = _encode(Image.new("RGB", (3000, 2000), (180, 90, 30)), "JPEG")
+
+        result = _transcode_image(data, (200, 400, 800), 2048)
+
+        with _open(result.original_url) as original:
+            assert original.size == (2048, 1365)
+        with _open(result.thumbnail_url) as thumbnail:
+            assert thumbnail.width == 400
+        entries = [entry.rsplit(" ", 1) for entry in result.srcset.split(", ")]
+        assert [width for _, width in entries] == ["200w", "400w", "800w", "2048w"]
+        assert entries[-1][0] == result.original_url
+        for url, width in entries[:-1]:
+            with _open(url) as rendition:
+                assert f"{rendition.width}w" == width
+                assert rendition.format == "WEBP"
+
+    def test_small_image_skips_renditions_wider_than_source(self, upload_dir):
+        data = _encode(Image.new("RGB", (300, 200), (0, 0, 255)), "PNG")
+
+        result = _transcode_image(data, (200, 400, 800), 2048)
+
+        assert [entry.rsplit(" ", 1)[1] for entry in result.srcset.split(", ")] == ["200w", "300w"]
+        with _open(result.original_url) as original:
+            assert original.size == (300, 200)
+
+    def test_transparent_image_is_flattened_on_white(self, upload_dir):
+        data = _encode(Image.new("RGBA", (500, 500), (0, 0, 0, 0)), "PNG")
+
+        result = _transcode_image(data, (200,), 0)
+
+        with _open(result.original_url) as original:
+            assert original.mode == "RGB"
+            r, g, b = original.getpixel((10, 10))
+            assert min(r, g, b) > 245
+
+    def test_process_image_reports_failure(self, upload_dir):
+        from app.utils.upload_ingest import IngestedUpload
+
+        result = image_processor.process_image(IngestedUpload(b"not an image", filename="x.jpg"), "dave")
+
+        assert result == (None, None, None)
+
+
+def test_created_post_exposes_srcset(test_client, tmp_path, monkeypatch):
+    from app.utils.transcode_pool import TranscodePool
+
+    monkeypatch.chdir(tmp_path)
+    pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(image_processor, "transcode_pool", pool)
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": "srcsetuser", "email": "srcset@example.com", "password": "password123!"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = test_client.post(
+        "/api/v1/posts",
+        data={"content": "幅ごとの画像"},
+        files={"image": ("photo.jpg", io.BytesIO(_encode(Image.new("RGB", (1000, 800)), "JPEG")), "image/jpeg")},
+        headers=headers,
+    )
+    pool.shutdown(wait=True)
+
+    assert response.status_code == 201
+    post_id = response.json()["id"]
+    srcset = test_client.get(f"/api/v1/posts/{post_id}", headers=headers).json()["image_srcset"]
+    assert srcset.endswith("1000w")
+    assert " 400w" in srcset
+    assert srcset.startswith("/uploads/media/")
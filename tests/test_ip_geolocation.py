@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.utils.ip_geolocation import IPGeolocator, IPRangeDatabase
+
+
+def _geolocator_with_transport(handler, **kwargs) -> IPGeolocator:
+    geolocator = IPGeolocator(**kwargs)
+    geolocator._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return geolocator
+
+
+class TestIPGeolocator:
+    async def test_online_lookup_is_cached_per_ip(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(200, json={"loc": "35.6812,139.7671", "city": "Tokyo", "country": "JP"})
+
+        geolocator = _geolocator_with_transport(handler)
+        first = await geolocator.locate("8.8.8.8")
+        second = await geolocator.locate("8.8.8.8")
+        await geolocator.aclose()
+
+        assert first == second
+        assert first["latitude"] == pytest.approx(35.6812)
+        assert first["city"] == "Tokyo"
+        assert calls == ["/8.8.8.8/json"]
+        assert geolocator.stats()["hits"] == 1
+
+    async def test_failed_lookup_is_negatively_cached(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(429)
+
+        geolocator = _geolocator_with_transport(handler, negative_ttl_seconds=60)
+        assert await geolocator.locate("1.1.1.1") is None
+        assert await geolocator.locate("1.1.1.1") is None
+        await geolocator.aclose()
+
+        assert len(calls) == 1
+
+    async def test_concurrent_lookups_share_one_request(self):
+        calls = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"loc": "34.6937,135.5023", "city": "Osaka"})
+
+        geolocator = _geolocator_with_transport(handler)
+        results = await asyncio.gather(*(geolocator.locate("9.9.9.9") for _ in range(5)))
+        await geolocator.aclose()
+
+        assert all(result["city"] == "Osaka" for result in results)
+        assert len(calls) == 1
+
+    async def test_offline_database_is_used_before_online_lookup(self, tmp_path):
+        db_path = tmp_path / "ip_ranges.csv"
+        db_path.write_text(
+            "ip_start,ip_end,lat,lng,city,region,country\n"
+            "203.0.113.0,203.0.113.255,43.0618,141.3545,Sapporo,Hokkaido,JP\n"
+            "2001:db8::,2001:db8::ffff,33.5902,130.4017,Fukuoka,Fukuoka,JP\n",
+            encoding="utf-8",
+        )
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise AssertionError("ローカルDBで見つかる場合は外部APIを呼ばない")
+
+        geolocator = _geolocator_with_transport(handler, database_path=str(db_path), online_lookup=False)
+        sapporo = await geolocator.locate("203.0.113.42")
+        fukuoka = await geolocator.locate("2001:db8::10")
+        missing = await geolocator.locate("198.51.100.1")
+        await geolocator.aclose()
+
+        assert sapporo["city"] == "Sapporo"
+        assert sapporo["longitude"] == pytest.approx(141.3545)
+        assert fukuoka["city"] == "Fukuoka"
+        assert missing is None
+
+
+    async def test_database_is_loaded_once_off_the_event_loop(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "ip_ranges.csv"
+        db_path.write_text(
+            "start,end,latitude,longitude\n203.0.113.0,203.0.113.255,43.0,141.0\n",
+            encoding="utf-8",
+        )
+        loads = []
+        original = IPGeolocator._read_database
+
+        def tracking_read(self):
+            loads.append(threading.get_ident())
+            return original(self)
+
+        monkeypatch.setattr(IPGeolocator, "_read_database", tracking_read)
+        geolocator = IPGeolocator(database_path=str(db_path), online_lookup=False)
+        results = await asyncio.gather(*(geolocator.locate(f"203.0.113.{i}") for i in range(5)))
+
+        assert all(result["latitude"] == 43.0 for result in results)
+        assert len(loads) == 1
+        assert loads[0] != threading.get_ident()
+
+class TestIPRangeDatabase:
+    def test_lookup_outside_ranges(self, tmp_path):
+        db_path = tmp_path / "ip_ranges.csv"
+        db_path.write_text(
+            "start,end,latitude,longitude\n"
+            "10.0.0.0,10.0.0.255,35.0,135.0\n"
+            "10.0.2.0,10.0.2.255,36.0,136.0\n"
+            "not-an-ip,10.0.3.0,0,0\n",
+            encoding="utf-8",
+        )
+        database = IPRangeDatabase(str(db_path))
+
+        assert len(database) == 2
+        assert database.lookup("10.0.0.1")["latitude"] == 35.0
+        assert database.lookup("10.0.1.1") is None
+        assert database.lookup("10.0.2.255")["latitude"] == 36.0
+        assert database.lookup("9.255.255.255") is None
+
+    def test_missing_columns_raise(self, tmp_path):
+        db_path = tmp_path / "ip_ranges.csv"
+        db_path.write_text("start,end,city\n", encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            IPRangeDatabase(str(db_path))
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.models import JST, User, UserLastLogin, UserLoginHistory
+from app.utils.login_history import get_last_login, prune_login_history, record_login
+
+
+def _add_user(db, user_id="historyuser"):
+    db.add(User(id=user_id, email=f"{user_id}@example.com", password_hash="x"))
+    db.commit()
+
+
+def _login(test_client, user_agent="Agent/1.0"):
+    return test_client.post(
+        "/api/v1/auth/login",
+        json={"id": "historyuser", "password": "password123!"},
+        headers={"User-Agent": user_agent},
+    )
+
+
+def test_last_login_is_a_single_upserted_row(test_client, test_db):
+    test_client.post(
+        "/api/v1/auth/register",
+        json={"id": "historyuser", "email": "historyuser@example.com", "password": "password123!"},
+    )
+    assert _login(test_client).json()["requires_email_verification"] is False
+    assert _login(test_client).json()["requires_email_verification"] is False
+    assert _login(test_client, "Other/2.0").json()["requires_email_verification"] is True
+
+    assert test_db.query(UserLoginHistory).filter(UserLoginHistory.user_id == "historyuser").count() == 3
+    rows = test_db.query(UserLastLogin).filter(UserLastLogin.user_id == "historyuser").all()
+    assert [row.user_agent for row in rows] == ["Other/2.0"]
+
+
+def test_login_does_not_scan_history(test_db):
+    _add_user(test_db)
+    for _ in range(3):
+        record_login(test_db, "historyuser", "127.0.0.1", "Agent/1.0")
+        test_db.commit()
+    test_db.expunge_all()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        last_login = get_last_login(test_db, "historyuser")
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert last_login.ip_address == "127.0.0.1"
+    assert len(statements) == 1
+    assert "user_login_history" not in statements[0]
+
+
+def test_last_login_falls_back_to_existing_history(test_db):
+    _add_user(test_db)
+    now = datetime.now(JST)
+    test_db.add_all([
+        UserLoginHistory(user_id="historyuser", ip_address="10.0.0.1", user_agent="Old", created_at=now - timedelta(days=2)),
+        UserLoginHistory(user_id="historyuser", ip_address="10.0.0.2", user_agent="New", created_at=now - timedelta(days=1)),
+    ])
+    test_db.commit()
+
+    last_login = get_last_login(test_db, "historyuser")
+    test_db.commit()
+
+    assert (last_login.ip_address, last_login.user_agent) == ("10.0.0.2", "New")
+    assert test_db.get(UserLastLogin, "historyuser") is not None
+
+
+def test_concurrent_first_logins_do_not_collide(test_db):
+    """行がないユーザーの2つのログインが、どちらも前回の端末なしと判定してから記録しても失敗しない"""
+    _add_user(test_db)
+    other = sessionmaker(autoflush=False, bind=test_db.get_bind())()
+    try:
+        assert get_last_login(test_db, "historyuser") is None
+        assert get_last_login(other, "historyuser") is None
+
+        record_login(test_db, "historyuser", "10.0.0.1", "First/1.0")
+        record_login(other, "historyuser", "10.0.0.2", "Second/1.0")
+        test_db.commit()
+        other.commit()
+    finally:
+        other.close()
+
+    test_db.expire_all()
+    rows = test_db.query(UserLastLogin).filter(UserLastLogin.user_id == "historyuser").all()
+    assert [(row.ip_address, row.user_agent) for row in rows] == [("10.0.0.2", "Second/1.0")]
+    assert test_db.query(UserLoginHistory).count() == 2
+
+
+def test_prune_keeps_recent_history_and_last_login(test_db):
+    _add_user(test_db)
+    now = datetime.now(JST)
+    for days in (400, 200, 10):
+        test_db.add(UserLoginHistory(user_id="historyuser", ip_address="10.0.0.1", created_at=now - timedelta(days=days)))
+    record_login(test_db, "historyuser", "10.0.0.1", None)
+    test_db.commit()
+
+    assert prune_login_history(test_db, retention_days=180, dry_run=True) == 2
+    assert prune_login_history(test_db, retention_days=180, batch_size=1) == 2
+
+    assert test_db.query(UserLoginHistory).count() == 2
+    assert test_db.get(UserLastLogin, "historyuser") is not None
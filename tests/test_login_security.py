@@ -7,7 +7,7 @@ from unittest.mock import patch, AsyncMock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database import get_db, Base
-from app.models import User, UserLoginHistory
+from app.models import User, UserLastLogin, UserLoginHistory
 from app import create_app
 from app.utils.auth import get_password_hash
 
@@ -51,6 +51,7 @@ def test_user(client):
     try:
         # 既存のテストユーザーと関連データを削除
         db.query(UserLoginHistory).filter(UserLoginHistory.user_id == "testuser").delete()
+        db.query(UserLastLogin).filter(UserLastLogin.user_id == "testuser").delete()
         db.query(User).filter(User.id == "testuser").delete()
         db.commit()
 
@@ -67,6 +68,7 @@ def test_user(client):
     finally:
         # テスト後にクリーンアップ
         db.query(UserLoginHistory).filter(UserLoginHistory.user_id == "testuser").delete()
+        db.query(UserLastLogin).filter(UserLastLogin.user_id == "testuser").delete()
         db.query(User).filter(User.id == "testuser").delete()
         db.commit()
         db.close()
@@ -0,0 +1,121 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.utils.media_files import MediaFiles
+from app.utils.media_store import MediaStore
+
+PAYLOAD = bytes(range(256)) * 64  # 16 KiB
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MediaStore(root=str(tmp_path / "media"))
+
+
+@pytest.fixture
+def client(store):
+    app = Starlette(routes=[Mount("/uploads/media", MediaFiles(store, chunk_size=4096))])
+    return TestClient(app)
+
+
+@pytest.fixture
+def video_url(store):
+    return store.put_bytes(PAYLOAD, "mp4")
+
+
+def _etag(url):
+    return '"' + url.rsplit("/", 1)[1].split(".")[0] + '"'
+
+
+def test_full_response_has_strong_content_hash_etag(client, video_url):
+    response = client.get(video_url)
+
+    assert response.status_code == 200
+    assert response.content == PAYLOAD
+    assert response.headers["etag"] == _etag(video_url)
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_if_none_match_returns_304(client, video_url):
+    response = client.get(video_url, headers={"If-None-Match": f'"other", W/{_etag(video_url)}'})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.parametrize(
+    "header, start, end",
+    [("bytes=100-199", 100, 199), ("bytes=16000-", 16000, 16383), ("bytes=-10", 16374, 16383), ("bytes=0-99999", 0, 16383)],
+)
+def test_range_returns_206(client, video_url, header, start, end):
+    response = client.get(video_url, headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(PAYLOAD)}"
+    assert response.content == PAYLOAD[start:end + 1]
+
+
+def test_unsatisfiable_range_returns_416(client, video_url):
+    response = client.get(video_url, headers={"Range": "bytes=20000-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(PAYLOAD)}"
+
+
+def test_stale_if_range_returns_whole_file(client, video_url):
+    response = client.get(video_url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == PAYLOAD
+
+
+def test_head_sends_headers_only(client, video_url):
+    response = client.head(video_url)
+
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(PAYLOAD))
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("path", ["/uploads/media/../secret", "/uploads/media/ab/cd/" + "0" * 64 + ".mp4", "/uploads/media/x"])
+def test_unknown_or_malformed_paths_are_404(client, path):
+    assert client.get(path).status_code == 404
+
+
+async def test_zero_copy_extension_is_used_when_server_supports_it(store, video_url):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append({key: value for key, value in message.items() if key != "file"})
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": video_url,
+        "root_path": "/uploads/media",
+        "headers": [(b"range", b"bytes=10-")],
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    await MediaFiles(store)(scope, receive, send)
+
+    assert messages[0]["status"] == 206
+    assert messages[1] == {"type": "http.response.zerocopysend", "offset": 10, "count": len(PAYLOAD) - 10, "more_body": False}
+
+
+def test_app_serves_media_before_static_uploads(test_client, store, monkeypatch):
+    # 実際の uploads/media には書かず、マウント済みの MediaFiles を一時ディレクトリのストアに向ける
+    mount = next(route for route in test_client.app.routes if getattr(route, "name", None) == "media")
+    monkeypatch.setattr(mount.app, "store", store)
+    url = store.put_bytes(b"served by MediaFiles", "webp")
+
+    response = test_client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == _etag(url)
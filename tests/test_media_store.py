@@ -0,0 +1,149 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from app.models import MediaAsset, MediaSource, Post, User
+from app.utils import image_processor
+from app.utils.media_gc import collect_garbage
+from app.utils.media_store import MediaStore, media_urls
+from app.utils.transcode_pool import TranscodePool
+from app.utils.upload_ingest import IngestedUpload
+
+
+def _jpeg(color=(200, 100, 50), size=(900, 600)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(image_processor, "transcode_pool", pool)
+    yield tmp_path
+    pool.shutdown(wait=True)
+
+
+def _media_files(root):
+    return sorted(
+        os.path.join(current, name)
+        for current, _, files in os.walk(os.path.join(root, "uploads", "media"))
+        for name in files
+    )
+
+
+class TestMediaStore:
+    def test_same_content_is_stored_once_under_hash_shards(self, tmp_path):
+        store = MediaStore(root=str(tmp_path / "media"))
+
+        first = store.put_bytes(b"same bytes", "webp")
+        second = store.put_stream(io.BytesIO(b"same bytes"), "webp")
+
+        assert first == second
+        digest = first.rsplit("/", 1)[1].split(".")[0]
+        assert first == f"/uploads/media/{digest[:2]}/{digest[2:4]}/{digest}.webp"
+        assert open(store.path_for_url(first), "rb").read() == b"same bytes"
+
+    def test_existing_file_is_not_rewritten(self, tmp_path, monkeypatch):
+        store = MediaStore(root=str(tmp_path / "media"))
+        store.put_bytes(b"video", "mp4")
+        monkeypatch.setattr(store, "_write_atomic", lambda *args: pytest.fail("重複を書き込んだ"))
+
+        store.put_bytes(b"video", "mp4")
+        store.put_stream(io.BytesIO(b"video"), "mp4")
+
+    def test_media_urls_reads_srcset(self):
+        url = "/uploads/media/ab/cd/" + "ab" * 32 + ".webp"
+        assert media_urls(f"{url} 200w, /uploads/renditions/x_400w.webp 400w") == [url]
+        assert media_urls("/uploads/original/a.webp") == []
+
+
+async def test_duplicate_upload_skips_transcode_and_writes(media_dir, test_db, monkeypatch):
+    data = _jpeg()
+    first = await image_processor.process_image_async(IngestedUpload(data, filename="a.jpg"), "alice", test_db)
+    test_db.commit()
+    files_before = {path: os.stat(path).st_mtime_ns for path in _media_files(media_dir)}
+
+    async def fail(*args):
+        pytest.fail("同じ画像を再変換した")
+
+    monkeypatch.setattr(image_processor.transcode_pool, "run", fail)
+    second = await image_processor.process_image_async(IngestedUpload(data, filename="b.jpg"), "bob", test_db)
+
+    assert second == first
+    assert {path: os.stat(path).st_mtime_ns for path in _media_files(media_dir)} == files_before
+    assert test_db.query(MediaSource).count() == 1
+
+
+async def test_ref_count_follows_posts(auth_headers, test_db, media_dir):
+    result = await image_processor.process_image_async(IngestedUpload(_jpeg(), filename="a.jpg"), "u", test_db)
+    owner = test_db.query(User).first()
+    posts = [
+        Post(
+            content=f"投稿{i}",
+            user_id=owner.id,
+            thumbnail_url=result.thumbnail_url,
+            original_image_url=result.original_url,
+            image_srcset=result.srcset,
+        )
+        for i in range(2)
+    ]
+    test_db.add_all(posts)
+    test_db.commit()
+
+    original = test_db.get(MediaAsset, result.original_url)
+    assert original.ref_count == 2
+    assert original.unreferenced_at is None
+
+    for post in posts:
+        test_db.delete(post)
+        test_db.commit()
+
+    test_db.expire_all()
+    counts = {asset.url: asset.ref_count for asset in test_db.query(MediaAsset)}
+    assert set(counts) == set(media_urls(result.srcset)) | {result.thumbnail_url}
+    assert set(counts.values()) == {0}
+    assert test_db.get(MediaAsset, result.original_url).unreferenced_at is not None
+
+
+async def test_garbage_collection_removes_orphans(auth_headers, test_db, media_dir):
+    owner = test_db.query(User).first()
+    kept = await image_processor.process_image_async(IngestedUpload(_jpeg((0, 0, 255)), filename="k.jpg"), "u", test_db)
+    orphan = await image_processor.process_image_async(IngestedUpload(_jpeg((0, 255, 0)), filename="o.jpg"), "u", test_db)
+    test_db.add(
+        Post(
+            content="残る",
+            user_id=owner.id,
+            thumbnail_url=kept.thumbnail_url,
+            original_image_url=kept.original_url,
+            image_srcset=kept.srcset,
+        )
+    )
+    test_db.commit()
+    os.makedirs("uploads/original", exist_ok=True)
+    legacy = os.path.join("uploads", "original", "old_original.webp")
+    with open(legacy, "wb") as handle:
+        handle.write(b"legacy")
+    past = time.time() - 7200
+    os.utime(legacy, (past, past))
+
+    # 参照がなくなったばかりのメディアは猶予期間中なので残る（古い旧形式ファイルは消える）
+    stats = collect_garbage(test_db, grace_hours=1)
+    assert stats["assets_deleted"] == 0
+    assert stats["legacy_deleted"] == 1
+    assert os.path.exists(orphan.original_url.lstrip("/"))
+
+    stats = collect_garbage(test_db, grace_hours=0)
+
+    assert os.path.exists(kept.original_url.lstrip("/"))
+    assert os.path.exists(kept.thumbnail_url.lstrip("/"))
+    assert not os.path.exists(orphan.original_url.lstrip("/"))
+    assert not os.path.exists(legacy)
+    assert stats["assets_deleted"] >= 2
+    assert stats["bytes_freed"] > 0
+    assert test_db.get(MediaAsset, orphan.original_url) is None
+    assert test_db.query(MediaSource).count() == 1
@@ -384,4 +384,53 @@ class TestModerationTasks:
 
 
 if __name__ == "__main__":
-    pytest.main([__file__])
\ No newline at end of file
+    pytest.main([__file__])
+
+class TestReplyModeration:
+    """返信の非同期審査のテスト"""
+
+    @pytest.mark.asyncio
+    @patch('app.utils.moderation_tasks.apply_penalty')
+    @patch('app.utils.moderation_tasks.content_moderator')
+    async def test_violating_reply_is_hidden(self, mock_moderator, mock_apply_penalty, mock_session_factory):
+        """違反と判断された返信は非表示化され、ペナルティが適用される"""
+        from app.utils.moderation_tasks import _moderate_reply
+        from app.models import Reply
+
+        mock_moderator.analyze_content = AsyncMock(return_value={
+            "is_violation": True,
+            "confidence": 0.9,
+            "reason": "誹謗中傷",
+            "severity": "high",
+        })
+        author = Mock(spec=User)
+        author.id = "user123"
+        reply = Mock(spec=Reply)
+        reply.id = 5
+        reply.post_id = 1
+        reply.author = author
+        reply.is_shadow_banned = False
+
+        mock_db = Mock(spec=Session)
+        mock_db.query.return_value.options.return_value.filter.return_value.first.return_value = reply
+        mock_session_factory.return_value = mock_db
+
+        await _moderate_reply(5, "ひどい返信", mock_session_factory)
+
+        assert reply.is_shadow_banned is True
+        assert "誹謗中傷" in reply.shadow_ban_reason
+        mock_apply_penalty.assert_called_once()
+        mock_db.commit.assert_called_once()
+        mock_db.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch('app.utils.moderation_tasks.content_moderator')
+    async def test_clean_reply_does_not_open_session(self, mock_moderator, mock_session_factory):
+        """問題のない返信ではDBセッションを開かない"""
+        from app.utils.moderation_tasks import _moderate_reply
+
+        mock_moderator.analyze_content = AsyncMock(return_value={"is_violation": False, "confidence": 0.1})
+
+        await _moderate_reply(6, "美味しかった", mock_session_factory)
+
+        mock_session_factory.assert_not_called()
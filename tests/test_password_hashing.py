@@ -0,0 +1,73 @@
+from app.models import User
+from app.utils import auth
+from app.utils.auth import get_password_hash, password_hash_rounds, password_needs_rehash, verify_password
+from app.utils.bounded_pool import PoolBusyError
+from config import settings
+
+
+def _register(test_client, user_id="hashuser", password="password123!"):
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": user_id, "email": f"{user_id}@example.com", "password": password},
+    )
+    assert response.status_code == 201
+    return response
+
+
+def _stored_hash(test_db, user_id="hashuser"):
+    test_db.expire_all()
+    return test_db.query(User).filter(User.id == user_id).first().password_hash
+
+
+def test_hash_uses_configured_rounds(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    hashed = get_password_hash("secret")
+
+    assert hashed.startswith("$2b$05$")
+    assert password_hash_rounds(hashed) == 5
+    assert password_needs_rehash(hashed) is False
+    assert verify_password("secret", hashed)
+
+
+def test_non_bcrypt_hash_needs_rehash():
+    assert password_hash_rounds("plain-text") is None
+    assert password_needs_rehash("") is True
+
+
+def test_login_rehashes_when_rounds_change(test_client, test_db, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    _register(test_client)
+    assert password_hash_rounds(_stored_hash(test_db)) == 4
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = test_client.post("/api/v1/auth/login", json={"id": "hashuser", "password": "password123!"})
+
+    assert response.status_code == 200
+    new_hash = _stored_hash(test_db)
+    assert password_hash_rounds(new_hash) == 5
+    assert verify_password("password123!", new_hash)
+
+
+def test_failed_login_keeps_old_hash(test_client, test_db, monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    _register(test_client)
+    old_hash = _stored_hash(test_db)
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = test_client.post("/api/v1/auth/login", json={"id": "hashuser", "password": "wrongpass1!"})
+
+    assert response.status_code == 401
+    assert _stored_hash(test_db) == old_hash
+
+
+def test_login_returns_503_when_password_pool_is_full(test_client, test_db, monkeypatch):
+    _register(test_client)
+
+    async def busy(*args):
+        raise PoolBusyError("full")
+
+    monkeypatch.setattr(auth.password_pool, "run", busy)
+    response = test_client.post("/api/v1/auth/login", json={"id": "hashuser", "password": "password123!"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
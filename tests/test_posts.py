@@ -1,9 +1,19 @@
 
 import io
+import struct
 import pytest
 
 from app.models import RamenShop, Reply, User
 
+
+def _mp4_bytes(duration_ms: int) -> bytes:
+    """長さだけを持つ最小限の MP4（ftyp + moov/mvhd + mdat）"""
+    def box(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+    mvhd = box(b"mvhd", bytes(4) + struct.pack(">IIII", 0, 0, 1000, duration_ms) + bytes(80))
+    return box(b"ftyp", b"isom" + bytes(4) + b"isom") + box(b"moov", mvhd) + box(b"mdat", bytes(1024))
+
 def test_create_post_authenticated(test_client, test_db):
     """認証済みユーザーによる投稿作成テスト"""
     # ユーザー登録
@@ -45,13 +55,12 @@ def test_create_post_with_short_video(test_client, test_db):
         "Authorization": f"Bearer {token}"
     }
 
-    video_content = io.BytesIO(b"fake video data")
+    video_content = io.BytesIO(_mp4_bytes(9000))
     files = {
         "video": ("sample.mp4", video_content, "video/mp4")
     }
     data = {
         "content": "Video post",
-        "video_duration": "9"
     }
 
     response = test_client.post("/api/v1/posts", data=data, files=files, headers=headers)
@@ -76,13 +85,14 @@ def test_create_post_with_long_video_rejected(test_client, test_db):
         "Authorization": f"Bearer {token}"
     }
 
-    video_content = io.BytesIO(b"fake video data")
+    video_content = io.BytesIO(_mp4_bytes(12000))
     files = {
         "video": ("sample.mp4", video_content, "video/mp4")
     }
     data = {
         "content": "Long video post",
-        "video_duration": "12"
+        # 申告された長さは信用しない
+        "video_duration": "5"
     }
 
     response = test_client.post("/api/v1/posts", data=data, files=files, headers=headers)
@@ -90,6 +100,25 @@ def test_create_post_with_long_video_rejected(test_client, test_db):
     assert response.status_code == 400
     assert response.json()["detail"] == "動画は10秒以内にしてください"
 
+
+def test_create_post_with_unreadable_video_rejected(test_client, test_db):
+    """ヘッダーから長さを読めない動画は拒否されるテスト"""
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": "fakevideouser", "email": "fakevideo@example.com", "password": "password123!"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = test_client.post(
+        "/api/v1/posts",
+        data={"content": "Fake video post", "video_duration": "3"},
+        files={"video": ("sample.mp4", io.BytesIO(b"fake video data"), "video/mp4")},
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "動画の長さを読み取れませんでした"
+
 def test_create_post_unauthenticated(test_client):
     """未認証ユーザーによる投稿作成テスト"""
     post_data = {
@@ -126,3 +126,28 @@ def test_search_special_chars(test_client, test_db):
     assert response.status_code == 200
     assert data["total"] == 0
     assert len(data["shops"]) == 0
+
+def test_ask_shop_stream_passes_shop_context(test_client, test_db, auth_headers):
+    """店舗Q&Aのストリーミング版が店舗情報を渡してSSEで回答を返すテスト"""
+    from unittest.mock import patch
+
+    shop = RamenShop(name="ラーメン二郎 三田本店", address="東京都港区", latitude=35.648, longitude=139.741)
+    test_db.add(shop)
+    test_db.commit()
+
+    async def fake_stream(question, shop_info):
+        yield f"{shop_info['name']}は"
+        yield "並びます"
+
+    with patch("app.routes.ramen.stream_shop_question", side_effect=fake_stream):
+        response = test_client.post(
+            f"/api/v1/ramen/{shop.id}/ask/stream", json={"question": "並びますか？"}, headers=auth_headers
+        )
+        missing = test_client.post(
+            "/api/v1/ramen/99999/ask/stream", json={"question": "並びますか？"}, headers=auth_headers
+        )
+
+    assert response.status_code == 200
+    assert 'data: {"delta": "ラーメン二郎 三田本店は"}' in response.text
+    assert "event: done" in response.text
+    assert missing.status_code == 404
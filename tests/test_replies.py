@@ -150,3 +150,93 @@ def test_reply_spam_detection_shadow_bans(test_client, test_db):
         other_headers = {"Authorization": f"Bearer {other_token}"}
         other_replies = test_client.get(f"/api/v1/posts/{post_id}/replies", headers=other_headers).json()
         assert len(other_replies) == 0
+
+
+from app.models import User
+from app.utils.metrics import latency_metrics
+from app.utils.moderation_tasks import (
+    REPLY_TIER_ASYNC,
+    REPLY_TIER_NONE,
+    REPLY_TIER_SYNC,
+    select_reply_moderation_tier,
+)
+
+
+def test_select_reply_moderation_tier():
+    """スパムスコアと internal_score から審査段階が決まることを確認"""
+    assert select_reply_moderation_tier(0.0, False, 100) == REPLY_TIER_NONE
+    assert select_reply_moderation_tier(1.5, False, 100) == REPLY_TIER_ASYNC
+    assert select_reply_moderation_tier(2.5, False, 100) == REPLY_TIER_SYNC
+    assert select_reply_moderation_tier(0.0, True, 100) == REPLY_TIER_SYNC
+    assert select_reply_moderation_tier(0.0, False, 60) == REPLY_TIER_SYNC
+    assert select_reply_moderation_tier(0.0, False, None) == REPLY_TIER_NONE
+
+
+def test_clean_reply_from_trusted_user_skips_sync_moderation(test_client, test_db):
+    """信頼ユーザーの問題ない返信はAI審査を待たずに保存される"""
+    token = create_user_and_get_token(test_client, "ruser8", "ruser8@example.com")
+    post = create_post(test_client, token)
+    headers = {"Authorization": f"Bearer {token}"}
+    latency_metrics.reset()
+
+    with patch("app.utils.content_moderator.content_moderator.analyze_content", new_callable=AsyncMock) as mock_analyze:
+        mock_analyze.return_value = {"is_violation": True, "confidence": 0.99}
+        response = test_client.post(
+            f"/api/v1/posts/{post['id']}/replies",
+            json={"content": "美味しそうですね。今度行ってみます。"},
+            headers=headers,
+        )
+
+    assert response.status_code == 201
+    mock_analyze.assert_not_called()
+    assert latency_metrics.summary(f"reply_create:{REPLY_TIER_NONE}")["count"] == 1
+
+
+def test_low_score_user_reply_is_held_for_sync_moderation(test_client, test_db):
+    """低スコアユーザーの返信は保存前に審査され、違反なら拒否される"""
+    token = create_user_and_get_token(test_client, "ruser9", "ruser9@example.com")
+    post = create_post(test_client, token)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    user = test_db.query(User).filter(User.id == "ruser9").first()
+    user.internal_score = 60
+    test_db.commit()
+    latency_metrics.reset()
+
+    with patch("app.utils.content_moderator.content_moderator.analyze_content", new_callable=AsyncMock) as mock_analyze:
+        mock_analyze.return_value = {"is_violation": True, "confidence": 0.9}
+        response = test_client.post(
+            f"/api/v1/posts/{post['id']}/replies",
+            json={"content": "美味しそうですね。今度行ってみます。"},
+            headers=headers,
+        )
+
+    assert response.status_code == 400
+    mock_analyze.assert_awaited_once()
+    # 拒否した返信も sync 段階のレイテンシに含める
+    assert latency_metrics.summary(f"reply_create:{REPLY_TIER_SYNC}")["count"] == 1
+
+
+def test_low_risk_reply_is_published_and_reviewed_async(test_client, test_db):
+    """低リスクの返信は即時公開され、審査はバックグラウンドにスケジュールされる"""
+    token = create_user_and_get_token(test_client, "ruser10", "ruser10@example.com")
+    post = create_post(test_client, token)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch(
+        "app.routes.replies.select_reply_moderation_tier", return_value=REPLY_TIER_ASYNC
+    ), patch(
+        "app.routes.replies.schedule_reply_moderation", new_callable=AsyncMock
+    ) as mock_schedule, patch(
+        "app.utils.content_moderator.content_moderator.analyze_content", new_callable=AsyncMock
+    ) as mock_analyze:
+        response = test_client.post(
+            f"/api/v1/posts/{post['id']}/replies",
+            json={"content": "行列すごかったです"},
+            headers=headers,
+        )
+
+    assert response.status_code == 201
+    mock_analyze.assert_not_called()
+    mock_schedule.assert_awaited_once()
+    assert mock_schedule.await_args.args[0] == response.json()["id"]
@@ -0,0 +1,296 @@
+import pytest
+from sqlalchemy import event, update
+
+from app.models import Post, Reply
+from app.utils.badword_matcher import AhoCorasickMatcher
+from app.utils.campaign_detector import CampaignTracker
+from app.utils.near_duplicate import backfill_signatures, estimate_similarity, signature_columns, unpack_signature
+from app.utils.spam_detector import JACONV_AVAILABLE, SpamDetector, spam_detector
+
+
+class TestAhoCorasickMatcher:
+    def test_finds_overlapping_words_in_one_pass(self):
+        matcher = AhoCorasickMatcher(["二郎", "郎系", "二郎系ラーメン", "麺"])
+        matches = list(matcher.finditer("二郎系ラーメン"))
+        assert sorted(matches) == [(0, 2), (0, 7), (1, 3)]
+
+    def test_ascii_words_require_word_boundary(self):
+        matcher = AhoCorasickMatcher(["ass", "死ね"])
+        assert matcher.search("you are an ASS!") == "ass"
+        assert matcher.search("first class ticket") is None
+        # 日本語の語は境界を問わない
+        assert matcher.search("お前死ねよ") == "死ね"
+        # re の \\b と同じく、前後が文字（かなを含む）なら単語とみなさない
+        assert matcher.search("あassだ") is None
+
+    def test_empty_matcher_never_matches(self):
+        matcher = AhoCorasickMatcher([])
+        assert len(matcher) == 0
+        assert matcher.search("なんでも") is None
+
+
+@pytest.mark.skipif(not JACONV_AVAILABLE, reason="jaconv が必要")
+class TestBadwordCheck:
+    def test_kana_variants_match_single_entry(self):
+        detector = SpamDetector.__new__(SpamDetector)
+        detector.badwords_matcher = AhoCorasickMatcher(["バカ"], fold=SpamDetector._fold_kana)
+        assert detector.badwords_matcher.search("ばかじゃないの") is not None
+        assert detector.badwords_matcher.search("バカじゃないの") is not None
+        # 半角カナは正規化（NFKC）後に照合される
+        assert detector.badwords_matcher.search(spam_detector._normalize("ﾊﾞｶ")) is not None
+
+    def test_check_badwords_adds_reason(self):
+        reasons = []
+        score = spam_detector._check_badwords("この店員はアホだ", reasons)
+        assert score == spam_detector.cfg.weights["badwords"]
+        assert reasons == ["不適切な単語が含まれています"]
+
+    def test_clean_text_is_not_flagged(self):
+        reasons = []
+        assert spam_detector._check_badwords("ニンニクヤサイマシマシでお願いします", reasons) == 0.0
+        assert reasons == []
+
+
+class TestTextAnalysis:
+    def test_analysis_collects_tokens_once(self):
+        analysis = spam_detector.analyze("  ＡＢＣ_def 二郎系ラーメン http://bit.ly/x @jiro_fan 😀  ")
+        assert analysis.text == "ABC_def 二郎系ラーメン http://bit.ly/x @jiro_fan 😀"
+        assert analysis.urls == ["http://bit.ly/x"]
+        assert analysis.hosts == ["bit.ly"]
+        assert "ABC_def" in analysis.word_tokens
+        assert analysis.alnum_tokens[:2] == ["ABC", "def"]
+        assert analysis.cjk_runs == ["二郎系ラーメン"]
+        assert analysis.bigram_total == 6
+        assert analysis.emoji_count == 1
+        assert analysis.mention_count == 1
+        assert analysis.kana_folded.startswith("abc_def 二郎系らーめん")
+
+    def test_blank_content_has_no_analysis(self):
+        assert spam_detector.analyze(" ​ ") is None
+
+    def test_checks_accept_plain_text(self):
+        """単体利用向けに、各チェックは解析前の文字列も受け付ける"""
+        reasons = []
+        score = spam_detector._check_social("@aa1 @bb2 @cc3 @dd4 @ee5 @ff6", reasons)
+        assert score == spam_detector.cfg.weights["mention_bomb"]
+        assert reasons == ["メンションが過剰に含まれています"]
+
+
+LONG_POST = "今日は三田本店で小ラーメンを食べました。ニンニクヤサイマシマシで最高でした！また来週も行きます。"
+
+
+class TestNearDuplicate:
+    def test_signature_ignores_punctuation_and_kana_variants(self):
+        base = spam_detector.content_signature(LONG_POST)
+        variant = spam_detector.content_signature(
+            "今日は三田本店で小らーめんを食べました!!　にんにくやさいましましで最高でした…また来週も行きます"
+        )
+        assert estimate_similarity(base, variant) == 1.0
+
+    def test_signature_is_stored_on_insert_and_update(self, test_db):
+        post = Post(content=LONG_POST, user_id="alice")
+        test_db.add(post)
+        test_db.commit()
+        assert unpack_signature(post.minhash) == spam_detector.content_signature(LONG_POST)
+        assert post.lsh_band0 is not None
+
+        first_band = post.lsh_band0
+        post.content = "豚山の汁なしは本当に美味しかった。次はアブラ増しで挑戦したいと思います。"
+        test_db.commit()
+        assert post.lsh_band0 != first_band
+
+    def test_near_duplicate_posts_are_found_across_accounts(self, test_db):
+        test_db.add(Post(content=LONG_POST, user_id="alice"))
+        test_db.commit()
+        edited = LONG_POST.replace("来週", "明日")
+
+        own_reasons = []
+        own_score = spam_detector._check_near_duplicate_posts(test_db, "alice", edited, own_reasons)
+        assert own_reasons == ["直近の投稿と内容がほぼ同一です"]
+        assert own_score == spam_detector.cfg.weights["near_duplicate"]
+
+        other_reasons = []
+        spam_detector._check_near_duplicate_posts(test_db, "bob", edited, other_reasons)
+        assert other_reasons == ["他のアカウントの投稿とほぼ同一の内容です"]
+
+    def test_unrelated_and_short_posts_are_not_flagged(self, test_db):
+        test_db.add(Post(content=LONG_POST, user_id="alice"))
+        test_db.add(Post(content="美味しかった", user_id="alice"))
+        test_db.commit()
+
+        reasons = []
+        spam_detector._check_near_duplicate_posts(
+            test_db, "bob", "豚山の汁なしは本当に美味しかった。次はアブラ増しで挑戦したいと思います。", reasons
+        )
+        spam_detector._check_near_duplicate_posts(test_db, "bob", "美味しかった", reasons)
+        assert reasons == []
+
+    def test_near_duplicate_replies_are_checked(self, test_db):
+        test_db.add(Reply(content=LONG_POST, user_id="alice", post_id=1))
+        test_db.commit()
+
+        result = spam_detector.evaluate_reply(test_db, "bob", LONG_POST + "!", 2)
+        assert "他のアカウントの返信とほぼ同一の内容です" in result.reasons
+
+    def test_rows_from_before_the_columns_are_backfilled(self, test_db):
+        post = Post(content=LONG_POST, user_id="alice")
+        reply = Reply(content="いいですね", user_id="alice", post_id=1)
+        blank = Post(content="", user_id="alice")
+        test_db.add_all([post, reply, blank])
+        test_db.commit()
+        # 列の追加前に保存された行と同じ状態にする
+        cleared = {"content_hash": None, **signature_columns(None)}
+        test_db.execute(update(Post).values(cleared))
+        test_db.execute(update(Reply).values(cleared))
+        test_db.commit()
+
+        reasons = []
+        spam_detector._check_user_activity(test_db, "alice", LONG_POST, reasons)
+        assert reasons == []
+
+        assert backfill_signatures(test_db.get_bind(), batch_size=1) == 2
+        assert backfill_signatures(test_db.get_bind()) == 0
+        test_db.expire_all()
+        assert unpack_signature(post.minhash) == spam_detector.content_signature(LONG_POST)
+        assert blank.content_hash is None
+
+        reasons = []
+        spam_detector._check_user_activity(test_db, "alice", LONG_POST, reasons)
+        assert reasons == ["同一内容の投稿が既に存在します"]
+        reasons = []
+        spam_detector._check_near_duplicate_posts(test_db, "bob", LONG_POST.replace("来週", "明日"), reasons)
+        assert reasons == ["他のアカウントの投稿とほぼ同一の内容です"]
+        reasons = []
+        spam_detector._check_user_activity(test_db, "alice", "いいですね", reasons, post_id=1)
+        assert reasons == ["同一内容の返信が既に存在します"]
+
+
+class TestCampaignTracker:
+    def test_counts_distinct_authors_within_window(self):
+        tracker = CampaignTracker(window_seconds=60)
+        assert tracker.observe(["host:spam.example"], "a", now=0) == {"host:spam.example": 1}
+        # 同じ投稿者の再投稿は数えない
+        assert tracker.observe(["host:spam.example"], "a", now=1) == {"host:spam.example": 1}
+        assert tracker.observe(["host:spam.example"], "b", now=2) == {"host:spam.example": 2}
+        # ウィンドウを過ぎた投稿者は外れる
+        assert tracker.observe(["host:spam.example"], "c", now=61.5) == {"host:spam.example": 2}
+
+    def test_memory_is_bounded(self):
+        tracker = CampaignTracker(window_seconds=60, max_keys=3, max_authors_per_key=2)
+        for index in range(5):
+            tracker.observe([f"k{index}"], "a", now=index)
+        stats = tracker.stats()
+        assert stats["keys"] == 3
+        assert stats["evictions"] == 2
+
+        counts = {}
+        for author in "abcd":
+            counts = tracker.observe(["k4"], author, now=10)
+        assert counts == {"k4": 2}
+
+    def test_expired_keys_are_dropped(self):
+        tracker = CampaignTracker(window_seconds=60)
+        tracker.observe(["old"], "a", now=0)
+        tracker.observe(["new"], "a", now=100)
+        assert tracker.stats()["keys"] == 1
+
+
+class TestCampaignCheck:
+    def test_same_text_from_many_accounts_is_flagged(self):
+        detector = SpamDetector()
+        results = [
+            detector.evaluate_post(None, f"user{index}", LONG_POST + "!" * index)
+            for index in range(detector.cfg.campaign_min_authors)
+        ]
+        assert all("複数のアカウントから同じ内容が短時間に投稿されています" not in r.reasons for r in results[:-1])
+        assert "複数のアカウントから同じ内容が短時間に投稿されています" in results[-1].reasons
+
+    def test_same_host_from_many_accounts_is_flagged(self):
+        detector = SpamDetector()
+        reasons = []
+        for index in range(detector.cfg.campaign_min_authors):
+            reasons = []
+            score = detector._check_campaign(f"user{index}", f"見て https://promo.example/{index}", reasons)
+        assert reasons == ["複数のアカウントから同じドメインのURLが短時間に投稿されています"]
+        assert score == detector.cfg.weights["campaign_url_host"]
+
+    def test_common_hosts_and_short_text_are_ignored(self):
+        detector = SpamDetector()
+        reasons = []
+        for index in range(detector.cfg.campaign_min_authors + 1):
+            detector._check_campaign(f"user{index}", "美味しかった https://youtu.be/abc", reasons)
+        assert reasons == []
+
+    @pytest.mark.parametrize(
+        "url", ["https://m.youtube.com/watch?v=abc", "https://mobile.twitter.com/a/status/1",
+                "https://vt.tiktok.com/ZSabc/", "https://s.tabelog.com/tokyo/A1301/"],
+    )
+    def test_subdomains_of_common_hosts_are_ignored(self, url):
+        detector = SpamDetector()
+        reasons = []
+        for index in range(detector.cfg.campaign_min_authors + 1):
+            detector._check_campaign(f"user{index}", f"美味しかった {url}", reasons)
+        assert "複数のアカウントから同じドメインのURLが短時間に投稿されています" not in reasons
+
+    def test_lookalike_hosts_are_not_ignored(self):
+        detector = SpamDetector()
+        assert detector._campaign_host("m.youtube.com") is None
+        assert detector._campaign_host("notyoutube.com") == "notyoutube.com"
+        assert detector._campaign_host("youtube.com.evil.example") == "youtube.com.evil.example"
+
+
+class TestUserActivityCheck:
+    def test_exact_duplicate_uses_normalized_hash(self, test_db):
+        test_db.add(Post(content="ラーメン　美味しい", user_id="alice"))
+        test_db.commit()
+
+        reasons = []
+        score = spam_detector._check_user_activity(test_db, "alice", " ラーメン 美味しい ", reasons)
+        assert reasons == ["同一内容の投稿が既に存在します"]
+        assert score == spam_detector.cfg.weights["exact_duplicate"]
+
+        reasons = []
+        spam_detector._check_user_activity(test_db, "bob", "ラーメン 美味しい", reasons)
+        assert reasons == []
+
+    def test_reply_duplicate_is_scoped_to_post(self, test_db):
+        test_db.add(Reply(content="いいですね", user_id="alice", post_id=1))
+        test_db.commit()
+
+        reasons = []
+        spam_detector._check_user_activity(test_db, "alice", "いいですね", reasons, post_id=1)
+        assert reasons == ["同一内容の返信が既に存在します"]
+        reasons = []
+        spam_detector._check_user_activity(test_db, "alice", "いいですね", reasons, post_id=2)
+        assert reasons == []
+
+    def test_burst_counts_posts_and_replies(self, test_db):
+        limit = spam_detector.cfg.burst_max_posts
+        test_db.add_all([Post(content=f"投稿{i}", user_id="alice") for i in range(limit)])
+        test_db.add(Reply(content="返信", user_id="alice", post_id=1))
+        test_db.commit()
+
+        reasons = []
+        score = spam_detector._check_user_activity(test_db, "alice", "新しい投稿", reasons)
+        assert reasons == ["短時間に大量の投稿/返信が行われています"]
+        assert score == spam_detector.cfg.weights["burst"]
+
+    def test_evaluate_post_issues_two_queries(self, test_db):
+        test_db.add(Post(content=LONG_POST, user_id="alice"))
+        test_db.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        bind = test_db.get_bind()
+        event.listen(bind, "before_cursor_execute", record)
+        try:
+            result = spam_detector.evaluate_post(test_db, "alice", LONG_POST)
+        finally:
+            event.remove(bind, "before_cursor_execute", record)
+
+        assert "同一内容の投稿が既に存在します" in result.reasons
+        # 完全重複 + バースト（1回）と近似重複（1回）
+        assert len(statements) == 2
@@ -0,0 +1,121 @@
+import asyncio
+import io
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from app.utils import image_processor
+from app.utils.transcode_pool import TranscodeBusyError, TranscodePool
+
+
+def _blocking_job(started: threading.Event, release: threading.Event) -> str:
+    started.set()
+    release.wait(5)
+    return "done"
+
+
+def _jpeg_bytes(size=(640, 480)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _register(test_client, user_id: str) -> dict:
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": user_id, "email": f"{user_id}@example.com", "password": "password123!"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestTranscodePool:
+    async def test_rejects_when_workers_and_queue_are_full(self):
+        pool = TranscodePool(max_workers=1, max_pending=1, kind="thread")
+        release = threading.Event()
+        started = threading.Event()
+        try:
+            running = asyncio.ensure_future(pool.run(_blocking_job, started, release))
+            queued = asyncio.ensure_future(pool.run(_blocking_job, threading.Event(), release))
+            await asyncio.sleep(0)
+            assert await asyncio.to_thread(started.wait, 5)
+
+            with pytest.raises(TranscodeBusyError):
+                await pool.run(_blocking_job, threading.Event(), release)
+            assert pool.stats()["rejected"] == 1
+
+            release.set()
+            assert await asyncio.gather(running, queued) == ["done", "done"]
+            assert pool.stats()["in_flight"] == 0
+
+            # 空きができれば再び受け付ける
+            assert await pool.run(_blocking_job, threading.Event(), release) == "done"
+        finally:
+            release.set()
+            pool.shutdown(wait=True)
+
+    async def test_process_pool_runs_image_transcode(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        image_processor.ensure_directories_exist()
+
+        pool = TranscodePool(max_workers=1, max_pending=0, kind="process")
+        try:
+            thumbnail_url, original_url, _ = await pool.run(image_processor._transcode_image, _jpeg_bytes())
+        finally:
+            pool.shutdown(wait=True)
+
+        assert os.path.exists(original_url.lstrip("/"))
+        with Image.open(thumbnail_url.lstrip("/")) as thumbnail:
+            assert thumbnail.format == "WEBP"
+            assert thumbnail.width == 400
+
+
+class TestImageUploadBackPressure:
+    def test_post_with_image_is_transcoded_off_the_event_loop(self, test_client, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+        monkeypatch.setattr(image_processor, "transcode_pool", pool)
+        headers = _register(test_client, "imageuser")
+
+        response = test_client.post(
+            "/api/v1/posts",
+            data={"content": "画像付き投稿"},
+            files={"image": ("photo.jpg", io.BytesIO(_jpeg_bytes()), "image/jpeg")},
+            headers=headers,
+        )
+        pool.shutdown(wait=True)
+
+        assert response.status_code == 201
+        assert response.json()["thumbnail_url"].startswith("/uploads/media/")
+        assert pool.stats()["completed"] == 1
+
+    def test_post_with_image_returns_503_when_pool_is_saturated(self, test_client, monkeypatch):
+        pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+        pool._in_flight = pool.capacity
+        monkeypatch.setattr(image_processor, "transcode_pool", pool)
+        headers = _register(test_client, "busyimageuser")
+
+        response = test_client.post(
+            "/api/v1/posts",
+            data={"content": "画像付き投稿"},
+            files={"image": ("photo.jpg", io.BytesIO(_jpeg_bytes()), "image/jpeg")},
+            headers=headers,
+        )
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+
+    def test_profile_icon_returns_503_when_pool_is_saturated(self, test_client, monkeypatch):
+        pool = TranscodePool(max_workers=1, max_pending=0, kind="thread")
+        pool._in_flight = pool.capacity
+        monkeypatch.setattr(image_processor, "transcode_pool", pool)
+        headers = _register(test_client, "busyiconuser")
+
+        response = test_client.post(
+            "/api/v1/users/me/icon",
+            files={"icon": ("icon.jpg", io.BytesIO(_jpeg_bytes()), "image/jpeg")},
+            headers=headers,
+        )
+
+        assert response.status_code == 503
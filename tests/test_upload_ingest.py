@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils.image_validation import validate_image_upload
+from app.utils.upload_ingest import IngestedUpload, UploadTooLargeError, read_stream
+
+
+class CountingStream(io.BytesIO):
+    """read で返したバイト数を数える"""
+
+    def __init__(self, data: bytes, seekable: bool = True) -> None:
+        super().__init__(data)
+        self.bytes_read = 0
+        self._seekable = seekable
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def seek(self, *args):
+        if not self._seekable:
+            raise OSError("not seekable")
+        return super().seek(*args)
+
+
+def _png_bytes(size=(200, 150)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (10, 200, 90)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestReadStream:
+    def test_reads_the_body_exactly_once(self):
+        data = _png_bytes()
+        stream = CountingStream(data)
+        stream.seek(10)
+
+        assert read_stream(stream, max_bytes=len(data)) == data
+        assert stream.bytes_read == len(data)
+
+    def test_oversized_seekable_upload_is_rejected_without_reading(self):
+        stream = CountingStream(b"x" * 5000)
+
+        with pytest.raises(UploadTooLargeError):
+            read_stream(stream, max_bytes=4096)
+        assert stream.bytes_read == 0
+
+    def test_oversized_stream_stops_at_the_cap(self):
+        stream = CountingStream(b"x" * (2 * 1024 * 1024), seekable=False)
+
+        with pytest.raises(UploadTooLargeError):
+            read_stream(stream, max_bytes=300 * 1024)
+        # 上限を超えたチャンクで打ち切り、残りは読まない
+        assert stream.bytes_read < 1024 * 1024
+
+
+class TestIngestedUpload:
+    def test_sniffs_type_from_content_not_name(self):
+        upload = IngestedUpload(_png_bytes(), filename="photo.jpg", declared_type="image/jpeg")
+
+        assert upload.mime == "image/png"
+        with upload.open_image() as img:
+            assert img.size == (200, 150)
+
+    def test_validation_rejects_disguised_content(self):
+        pdf = b"%PDF-1.4\n" + b"0" * 2048
+        upload = IngestedUpload(pdf, filename="photo.png", declared_type="image/png")
+
+        result = validate_image_upload(upload)
+
+        assert not result["is_valid"]
+        assert "application/pdf" in result["error"]
+
+    def test_validation_accepts_image_buffer(self):
+        upload = IngestedUpload(_png_bytes(), filename="photo.png")
+
+        assert validate_image_upload(upload) == {"is_valid": True, "error": None}
+
+
+def test_post_with_oversized_image_is_rejected(test_client, monkeypatch):
+    from app.routes import posts
+
+    monkeypatch.setattr(posts, "MAX_IMAGE_SIZE_BYTES", 1024)
+    response = test_client.post(
+        "/api/v1/auth/register",
+        json={"id": "biguploader", "email": "big@example.com", "password": "password123!"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = test_client.post(
+        "/api/v1/posts",
+        data={"content": "大きな画像"},
+        files={"image": ("photo.png", io.BytesIO(_png_bytes((400, 400))), "image/png")},
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "画像サイズは20MB以下にしてください"
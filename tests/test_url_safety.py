@@ -1,3 +1,8 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
@@ -11,6 +16,12 @@ app.include_router(router)
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_blocklist_cache(tmp_path, monkeypatch):
+    """共有インスタンスのスナップショットをリポジトリ内に書き出さないようにする"""
+    monkeypatch.setattr(url_blocklist_manager, "_cache_dir", str(tmp_path))
+
 class TestURLSafetyAPI:
     """URL安全性チェックAPIのテスト"""
 
@@ -82,6 +93,48 @@ class TestURLSafetyAPI:
         response = client.post('/api/url-safety-check', json={'url': 'invalid-url'})
         assert response.status_code == 200  # 無効なURLでも200を返す（safe=Falseになる）
 
+    @patch.object(url_blocklist_manager, 'ensure_loaded')
+    def test_check_url_safety_batch_dedupes_by_domain(self, mock_ensure_loaded):
+        """バッチチェックは同じドメインを1回だけ照合し、URLをキーに返す"""
+        from app.utils.domain_index import DomainSuffixIndex
+
+        mock_ensure_loaded.return_value = None
+        original = dict(url_blocklist_manager._cache)
+        url_blocklist_manager._install_indexes({
+            "phishing": DomainSuffixIndex(["phish.example"]),
+            "urlhaus": DomainSuffixIndex(()),
+        })
+        try:
+            with patch.object(url_blocklist_manager, '_match_domain', wraps=url_blocklist_manager._match_domain) as spy:
+                response = client.post('/api/url-safety-check/batch', json={'urls': [
+                    'https://a.phish.example/login',
+                    'https://a.phish.example/other',
+                    'https://example.com/',
+                    'https://example.com/',
+                    'not a url',
+                ]})
+                assert spy.call_count == 2
+        finally:
+            url_blocklist_manager._install_indexes(original)
+
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert set(results) == {
+            'https://a.phish.example/login', 'https://a.phish.example/other', 'https://example.com/', 'not a url',
+        }
+        assert results['https://a.phish.example/other'] == {
+            'safe': False, 'reason': 'matched', 'matched_domain': 'phish.example', 'source': 'phishing',
+        }
+        assert results['https://example.com/']['safe'] is True
+        assert results['not a url']['reason'] == 'invalid_url'
+
+    def test_check_url_safety_batch_rejects_oversized_batch(self):
+        from app.routes.url_safety import MAX_BATCH_URLS
+
+        urls = [f'https://example.com/{i}' for i in range(MAX_BATCH_URLS + 1)]
+        assert client.post('/api/url-safety-check/batch', json={'urls': urls}).status_code == 422
+        assert client.post('/api/url-safety-check/batch', json={'urls': []}).status_code == 422
+
     @patch.object(url_blocklist_manager, 'ensure_loaded')
     def test_get_blocklist_status(self, mock_ensure_loaded):
         """ブロックリストステータスのテスト"""
@@ -99,6 +152,8 @@ class TestURLSafetyAPI:
         assert 'phishing_domains' in data
         assert 'urlhaus_domains' in data
         assert 'total_domains' in data
+        assert set(data['memory_bytes']) == {'phishing', 'urlhaus'}
+        assert data['total_memory_bytes'] == sum(data['memory_bytes'].values())
 
 class TestSpamDetectorIntegration:
     """SpamDetectorとの統合テスト"""
@@ -197,5 +252,170 @@ class TestURLBlocklistManager:
         assert 'bad-site.com' in result
         assert len(result) == 3
 
+class TestDomainSuffixIndex:
+    """ブロックリスト索引の単体テスト"""
+
+    def test_matches_most_specific_registered_suffix(self):
+        from app.utils.domain_index import DomainSuffixIndex
+
+        index = DomainSuffixIndex(["evil.com", "login.evil.com", "bad.co.jp"])
+        assert len(index) == 3
+        assert index.match("a.login.evil.com") == "login.evil.com"
+        assert index.match("www.evil.com") == "evil.com"
+        assert index.match("shop.bad.co.jp") == "bad.co.jp"
+        assert index.match("notevil.com") is None
+        assert index.match("evil.com.example.org") is None
+        # TLD だけの登録には一致させない
+        assert DomainSuffixIndex(["com"]).match("example.com") is None
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        from app.utils.domain_index import DomainSuffixIndex
+
+        domains = [f"site{i}.example{i % 7}.net" for i in range(2000)]
+        index = DomainSuffixIndex(domains)
+        assert all(domain in index for domain in domains)
+        assert index.memory_bytes() > 0
+
+    def test_check_url_uses_index(self):
+        from app.utils.domain_index import DomainSuffixIndex
+        from app.utils.url_safety import URLBlocklistManager
+
+        manager = URLBlocklistManager(cache_dir="")
+        manager._cache["urlhaus"] = DomainSuffixIndex(["malware.example"])
+        result = manager.check_url("https://cdn.malware.example/payload.exe")
+        assert result.safe is False
+        assert result.matched_domain == "malware.example"
+        assert result.source == "urlhaus"
+        assert manager.check_url("https://example.org/").safe is True
+        assert manager.stats()["urlhaus_domains"] == 1
+
+    def test_domain_verdicts_are_cached_until_index_changes(self):
+        from app.utils.domain_index import DomainSuffixIndex
+        from app.utils.url_safety import URLBlocklistManager
+
+        manager = URLBlocklistManager(cache_dir="", verdict_ttl_seconds=60)
+        assert manager.check_url("https://a.example.org/").safe is True
+        assert manager.check_url("https://a.example.org/other").safe is True
+        assert (manager.verdict_hits, manager.verdict_misses) == (1, 1)
+
+        # 索引が差し替わったら判定結果も破棄する
+        manager._install_indexes({"phishing": DomainSuffixIndex(["example.org"]), "urlhaus": DomainSuffixIndex(())})
+        assert manager.check_url("https://a.example.org/").safe is False
+        assert manager.stats()["verdict_cache"]["entries"] == 1
+
+
+class _BlocklistHandler(BaseHTTPRequestHandler):
+    """ETag 付きでブロックリストを返すテスト用サーバー"""
+
+    lists = {}
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        body = type(self).lists.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def blocklist_server():
+    _BlocklistHandler.lists = {
+        "/phishing.txt": "# comment\nphish.example\n127.0.0.1 login.bank-phish.example\n",
+        "/urlhaus.txt": "malware.example\n",
+    }
+    _BlocklistHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BlocklistHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _manager_for(base_url, cache_dir):
+    from app.utils.url_safety import URLBlocklistManager
+
+    manager = URLBlocklistManager(cache_dir=str(cache_dir))
+    # インデックス 2 が urlhaus として扱われる
+    manager.block_lists = [f"{base_url}/phishing.txt", f"{base_url}/missing.txt", f"{base_url}/urlhaus.txt"]
+    manager.extra_lists = []
+    return manager
+
+
+class TestBlocklistSnapshot:
+    """スナップショットの書き出し・共有・条件付き更新のテスト"""
+
+    def test_snapshot_round_trip(self, tmp_path):
+        from app.utils.blocklist_snapshot import BlocklistSnapshot, write_snapshot
+        from app.utils.domain_index import DomainSuffixIndex
+
+        path = str(tmp_path / "blocklist.snap")
+        write_snapshot(path, {"phishing": DomainSuffixIndex(["evil.com", "bad.co.jp"])}, {"lists": {"u": {"etag": "x"}}})
+        snapshot = BlocklistSnapshot(path)
+        index = snapshot.indexes["phishing"]
+        assert len(index) == 2
+        assert index.match("www.evil.com") == "evil.com"
+        assert index.match("good.co.jp") is None
+        assert snapshot.meta == {"lists": {"u": {"etag": "x"}}}
+
+    def test_corrupt_snapshot_is_rejected(self, tmp_path):
+        from app.utils.blocklist_snapshot import BlocklistSnapshot, SnapshotError
+
+        path = tmp_path / "blocklist.snap"
+        path.write_bytes(b"not a snapshot at all")
+        with pytest.raises(SnapshotError):
+            BlocklistSnapshot(str(path))
+
+    async def test_refresh_writes_snapshot_shared_by_other_workers(self, blocklist_server, tmp_path):
+        refresher = _manager_for(blocklist_server, tmp_path)
+        await refresher.ensure_loaded()
+        assert refresher.stats()["snapshot"]["mapped"] is True
+        assert refresher.check_url("https://a.login.bank-phish.example/").source == "phishing"
+
+        # 別のワーカー（とスパム判定）はダウンロードせず、スナップショットを読むだけで照合できる
+        requests_before = len(_BlocklistHandler.requests)
+        worker = _manager_for(blocklist_server, tmp_path)
+        result = worker.check_url("http://cdn.malware.example/x.exe")
+        assert result.safe is False
+        assert result.source == "urlhaus"
+        await worker.ensure_loaded()
+        assert len(_BlocklistHandler.requests) == requests_before
+
+    async def test_unchanged_lists_are_revalidated_with_etag(self, blocklist_server, tmp_path):
+        manager = _manager_for(blocklist_server, tmp_path)
+        await manager.ensure_loaded()
+        inode = os.stat(manager.snapshot_path).st_ino
+
+        _BlocklistHandler.requests = []
+        await manager.ensure_loaded(force=True)
+        conditional = [etag for path, etag in _BlocklistHandler.requests if path != "/missing.txt"]
+        assert conditional and all(etag for etag in conditional)
+        # すべて 304 なので索引は作り直さない
+        assert os.stat(manager.snapshot_path).st_ino == inode
+        assert manager.check_url("https://phish.example/").safe is False
+
+        # リストが更新されたら作り直して差し替える
+        _BlocklistHandler.lists["/urlhaus.txt"] = "malware.example\nnew-malware.example\n"
+        await manager.ensure_loaded(force=True)
+        assert os.stat(manager.snapshot_path).st_ino != inode
+        assert manager.check_url("https://new-malware.example/").source == "urlhaus"
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file
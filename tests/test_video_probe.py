@@ -0,0 +1,131 @@
+import io
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import video_validation
+from app.utils.video_probe import VideoInfo, VideoProbeError, probe_video
+from app.utils.video_validation import probe_video_file
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _full_box(kind: bytes, version: int, payload: bytes) -> bytes:
+    return _box(kind, bytes([version, 0, 0, 0]) + payload)
+
+
+def _mp4(duration: int, timescale: int = 1000, version: int = 0, brand: bytes = b"isom", codec: bytes = b"avc1",
+         moov_last: bool = False) -> bytes:
+    if version == 1:
+        mvhd = _full_box(b"mvhd", 1, struct.pack(">QQIQ", 0, 0, timescale, duration) + bytes(80))
+    else:
+        mvhd = _full_box(b"mvhd", 0, struct.pack(">IIII", 0, 0, timescale, duration) + bytes(80))
+    sound = _box(b"trak", _box(b"mdia", _full_box(b"hdlr", 0, b"\0\0\0\0soun" + bytes(12))))
+    video = _box(
+        b"trak",
+        _box(
+            b"mdia",
+            _full_box(b"hdlr", 0, b"\0\0\0\0vide" + bytes(12))
+            + _box(b"minf", _box(b"stbl", _full_box(b"stsd", 0, struct.pack(">I", 1) + _box(codec, bytes(78))))),
+        ),
+    )
+    ftyp = _box(b"ftyp", brand + struct.pack(">I", 0) + brand)
+    moov = _box(b"moov", mvhd + sound + video)
+    mdat = _box(b"mdat", bytes(4096))
+    return ftyp + (mdat + moov if moov_last else moov + mdat)
+
+
+def _element(element_id: int, payload: bytes, unknown_size: bool = False) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    size = b"\x01\xff\xff\xff\xff\xff\xff\xff" if unknown_size else (0x01 << 56 | len(payload)).to_bytes(8, "big")
+    return id_bytes + size + payload
+
+
+def _simple_block(timestamp: int) -> bytes:
+    return _element(0xA3, b"\x81" + struct.pack(">h", timestamp) + b"\x80" + bytes(512))
+
+
+def _webm(duration_ms=None, clusters=((0, (0, 500)),), unknown_cluster_size: bool = False) -> bytes:
+    header = _element(0x1A45DFA3, _element(0x4282, b"webm"))
+    info = _element(0x2AD7B1, (1_000_000).to_bytes(3, "big"))
+    if duration_ms is not None:
+        info += _element(0x4489, struct.pack(">d", duration_ms))
+    tracks = _element(
+        0x1654AE6B,
+        _element(0xAE, _element(0x83, b"\x02") + _element(0x86, b"A_OPUS"))
+        + _element(0xAE, _element(0x83, b"\x01") + _element(0x86, b"V_VP9")),
+    )
+    body = _element(0x1549A966, info) + tracks
+    for cluster_time, block_times in clusters:
+        payload = _element(0xE7, cluster_time.to_bytes(2, "big")) + b"".join(_simple_block(t) for t in block_times)
+        body += _element(0x1F43B675, payload, unknown_size=unknown_cluster_size)
+    return header + _element(0x18538067, body, unknown_size=True)
+
+
+class TestMp4:
+    def test_reads_duration_and_video_codec(self):
+        info = probe_video(io.BytesIO(_mp4(duration=9500)))
+
+        assert info.container == "mp4"
+        assert info.duration == pytest.approx(9.5)
+        assert info.codec == "avc1"
+
+    def test_version1_mvhd_and_moov_after_mdat(self):
+        info = probe_video(io.BytesIO(_mp4(duration=12 * 90000, timescale=90000, version=1, moov_last=True)))
+
+        assert info.duration == pytest.approx(12.0)
+
+    def test_quicktime_brand(self):
+        info = probe_video(io.BytesIO(_mp4(duration=3000, brand=b"qt  ", codec=b"hvc1")))
+
+        assert (info.container, info.codec) == ("mov", "hvc1")
+
+    def test_truncated_file_is_rejected(self):
+        data = _mp4(duration=1000, moov_last=True)
+
+        with pytest.raises(VideoProbeError):
+            probe_video(io.BytesIO(data[:-40]))
+
+
+class TestWebm:
+    def test_reads_duration_from_info(self):
+        info = probe_video(io.BytesIO(_webm(duration_ms=4250.0)))
+
+        assert info.container == "webm"
+        assert info.duration == pytest.approx(4.25)
+        assert info.codec == "V_VP9"
+
+    def test_duration_from_blocks_when_info_has_none(self):
+        clusters = ((0, (0, 5000)), (10000, (0, 1500)))
+
+        info = probe_video(io.BytesIO(_webm(clusters=clusters, unknown_cluster_size=True)))
+
+        assert info.duration == pytest.approx(11.5)
+
+    @pytest.mark.parametrize("bad_duration", [float("nan"), float("inf")])
+    def test_non_finite_duration_falls_back_to_blocks(self, bad_duration):
+        clusters = ((0, (0, 5000)), (10000, (0, 2000)))
+
+        info = probe_video(io.BytesIO(_webm(duration_ms=bad_duration, clusters=clusters)))
+
+        assert info.duration == pytest.approx(12.0)
+        result = probe_video_file(SimpleNamespace(file=io.BytesIO(_webm(duration_ms=bad_duration, clusters=clusters))))
+        assert result["is_valid"] is False
+        assert result["error"] == "動画は10秒以内にしてください"
+
+
+@pytest.mark.parametrize("bad_duration", [float("nan"), float("inf")])
+def test_probe_video_file_rejects_non_finite_duration(monkeypatch, bad_duration):
+    monkeypatch.setattr(video_validation, "probe_video", lambda f: VideoInfo("webm", bad_duration, "V_VP9"))
+
+    result = probe_video_file(SimpleNamespace(file=io.BytesIO(b"")))
+
+    assert result == {"is_valid": False, "error": "動画の長さを読み取れませんでした"}
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(VideoProbeError):
+        probe_video(io.BytesIO(b"fake video data"))